@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""Benchmark systemd-net commands against N synthetic services with fake systemctl/journalctl.
+
+Every measurement runs in its own process (see runner.py) and reports wall time, started
+subprocesses, time spent in fake tools, opened data files and peak RSS.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+from datetime import datetime
+
+from generate import generate_units
+
+BENCH_DIR = os.path.abspath(os.path.dirname(__file__))
+FAKE_BIN_DIR = os.path.join(BENCH_DIR, 'fakebin')
+RUNNER_PATH = os.path.join(BENCH_DIR, 'runner.py')
+BENCH_SIZES = [10, 100, 1000, 10000]
+BENCH_PREFIX = "netapp."
+BENCH_TABLE_HEADERS = ["Benchmark", "N", "Wall ms", "Subprocesses", "Fake tools ms", "Files opened", "Peak RSS KiB", "Change"]
+
+class BenchRun:
+    """Directories and environment shared by all benchmarks of one N."""
+
+    def __init__(self, work_dir:str, count:int, latency_ms:float):
+        self.ServiceDir = os.path.join(work_dir, 'services')
+        self.CacheDir = os.path.join(work_dir, 'cache')
+        self.CallsLog = os.path.join(work_dir, 'calls.jsonl')
+        self.StatsPath = os.path.join(work_dir, 'stats.json')
+        proc_net_dir = os.path.join(work_dir, 'proc-net') # no listeners, results do not depend on host
+        os.makedirs(proc_net_dir, exist_ok=True)
+        generate_units(self.ServiceDir, count, BENCH_PREFIX)
+        self.Env = dict(os.environ,
+            PATH=f"{FAKE_BIN_DIR}{os.pathsep}{os.environ.get('PATH', '')}",
+            BENCH_CALLS_LOG=self.CallsLog,
+            BENCH_FAKE_LATENCY_MS=str(latency_ms),
+            SYSTEMD_NET_CACHE_DIR=self.CacheDir,
+            SYSTEMD_NET_PROC_NET_DIR=proc_net_dir,
+            SYSTEMD_NET_CGROUP_ROOT=os.path.join(work_dir, 'cgroup'),
+        )
+
+    def measure(self, name:str, count:int, runner_args:list[str])->dict:
+        for path in (self.CallsLog, self.StatsPath):
+            if os.path.exists(path):
+                os.remove(path)
+        started = time.perf_counter()
+        process = subprocess.Popen([sys.executable, RUNNER_PATH, self.StatsPath] + runner_args,
+                                   env=self.Env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        _, status, usage = os.wait4(process.pid, 0)
+        wall = time.perf_counter() - started
+        process.returncode = os.waitstatus_to_exitcode(status)
+        stderr = process.stderr.read().decode('utf-8', 'replace')
+        process.stderr.close()
+
+        stats = { 'files_opened': None, 'subprocesses': None }
+        if os.path.isfile(self.StatsPath):
+            with open(self.StatsPath, 'r') as file:
+                stats = json.load(file)
+        fake_ms = 0.0
+        if os.path.isfile(self.CallsLog):
+            with open(self.CallsLog, 'r') as file:
+                fake_ms = sum(json.loads(line)['duration_ms'] for line in file if line.strip())
+        return {
+            'benchmark': name, 'n': count, 'wall_ms': wall * 1000, 'exit_code': process.returncode,
+            'subprocesses': stats['subprocesses'], 'fake_tools_ms': round(fake_ms, 2),
+            'files_opened': stats['files_opened'], 'peak_rss_kib': usage.ru_maxrss,
+            'error': stderr.strip().splitlines()[-1] if process.returncode not in (0, None) and stderr.strip() else '',
+        }
+
+def get_benchmarks(run:BenchRun)->list[tuple[str,list[str]]]:
+    common = ['-sdir', run.ServiceDir, '--cache-dir', run.CacheDir]
+    return [
+        ('list (cold cache)', ['cli', 'list'] + common),
+        ('list', ['cli', 'list'] + common),
+        ('list -r', ['cli', 'list', '-r', '--interval', '0'] + common),
+        ('add', ['cli', 'add', 'bench-added', '/www/Added/Added.dll', '-edir', run.ServiceDir, '--no-runtime-check', '--aspnetcore-urls', 'auto'] + common),
+        ('del', ['cli', 'del', 'bench-added', '-F'] + common),
+        ('get_services', ['function', 'get_services', run.ServiceDir, BENCH_PREFIX, run.CacheDir]),
+        ('read_service', ['function', 'read_service', run.ServiceDir, BENCH_PREFIX]),
+    ]
+
+def run_benchmarks(sizes:list[int], repeat:int, latency_ms:float, only:list[str])->list[dict]:
+    results:list[dict] = []
+    for count in sizes:
+        work_dir = tempfile.mkdtemp(prefix=f"systemd-net-bench-{count}-")
+        try:
+            run = BenchRun(work_dir, count, latency_ms)
+            for name, runner_args in get_benchmarks(run):
+                if only and name.split()[0] not in only:
+                    continue
+                # Cold cache run has to find empty cache every time
+                if name.endswith('(cold cache)'):
+                    samples = []
+                    for _ in range(repeat):
+                        shutil.rmtree(run.CacheDir, ignore_errors=True)
+                        samples.append(run.measure(name, count, runner_args))
+                elif name in ('add', 'del'):
+                    samples = [run.measure(name, count, runner_args)] # changes services, measured once
+                else:
+                    samples = [run.measure(name, count, runner_args) for _ in range(repeat)]
+                result = samples[-1]
+                result['wall_ms'] = round(statistics.median(s['wall_ms'] for s in samples), 2)
+                results.append(result)
+                print(f"{name:<20} N={count:<6} {result['wall_ms']:10.1f} ms", file=sys.stderr, flush=True)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+def get_commit()->str:
+    result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    return result.stdout.strip()
+
+def format_change(result:dict, baseline:dict[tuple[str,int],dict])->str:
+    previous = baseline.get((result['benchmark'], result['n']))
+    if previous is None or not previous.get('wall_ms'):
+        return ''
+    return f"{(result['wall_ms'] / previous['wall_ms'] - 1) * 100:+.0f}%"
+
+def print_results(results:list[dict], baseline:dict[tuple[str,int],dict]):
+    data = []
+    for r in results:
+        name = r['benchmark'] if r['exit_code'] == 0 else f"{r['benchmark']} (exit {r['exit_code']}: {r['error']})"
+        data.append([name, r['n'], f"{r['wall_ms']:.1f}", r['subprocesses'], f"{r['fake_tools_ms']:.1f}", r['files_opened'], r['peak_rss_kib'], format_change(r, baseline)])
+    from tabulate import tabulate
+    print(tabulate(data, headers=BENCH_TABLE_HEADERS, tablefmt="github", disable_numparse=True))
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark systemd-net commands with synthetic services")
+    parser.add_argument('-n', '--sizes', type=str, help="Comma separated numbers of services\n(default: %(default)s)", default=','.join(str(s) for s in BENCH_SIZES))
+    parser.add_argument('-r', '--repeat', type=int, help="Runs per benchmark, median wall time is reported\n(default: %(default)s)", default=3)
+    parser.add_argument('--latency-ms', type=float, help="Simulated latency of every fake systemctl/journalctl call\n(default: %(default)s)", default=0.0)
+    parser.add_argument('--only', type=str, help="Comma separated benchmarks to run (list, add, del, get_services, read_service)", default='')
+    parser.add_argument('-o', '--output', type=str, help="Save results to JSON file", default=None)
+    parser.add_argument('--compare', type=str, help="Show wall time change against results JSON saved earlier", default=None)
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(',') if s.strip()]
+    only = [s.strip() for s in args.only.split(',') if s.strip()]
+    results = run_benchmarks(sizes, max(1, args.repeat), args.latency_ms, only)
+
+    baseline:dict[tuple[str,int],dict] = {}
+    if args.compare is not None:
+        with open(args.compare, 'r') as file:
+            baseline = { (r['benchmark'], r['n']): r for r in json.load(file)['results'] }
+    print_results(results, baseline)
+
+    if args.output is not None:
+        report = {
+            'created': datetime.now().isoformat(timespec='seconds'), 'commit': get_commit(),
+            'python': platform.python_version(), 'platform': platform.platform(),
+            'latency_ms': args.latency_ms, 'repeat': args.repeat, 'results': results,
+        }
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""Fill service directory with N synthetic units like the ones `add` writes."""
+
+import os
+import sys
+import time
+import argparse
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from modules.core import TOOL_FILEGEN_COMMENT
+from modules.profiles import BUILTIN_PROFILES, PROFILE_UNIT_KEY
+
+BENCH_PROFILES = [None, 'throughput', 'latency', 'low-memory']
+BENCH_FIRST_PORT = 10000
+
+def format_unit(svc_dir:str, name:str, idx:int, profile:str=None)->str:
+    app_dir = f"/www/{name}"
+    lines = [ TOOL_FILEGEN_COMMENT, '', '[Unit]', f"Description=Benchmark service {idx}" ]
+    if profile is not None:
+        lines.append(f"{PROFILE_UNIT_KEY}={profile}")
+    lines += [ '', '[Service]',
+        f"WorkingDirectory={app_dir}",
+        f"ExecStart=/usr/bin/dotnet {app_dir}/App{idx}.dll",
+        "Restart=always", "RestartSec=5", "KillSignal=SIGINT",
+        f"SyslogIdentifier={name}",
+        "User=www-data", "Group=www-data",
+        f"EnvironmentFile={os.path.join(svc_dir, f'{name}.env')}",
+    ]
+    if profile is not None:
+        lines += [f"{key}={value}" for key, value in BUILTIN_PROFILES[profile]['service'].items()]
+    lines += [ '', '[Install]', 'WantedBy=multi-user.target' ]
+    return '\n'.join(lines)
+
+def format_env(idx:int, profile:str=None)->str:
+    lines = [ TOOL_FILEGEN_COMMENT,
+        f"ASPNETCORE_URLS=\"http://+:{BENCH_FIRST_PORT + idx}\"",
+        "ASPNETCORE_ENVIRONMENT=\"Production\"",
+        f"ConnectionStrings__Default=\"Host=db{idx % 4};Database=app{idx}\"",
+        f"Logging__LogLevel__Default=\"{'Warning' if idx % 2 else 'Information'}\"",
+    ]
+    if profile is not None:
+        lines += [f"{key}=\"{value}\"" for key, value in BUILTIN_PROFILES[profile]['env'].items()]
+    return '\n'.join(lines)
+
+def generate_units(svc_dir:str, count:int, prefix:str="netapp.")->list[str]:
+    """Write `count` service and env files using resource profiles in turn, returns unit names."""
+    os.makedirs(svc_dir, exist_ok=True)
+    names:list[str] = []
+    for idx in range(count):
+        name = f"{prefix}bench{idx}"
+        profile = BENCH_PROFILES[idx % len(BENCH_PROFILES)]
+        with open(os.path.join(svc_dir, f"{name}.service"), 'w') as file:
+            file.write(format_unit(svc_dir, name, idx, profile))
+        with open(os.path.join(svc_dir, f"{name}.env"), 'w') as file:
+            file.write(format_env(idx, profile))
+        names.append(name)
+    # Existing services are not modified just now, otherwise inventory cache skips them as racy
+    past = time.time() - 3600
+    for name in names:
+        for suffix in ('.service', '.env'):
+            os.utime(os.path.join(svc_dir, f"{name}{suffix}"), (past, past))
+    os.utime(svc_dir, (past, past))
+    return names
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic systemd-net services")
+    parser.add_argument('count', type=int, help="Number of services")
+    parser.add_argument('service_dir', type=str, help="Directory for .service and .env files")
+    parser.add_argument('-p', '--prefix', type=str, help="Services prefix\n(default: '%(default)s')", default="netapp.")
+    args = parser.parse_args()
+    generate_units(args.service_dir, args.count, args.prefix)
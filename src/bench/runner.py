@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""Run systemd-net command or module function counting opened files and started processes.
+
+Usage: runner.py <stats.json> cli <command args...>
+       runner.py <stats.json> function <name> <args...>
+"""
+
+import os
+import sys
+import json
+import atexit
+import runpy
+
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+CLI_PATH = os.path.join(SRC_DIR, 'bin', 'systemd-net.py')
+MODULE_SUFFIXES = ('.py', '.pyc', '.so')
+
+stats = { 'files_opened': 0, 'subprocesses': 0 }
+
+def audit(event:str, args:tuple):
+    if event == 'open':
+        path = args[0]
+        # Imports are measured by wall time, count only data files
+        if isinstance(path, (str, bytes)) and not os.fsdecode(path).endswith(MODULE_SUFFIXES):
+            stats['files_opened'] += 1
+    elif event in ('subprocess.Popen', 'os.posix_spawn', 'os.exec'):
+        stats['subprocesses'] += 1
+
+def write_stats(stats_path:str):
+    with open(stats_path, 'w') as file:
+        json.dump(stats, file)
+
+def run_function(name:str, args:list[str]):
+    sys.path.append(SRC_DIR)
+    from modules.core import list_service_files
+    from modules.NetService import get_services, read_service
+    if name == 'get_services':
+        svc_dir, prefix, cache_dir = args
+        get_services(svc_dir, prefix, cache_dir)
+    elif name == 'read_service':
+        svc_dir, prefix = args
+        for svc_path in list_service_files(svc_dir, prefix):
+            read_service(svc_path)
+    else:
+        raise SystemExit(f"Unknown function {name}")
+
+def main():
+    stats_path, mode = sys.argv[1], sys.argv[2]
+    atexit.register(write_stats, stats_path)
+    sys.addaudithook(audit)
+    if mode == 'cli':
+        sys.argv = [CLI_PATH] + sys.argv[3:]
+        runpy.run_path(CLI_PATH, run_name='__main__')
+    else:
+        run_function(sys.argv[3], sys.argv[4:])
+
+main()
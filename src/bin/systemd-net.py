@@ -1,28 +1,30 @@
 #!/usr/bin/env python3
 
+import time
+STARTUP_TIME = time.perf_counter()
+
 import sys
 import os
-import time
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+# Commands import modules they use, only the selected one is loaded
 from modules.core import *
-from modules.NetService import *
 from modules.application import *
 
-DOTNET_CLI = "/usr/bin/dotnet"
+profile = StartupProfile(STARTUP_TIME)
+profile.mark('imports')
 
 DOTNET_INSTALLED = is_dotnet_installed(DOTNET_CLI)
-RUNTIMES = get_dotnet_runtimes(DOTNET_CLI)
 #CURRENT_USER = pwd.getpwuid(os.getuid())[0]
 
-args = app_argsparser.parse_args()
-handle_command(args)
+args = parse_args()
+profile.mark('parse arguments')
+handle_command(args, profile)
 
 def main():
     if not DOTNET_INSTALLED:
-        print(f"{COLOR_WARN}Warning: {DOTNET_CLI} not found. Only self-contained apps can run.{COLOR_BASE}")
-    print(args)
+        print(f"{COLOR_WARN}Warning: {DOTNET_CLI} not found. Only self-contained apps can run.{COLOR_BASE}", file=sys.stderr)
 
     #svc = create_service_blank(args.service_dir, 'netapp.test')
     #svc.Description = 'Test Service'
@@ -36,9 +38,8 @@ def main():
     #svc.ASPNETCORE_ENVIRONMENT = 'Development'
     #svc.try_save(args.service_dir)
 
-    time.sleep(0.25)
-    services = get_services(args.service_dir, args.prefix)
-    print_services(services)
+    # Commands exit on their own, here only without command
+    build_argsparser().print_help()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
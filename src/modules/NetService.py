@@ -1,17 +1,175 @@
 import os
+import sys
+import shutil
+import shlex
+import hashlib
+import tempfile
 from datetime import datetime
+from typing import Iterator
 
 from modules.core import *
 from modules.services import *
+from modules.inventory import *
+from modules.profiles import PROFILE_UNIT_KEY
+from modules.sockets import get_service_sockets
 
-class NetService:
-    Name:str = None
-    ServicePath:str = None
+TEMPLATE_INSTANCE_DROPIN = "50-systemd-net-instance.conf"
+# Shared base env files referenced by services before their own env file
+ENV_BASE_DIR = os.environ.get('SYSTEMD_NET_ENV_DIR', "/etc/systemd-net/env/")
+
+class SaveResult:
+    """Outcome of NetService.try_save telling what systemd has to pick up."""
+    UnitChanged:bool = False
+    EnvChanged:bool = False
+
+    @property
+    def Unchanged(self)->bool:
+        return not self.UnitChanged and not self.EnvChanged
+
+    @property
+    def NeedsReload(self)->bool:
+        return self.UnitChanged
+
+    @property
+    def NeedsRestart(self)->bool:
+        return self.UnitChanged or self.EnvChanged
+
+def _normalize_content(content:str)->str:
+    # Comments (generator header and timestamp) and blank lines are not part of configuration
+    lines = [line.strip() for line in content.splitlines()]
+    return '\n'.join(line for line in lines if len(line) > 0 and not line.startswith(('#', ';')))
 
-    Unit:ServiceUnit = ServiceUnit()
-    Params:ServiceParameters = ServiceParameters()
-    Install:ServiceInstall = ServiceInstall()
-    Environment:dict[str, str] = {}
+def is_same_content(file_path:str, content:str)->bool:
+    if not os.path.isfile(file_path):
+        return False
+    with open(file_path, 'r') as file:
+        current = file.read()
+    current_hash = hashlib.sha256(_normalize_content(current).encode('utf-8')).digest()
+    return current_hash == hashlib.sha256(_normalize_content(content).encode('utf-8')).digest()
+
+def write_file_atomic(file_path:str, content:str, chmod=0o644, backup=True):
+    """Write content to temp file, fsync it and rename over file_path. Old file is kept as .bak"""
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(file_path)}.", suffix='.tmp', dir=os.path.dirname(os.path.abspath(file_path)))
+    try:
+        with os.fdopen(fd, 'w') as file:
+            file.write(content)
+            file.flush()
+            os.fsync(file.fileno())
+        os.chmod(tmp_path, chmod)
+        if backup and os.path.isfile(file_path):
+            bak_path = f"{file_path}.bak"
+            if os.path.lexists(bak_path):
+                os.remove(bak_path)
+            try:
+                os.link(file_path, bak_path)
+            except OSError:
+                shutil.copy2(file_path, bak_path)
+        os.replace(tmp_path, file_path)
+    except:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def fsync_directories(dirs:set[str]):
+    """Persist renames done in directories (once per directory for a batch of writes)."""
+    for dir_path in dirs:
+        fd = os.open(dir_path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+class ServiceSnapshot:
+    """Immutable copy of service configuration that is cheap to hash, compare and diff."""
+    __slots__ = ('Name', 'Sections', 'Environment', '_hash')
+    Name:str
+    Sections:tuple[tuple[str, tuple[tuple[str,str], ...]], ...]
+    Environment:tuple[tuple[str,str], ...]
+
+    def __init__(self, name:str, sections:dict[str,dict[str,str]], environment:dict[str,str]):
+        object.__setattr__(self, 'Name', name)
+        object.__setattr__(self, 'Sections', tuple((section, tuple(sorted(props.items()))) for section, props in sections.items()))
+        object.__setattr__(self, 'Environment', tuple(sorted(environment.items())))
+        object.__setattr__(self, '_hash', hash((self.Name, self.Sections, self.Environment)))
+
+    def __setattr__(self, key, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __hash__(self):
+        return self._hash
+
+    def __eq__(self, other):
+        if not isinstance(other, ServiceSnapshot):
+            return NotImplemented
+        return self._hash == other._hash and self.Name == other.Name \
+            and self.Sections == other.Sections and self.Environment == other.Environment
+
+    def __repr__(self):
+        return f"ServiceSnapshot({self.Name!r})"
+
+    def diff_sections(self, other:'ServiceSnapshot')->list[str]:
+        """Changed unit keys as '[Section] Key' (self is current, other is desired state)."""
+        if self.Sections == other.Sections:
+            return []
+        current = dict(self.Sections)
+        desired = dict(other.Sections)
+        changes:list[str] = []
+        for section in list(current) + [s for s in desired if s not in current]:
+            changes += _diff_items(f"[{section}] ", current.get(section, ()), desired.get(section, ()))
+        return changes
+
+    def diff_environment(self, other:'ServiceSnapshot')->list[str]:
+        """Changed environment variables as 'env KEY'."""
+        if self.Environment == other.Environment:
+            return []
+        return _diff_items('env ', self.Environment, other.Environment)
+
+    def diff(self, other:'ServiceSnapshot')->list[str]:
+        return self.diff_sections(other) + self.diff_environment(other)
+
+def _diff_items(title:str, current:tuple[tuple[str,str], ...], desired:tuple[tuple[str,str], ...])->list[str]:
+    current_dict = dict(current)
+    desired_dict = dict(desired)
+    keys = sorted(set(current_dict) | set(desired_dict))
+    return [f"{title}{key}" for key in keys if current_dict.get(key) != desired_dict.get(key)]
+
+def _env_file_path(entry:str)->str:
+    # '-' prefix tells systemd to ignore missing file
+    return entry[1:] if entry.startswith('-') else entry
+
+def format_environment(env:dict[str,str])->str:
+    lines = [ TOOL_FILEGEN_COMMENT, f"# {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}" ]
+    for key,value in env.items():
+        lines.append(f"{key}={value}")
+    return '\n'.join(lines)
+
+class NetService:
+    __slots__ = ('Name', 'ServicePath', 'Unit', 'Params', 'Install', 'Environment', 'BaseEnvironment',
+                 'DropIns', 'UnitEnvironment', 'DropInEnvironment')
+    Name:str
+    ServicePath:str
+
+    # Sections of the unit file itself, the tool writes only this file
+    Unit:ServiceUnit
+    Params:ServiceParameters
+    Install:ServiceInstall
+    Environment:dict[str, str]
+    BaseEnvironment:dict[str, str]
+    DropIns:list[tuple[str, dict[str,dict[str,str]]]] # (path, parsed sections) of drop-ins in the order systemd applies them
+    UnitEnvironment:dict[str, str] # Environment= of unit file and drop-ins
+    DropInEnvironment:dict[str, str] # EnvironmentFile= added by drop-ins, loaded after own env file
+
+    def __init__(self):
+        self.Name = None
+        self.ServicePath = None
+        self.Unit = ServiceUnit()
+        self.Params = ServiceParameters()
+        self.Install = ServiceInstall()
+        self.Environment = {}
+        self.BaseEnvironment = {}
+        self.DropIns = []
+        self.UnitEnvironment = {}
+        self.DropInEnvironment = {}
 
     @property
     def Description(self)->Optional[str]:
@@ -21,13 +179,75 @@ class NetService:
     def Description(self,value:str):
         self.Unit.Description = value
 
+    @property
+    def EnvironmentFiles(self)->list[str]:
+        """All EnvironmentFile= entries in order, as written in unit file."""
+        return self.Params.get_values('EnvironmentFile')
+
     @property
     def EnvironmentFile(self)->Optional[str]:
-        return self.Params.Properties.get('EnvironmentFile', None)
+        """Own env file of service, the last layer of EnvironmentFile= entries."""
+        files = self.EnvironmentFiles
+        return _env_file_path(files[-1]) if len(files) > 0 else None
 
     @EnvironmentFile.setter
     def EnvironmentFile(self, value:str):
-        self.Params.Properties['EnvironmentFile'] = value
+        self.Params.set_values('EnvironmentFile', self.EnvironmentFiles[:-1] + [value])
+
+    @property
+    def BaseEnvironmentFiles(self)->list[str]:
+        """Shared env files loaded before own env file."""
+        return [_env_file_path(entry) for entry in self.EnvironmentFiles[:-1]]
+
+    def add_base_environment_file(self, path:str)->bool:
+        """Reference shared env file right before own env file, returns False if it is already used."""
+        if path in self.BaseEnvironmentFiles:
+            return False
+        files = self.EnvironmentFiles
+        if len(files) == 0:
+            files = [os.path.join(os.path.dirname(self.ServicePath), f"{self.Name}.env")]
+        self.Params.set_values('EnvironmentFile', files[:-1] + [path, files[-1]])
+        return True
+
+    @property
+    def ResolvedEnvironment(self)->dict[str, str]:
+        """Environment service runs with: Environment= lines, base files, own file, then files of drop-ins."""
+        return { **self.UnitEnvironment, **self.BaseEnvironment, **self.Environment, **self.DropInEnvironment }
+
+    @property
+    def DropInPaths(self)->list[str]:
+        return [path for path, _ in self.DropIns]
+
+    @property
+    def Effective(self)->dict[str,dict[str,list[tuple[str,str]]]]:
+        """Settings systemd runs with, unit file merged with drop-ins, every value with path it comes from."""
+        sections = { section.Name: section.Properties for section in (self.Unit, self.Params, self.Install) }
+        return merge_unit_files([(self.ServicePath, sections)] + self.DropIns)
+
+    def get_effective_values(self, section:str, key:str)->list[tuple[str,str]]:
+        """(value, source path) of key after drop-ins are applied, one item for scalar keys."""
+        if len(self.DropIns) == 0:
+            target = { 'Unit': self.Unit, 'Service': self.Params, 'Install': self.Install }.get(section)
+            value = target.Properties.get(key) if target is not None else None
+            if value is None:
+                return []
+            items = value.split('\n') if is_list_key(key) else [value]
+            return [(item, self.ServicePath) for item in items if item != '' or not is_list_key(key)]
+        return self.Effective.get(section, {}).get(key, [])
+
+    def get_effective(self, section:str, key:str)->Optional[str]:
+        values = self.get_effective_values(section, key)
+        if len(values) == 0:
+            return None
+        return '\n'.join(value for value, _ in values) if is_list_key(key) else values[-1][0]
+
+    @property
+    def IsTemplate(self)->bool:
+        return self.Name is not None and self.Name.endswith('@')
+
+    @property
+    def Profile(self)->Optional[str]:
+        return self.get_effective('Unit', PROFILE_UNIT_KEY)
 
     @property
     def ExecUser(self):
@@ -46,8 +266,12 @@ class NetService:
         self.Params.Properties['Group'] = group
 
     def get_environment_variable(self, key:str)->Optional[str]:
-        if key in self.Environment:
-            value = self.Environment[key]
+        value = None
+        for env in (self.DropInEnvironment, self.Environment, self.BaseEnvironment, self.UnitEnvironment):
+            if key in env:
+                value = env[key]
+                break
+        if value is not None:
             if value.startswith('"') and value.endswith('"'):
                 value = value[1:-1]
             return value
@@ -76,58 +300,63 @@ class NetService:
     def ASPNETCORE_ENVIRONMENT(self, value:str):
         self.set_environment_variable('ASPNETCORE_ENVIRONMENT', value)
 
-    def __write_file(self, file_path:str, chmod=0o644):
+    def snapshot(self)->ServiceSnapshot:
+        sections = { section.Name: section.Properties for section in (self.Unit, self.Params, self.Install) }
+        return ServiceSnapshot(self.Name, sections, self.Environment)
+
+    def __format_file(self)->str:
         lines = [
             TOOL_FILEGEN_COMMENT,
             f"# {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}", '',
             self.Unit.format_section(), '',
-            self.Params.format_section(), '',
-            self.Install.format_section()
+            self.Params.format_section()
         ]
+        if len(self.Install.Properties) > 0: # units read without [Install] stay not installable
+            lines += ['', self.Install.format_section()]
+        return '\n'.join(lines)
 
-        with open(file_path, 'w') as file:
-            file.write('\n'.join(lines))
-        os.chmod(file_path, chmod)
-    
-    def __write_env(self, file_path:str, chmod=0o644):
-        lines = [ TOOL_FILEGEN_COMMENT, f"# {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}" ]
-        for key,value in self.Environment.items():
-            lines.append(f"{key}={value}")
+    def __format_env(self)->str:
+        return format_environment(self.Environment)
 
-        with open(file_path, 'w') as file:
-            file.write('\n'.join(lines))
-        os.chmod(file_path, chmod)
+    def try_save(self, svc_dir:str, rewrite=True, chmod=0o644, synced_dirs:Optional[set[str]]=None):
+        """Write service and env files if their content changed.
 
-    def try_save(self, svc_dir:str, rewrite=True, chmod=0o644):
+        Returns SaveResult (or False on error). When synced_dirs is passed, directories
+        to fsync are collected there for fsync_directories() after the whole batch.
+        """
         save_fpath = os.path.join(svc_dir, f"{self.Name}.service")
         env_fpath = self.EnvironmentFile
         if env_fpath is None or len(env_fpath.strip()) == 0:
             env_fpath = os.path.join(svc_dir, f"{self.Name}.env")
         self.EnvironmentFile = env_fpath # ensure env file path before save
 
-        rename_svc = False
-        rename_env = False
-        if os.path.isfile(save_fpath):
-            if (rewrite is False):
-                print(f"{COLOR_DANGER}Error: file {save_fpath} exists and rewrite is disabled.{COLOR_BASE}")
-                return False
-            rename_svc = True
-
-        if os.path.isfile(env_fpath):
-            if (rewrite is False):
-                print(f"{COLOR_DANGER}Error: file {env_fpath} exists and rewrite is disabled.{COLOR_BASE}")
-                return False
-            rename_env = True
-
-        if rename_svc:
-            os.rename(save_fpath, f"{save_fpath}.bak")
-        if rename_env:
-            os.rename(env_fpath, f"{env_fpath}.bak")
-
-        self.__write_file(save_fpath, chmod)
+        if os.path.isfile(save_fpath) and (rewrite is False):
+            print(f"{COLOR_DANGER}Error: file {save_fpath} exists and rewrite is disabled.{COLOR_BASE}", file=sys.stderr)
+            return False
+        if os.path.isfile(env_fpath) and (rewrite is False):
+            print(f"{COLOR_DANGER}Error: file {env_fpath} exists and rewrite is disabled.{COLOR_BASE}", file=sys.stderr)
+            return False
+
+        result = SaveResult()
+        dirs:set[str] = set()
+        svc_content = self.__format_file()
+        if not is_same_content(save_fpath, svc_content):
+            write_file_atomic(save_fpath, svc_content, chmod)
+            dirs.add(os.path.dirname(os.path.abspath(save_fpath)))
+            result.UnitChanged = True
         self.ServicePath = save_fpath
-        self.__write_env(env_fpath, chmod)
-        return True
+
+        env_content = self.__format_env()
+        if not is_same_content(env_fpath, env_content):
+            write_file_atomic(env_fpath, env_content, chmod)
+            dirs.add(os.path.dirname(os.path.abspath(env_fpath)))
+            result.EnvChanged = True
+
+        if synced_dirs is not None:
+            synced_dirs.update(dirs)
+        else:
+            fsync_directories(dirs)
+        return result
 
     def get_service_enabled(self):
         result = subprocess.run(
@@ -137,36 +366,18 @@ class NetService:
         return result.stdout.strip()
 
     def get_service_active(self):
+        units = [self.Name]
+        if self.IsTemplate:
+            # Template never runs itself, it is active while any of its instances is
+            units = get_template_instance_units(os.path.dirname(self.ServicePath), self.Name)
+            if len(units) == 0:
+                return 'inactive'
         result = subprocess.run(
-            ["systemctl", "is-active", self.Name],
+            ["systemctl", "is-active", *units],
             stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
         )
-        return result.stdout.strip()
-
-def __read_file(file_path:str):
-    sections:dict[str,dict[str,str]] = {}
-    current_section:str = None
-    current_dict:dict[str,str] = {}
-    with open(file_path, 'r') as file:
-        for line in file:
-            if not line:
-                continue
-            line = line.strip()
-
-            if line.startswith('[') and line.endswith(']'):
-                if current_section is not None:
-                    sections[current_section] = current_dict
-
-                current_section = line[1:-1]
-                current_dict = {}
-            else:
-                if '=' in line:
-                    key, value = line.split('=', 1)
-                    current_dict[key.strip()] = value.strip()
-
-        if current_section is not None:
-            sections[current_section] = current_dict
-    return sections
+        states = result.stdout.split()
+        return 'active' if 'active' in states else (states[0] if len(states) > 0 else '')
 
 def __read_env(file_path:str):
     env:dict[str,str] = {}
@@ -180,18 +391,88 @@ def __read_env(file_path:str):
 
             if '=' in line:
                 key, value = line.split('=', 1)
-                env[key.strip()] = value.strip()
+                env[sys.intern(key.strip())] = value.strip()
     return env
 
-def read_service(svc_path:str)->NetService:
-    if not os.path.isfile(svc_path):
-        raise Exception(f"File not found - {svc_path}")
+def read_environment(file_path:str, inventory:Optional[ServiceInventory]=None)->dict[str,str]:
+    if inventory is not None:
+        return dict(inventory.read(file_path, __read_env))
+    return __read_env(file_path)
+
+def read_environment_layers(env_files:list[str], inventory:Optional[ServiceInventory]=None,
+                            overrides:Optional[dict[str,dict[str,str]]]=None)->dict[str,str]:
+    """Merge EnvironmentFile= entries in order, later files override earlier ones. Overrides replace content of given paths."""
+    env:dict[str,str] = {}
+    for entry in env_files:
+        env_path = _env_file_path(entry)
+        if overrides is not None and env_path in overrides:
+            env.update(overrides[env_path])
+        elif os.path.isfile(env_path):
+            env.update(read_environment(env_path, inventory))
+        elif not entry.startswith('-'):
+            print(f"{COLOR_WARN}Missing EnvironmentFile {env_path}{COLOR_BASE}", file=sys.stderr)
+    return env
+
+def get_dropin_dir_names(unit_name:str)->list[str]:
+    """Drop-in directories of unit, least specific first (systemd.unit(5)): 'service.d', prefix 'a-.service.d', template 'a@.service.d', unit itself."""
+    names = ['service.d']
+    base, at, instance = unit_name.partition('@')
+    parts = base.split('-')
+    for idx in range(1, len(parts)):
+        names.append(f"{'-'.join(parts[:idx])}-.service.d")
+    if at:
+        names.append(f"{base}@.service.d")
+    if not at or instance:
+        names.append(f"{unit_name}.service.d")
+    return names
+
+def find_dropins(svc_dir:str, unit_name:str, dropin_dirs:Optional[set[str]]=None)->list[str]:
+    """.conf drop-ins of unit in the order systemd applies them, same file name in more specific directory wins.
+
+    dropin_dirs are names of existing drop-in directories, so units without drop-ins need no stat.
+    """
+    if dropin_dirs is not None and len(dropin_dirs) == 0:
+        return []
+    confs:dict[str,str] = {}
+    for dir_name in get_dropin_dir_names(unit_name):
+        if dropin_dirs is not None and dir_name not in dropin_dirs:
+            continue
+        try:
+            for entry in os.scandir(os.path.join(svc_dir, dir_name)):
+                if entry.name.endswith('.conf'):
+                    confs[entry.name] = entry.path
+        except OSError:
+            continue
+    return [confs[name] for name in sorted(confs)]
+
+def parse_environment_assignments(values:list[str])->dict[str,str]:
+    """Variables of Environment= lines, 'A=1 "B=two words"' quoting as in systemd."""
+    env:dict[str,str] = {}
+    for value in values:
+        try:
+            words = shlex.split(value)
+        except ValueError:
+            continue # unbalanced quotes, systemd ignores the line
+        for word in words:
+            key, sep, val = word.partition('=')
+            if sep and len(key) > 0:
+                env[key] = val
+    return env
+
+def read_service(svc_path:str, inventory:Optional[ServiceInventory]=None)->NetService:
     if not svc_path.endswith('.service'):
         raise Exception(f"{svc_path} is not a service")
 
     svc_name = os.path.basename(svc_path)[0:-8]
+    svc_dir = os.path.dirname(svc_path)
 
-    svc_data = __read_file(svc_path)
+    try:
+        if inventory is not None:
+            svc_data = inventory.read(svc_path, parse_unit_file)
+        else:
+            svc_data = parse_unit_file(svc_path)
+    except (FileNotFoundError, NotADirectoryError, IsADirectoryError):
+        raise Exception(f"File not found - {svc_path}")
     if not 'Service' in svc_data or not 'Unit' in svc_data:
         raise Exception(f"Cannot read {svc_path} - invalid type of service or missing description")
 
@@ -199,58 +480,177 @@ def read_service(svc_path:str)->NetService:
     svc.Name = svc_name
     svc.ServicePath = svc_path
 
-    for prop, value in svc_data['Unit'].items():
-        svc.Unit.Properties[prop] = value
-    for prop, value in svc_data['Service'].items():
-        svc.Params.Properties[prop] = value
-    for prop, value in svc_data['Install'].items():
-        svc.Install.Properties[prop] = value
-    if svc.EnvironmentFile is not None:
-        if os.path.isfile(svc.EnvironmentFile):
-            svc.Environment = __read_env(svc.EnvironmentFile)
-        else:
-            print(f"{COLOR_WARN}Missing EnvironmentFile {svc.EnvironmentFile}{COLOR_BASE}")
+    # Defaults are for new services only, saving unit read from disk writes back just its own settings
+    for section in (svc.Unit, svc.Params, svc.Install):
+        section.Properties = {}
+        for prop, value in svc_data.get(section.Name, {}).items():
+            # Only repeated list keys contain new lines
+            section.Properties[prop] = collapse_values(value) if '\n' in value else value
+
+    dropin_dirs = inventory.list_dropin_dirs() if inventory is not None and inventory.ServicesDir == svc_dir else None
+    for conf_path in find_dropins(svc_dir, svc_name, dropin_dirs):
+        try:
+            svc.DropIns.append((conf_path, inventory.read(conf_path, parse_unit_file) if inventory is not None else parse_unit_file(conf_path)))
+        except OSError:
+            print(f"{COLOR_WARN}Unable to read drop-in {conf_path}{COLOR_BASE}", file=sys.stderr)
+
+    svc.UnitEnvironment = parse_environment_assignments([value for value, _ in svc.get_effective_values('Service', 'Environment')])
+    env_path = svc.EnvironmentFile
+    if env_path is not None:
+        svc.BaseEnvironment = read_environment_layers(svc.EnvironmentFiles[:-1], inventory)
+        try:
+            svc.Environment = read_environment(env_path, inventory)
+        except (FileNotFoundError, IsADirectoryError):
+            print(f"{COLOR_WARN}Missing EnvironmentFile {env_path}{COLOR_BASE}", file=sys.stderr)
+    if len(svc.DropIns) > 0:
+        dropin_files = [value for value, source in svc.get_effective_values('Service', 'EnvironmentFile') if source != svc_path]
+        svc.DropInEnvironment = read_environment_layers(dropin_files, inventory)
     return svc
 
-def get_services(services_dir:str, prefix:str):
-    service_files = list_service_files(services_dir, prefix)
-    services:list[NetService] = []
+def iter_services(services_dir:str, prefix:str, cache_dir:Optional[str]=None)->Iterator[NetService]:
+    """Read services one by one, so streaming output does not hold all of them."""
+    inventory = ServiceInventory(services_dir, cache_dir)
+    service_files = inventory.list_units(prefix)
     for service_path in service_files:
         try:
-            services.append(read_service(service_path))
+            svc = read_service(service_path, inventory)
         except:
-            print(f"{COLOR_WARN}Unable to read service {service_path}{COLOR_BASE}")
-    return services
-
-def create_service_blank(svc_dir:str, name:str):
+            print(f"{COLOR_WARN}Unable to read service {service_path}{COLOR_BASE}", file=sys.stderr)
+            continue
+        yield svc
+    inventory.save()
+
+def get_services(services_dir:str, prefix:str, cache_dir:Optional[str]=None):
+    return list(iter_services(services_dir, prefix, cache_dir))
+
+def update_inventory(services_dir:str, cache_dir:Optional[str], svc_path:str, env_path:Optional[str]=None):
+    """Refresh cached entries of service after it was added, edited or deleted."""
+    if not cache_dir:
+        return
+    inventory = ServiceInventory(services_dir, cache_dir)
+    inventory.forget(svc_path)
+    if env_path is not None:
+        inventory.forget(env_path)
+    if os.path.isfile(svc_path):
+        try:
+            read_service(svc_path, inventory)
+        except Exception:
+            pass
+    inventory.save()
+
+def get_instance_paths(svc_dir:str, template_name:str, instance:str)->tuple[str,str]:
+    """Paths of per-instance (env file, drop-in conf) of template service 'name@'."""
+    unit_name = f"{template_name}{instance}"
+    return (os.path.join(svc_dir, f"{unit_name}.env"),
+            os.path.join(svc_dir, f"{unit_name}.service.d", TEMPLATE_INSTANCE_DROPIN))
+
+def get_template_instances(svc_dir:str)->dict[str,list[str]]:
+    """Instances created by 'scale' for every template in directory, found by their drop-ins."""
+    instances:dict[str,list[str]] = {}
+    if not os.path.isdir(svc_dir):
+        return instances
+    for entry in os.scandir(svc_dir):
+        if not entry.name.endswith('.service.d') or '@' not in entry.name:
+            continue
+        template, _, instance = entry.name[0:-10].partition('@')
+        if len(instance) > 0 and os.path.isfile(os.path.join(entry.path, TEMPLATE_INSTANCE_DROPIN)):
+            instances.setdefault(f"{template}@", []).append(instance)
+    for names in instances.values():
+        names.sort(key=lambda i: (len(i), i))
+    return instances
+
+def list_service_unit_names(services_dir:str, prefix:str, cache_dir:Optional[str]=None)->list[str]:
+    """Unit names of services without reading their files, templates are replaced by their instances."""
+    inventory = ServiceInventory(services_dir, cache_dir)
+    instances:Optional[dict[str,list[str]]] = None
+    units:list[str] = []
+    for svc_path in inventory.list_units(prefix):
+        name = os.path.basename(svc_path)[0:-8]
+        if not name.endswith('@'):
+            units.append(name)
+            continue
+        if instances is None:
+            instances = get_template_instances(services_dir)
+        units += [f"{name}{instance}" for instance in instances.get(name, [])]
+    return units
+
+def read_instance_environment(svc_dir:str, template_name:str, instance:str, inventory:Optional[ServiceInventory]=None)->dict[str,str]:
+    env_path, _ = get_instance_paths(svc_dir, template_name, instance)
+    if not os.path.isfile(env_path):
+        return {}
+    return read_environment(env_path, inventory)
+
+def get_template_instance_units(svc_dir:str, template_name:str)->list[str]:
+    return [f"{template_name}{instance}" for instance in get_template_instances(svc_dir).get(template_name, [])]
+
+def find_service_path(svc_dir:str, name:str)->Optional[str]:
+    """Path of service unit, or of its template when service was scaled to instances."""
+    for unit_name in (name, f"{name}@"):
+        svc_path = os.path.join(svc_dir, f"{unit_name}.service")
+        if os.path.isfile(svc_path):
+            return svc_path
+    return None
+
+def get_service_units(services:list[NetService], inventory:Optional[ServiceInventory]=None)->list[tuple[str,NetService,Optional[str]]]:
+    """Running units of services as (unit, service, ASPNETCORE_URLS), templates are replaced by their instances."""
+    instances:dict[str,list[str]] = {}
+    if any(svc.IsTemplate for svc in services):
+        instances = get_template_instances(os.path.dirname(services[0].ServicePath))
+    units:list[tuple[str,NetService,Optional[str]]] = []
+    for svc in services:
+        if not svc.IsTemplate:
+            units.append((svc.Name, svc, svc.ASPNETCORE_URLS))
+            continue
+        svc_dir = os.path.dirname(svc.ServicePath)
+        for instance in instances.get(svc.Name, []):
+            urls = read_instance_environment(svc_dir, svc.Name, instance, inventory).get('ASPNETCORE_URLS', None)
+            units.append((f"{svc.Name}{instance}", svc, urls.strip('"') if urls is not None else None))
+    return units
+
+def new_service(svc_dir:str, name:str)->NetService:
     svc_name = name.strip()
-    if not svc_name.endswith('.service'):
-        svc_name = f"{svc_name}.service"
-    svc_path = os.path.join(svc_dir, svc_name)
-
-    if (os.path.isfile(svc_path)):
-        print(f"{COLOR_DANGER}Error: service at {svc_path} already exists.{COLOR_BASE}")
-        return None
+    if svc_name.endswith('.service'):
+        svc_name = svc_name[0:-8]
 
     svc = NetService()
-    svc.Name = svc_name[0:-8]
-    svc.ServicePath = svc_path
+    svc.Name = svc_name
+    svc.ServicePath = os.path.join(svc_dir, f"{svc_name}.service")
     svc.Params.Properties['SyslogIdentifier'] = svc.Name
     svc.EnvironmentFile = os.path.join(svc_dir, f"{svc.Name}.env")
+    return svc
 
+def create_service_blank(svc_dir:str, name:str):
+    svc = new_service(svc_dir, name)
+    if (os.path.isfile(svc.ServicePath)):
+        print(f"{COLOR_DANGER}Error: service at {svc.ServicePath} already exists.{COLOR_BASE}", file=sys.stderr)
+        return None
     return svc
 
-def delete_service(svc_path:str, clear_bak=False):
+def delete_service(svc_path:str, clear_bak=False, reload=True):
     if not os.path.isfile(svc_path):
         return True
     if not svc_path.endswith('.service'):
-        print(f"{COLOR_DANGER}Error: {svc_path} is not service.{COLOR_BASE}")
+        print(f"{COLOR_DANGER}Error: {svc_path} is not service.{COLOR_BASE}", file=sys.stderr)
         return False
 
     svc = read_service(svc_path)
-    do_disable_service(svc.Name)
-    if (svc.get_service_active() == 'active'):
-        do_stop_service(svc.Name)
+    svc_dir = os.path.dirname(svc_path)
+    # Stop listening sockets first so they cannot activate service again
+    for socket_name in get_service_sockets(svc):
+        subprocess.run(["systemctl", "disable", "--now", socket_name])
+        socket_path = os.path.join(svc_dir, socket_name)
+        if os.path.isfile(socket_path):
+            os.remove(socket_path)
+    if svc.IsTemplate:
+        delete_template_instances(svc_dir, svc.Name)
+        # Concrete unit replaced by 'scale'
+        concrete_bak = os.path.join(svc_dir, f"{svc.Name[0:-1]}.service.bak")
+        if clear_bak and os.path.isfile(concrete_bak):
+            os.remove(concrete_bak)
+    else:
+        do_disable_service(svc.Name)
+        if (svc.get_service_active() == 'active'):
+            do_stop_service(svc.Name)
 
     svc_env_file = svc.EnvironmentFile
     if svc_env_file is not None:
@@ -264,5 +664,17 @@ def delete_service(svc_path:str, clear_bak=False):
             os.remove(f"{svc_path}.bak")
     os.remove(svc_path)
 
-    do_reload_systemctl()
-    return True
\ No newline at end of file
+    if reload:
+        do_reload_systemctl()
+    return True
+
+def delete_template_instances(svc_dir:str, template_name:str):
+    """Stop instances created by 'scale' and remove their env files and drop-ins."""
+    instances = get_template_instances(svc_dir).get(template_name, [])
+    if len(instances) > 0:
+        subprocess.run(["systemctl", "disable", "--now", "--", *[f"{template_name}{instance}" for instance in instances]])
+    for instance in instances:
+        env_path, dropin_path = get_instance_paths(svc_dir, template_name, instance)
+        if os.path.isfile(env_path):
+            os.remove(env_path)
+        shutil.rmtree(os.path.dirname(dropin_path), ignore_errors=True)
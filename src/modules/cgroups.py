@@ -0,0 +1,138 @@
+import os
+import time
+from typing import Optional
+
+CGROUP_ROOT = os.environ.get('SYSTEMD_NET_CGROUP_ROOT', "/sys/fs/cgroup")
+CGROUP_SYSTEM_SLICE = "system.slice"
+
+class CgroupStats:
+    MemoryCurrent:Optional[int] = None
+    MemoryPeak:Optional[int] = None
+    CpuUsageUsec:Optional[int] = None
+    CpuPercent:Optional[float] = None
+    Tasks:Optional[int] = None
+    IoReadBytes:Optional[int] = None
+    IoWriteBytes:Optional[int] = None
+
+def _read_value(path:str)->Optional[int]:
+    try:
+        with open(path, 'r') as file:
+            value = file.read().strip()
+        return int(value) if value != 'max' else None
+    except (OSError, ValueError):
+        return None
+
+def _read_keyed(path:str)->dict[str,int]:
+    """Read flat keyed file like cpu.stat ('usage_usec 123')."""
+    values:dict[str,int] = {}
+    try:
+        with open(path, 'r') as file:
+            for line in file:
+                parts = line.split()
+                if len(parts) == 2 and parts[1].isdigit():
+                    values[parts[0]] = int(parts[1])
+    except OSError:
+        pass
+    return values
+
+def _read_io_bytes(path:str)->tuple[Optional[int],Optional[int]]:
+    """Sum rbytes and wbytes of all devices in io.stat."""
+    try:
+        with open(path, 'r') as file:
+            lines = file.readlines()
+    except OSError:
+        return (None, None)
+    rbytes = 0
+    wbytes = 0
+    for line in lines:
+        for field in line.split()[1:]:
+            key, _, value = field.partition('=')
+            if key == 'rbytes' and value.isdigit():
+                rbytes += int(value)
+            elif key == 'wbytes' and value.isdigit():
+                wbytes += int(value)
+    return (rbytes, wbytes)
+
+def systemd_escape(name:str)->str:
+    """Escape unit name part like `systemd-escape` does for slice names."""
+    escaped = []
+    for idx, char in enumerate(name):
+        if char.isalnum() or char in ':_' or (char == '.' and idx > 0):
+            escaped.append(char)
+        elif char == '/':
+            escaped.append('-')
+        else:
+            escaped.append(''.join(f"\\x{b:02x}" for b in char.encode('utf-8')))
+    return ''.join(escaped)
+
+def get_unit_cgroup_path(unit:str, control_group:Optional[str]=None, cgroup_root:str=CGROUP_ROOT)->str:
+    """Cgroup directory of unit, prefers ControlGroup reported by systemd."""
+    if control_group:
+        return os.path.join(cgroup_root, control_group.lstrip('/'))
+    if not unit.endswith('.service'):
+        unit = f"{unit}.service"
+    if '@' in unit:
+        # Template instances live in 'system-<template>.slice'
+        template = unit.split('@', 1)[0]
+        return os.path.join(cgroup_root, CGROUP_SYSTEM_SLICE, f"system-{systemd_escape(template)}.slice", unit)
+    return os.path.join(cgroup_root, CGROUP_SYSTEM_SLICE, unit)
+
+def read_cgroup_stats(cgroup_path:str)->Optional[CgroupStats]:
+    if not os.path.isdir(cgroup_path):
+        return None
+    stats = CgroupStats()
+    stats.MemoryCurrent = _read_value(os.path.join(cgroup_path, 'memory.current'))
+    stats.MemoryPeak = _read_value(os.path.join(cgroup_path, 'memory.peak'))
+    stats.CpuUsageUsec = _read_keyed(os.path.join(cgroup_path, 'cpu.stat')).get('usage_usec', None)
+    stats.Tasks = _read_value(os.path.join(cgroup_path, 'pids.current'))
+    stats.IoReadBytes, stats.IoWriteBytes = _read_io_bytes(os.path.join(cgroup_path, 'io.stat'))
+    return stats
+
+def collect_cgroup_stats(cgroup_paths:dict[str,str], interval:float=0.5)->dict[str,Optional[CgroupStats]]:
+    """Read stats of all units, CPU% is computed from two samples of every unit taken one interval apart."""
+    first = { name: _read_keyed(os.path.join(path, 'cpu.stat')).get('usage_usec', None) for name, path in cgroup_paths.items() }
+    started = time.monotonic()
+    if interval > 0:
+        time.sleep(interval)
+    stats = { name: read_cgroup_stats(path) for name, path in cgroup_paths.items() }
+    elapsed_usec = (time.monotonic() - started) * 1_000_000
+
+    for name, unit_stats in stats.items():
+        if unit_stats is None or unit_stats.CpuUsageUsec is None or first[name] is None or elapsed_usec <= 0:
+            continue
+        unit_stats.CpuPercent = max(0.0, (unit_stats.CpuUsageUsec - first[name]) * 100.0 / elapsed_usec)
+    return stats
+
+class CgroupSampler:
+    """Keeps previous sample of every unit so periodic readers get CPU% without sleeping.
+
+    Units can be sampled in parts (batches of streamed rows), other units keep their previous sample.
+    """
+
+    def __init__(self):
+        self._previous:dict[str,tuple[int,float]] = {}
+
+    def sample(self, cgroup_paths:dict[str,str])->dict[str,Optional[CgroupStats]]:
+        now = time.monotonic()
+        stats = { name: read_cgroup_stats(path) for name, path in cgroup_paths.items() }
+        for name, unit_stats in stats.items():
+            previous = self._previous.pop(name, None)
+            if unit_stats is None or unit_stats.CpuUsageUsec is None:
+                continue
+            self._previous[name] = (unit_stats.CpuUsageUsec, now)
+            if previous is not None:
+                usage, taken = previous
+                elapsed_usec = (now - taken) * 1_000_000
+                if elapsed_usec > 0:
+                    unit_stats.CpuPercent = max(0.0, (unit_stats.CpuUsageUsec - usage) * 100.0 / elapsed_usec)
+        return stats
+
+def format_bytes(value:Optional[int])->str:
+    if value is None:
+        return ''
+    size = float(value)
+    for unit in ('B', 'K', 'M', 'G', 'T'):
+        if size < 1024 or unit == 'T':
+            return f"{size:.0f}{unit}" if unit == 'B' else f"{size:.1f}{unit}"
+        size /= 1024
+    return str(value)
@@ -0,0 +1,144 @@
+import argparse
+
+from modules.core import *
+from modules.NetService import *
+from modules.runtimes import *
+from modules.profiles import *
+from modules.sockets import *
+from modules.ports import *
+from modules.restarts import *
+from modules.locking import *
+
+def build_parser(parser:argparse.ArgumentParser):
+    parser.add_argument('service_name', type=str, help='Name of service in systemd')
+    parser.add_argument('exec_path', type=str, help="Path to application executable (.dll)")
+    add_service_dir_argument(parser)
+    parser.add_argument('-edir', '--env-dir', type=str, help=".env files directory\n(default: %(default)s)", default="/etc/systemd/system/env/")
+    parser.add_argument('-wdir', '--working-dir', help="Application working directory\n(default same as 'exec_path' directory)")
+    parser.add_argument('-u', '--user', help='User to run application\n(default: %(default)s)', default='www-data')
+    parser.add_argument('--aspnetcore-env', type=str, help="ASPNETCORE_ENVIRONMENT environment variable (default: '%(default)s')", default="Production")
+    parser.add_argument('--aspnetcore-urls', type=str, help="ASPNETCORE_URLS environment variable, 'auto' to take free port from --port-range", default=None)
+    parser.add_argument('--port-range', type=str, help="Ports for '--aspnetcore-urls auto'\n(default: %(default)s)", default=DEFAULT_PORT_RANGE)
+    parser.add_argument('--no-runtime-check', help="Do not check required .NET runtime against installed frameworks", action="store_true")
+    parser.add_argument('--profile', type=str, help="Resource and .NET runtime profile: throughput, latency, low-memory, custom or own profile name", default=None)
+    parser.add_argument('--socket-activation', help="Create .socket unit for every ASPNETCORE_URLS entry (app must call UseSystemd())", action="store_true")
+    parser.add_argument('--profiles-dir', type=str, help="Directory with editable <profile>.json files\n(default: %(default)s)", default=PROFILES_DIR)
+    add_restart_arguments(parser)
+
+def allocate_urls(args:argparse.Namespace, svc_name:str)->str:
+    """Resolve 'auto' to free port and reject ports used by other services or listeners."""
+    services = get_services(args.service_dir, args.prefix, args.cache_dir)
+    index = build_port_index([(unit, urls) for unit, _, urls in get_service_units(services)])
+    urls = args.aspnetcore_urls
+    if urls == 'auto':
+        try:
+            port_range = parse_port_range(args.port_range)
+        except ValueError as e:
+            print(f"{COLOR_DANGER}{e}{COLOR_BASE}", file=sys.stderr)
+            exit(2)
+        port = index.next_free(port_range)
+        if port is None:
+            print(f"{COLOR_DANGER}No free port in range {args.port_range}{COLOR_BASE}", file=sys.stderr)
+            exit(1)
+        urls = f"http://+:{port}"
+        print(f"Using {urls}")
+
+    conflicts = [(url, owner) for url in parse_urls(urls) if url.EffectivePort is not None for owner in index.find_conflicts(url, svc_name)]
+    for url, owner in conflicts:
+        owner_name = owner.Name if owner.Name is not None else f"listening socket {owner.Host}"
+        print(f"{COLOR_DANGER}Port {url.EffectivePort} of {url} is already used by {owner_name}{COLOR_BASE}", file=sys.stderr)
+    if len(conflicts) > 0:
+        exit(1)
+    return urls
+
+def handle(args:argparse.Namespace):
+    # Register net service
+    if args.exec_path is None or len(str(args.exec_path).strip()) == 0:
+        print(f"{COLOR_DANGER}Service execution path required (-exec){COLOR_BASE}", file=sys.stderr)
+        exit(2)
+
+    # Existence check, port allocation and write are one batch, parallel adds can not take the same port
+    with ServiceDirLock(args.service_dir):
+        add_service(args)
+    exit()
+
+def add_service(args:argparse.Namespace):
+    svcArgs = SVCArgsProp(args.service_dir, args.prefix, args.service_name)
+    if os.path.isfile(svcArgs.Path):
+        print(f"{COLOR_DANGER}Service already exists - {svcArgs.Path}{COLOR_BASE}", file=sys.stderr)
+        exit(1)
+
+    profile = None
+    if args.profile:
+        try:
+            profile = load_profile(args.profile, args.profiles_dir)
+        except Exception as e:
+            print(f"{COLOR_DANGER}{e}{COLOR_BASE}", file=sys.stderr)
+            exit(1)
+
+    try:
+        restart_policy = get_restart_policy(args)
+    except Exception as e:
+        print(f"{COLOR_DANGER}{e}{COLOR_BASE}", file=sys.stderr)
+        exit(2)
+
+    svc = create_service_blank(args.service_dir, svcArgs.FullName)
+    runtime_config = read_runtimeconfig(args.exec_path)
+    is_self_contained = runtime_config is not None and runtime_config.IsSelfContained
+    if runtime_config is None:
+        if args.exec_path.endswith('.dll'):
+            print(f"{COLOR_WARN}Warning: {get_runtimeconfig_path(args.exec_path)} not found, required runtime not checked{COLOR_BASE}", file=sys.stderr)
+    elif not is_self_contained and not args.no_runtime_check:
+        missing = find_missing_frameworks(runtime_config, DOTNET_CLI, args.cache_dir)
+        if len(missing) > 0:
+            print(f"{COLOR_DANGER}Required .NET runtime not installed ({runtime_config.RollForward} roll forward): {', '.join(missing)}{COLOR_BASE}", file=sys.stderr)
+            print("Use --no-runtime-check to add service anyway.")
+            exit(1)
+
+    exec_path, dotnet = resolve_exec_start(args.exec_path, runtime_config)
+    svc.Params.set_ExecStart(exec_path, dotnet=dotnet)
+    if (args.working_dir and len(args.working_dir) > 0):
+        if os.path.isdir(args.working_dir):
+            svc.Params.Properties['WorkingDirectory'] = args.working_dir
+        else:
+            print(f"{COLOR_DANGER}Path is not directory - '{args.working_dir}'{COLOR_BASE}", file=sys.stderr)
+            exit(1)
+
+    if (args.user and len(args.user) > 0):
+        svc.Params.Properties['User'] = args.user
+        svc.Params.Properties['Group'] = args.user
+
+    if args.aspnetcore_urls is not None and len(str(args.aspnetcore_urls)) > 0:
+        svc.ASPNETCORE_URLS = allocate_urls(args, svcArgs.FullName)
+    svc.ASPNETCORE_ENVIRONMENT = args.aspnetcore_env
+    if profile is not None:
+        apply_profile(svc, profile)
+    if restart_policy is not None:
+        apply_restart_policy(svc, restart_policy)
+        warn_backoff_support(restart_policy)
+
+    socket_units:dict[str,str] = {}
+    if args.socket_activation:
+        try:
+            socket_units = enable_socket_activation(svc, args.service_dir)
+        except Exception as e:
+            print(f"{COLOR_DANGER}{e}{COLOR_BASE}", file=sys.stderr)
+            exit(1)
+        for socket_path in socket_units:
+            if os.path.isfile(socket_path):
+                print(f"{COLOR_DANGER}Socket unit already exists - {socket_path}{COLOR_BASE}", file=sys.stderr)
+                exit(1)
+
+    synced_dirs:set[str] = set()
+    for socket_path, content in socket_units.items():
+        write_file_atomic(socket_path, content, backup=False)
+        synced_dirs.add(os.path.dirname(os.path.abspath(socket_path)))
+    result = svc.try_save(args.service_dir, synced_dirs=synced_dirs)
+    fsync_directories(synced_dirs)
+    update_inventory(args.service_dir, args.cache_dir, svc.ServicePath, svc.EnvironmentFile)
+    if len(socket_units) > 0 or (result and result.NeedsReload):
+        do_reload_systemctl()
+    print(f"{COLOR_SUCCESS}Service {svc.Name} added to systemd - {svc.ServicePath}{COLOR_BASE}")
+    if len(socket_units) > 0:
+        print(f"Socket units: {', '.join(os.path.basename(p) for p in socket_units)}")
+        print(f"Enable them with: sudo systemctl enable --now {' '.join(os.path.basename(p) for p in socket_units)}")
@@ -0,0 +1,73 @@
+import time
+import argparse
+
+from modules.core import *
+from modules.NetService import *
+from modules.status import *
+from modules.manifest import *
+from modules.startup import *
+from modules.locking import *
+
+def build_parser(parser:argparse.ArgumentParser):
+    parser.add_argument('manifest', type=str, help="Desired state manifest file (.json or .toml)")
+    add_service_dir_argument(parser)
+    parser.add_argument('--dry-run', help="Print plan without changing anything", action="store_true")
+    parser.add_argument('--prune', help="Delete registered services missing in manifest", action="store_true")
+    parser.add_argument('--max-parallel', type=int, help="Maximum number of services restarted at once\n(default: %(default)s)", default=4)
+
+def handle(args:argparse.Namespace):
+    # Plan and writes are one batch, other writers can not change services in between; daemon-reload runs when lock is released
+    with ServiceDirLock(args.service_dir):
+        try:
+            specs = load_manifest(args.manifest)
+            actions = plan_apply(specs, args.service_dir, args.prefix, args.cache_dir, args.prune)
+        except Exception as e:
+            print(f"{COLOR_DANGER}{e}{COLOR_BASE}", file=sys.stderr)
+            exit(1)
+
+        statuses = get_services_status([a.Name for a in actions])
+        to_enable = [a.Name for a in actions if a.Enabled is True and statuses[a.Name].Enabled != 'enabled']
+        to_disable = [a.Name for a in actions if a.Enabled is False and statuses[a.Name].Enabled == 'enabled']
+
+        print_apply_plan(actions)
+        for name in to_enable:
+            print(f"  enable {name}")
+        for name in to_disable:
+            print(f"  disable {name}")
+        if args.dry_run:
+            exit()
+
+        changed = [a for a in actions if a.Action in ('create', 'update')]
+        deleted = [a for a in actions if a.Action == 'delete']
+        synced_dirs:set[str] = set()
+        saved = [a.Service.try_save(args.service_dir, synced_dirs=synced_dirs) for a in changed]
+        fsync_directories(synced_dirs)
+        for a in deleted:
+            delete_service(a.Current.ServicePath, reload=False)
+
+        inventory = ServiceInventory(args.service_dir, args.cache_dir)
+        for a in changed + deleted:
+            svc = a.Service if a.Service is not None else a.Current
+            inventory.forget(svc.ServicePath)
+            if svc.EnvironmentFile is not None:
+                inventory.forget(svc.EnvironmentFile)
+        inventory.save()
+
+        if len(deleted) > 0 or any(r and r.NeedsReload for r in saved):
+            do_reload_systemctl()
+    do_disable_services(to_disable)
+    do_enable_services(to_enable)
+
+    # Restart running services with changes and start newly enabled ones
+    to_restart = [a.Name for a, r in zip(changed, saved) if r and r.NeedsRestart and
+                  (statuses[a.Name].Active in ('active', 'activating') or (a.Action == 'create' and a.Enabled is True))]
+    started = time.monotonic()
+    results = run_parallel(do_restart_service, to_restart, args.max_parallel)
+    failed = [name for name, ok in zip(to_restart, results) if not ok]
+    releases = { a.Name: get_service_release(a.Service) for a in changed }
+    record_startups([(name, releases[name]) for name, ok in zip(to_restart, results) if ok], started)
+    for name in failed:
+        print(f"{COLOR_DANGER}Failed to restart {name}{COLOR_BASE}", file=sys.stderr)
+
+    print(f"{COLOR_SUCCESS}Applied {len(changed)} changed and {len(deleted)} deleted services, {len(to_restart) - len(failed)} restarted{COLOR_BASE}")
+    exit(1 if len(failed) > 0 else 0)
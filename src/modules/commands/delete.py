@@ -0,0 +1,32 @@
+import argparse
+
+from modules.core import *
+from modules.NetService import *
+from modules.locking import *
+
+def build_parser(parser:argparse.ArgumentParser):
+    parser.add_argument('service_name', help='Name of service in systemd (with prefix)')
+    add_service_dir_argument(parser)
+    parser.add_argument('-F', '--force', help="Force deletion", action="store_true")
+    parser.add_argument('--cleanup', help="Delete service and environment .bak files\n(default is false)", action="store_true", default=False)
+
+def handle(args:argparse.Namespace):
+    # Delete service
+    svcArgs = SVCArgsProp(args.service_dir, args.prefix, args.service_name)
+    # daemon-reload of delete_service runs when lock is released
+    with ServiceDirLock(args.service_dir):
+        # Scaled service is deleted with its template, instances, their drop-ins and env files
+        svc_path = find_service_path(args.service_dir, svcArgs.FullName.removesuffix('.service'))
+        if svc_path is None:
+            print(f"Service not found - {svcArgs.Path}", file=sys.stderr)
+            exit(1)
+
+        svc = read_service(svc_path)
+        if svc.get_service_active() == 'active' and not args.force:
+            print(f"{COLOR_DANGER}Service is currently active. Use --force to stop and delete service.{COLOR_BASE}", file=sys.stderr)
+            exit(1)
+        print(f"Deleting service '{svc.Name}' from systemd...")
+        delete_service(svc_path, args.cleanup)
+        update_inventory(args.service_dir, args.cache_dir, svc_path, svc.EnvironmentFile)
+    print(f"{COLOR_SUCCESS}Service '{svc.Name}' deleted from systemd{COLOR_BASE}")
+    exit()
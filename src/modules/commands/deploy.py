@@ -0,0 +1,80 @@
+import argparse
+
+from modules.core import *
+from modules.NetService import *
+from modules.runtimes import *
+from modules.releases import *
+from modules.rollout import *
+from modules.locking import *
+
+def build_parser(parser:argparse.ArgumentParser):
+    parser.add_argument('service_name', type=str, help='Name of service in systemd')
+    parser.add_argument('publish_dir', type=str, help="Output of `dotnet publish` to deploy")
+    add_service_dir_argument(parser)
+    parser.add_argument('--entry', type=str, help="Application file relative to publish_dir\n(default: file name from current ExecStart)", default=None)
+    parser.add_argument('--releases-dir', type=str, help="Directory for '<service>/releases' of new services\n(default: %(default)s)", default=RELEASES_DIR)
+    parser.add_argument('--keep', type=int, help="Number of releases to keep\n(default: %(default)s)", default=5)
+    parser.add_argument('--copy-parallel', type=int, help="Files copied or hashed at once\n(default: %(default)s)", default=8)
+    parser.add_argument('--no-restart', help="Only switch 'current' release, do not restart service", action="store_true")
+    add_rollout_arguments(parser)
+
+def get_exec_file_name(svc:NetService)->Optional[str]:
+    exec_start = svc.Params.Properties.get('ExecStart', '').split()
+    return os.path.basename(exec_start[-1]) if len(exec_start) > 0 else None
+
+def point_service_to_release(svc:NetService, app_dir:str, entry:str)->bool:
+    """Run service from '<app dir>/current', returns True if unit file has to be reloaded."""
+    current_dir = os.path.join(app_dir, CURRENT_LINK)
+    exec_path = os.path.join(current_dir, entry)
+    svc.Params.Properties['WorkingDirectory'] = current_dir
+    exec_path, dotnet = resolve_exec_start(exec_path, read_runtimeconfig(exec_path))
+    svc.Params.set_ExecStart(exec_path, dotnet=dotnet)
+    result = svc.try_save(os.path.dirname(svc.ServicePath))
+    if result is False:
+        raise Exception(f"Unable to save {svc.ServicePath}")
+    return result.NeedsReload
+
+def handle(args:argparse.Namespace):
+    svcArgs = SVCArgsProp(args.service_dir, args.prefix, args.service_name)
+    if not os.path.isdir(args.publish_dir):
+        print(f"{COLOR_DANGER}Path is not directory - '{args.publish_dir}'{COLOR_BASE}", file=sys.stderr)
+        exit(1)
+
+    # Unit is read and changed under lock, its releases directory too, so concurrent deploys and rollbacks do not mix
+    with ServiceDirLock(args.service_dir):
+        svc_path = find_service_path(args.service_dir, svcArgs.FullName)
+        if svc_path is None:
+            print(f"Service not found - {svcArgs.Path}", file=sys.stderr)
+            exit(1)
+
+        svc = read_service(svc_path)
+        entry = args.entry or get_exec_file_name(svc)
+        if entry is None or not os.path.isfile(os.path.join(args.publish_dir, entry)):
+            print(f"{COLOR_DANGER}Application file '{entry}' not found in {args.publish_dir}, use --entry{COLOR_BASE}", file=sys.stderr)
+            exit(1)
+
+        app_dir = get_app_dir_of_service(svc) or get_app_dir(svcArgs.FullName, args.releases_dir)
+        os.makedirs(app_dir, exist_ok=True)
+        with ServiceDirLock(app_dir):
+            previous = get_current_release(app_dir)
+            release = create_release(app_dir, args.publish_dir, args.copy_parallel)
+            print(f"Release {release.Name}: {release.Copied} files copied ({release.CopiedBytes} bytes), {release.Linked} hardlinked to previous release, {release.Hashed} hashed")
+
+            switch_release(app_dir, release.Name)
+            try:
+                if point_service_to_release(svc, app_dir, entry):
+                    do_reload_systemctl()
+                update_inventory(args.service_dir, args.cache_dir, svc.ServicePath, svc.EnvironmentFile)
+            except Exception as e:
+                print(f"{COLOR_DANGER}{e}{COLOR_BASE}", file=sys.stderr)
+                exit(1)
+            print(f"{COLOR_SUCCESS}{svc.Name} now runs {os.path.join(app_dir, CURRENT_LINK)} -> {release.Name}{COLOR_BASE}")
+
+            for name in prune_releases(app_dir, args.keep):
+                print(f"Removed old release {name}")
+
+    if not args.no_restart and not restart_service_units(svc, args):
+        if previous is not None:
+            print(f"{COLOR_WARN}Use `rollback {args.service_name}` to return to release {previous}{COLOR_BASE}", file=sys.stderr)
+        exit(1)
+    exit()
@@ -0,0 +1,215 @@
+import signal
+import argparse
+
+from modules.core import *
+from modules.NetService import *
+from modules.status import *
+from modules.journal import *
+from modules.restarts import *
+from modules.locking import *
+from modules.output import *
+
+DOCTOR_STATUS_PROPERTIES = ['ActiveState', 'SubState', 'Result', 'NRestarts', 'ExecMainCode', 'ExecMainStatus',
+                            'RestartUSec', 'RestartSteps', 'RestartMaxDelayUSec']
+DOCTOR_TABLE_HEADERS = ["Name", "State", "Restarts", "Exits", "Last exit", "Restart", "Reason"]
+# Units restarting after the same delay come back at the same time
+DOCTOR_HERD_SIZE = 5
+EXIT_CODES = { '1': 'exit', '2': 'killed', '3': 'dumped' } # ExecMainCode is CLD_* code of waitid()
+MAIN_PROCESS_EXITED = "Main process exited, "
+DOCTOR_ROW_FIELDS = UNIT_ROW_FIELDS + ['active', 'sub_state', 'result', 'restarts', 'exits', 'last_exit', 'reason', 'restart', 'crash_loop', 'suggested']
+
+def build_parser(parser:argparse.ArgumentParser):
+    add_service_dir_argument(parser)
+    parser.add_argument('-S', '--since', type=str, help="Journal window for exit reasons\n(default: %(default)s)", default='1 hour ago')
+    parser.add_argument('--min-restarts', type=int, help="NRestarts of failing or restarting unit to report crash loop\n(default: %(default)s)", default=3)
+    parser.add_argument('--min-exits', type=int, help="Main process exits in journal window to report crash loop\n(default: %(default)s)", default=3)
+    parser.add_argument('--apply', help="Write suggested restart settings to crash looping services and reload systemd", action="store_true")
+    parser.add_argument('--all', help="With --apply change all services, not only crash looping", action="store_true")
+    add_restart_arguments(parser, backoff_option=False)
+    add_format_argument(parser)
+
+class UnitDiagnosis:
+    Unit:str = None
+    Service:NetService = None
+    Status:ServiceStatus = None
+    Exits:int = 0
+    LastExit:str = ''
+    LastError:str = ''
+    StartLimitHit:bool = False
+
+    def __init__(self, unit:str, svc:NetService, status:ServiceStatus):
+        self.Unit = unit
+        self.Service = svc
+        self.Status = status
+
+    @property
+    def RestartSec(self)->Optional[float]:
+        return _parse_status_timespan(self.Status.Properties.get('RestartUSec'))
+
+    @property
+    def HasBackoff(self)->bool:
+        return self.Status.Properties.get('RestartSteps', '0') not in ('', '0')
+
+    def is_crash_loop(self, min_restarts:int, min_exits:int)->bool:
+        if self.StartLimitHit or self.Status.Properties.get('Result') == 'start-limit-hit':
+            return True
+        restarting = self.Status.Active in ('activating', 'failed') or self.Status.SubState == 'auto-restart'
+        return self.Exits >= min_exits or (restarting and self.Status.NRestarts >= min_restarts)
+
+    def format_exit(self)->str:
+        code = EXIT_CODES.get(self.Status.Properties.get('ExecMainCode', ''), None)
+        status = self.Status.Properties.get('ExecMainStatus', '')
+        if code is None or not status.isdigit():
+            return self.LastExit
+        if code != 'exit':
+            try:
+                return f"{code} {signal.Signals(int(status)).name}"
+            except ValueError:
+                pass
+        return f"{code} {status}"
+
+    def format_restart(self)->str:
+        steps = self.Status.Properties.get('RestartSteps', '0')
+        return format_restart_settings(self.RestartSec, int(steps) if steps.isdigit() else 0,
+                                       _parse_status_timespan(self.Status.Properties.get('RestartMaxDelayUSec')))
+
+def _parse_status_timespan(value:Optional[str])->Optional[float]:
+    try:
+        return parse_timespan(value) if value else None
+    except ValueError:
+        return None # 'infinity'
+
+def get_unit_identifier(unit:str, svc:NetService)->str:
+    identifier = svc.Params.Properties.get('SyslogIdentifier', '') or unit
+    return identifier.replace('%i', unit.partition('@')[2])
+
+def read_unit_failures(diagnoses:list[UnitDiagnosis], since:str):
+    """Count main process exits and remember last reasons of all units from one journalctl run."""
+    by_unit = { f"{d.Unit}.service": d for d in diagnoses }
+    by_identifier = { get_unit_identifier(d.Unit, d.Service): d for d in diagnoses }
+    command = build_unit_failures_command([d.Unit for d in diagnoses], list(by_identifier), since)
+    for line in read_journal(command):
+        entry = parse_journal_entry(line)
+        if entry is None:
+            continue
+        diagnosis = by_unit.get(entry.Unit)
+        if diagnosis is not None:
+            exited = entry.Message.find(MAIN_PROCESS_EXITED) # message starts with unit name
+            if exited >= 0:
+                diagnosis.Exits += 1
+                diagnosis.LastExit = entry.Message[exited + len(MAIN_PROCESS_EXITED):].strip()
+            elif 'Start request repeated too quickly' in entry.Message:
+                diagnosis.StartLimitHit = True
+            continue
+        diagnosis = by_identifier.get(entry.Identifier)
+        if diagnosis is not None and entry.Priority <= JOURNAL_ERROR_PRIORITY and entry.Message.strip():
+            diagnosis.LastError = entry.Message.strip().splitlines()[0][:120]
+
+def format_reason(d:UnitDiagnosis)->str:
+    reason = d.LastError or (f"exited {d.LastExit}" if d.LastExit else '')
+    if d.StartLimitHit:
+        reason = f"start limit hit; {reason}" if reason else "start limit hit"
+    return reason
+
+def format_diagnosis(d:UnitDiagnosis)->list[str]:
+    state = f"{d.Status.Active} ({d.Status.SubState})" if d.Status.SubState else d.Status.Active
+    return [d.Unit, f"{COLOR_DANGER}{state}{COLOR_BASE}", str(d.Status.NRestarts), str(d.Exits), d.format_exit(), d.format_restart(), format_reason(d)]
+
+def get_suggested_settings(svc:NetService, policy:RestartPolicy)->dict[str,str]:
+    unit, service = policy.get_settings(svc.Name)
+    return { **service, **unit }
+
+def format_settings(svc:NetService, policy:RestartPolicy)->str:
+    return ' '.join(f"{key}={value}" for key, value in get_suggested_settings(svc, policy).items())
+
+def build_diagnosis_row(d:UnitDiagnosis, crash_loop:bool, suggested:Optional[dict[str,str]])->dict:
+    row = get_unit_fields(d.Service.Name, d.Unit)
+    row.update({
+        'active': d.Status.Active, 'sub_state': d.Status.SubState, 'result': d.Status.Properties.get('Result') or None,
+        'restarts': d.Status.NRestarts, 'exits': d.Exits, 'last_exit': d.format_exit() or None, 'reason': format_reason(d) or None,
+        'restart': d.format_restart() or None, 'crash_loop': crash_loop, 'suggested': suggested,
+    })
+    return row
+
+def handle(args:argparse.Namespace):
+    try:
+        settings = get_restart_settings(vars(args), True)
+        policy = RestartPolicy.from_settings(settings, args.restart_jitter)
+    except Exception as e:
+        print(f"{COLOR_DANGER}{e}{COLOR_BASE}", file=sys.stderr)
+        exit(2)
+
+    services = get_services(args.service_dir, args.prefix, args.cache_dir)
+    units = get_service_units(services)
+    if len(units) == 0:
+        if args.format != 'table':
+            RowWriter(args.format, DOCTOR_ROW_FIELDS).close()
+        else:
+            print("No services registered.")
+        exit()
+
+    # State of all units and journal of all units are both read in one pass
+    statuses = get_services_status([unit for unit, _, _ in units], DOCTOR_STATUS_PROPERTIES)
+    diagnoses = [UnitDiagnosis(unit, svc, statuses[unit]) for unit, svc, _ in units]
+    read_unit_failures(diagnoses, args.since)
+    looping = [d for d in diagnoses if d.is_crash_loop(args.min_restarts, args.min_exits)]
+
+    targets:dict[str,NetService] = {}
+    for d in (diagnoses if args.all else looping):
+        if not (d.HasBackoff and not args.all):
+            targets.setdefault(d.Service.Name, d.Service)
+
+    # With machine formats rows are the output, notes about them go to stderr
+    notes = sys.stdout if args.format == 'table' else sys.stderr
+    if args.format != 'table':
+        looping_units = set(d.Unit for d in looping)
+        writer = RowWriter(args.format, DOCTOR_ROW_FIELDS)
+        for d in diagnoses:
+            target = targets.get(d.Service.Name)
+            writer.write(build_diagnosis_row(d, d.Unit in looping_units, get_suggested_settings(target, policy) if target is not None else None))
+        writer.close()
+    elif len(looping) > 0:
+        from tabulate import tabulate # loaded only for table output
+        print(f"{COLOR_DANGER}{len(looping)} of {len(diagnoses)} units are crash looping{COLOR_BASE}")
+        print(tabulate([format_diagnosis(d) for d in looping], headers=DOCTOR_TABLE_HEADERS, tablefmt="grid", disable_numparse=True))
+    else:
+        print(f"{COLOR_SUCCESS}No crash looping units among {len(diagnoses)}{COLOR_BASE}")
+
+    herds:dict[Optional[float],int] = {}
+    for d in diagnoses:
+        if not d.HasBackoff:
+            herds[d.RestartSec] = herds.get(d.RestartSec, 0) + 1
+    for restart_sec, count in herds.items():
+        if restart_sec is not None and count >= DOCTOR_HERD_SIZE:
+            print(f"{COLOR_WARN}{count} units restart after the same {format_timespan(restart_sec)} without backoff, they restart together when shared dependency fails{COLOR_BASE}", file=notes)
+
+    for d in looping:
+        if d.HasBackoff:
+            print(f"{d.Unit}: restart backoff is configured, check reason of failures", file=notes)
+    if len(targets) == 0:
+        exit(1 if len(looping) > 0 else 0)
+
+    if not args.apply:
+        if args.format == 'table':
+            print("Suggested restart settings (write them with --apply):")
+            for svc in targets.values():
+                print(f"  {svc.Name}: {format_settings(svc, policy)}")
+        exit(1 if len(looping) > 0 else 0)
+
+    synced_dirs:set[str] = set()
+    with ServiceDirLock(args.service_dir):
+        inventory = ServiceInventory(args.service_dir, args.cache_dir)
+        for svc in targets.values():
+            # Re-read under lock, service could be changed by other writer since diagnosis
+            svc = read_service(svc.ServicePath, inventory)
+            apply_restart_policy(svc, policy)
+            result = svc.try_save(os.path.dirname(svc.ServicePath), synced_dirs=synced_dirs)
+            if result and result.NeedsReload:
+                do_reload_systemctl()
+            inventory.forget(svc.ServicePath)
+            print(f"  {svc.Name}: {format_settings(svc, policy)}", file=notes)
+        fsync_directories(synced_dirs)
+        inventory.save()
+    warn_backoff_support(policy)
+    print(f"{COLOR_SUCCESS}Restart settings of {len(targets)} services updated{COLOR_BASE}", file=notes)
+    exit()
@@ -0,0 +1,30 @@
+import argparse
+
+from modules.core import *
+from modules.NetService import *
+
+def build_parser(parser:argparse.ArgumentParser):
+    parser.add_argument('app', help="Application of your choise to use for edit ('vi', 'nano', etc.)")
+    parser.add_argument('service_name', help="Name of service in systemd")
+    add_service_dir_argument(parser)
+    parser.add_argument('--env', help="Edit environment file defined in service", action="store_true")
+
+def handle(args:argparse.Namespace):
+    app = str(args.app)
+    svcArgs = SVCArgsProp(args.service_dir, args.prefix, args.service_name)
+    if not os.path.isfile(svcArgs.Path):
+        print(f"Service not found - {svcArgs.Path}", file=sys.stderr)
+        exit(1)
+
+    if args.env:
+        svc = read_service(svcArgs.Path)
+        if not os.path.isfile(svc.EnvironmentFile):
+            print(f"Environment file not found - {svc.EnvironmentFile}", file=sys.stderr)
+            exit(1)
+        subprocess.run([app, svc.EnvironmentFile])
+        update_inventory(args.service_dir, args.cache_dir, svcArgs.Path, svc.EnvironmentFile)
+        exit()
+
+    subprocess.run([app, svcArgs.Path])
+    update_inventory(args.service_dir, args.cache_dir, svcArgs.Path)
+    exit()
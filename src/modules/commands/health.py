@@ -0,0 +1,60 @@
+import argparse
+
+from modules.core import *
+from modules.NetService import *
+from modules.health import *
+from modules.output import *
+
+HEALTH_TABLE_HEADERS = ["Name", "URL", "Status", "p50 ms", "Max ms", "Errors"]
+HEALTH_ROW_FIELDS = UNIT_ROW_FIELDS + ['url', 'healthy', 'status', 'p50_ms', 'max_ms', 'probes', 'errors']
+
+def build_parser(parser:argparse.ArgumentParser):
+    parser.add_argument('service_name', type=str, nargs='*', help="Services to check (default: all registered)")
+    add_service_dir_argument(parser)
+    parser.add_argument('--path', type=str, help="Request path of health endpoint\n(default: '%(default)s')", default='/')
+    parser.add_argument('-k', '--count', type=int, help="Probes per endpoint\n(default: %(default)s)", default=3)
+    parser.add_argument('--timeout', type=float, help="Timeout of single probe in seconds\n(default: %(default)s)", default=2.0)
+    parser.add_argument('--max-parallel', type=int, help="Maximum number of probes in flight\n(default: %(default)s)", default=256)
+    add_format_argument(parser)
+    parser.add_argument('--json', dest='format', help="Same as --format json", action="store_const", const='json')
+
+def format_latency(value:Optional[float])->str:
+    return f"{value * 1000:.1f}" if value is not None else ''
+
+def format_status(health:EndpointHealth)->str:
+    status = str(health.Status) if health.Status is not None else 'down'
+    color = COLOR_SUCCESS if health.Healthy else COLOR_DANGER
+    return f"{color}{status}{COLOR_BASE}"
+
+def handle(args:argparse.Namespace):
+    if args.count < 1 or args.max_parallel < 1:
+        print(f"{COLOR_DANGER}--count and --max-parallel must be positive{COLOR_BASE}", file=sys.stderr)
+        exit(2)
+
+    services = get_services(args.service_dir, args.prefix, args.cache_dir)
+    if len(args.service_name) > 0:
+        names = set(SVCArgsProp(args.service_dir, args.prefix, name).FullName for name in args.service_name)
+        services = [svc for svc in services if svc.Name in names or svc.Name.rstrip('@') in names]
+    service_units = get_service_units(services)
+    units = [(unit, urls) for unit, _, urls in service_units]
+
+    results = probe_units(units, args.path, args.count, args.timeout, args.max_parallel)
+    probed = set(health.Unit for health in results)
+    without_urls = [unit for unit, _ in units if unit not in probed]
+
+    if args.format != 'table':
+        unit_services = { unit: svc.Name for unit, svc, _ in service_units }
+        writer = RowWriter(args.format, HEALTH_ROW_FIELDS)
+        for health in results:
+            writer.write({ **get_unit_fields(unit_services[health.Unit], health.Unit), **health.to_dict() })
+        for unit in without_urls:
+            writer.write({ **get_unit_fields(unit_services[unit], unit), 'errors': ['no ASPNETCORE_URLS'] })
+        writer.close()
+    elif len(units) == 0:
+        print("No services registered.")
+    else:
+        data = [[h.Unit, h.Url, format_status(h), format_latency(h.LatencyP50), format_latency(h.LatencyMax), '\n'.join(sorted(set(h.Errors)))] for h in results]
+        data += [[unit, '', '', '', '', 'no ASPNETCORE_URLS'] for unit in without_urls]
+        from tabulate import tabulate # loaded only for table output
+        print(tabulate(data, headers=HEALTH_TABLE_HEADERS, tablefmt="grid", disable_numparse=True))
+    exit(0 if all(health.Healthy for health in results) else 1)
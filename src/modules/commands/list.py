@@ -0,0 +1,24 @@
+import argparse
+
+from modules.core import *
+from modules.NetService import *
+from modules.output import add_format_argument
+from modules.listing import print_services
+
+def build_parser(parser:argparse.ArgumentParser):
+    add_service_dir_argument(parser)
+    parser.add_argument('-v', '--verbose', help="Show more details (profile, drop-ins)", action="store_true")
+    parser.add_argument('-r', '--resources', help="Show CPU, memory, tasks, IO and restarts from cgroups", action="store_true")
+    parser.add_argument('--interval', type=float, help="CPU usage sampling interval in seconds (streamed formats sample all units once before first row)\n(default: %(default)s)", default=0.5)
+    add_format_argument(parser)
+
+def handle(args:argparse.Namespace):
+    # List registered services
+    if args.format == 'table':
+        services = get_services(args.service_dir, args.prefix, args.cache_dir)
+    else:
+        services = iter_services(args.service_dir, args.prefix, args.cache_dir)
+    # Streamed rows take first CPU sample of all units up front, not one sampling interval per batch
+    units = list_service_unit_names(args.service_dir, args.prefix, args.cache_dir) if args.resources and args.format != 'table' else None
+    print_services(services, args.service_dir, args.verbose, args.resources, args.interval, args.format, units)
+    exit()
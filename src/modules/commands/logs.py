@@ -0,0 +1,129 @@
+import re
+import fnmatch
+import argparse
+
+from modules.core import *
+from modules.NetService import *
+from modules.journal import *
+from modules.output import *
+
+LOG_COLORS = ['\033[36m', '\033[35m', '\033[34m', '\033[32m', '\033[33m', '\033[96m', '\033[95m', '\033[94m'] if COLORS_ENABLED else ['']
+LOG_SUMMARY_HEADERS = ["Name", "Lines", "Errors", "Warnings", "Error %", "Errors/min"]
+LOG_DEFAULT_LINES = 100
+LOG_ROW_FIELDS = UNIT_ROW_FIELDS + ['identifier', 'time', 'priority', 'message']
+LOG_SUMMARY_ROW_FIELDS = UNIT_ROW_FIELDS + ['identifier', 'lines', 'errors', 'warnings', 'error_percent', 'errors_per_minute']
+
+def build_parser(parser:argparse.ArgumentParser):
+    parser.add_argument('pattern', type=str, nargs='?', help="Glob of service names without prefix\n(default: all services)", default='*')
+    add_service_dir_argument(parser)
+    parser.add_argument('-f', '--follow', help="Keep printing new entries", action="store_true")
+    parser.add_argument('--priority', type=str, help="Priority or range, e.g. 'err' or 'warning..emerg'", default=None)
+    parser.add_argument('-g', '--grep', type=str, help="Show only messages matching regular expression", default=None)
+    parser.add_argument('-S', '--since', type=str, help="Show entries not older than date, e.g. '1 hour ago'", default=None)
+    parser.add_argument('-n', '--lines', type=int, help=f"Number of most recent entries\n(default: {LOG_DEFAULT_LINES} without --since and --summary)", default=None)
+    parser.add_argument('--summary', help="Print per service error rate instead of entries", action="store_true")
+    parser.add_argument('--no-color', help="Do not color service names", action="store_true")
+    parser.add_argument('--from-file', type=str, help="Read recorded `journalctl -o json` output instead of journal", default=None)
+    add_format_argument(parser)
+
+def get_log_identifiers(services_dir:str, prefix:str, pattern:str)->dict[str,str]:
+    """SyslogIdentifier of matching services mapped to their units, template instances log under their own identifier."""
+    identifiers:dict[str,str] = {}
+    instances:Optional[dict[str,list[str]]] = None
+    for svc_path in sorted(list_service_files(services_dir, prefix)):
+        name = os.path.basename(svc_path)[0:-8]
+        if not fnmatch.fnmatch(name.removeprefix(prefix), pattern) and not fnmatch.fnmatch(name, pattern):
+            continue
+        identifier = read_service(svc_path).Params.Properties.get('SyslogIdentifier', name)
+        if name.endswith('@'):
+            if instances is None:
+                instances = get_template_instances(services_dir)
+            for instance in instances.get(name, []):
+                identifiers[identifier.replace('%i', instance)] = f"{name}{instance}"
+        else:
+            identifiers[identifier] = name
+    return identifiers
+
+def get_entry_row(entry:JournalEntry, unit:str)->dict:
+    row = get_unit_fields_from_name(unit)
+    row.update({ 'identifier': entry.Identifier, 'time': entry.Time.isoformat(timespec='milliseconds'),
+                 'priority': JOURNAL_PRIORITIES[entry.Priority] if 0 <= entry.Priority < len(JOURNAL_PRIORITIES) else str(entry.Priority),
+                 'message': entry.Message })
+    return row
+
+def format_entry(entry:JournalEntry, width:int, color:Optional[str])->str:
+    name = entry.Identifier.ljust(width)
+    if color is not None:
+        name = f"{color}{name}{COLOR_BASE}"
+    message = entry.Message
+    if color is not None and entry.Priority <= JOURNAL_ERROR_PRIORITY:
+        message = f"{COLOR_DANGER}{message}{COLOR_BASE}"
+    elif color is not None and entry.Priority == JOURNAL_WARNING_PRIORITY:
+        message = f"{COLOR_WARN}{message}{COLOR_BASE}"
+    return f"{entry.Time.strftime('%b %d %H:%M:%S.%f')[:-3]} {name} | {message}"
+
+def print_summary(summary:LogSummary, identifiers:dict[str,str], format:str='table'):
+    if format != 'table':
+        writer = RowWriter(format, LOG_SUMMARY_ROW_FIELDS)
+        for name, unit in identifiers.items():
+            per_minute = summary.errors_per_minute(name)
+            writer.write({ **get_unit_fields_from_name(unit), 'identifier': name,
+                           'lines': summary.Total.get(name, 0), 'errors': summary.Errors.get(name, 0), 'warnings': summary.Warnings.get(name, 0),
+                           'error_percent': round(summary.error_rate(name), 1), 'errors_per_minute': round(per_minute, 2) if per_minute is not None else None })
+        writer.close()
+        return
+    data = []
+    for name in identifiers:
+        per_minute = summary.errors_per_minute(name)
+        data.append([name, str(summary.Total.get(name, 0)), str(summary.Errors.get(name, 0)), str(summary.Warnings.get(name, 0)),
+                     f"{summary.error_rate(name):.1f}", f"{per_minute:.2f}" if per_minute is not None else ''])
+    from tabulate import tabulate # loaded only for table output
+    print(tabulate(data, headers=LOG_SUMMARY_HEADERS, tablefmt="grid", disable_numparse=True))
+
+def handle(args:argparse.Namespace):
+    try:
+        priority = parse_priority(args.priority) if args.priority is not None else None
+        pattern = re.compile(args.grep) if args.grep is not None else None
+    except (ValueError, re.error) as e:
+        print(f"{COLOR_DANGER}{e}{COLOR_BASE}", file=sys.stderr)
+        exit(2)
+
+    identifiers = get_log_identifiers(args.service_dir, args.prefix, args.pattern)
+    if len(identifiers) == 0:
+        print(f"No services match '{args.pattern}'")
+        exit(1)
+
+    if args.from_file is not None:
+        source = open(args.from_file, 'r', errors='replace')
+    else:
+        lines = args.lines
+        if lines is None and args.since is None and not args.summary:
+            lines = LOG_DEFAULT_LINES
+        source = read_journal(build_journalctl_command(list(identifiers), args.follow, priority, args.since, lines))
+
+    writer = RowWriter(args.format, LOG_ROW_FIELDS) if args.format != 'table' and not args.summary else None
+    colored = not args.no_color and sys.stdout.isatty()
+    colors = { name: LOG_COLORS[idx % len(LOG_COLORS)] for idx, name in enumerate(identifiers) }
+    width = max(len(name) for name in identifiers)
+    summary = LogSummary()
+    try:
+        for entry in iter_journal_entries(source, set(identifiers), priority, pattern):
+            if args.summary:
+                summary.add(entry)
+            elif writer is not None:
+                writer.write(get_entry_row(entry, identifiers[entry.Identifier]))
+            else:
+                print(format_entry(entry, width, colors[entry.Identifier] if colored else None), flush=args.follow)
+    except KeyboardInterrupt:
+        pass
+    except BrokenPipeError:
+        # Output closed by pager or `head`
+        sys.stdout = open(os.devnull, 'w')
+        exit()
+    finally:
+        source.close()
+    if writer is not None:
+        writer.close()
+    if args.summary:
+        print_summary(summary, identifiers, args.format)
+    exit()
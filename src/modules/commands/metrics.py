@@ -0,0 +1,115 @@
+import select
+import argparse
+from http.server import HTTPServer, BaseHTTPRequestHandler
+
+from modules.core import *
+from modules.NetService import *
+from modules.metrics import *
+
+def build_parser(parser:argparse.ArgumentParser):
+    add_service_dir_argument(parser)
+    parser.add_argument('--textfile', type=str, help="Write metrics to node_exporter textfile collector file every --interval", default=None)
+    parser.add_argument('--listen', type=str, help="Serve metrics over HTTP on [HOST:]PORT at /metrics", default=None)
+    parser.add_argument('--once', help="Write textfile once and exit", action="store_true")
+    parser.add_argument('--interval', type=float, help="Seconds between textfile writes and between endpoint probes\n(default: %(default)s)", default=15.0)
+    parser.add_argument('--health-path', type=str, help="Request path of endpoint probes\n(default: '%(default)s')", default='/')
+    parser.add_argument('--probe-timeout', type=float, help="Timeout of single probe in seconds\n(default: %(default)s)", default=2.0)
+    parser.add_argument('--no-probe', help="Do not probe ASPNETCORE_URLS endpoints", action="store_true")
+    parser.add_argument('--poll', help="Do not subscribe to systemd signals, read state of all units on every scrape", action="store_true")
+
+def parse_listen_address(value:str)->tuple[str,int]:
+    host, sep, port = value.rpartition(':')
+    if not port.isdigit():
+        raise Exception(f"Invalid listen address '{value}', expected [HOST:]PORT")
+    return (host.strip('[]') if sep else '', int(port))
+
+def create_metrics_server(address:tuple[str,int], collector:MetricsCollector)->HTTPServer:
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?', 1)[0] not in ('/metrics', '/'):
+                self.send_error(404)
+                return
+            body = b''
+            try:
+                collector.refresh()
+                body = collector.render().encode('utf-8')
+                self.send_response(200)
+            except Exception as e:
+                body = f"{e}\n".encode('utf-8')
+                self.send_response(500)
+            self.send_header('Content-Type', METRICS_CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass # scrapes are not logged
+
+    server = HTTPServer(address, MetricsHandler)
+    server.timeout = 0
+    return server
+
+def write_textfile(path:str, collector:MetricsCollector):
+    # node_exporter reads only complete files, so write goes through rename
+    write_file_atomic(path, collector.render(), chmod=0o644, backup=False)
+
+def handle(args:argparse.Namespace):
+    if args.interval <= 0:
+        print(f"{COLOR_DANGER}--interval must be positive{COLOR_BASE}", file=sys.stderr)
+        exit(2)
+    collector = MetricsCollector(args.service_dir, args.prefix, args.cache_dir)
+    single = args.listen is None and (args.textfile is None or args.once)
+    if not single and not args.poll:
+        collector.connect_bus()
+
+    # First state read comes after subscribe, so no change is lost in between
+    collector.refresh()
+    if not args.no_probe:
+        collector.probe(args.health_path, args.probe_timeout)
+    if single:
+        if args.textfile is not None:
+            write_textfile(args.textfile, collector)
+        else:
+            sys.stdout.write(collector.render())
+        exit()
+
+    server = None
+    if args.listen is not None:
+        try:
+            server = create_metrics_server(parse_listen_address(args.listen), collector)
+        except Exception as e:
+            print(f"{COLOR_DANGER}{e}{COLOR_BASE}", file=sys.stderr)
+            exit(1)
+        print(f"Serving metrics of {len(collector.Units)} units on http://{args.listen}/metrics", file=sys.stderr)
+    if args.textfile is not None:
+        write_textfile(args.textfile, collector)
+
+    next_tick = time.monotonic() + args.interval
+    try:
+        while True:
+            waitables = [w for w in (server, collector.Bus) if w is not None]
+            timeout = max(0.0, next_tick - time.monotonic())
+            if collector.Bus is not None and collector.Bus.has_pending():
+                readable = [collector.Bus]
+            elif len(waitables) > 0:
+                readable = select.select(waitables, [], [], timeout)[0]
+            else:
+                time.sleep(timeout)
+                readable = []
+            if collector.Bus is not None and collector.Bus in readable:
+                collector.read_signals()
+            if server is not None and server in readable:
+                server.handle_request()
+
+            if time.monotonic() >= next_tick:
+                collector.refresh()
+                if not args.no_probe:
+                    collector.probe(args.health_path, args.probe_timeout)
+                if args.textfile is not None:
+                    write_textfile(args.textfile, collector)
+                next_tick = time.monotonic() + args.interval
+    except KeyboardInterrupt:
+        pass
+    if server is not None:
+        server.server_close()
+    exit()
@@ -0,0 +1,55 @@
+import argparse
+
+from modules.core import *
+from modules.NetService import *
+from modules.ports import *
+from modules.output import *
+
+PORTS_TABLE_HEADERS = ["Port", "Host", "Owner", "URL"]
+# Listening sockets not matched to any service have null service and unit
+PORTS_ROW_FIELDS = UNIT_ROW_FIELDS + ['port', 'host', 'url', 'conflict']
+
+def build_parser(parser:argparse.ArgumentParser):
+    add_service_dir_argument(parser)
+    parser.add_argument('--conflicts', help="Show only ports used by more than one owner", action="store_true")
+    parser.add_argument('--no-listeners', help="Do not read listening sockets from /proc/net", action="store_true")
+    parser.add_argument('--port-range', type=str, help="Also show next free port of range", default=None)
+    add_format_argument(parser)
+
+def handle(args:argparse.Namespace):
+    services = get_services(args.service_dir, args.prefix, args.cache_dir)
+    service_units = get_service_units(services)
+    index = build_port_index([(unit, urls) for unit, _, urls in service_units], None if args.no_listeners else PROC_NET_DIR)
+    conflicts = index.get_conflicts()
+
+    if args.format != 'table':
+        unit_services = { unit: svc.Name for unit, svc, _ in service_units }
+        writer = RowWriter(args.format, PORTS_ROW_FIELDS)
+        for port in sorted(conflicts if args.conflicts else index.Ports):
+            for owner in index.Ports[port]:
+                row = get_unit_fields(unit_services.get(owner.Name), owner.Name)
+                writer.write({ **row, 'port': port, 'host': owner.Host, 'url': owner.Url, 'conflict': port in conflicts })
+        writer.close()
+        exit(1 if len(conflicts) > 0 else 0)
+
+    data = []
+    for port in sorted(conflicts if args.conflicts else index.Ports):
+        for owner in index.Ports[port]:
+            name = owner.Name if owner.Name is not None else '(listening)'
+            port_text = f"{COLOR_DANGER}{port}{COLOR_BASE}" if port in conflicts else str(port)
+            data.append([port_text, owner.Host, name, owner.Url or ''])
+
+    if len(data) > 0:
+        from tabulate import tabulate # loaded only for table output
+        print(tabulate(data, headers=PORTS_TABLE_HEADERS, tablefmt="grid", disable_numparse=True))
+    else:
+        print("No ports in use." if not args.conflicts else "No port conflicts.")
+
+    if args.port_range is not None:
+        try:
+            port = index.next_free(parse_port_range(args.port_range))
+        except ValueError as e:
+            print(f"{COLOR_DANGER}{e}{COLOR_BASE}", file=sys.stderr)
+            exit(2)
+        print(f"Next free port in {args.port_range}: {port if port is not None else 'none'}")
+    exit(1 if len(conflicts) > 0 else 0)
@@ -0,0 +1,41 @@
+import time
+import fnmatch
+import argparse
+
+from modules.core import *
+from modules.NetService import *
+from modules.rollout import *
+
+def build_parser(parser:argparse.ArgumentParser):
+    parser.add_argument('pattern', type=str, help="Glob of service names without prefix, template name ('api@') restarts all its instances")
+    add_service_dir_argument(parser)
+    add_rollout_arguments(parser)
+
+def match_units(units:list[tuple[str,NetService,Optional[str]]], prefix:str, pattern:str)->list[tuple[str,Optional[str]]]:
+    matched:list[tuple[str,Optional[str]]] = []
+    for unit, svc, urls in units:
+        names = [unit, unit.removeprefix(prefix), svc.Name, svc.Name.removeprefix(prefix)]
+        if any(fnmatch.fnmatch(name, pattern) for name in names):
+            matched.append((unit, urls))
+    return matched
+
+def handle(args:argparse.Namespace):
+    if args.wave_size < 1 or args.timeout <= 0:
+        print(f"{COLOR_DANGER}--wave-size and --timeout must be positive{COLOR_BASE}", file=sys.stderr)
+        exit(2)
+
+    services = get_services(args.service_dir, args.prefix, args.cache_dir)
+    service_units = get_service_units(services)
+    units = match_units(service_units, args.prefix, args.pattern)
+    if len(units) == 0:
+        print(f"No services match '{args.pattern}'")
+        exit(1)
+
+    waves = len(split_waves(units, args.wave_size))
+    print(f"Restarting {len(units)} units in {waves} waves of up to {args.wave_size}")
+    started = time.monotonic()
+    rollouts = restart_in_waves(units, args.wave_size, args.timeout, args.health_path, args.on_failure, report=print_wave)
+    print_rollouts(rollouts)
+    releases = { svc.Name: get_service_release(svc) for svc in services }
+    record_rollouts(rollouts, { unit: releases[svc.Name] for unit, svc, _ in service_units }, started)
+    exit(0 if all(r.Result == 'ready' for r in rollouts) else 1)
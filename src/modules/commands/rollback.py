@@ -0,0 +1,61 @@
+import argparse
+
+from modules.core import *
+from modules.NetService import *
+from modules.releases import *
+from modules.rollout import *
+from modules.locking import *
+
+def build_parser(parser:argparse.ArgumentParser):
+    parser.add_argument('service_name', type=str, help='Name of service in systemd')
+    parser.add_argument('release', type=str, nargs='?', help="Release to switch to\n(default: release before current)", default=None)
+    add_service_dir_argument(parser)
+    parser.add_argument('-l', '--list', help="Only list releases", action="store_true")
+    parser.add_argument('--no-restart', help="Only switch 'current' release, do not restart service", action="store_true")
+    add_rollout_arguments(parser)
+
+def select_release(releases:list[str], current:Optional[str], release:Optional[str])->str:
+    if release is not None:
+        if release not in releases:
+            print(f"{COLOR_DANGER}Release {release} not found, available: {', '.join(releases)}{COLOR_BASE}", file=sys.stderr)
+            exit(1)
+        return release
+    older = releases[:releases.index(current)] if current in releases else []
+    if len(older) == 0:
+        print(f"{COLOR_DANGER}No release older than {current}{COLOR_BASE}", file=sys.stderr)
+        exit(1)
+    return older[-1]
+
+def get_deployed_app_dir(svc:NetService)->str:
+    app_dir = get_app_dir_of_service(svc)
+    if app_dir is None or len(list_releases(app_dir)) == 0:
+        print(f"{COLOR_DANGER}{svc.Name} has no releases, it was not deployed with `deploy`{COLOR_BASE}", file=sys.stderr)
+        exit(1)
+    return app_dir
+
+def handle(args:argparse.Namespace):
+    svcArgs = SVCArgsProp(args.service_dir, args.prefix, args.service_name)
+    svc_path = find_service_path(args.service_dir, svcArgs.FullName)
+    if svc_path is None:
+        print(f"Service not found - {svcArgs.Path}", file=sys.stderr)
+        exit(1)
+
+    if args.list:
+        app_dir = get_deployed_app_dir(read_service(svc_path))
+        current = get_current_release(app_dir)
+        for name in list_releases(app_dir):
+            print(f"{COLOR_SUCCESS}* {name}{COLOR_BASE}" if name == current else f"  {name}")
+        exit()
+
+    # Unit and its releases are read under lock, concurrent deploy could add release or switch current meanwhile
+    with ServiceDirLock(args.service_dir):
+        svc = read_service(svc_path)
+        app_dir = get_deployed_app_dir(svc)
+        with ServiceDirLock(app_dir):
+            current = get_current_release(app_dir)
+            target = select_release(list_releases(app_dir), current, args.release)
+            switch_release(app_dir, target)
+    print(f"{COLOR_SUCCESS}{svc.Name} switched from {current} to {target}{COLOR_BASE}")
+    if not args.no_restart and not restart_service_units(svc, args):
+        exit(1)
+    exit()
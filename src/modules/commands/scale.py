@@ -0,0 +1,179 @@
+import time
+import shutil
+import argparse
+
+from modules.core import *
+from modules.NetService import *
+from modules.status import *
+from modules.urls import *
+from modules.ports import *
+from modules.topology import *
+from modules.startup import *
+from modules.locking import *
+
+def build_parser(parser:argparse.ArgumentParser):
+    parser.add_argument('service_name', type=str, help='Name of service in systemd')
+    parser.add_argument('count', type=int, help="Number of instances to run")
+    add_service_dir_argument(parser)
+    parser.add_argument('--port-step', type=int, help="Port offset between instances\n(default: span of ports in ASPNETCORE_URLS)", default=None)
+    parser.add_argument('--port-range', type=str, help="Ports for instances which offset port is already used\n(default: %(default)s)", default=DEFAULT_PORT_RANGE)
+    parser.add_argument('--no-pin', help="Do not set CPUAffinity and NUMA policy for instances", action="store_true")
+    parser.add_argument('--max-parallel', type=int, help="Maximum number of instances started or stopped at once\n(default: %(default)s)", default=8)
+
+def _systemctl_now(action:str):
+    def run(unit:str)->bool:
+        result = subprocess.run(["systemctl", action, "--now", unit], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        return result.returncode == 0
+    return run
+
+def convert_to_template(svc:NetService, svc_dir:str)->NetService:
+    """Write 'name@.service' template from concrete service, base env file is shared by instances."""
+    template_name = f"{svc.Name}@"
+    svc.Name = template_name
+    svc.ServicePath = os.path.join(svc_dir, f"{template_name}.service")
+    svc.Params.Properties['SyslogIdentifier'] = f"{template_name}%i"
+    if svc.Description is not None and '%i' not in svc.Description:
+        svc.Description = f"{svc.Description} (instance %i)"
+    return svc
+
+def format_instance_env(urls:list[UrlBinding])->str:
+    lines = [ TOOL_FILEGEN_COMMENT ]
+    if len(urls) > 0:
+        lines.append(f"ASPNETCORE_URLS=\"{format_urls(urls)}\"")
+    return '\n'.join(lines)
+
+def format_instance_dropin(env_path:str, cpus:Optional[list[CpuInfo]], numa:bool)->str:
+    lines = [ TOOL_FILEGEN_COMMENT, '[Service]', f"EnvironmentFile={env_path}" ]
+    if cpus is not None and len(cpus) > 0:
+        lines.append(f"CPUAffinity={format_cpulist([c.Id for c in cpus])}")
+        if numa:
+            lines.append("NUMAPolicy=bind")
+            lines.append(f"NUMAMask={format_cpulist([c.Node for c in cpus])}")
+    return '\n'.join(lines)
+
+def allocate_instance_urls(index:PortIndex, base_urls:list[UrlBinding], template_name:str, instances:list[str],
+                           port_step:int, port_range:tuple[int,int])->Optional[list[list[UrlBinding]]]:
+    """URLs of every instance, ports are offset by port_step unless other services or listeners use them, then taken from port_range."""
+    planned:list[list[UrlBinding]] = []
+    for idx, instance in enumerate(instances):
+        unit = f"{template_name}{instance}"
+        urls:list[UrlBinding] = []
+        for url in base_urls:
+            if url.EffectivePort is not None:
+                candidate = url.with_port(url.EffectivePort + idx * port_step)
+                conflicts = index.find_conflicts(candidate, unit)
+                if len(conflicts) > 0:
+                    port = index.next_free(port_range)
+                    if port is None:
+                        return None
+                    owner = conflicts[0].Name if conflicts[0].Name is not None else f"listening socket {conflicts[0].Host}"
+                    print(f"{COLOR_WARN}Port {candidate.EffectivePort} is already used by {owner}, {unit} gets {port}{COLOR_BASE}", file=sys.stderr)
+                    candidate = url.with_port(port)
+                index.reserve(unit, candidate)
+                url = candidate
+            urls.append(url)
+        planned.append(urls)
+    return planned
+
+def handle(args:argparse.Namespace):
+    if args.count < 0:
+        print(f"{COLOR_DANGER}Instances count must not be negative{COLOR_BASE}", file=sys.stderr)
+        exit(2)
+    try:
+        port_range = parse_port_range(args.port_range)
+    except ValueError as e:
+        print(f"{COLOR_DANGER}{e}{COLOR_BASE}", file=sys.stderr)
+        exit(2)
+
+    svcArgs = SVCArgsProp(args.service_dir, args.prefix, args.service_name)
+    template_name = f"{svcArgs.FullName}@"
+    template_path = os.path.join(args.service_dir, f"{template_name}.service")
+
+    # Template and instance files are read, planned and written under lock, daemon-reload runs when it is released
+    with ServiceDirLock(args.service_dir):
+        converted = False
+        if os.path.isfile(template_path):
+            template = read_service(template_path)
+        elif os.path.isfile(svcArgs.Path):
+            template = convert_to_template(read_service(svcArgs.Path), args.service_dir)
+            converted = True
+        else:
+            print(f"Service not found - {svcArgs.Path}", file=sys.stderr)
+            exit(1)
+
+        base_urls = parse_urls(template.ASPNETCORE_URLS)
+        ports = [url.EffectivePort for url in base_urls if url.EffectivePort is not None]
+        port_step = args.port_step if args.port_step is not None else (max(ports) - min(ports) + 1 if len(ports) > 0 else 0)
+
+        # Ports of this service and its instances are planned again, other services and listeners keep theirs
+        desired = [str(idx + 1) for idx in range(args.count)]
+        service_units = get_service_units(get_services(args.service_dir, args.prefix, args.cache_dir))
+        index = build_port_index([(unit, urls) for unit, _, urls in service_units])
+        index.remove_services(set([svcArgs.FullName]) | set(unit for unit, svc, _ in service_units if svc.Name == template_name))
+        instance_urls = allocate_instance_urls(index, base_urls, template_name, desired, port_step, port_range)
+        if instance_urls is None:
+            print(f"{COLOR_DANGER}No free port in range {args.port_range} for instances of {template_name}{COLOR_BASE}", file=sys.stderr)
+            exit(1)
+
+        slices:list[Optional[list[CpuInfo]]] = [None] * args.count
+        numa = False
+        if not args.no_pin:
+            cpus = read_cpu_topology()
+            numa = len(set(c.Node for c in cpus)) > 1
+            slices = split_cpus(cpus, args.count) or slices
+
+        synced_dirs:set[str] = set()
+        if converted:
+            template.try_save(args.service_dir, synced_dirs=synced_dirs)
+
+        # Write per-instance env and drop-in, remember instances which config changed
+        changed:set[str] = set()
+        for idx, instance in enumerate(desired):
+            env_path, dropin_path = get_instance_paths(args.service_dir, template_name, instance)
+            env_content = format_instance_env(instance_urls[idx])
+            dropin_content = format_instance_dropin(env_path, slices[idx], numa)
+            if not is_same_content(env_path, env_content):
+                write_file_atomic(env_path, env_content, backup=False)
+                synced_dirs.add(os.path.dirname(env_path))
+                changed.add(instance)
+            if not is_same_content(dropin_path, dropin_content):
+                os.makedirs(os.path.dirname(dropin_path), exist_ok=True)
+                write_file_atomic(dropin_path, dropin_content, backup=False)
+                synced_dirs.add(os.path.dirname(dropin_path))
+                changed.add(instance)
+        fsync_directories(synced_dirs)
+
+        existing = get_template_instances(args.service_dir).get(template_name, [])
+        removed = [i for i in existing if i not in desired]
+        units = { i: f"{template_name}{i}" for i in set(existing) | set(desired) }
+        statuses = get_services_status([units[i] for i in desired + removed])
+
+        if converted:
+            # Replace concrete service with its instances
+            _systemctl_now('disable')(svcArgs.FullName)
+            os.replace(svcArgs.Path, f"{svcArgs.Path}.bak")
+        if converted or len(changed) > 0:
+            do_reload_systemctl()
+
+        stop_results = run_parallel(_systemctl_now('disable'), [units[i] for i in removed], args.max_parallel)
+        for instance in removed:
+            env_path, dropin_path = get_instance_paths(args.service_dir, template_name, instance)
+            if os.path.isfile(env_path):
+                os.remove(env_path)
+            shutil.rmtree(os.path.dirname(dropin_path), ignore_errors=True)
+        if len(removed) > 0:
+            do_reload_systemctl()
+
+    to_start = [units[i] for i in desired if statuses[units[i]].Active not in ('active', 'activating')]
+    to_restart = [units[i] for i in desired if i in changed and units[i] not in to_start]
+    started = time.monotonic()
+    start_results = run_parallel(_systemctl_now('enable'), to_start, args.max_parallel)
+    restart_results = run_parallel(do_restart_service, to_restart, args.max_parallel)
+    release = get_service_release(template)
+    record_startups([(unit, release) for unit, ok in zip(to_start + to_restart, start_results + restart_results) if ok], started)
+
+    failed = [u for u, ok in zip([units[i] for i in removed] + to_start + to_restart, stop_results + start_results + restart_results) if not ok]
+    for unit in failed:
+        print(f"{COLOR_DANGER}Failed to change state of {unit}{COLOR_BASE}", file=sys.stderr)
+    print(f"{COLOR_SUCCESS}{template_name}: {len(desired)} instances ({len(to_start)} started, {len(to_restart)} restarted, {len(removed)} stopped){COLOR_BASE}")
+    exit(1 if len(failed) > 0 else 0)
@@ -0,0 +1,152 @@
+import time
+import fnmatch
+import argparse
+
+from modules.core import *
+from modules.NetService import *
+from modules.startup import *
+from modules.locking import *
+
+def build_parser(parser:argparse.ArgumentParser):
+    parser.add_argument('variables', type=str, nargs='*', help="Variables to set as KEY=VALUE")
+    add_service_dir_argument(parser)
+    parser.add_argument('-u', '--unset', type=str, action='append', help="Variable to remove, can be repeated", default=[])
+    parser.add_argument('--services', type=str, help="Glob of service names without prefix\n(default: %(default)s)", default='*')
+    parser.add_argument('--base', type=str, help="Change shared base env file '<env dir>/<BASE>.env' and reference it from matched services", default=None)
+    parser.add_argument('--env-dir', type=str, help="Directory of shared base env files\n(default: %(default)s)", default=ENV_BASE_DIR)
+    parser.add_argument('--max-parallel', type=int, help="Maximum number of services restarted at once\n(default: %(default)s)", default=4)
+    parser.add_argument('--no-restart', help="Only write env files, do not restart services", action="store_true")
+    parser.add_argument('--dry-run', help="Print changes without writing anything", action="store_true")
+
+def parse_assignments(variables:list[str])->dict[str,str]:
+    changes:dict[str,str] = {}
+    for item in variables:
+        key, sep, value = item.partition('=')
+        key = key.strip()
+        if not sep or len(key) == 0 or any(c.isspace() for c in key):
+            raise Exception(f"Invalid variable '{item}', expected KEY=VALUE")
+        changes[key] = value
+    return changes
+
+def update_environment(env:dict[str,str], changes:dict[str,str], unset:list[str])->dict[str,str]:
+    """Copy of env with changes applied, values are quoted the same way as NetService stores them."""
+    svc = NetService()
+    svc.Environment = dict(env)
+    for key, value in changes.items():
+        svc.set_environment_variable(key, value)
+    for key in unset:
+        svc.Environment.pop(key, None)
+    return svc.Environment
+
+def changed_keys(before:dict[str,str], after:dict[str,str])->set[str]:
+    return { key for key in set(before) | set(after) if before.get(key) != after.get(key) }
+
+def match_services(services:list[NetService], prefix:str, pattern:str)->list[NetService]:
+    return [svc for svc in services if fnmatch.fnmatch(svc.Name, pattern) or fnmatch.fnmatch(svc.Name.removeprefix(prefix), pattern)]
+
+def get_changed_units(svc:NetService, keys:set[str], instances:dict[str,list[str]])->list[str]:
+    """Units to restart after resolved environment of service changed by keys."""
+    if not svc.IsTemplate:
+        return [svc.Name]
+    svc_dir = os.path.dirname(svc.ServicePath)
+    units:list[str] = []
+    for instance in instances.get(svc.Name, []):
+        # Instance env file is the last layer, variables it sets are not affected
+        if len(keys - set(read_instance_environment(svc_dir, svc.Name, instance))) > 0:
+            units.append(f"{svc.Name}{instance}")
+    return units
+
+def handle(args:argparse.Namespace):
+    try:
+        changes = parse_assignments(args.variables)
+    except Exception as e:
+        print(f"{COLOR_DANGER}{e}{COLOR_BASE}", file=sys.stderr)
+        exit(2)
+    if len(changes) == 0 and len(args.unset) == 0:
+        print(f"{COLOR_DANGER}Nothing to change, pass KEY=VALUE or --unset KEY{COLOR_BASE}", file=sys.stderr)
+        exit(2)
+
+    env_dir = None
+    if args.base is not None:
+        env_dir = args.env_dir
+        if not args.dry_run:
+            os.makedirs(env_dir, exist_ok=True) # created before locking, lock is taken on directory itself
+    # Read, compare and write are one batch, so concurrent set-env/add/apply never leave stale env files
+    with ServiceDirLock(args.service_dir, env_dir):
+        inventory = ServiceInventory(args.service_dir, args.cache_dir)
+        services:list[NetService] = []
+        for svc_path in inventory.list_units(args.prefix):
+            try:
+                services.append(read_service(svc_path, inventory))
+            except Exception:
+                print(f"{COLOR_WARN}Unable to read service {svc_path}{COLOR_BASE}", file=sys.stderr)
+        matched = match_services(services, args.prefix, args.services)
+        if len(matched) == 0:
+            print(f"No services match '{args.services}'")
+            exit(1)
+        resolved_before = { svc.Name: svc.ResolvedEnvironment for svc in services }
+
+        env_files:dict[str,dict[str,str]] = {} # env file path -> new content
+        unit_changed:list[NetService] = []
+        if args.base is not None:
+            base_path = os.path.join(args.env_dir, f"{args.base}.env")
+            base_env = read_environment(base_path) if os.path.isfile(base_path) else {}
+            new_base_env = update_environment(base_env, changes, args.unset)
+            if new_base_env != base_env or not os.path.isfile(base_path):
+                env_files[base_path] = new_base_env
+            unit_changed = [svc for svc in matched if svc.add_base_environment_file(base_path)]
+            # Base file is shared, services outside of --services that use it change too
+            for svc in services:
+                if base_path in svc.BaseEnvironmentFiles:
+                    svc.BaseEnvironment = read_environment_layers(svc.EnvironmentFiles[:-1], inventory, { base_path: new_base_env })
+        else:
+            for svc in matched:
+                env = update_environment(svc.Environment, changes, args.unset)
+                if env != svc.Environment:
+                    svc.Environment = env
+                    env_files[svc.EnvironmentFile or os.path.join(args.service_dir, f"{svc.Name}.env")] = env
+
+        changed = [(svc, changed_keys(resolved_before[svc.Name], svc.ResolvedEnvironment)) for svc in services]
+        changed = [(svc, keys) for svc, keys in changed if len(keys) > 0]
+        for svc, keys in changed:
+            print(f"  {svc.Name}: {', '.join(sorted(keys))}")
+        if len(changed) == 0 and len(env_files) == 0 and len(unit_changed) == 0:
+            print(f"{COLOR_SUCCESS}Environment of {len(matched)} services is up to date{COLOR_BASE}")
+            exit()
+        if args.dry_run:
+            for env_path in env_files:
+                print(f"  write {env_path}")
+            for svc in unit_changed:
+                print(f"  reference {args.base} env from {svc.ServicePath}")
+            exit()
+
+        synced_dirs:set[str] = set()
+        for env_path, env in env_files.items():
+            content = format_environment(env)
+            if not is_same_content(env_path, content):
+                os.makedirs(os.path.dirname(os.path.abspath(env_path)), exist_ok=True)
+                write_file_atomic(env_path, content)
+                synced_dirs.add(os.path.dirname(os.path.abspath(env_path)))
+            inventory.forget(env_path)
+        saved = [svc.try_save(os.path.dirname(svc.ServicePath), synced_dirs=synced_dirs) for svc in unit_changed]
+        fsync_directories(synced_dirs)
+        for svc in unit_changed:
+            inventory.forget(svc.ServicePath)
+        inventory.save()
+        if any(r and r.NeedsReload for r in saved):
+            do_reload_systemctl()
+        print(f"{COLOR_SUCCESS}Updated {len(env_files)} env files, {len(changed)} services have changed environment{COLOR_BASE}")
+
+    if args.no_restart or len(changed) == 0:
+        exit()
+    instances = get_template_instances(args.service_dir) if any(svc.IsTemplate for svc, _ in changed) else {}
+    units = [(unit, svc) for svc, keys in changed for unit in get_changed_units(svc, keys, instances)]
+    # try-restart leaves stopped services stopped
+    started = time.monotonic()
+    results = run_parallel(do_try_restart_service, [unit for unit, _ in units], args.max_parallel)
+    failed = [unit for (unit, _), ok in zip(units, results) if not ok]
+    record_startups([(unit, get_service_release(svc)) for (unit, svc), ok in zip(units, results) if ok], started)
+    for unit in failed:
+        print(f"{COLOR_DANGER}Failed to restart {unit}{COLOR_BASE}", file=sys.stderr)
+    print(f"{COLOR_SUCCESS}Restarted {len(units) - len(failed)} of {len(units)} units{COLOR_BASE}")
+    exit(1 if len(failed) > 0 else 0)
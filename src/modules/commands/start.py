@@ -0,0 +1,34 @@
+import time
+import argparse
+
+from modules.core import *
+from modules.NetService import *
+from modules.status import *
+from modules.startup import *
+
+def build_parser(parser:argparse.ArgumentParser):
+    parser.add_argument('service_name', type=str, help='Name of service in systemd')
+    add_service_dir_argument(parser)
+    parser.add_argument('--max-parallel', type=int, help="Maximum number of instances of scaled service started at once\n(default: %(default)s)", default=8)
+
+def handle(args:argparse.Namespace):
+    svcArgs = SVCArgsProp(args.service_dir, args.prefix, args.service_name)
+    # Scaled service is started as all of its instances
+    svc_path = find_service_path(args.service_dir, svcArgs.FullName.removesuffix('.service'))
+    if svc_path is None:
+        print(f"Service not found - {svcArgs.Path}", file=sys.stderr)
+        exit(1)
+
+    svc = read_service(svc_path)
+    units = get_template_instance_units(args.service_dir, svc.Name) if svc.IsTemplate else [svc.Name]
+    statuses = get_services_status(units)
+    to_start = [unit for unit in units if statuses[unit].Active not in ('active', 'activating')]
+    started = time.monotonic()
+    results = run_parallel(do_start_service, to_start, args.max_parallel)
+    release = get_service_release(svc)
+    record_startups([(unit, release) for unit, ok in zip(to_start, results) if ok], started)
+
+    failed = [unit for unit, ok in zip(to_start, results) if not ok]
+    for unit in failed:
+        print(f"{COLOR_DANGER}Failed to start {unit}{COLOR_BASE}", file=sys.stderr)
+    exit(1 if len(failed) > 0 else 0)
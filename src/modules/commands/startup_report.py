@@ -0,0 +1,62 @@
+import fnmatch
+import argparse
+
+from modules.core import *
+from modules.startup import *
+from modules.output import *
+
+STARTUP_TABLE_HEADERS = ["Name", "Release", "Starts", "p50 ms", "p90 ms", "p99 ms", "Max ms", "Change"]
+STARTUP_GROUPS = ['release', 'day', 'week']
+STARTUP_METRICS = ['ready', 'activation']
+# Row per service and group, unit is empty for templates as their instances are reported together
+STARTUP_ROW_FIELDS = UNIT_ROW_FIELDS + ['metric', 'by', 'period', 'starts', 'p50_ms', 'p90_ms', 'p99_ms', 'max_ms', 'change', 'regression']
+
+def build_parser(parser:argparse.ArgumentParser):
+    parser.add_argument('pattern', type=str, nargs='?', help="Glob of service names without prefix\n(default: all services)", default='*')
+    parser.add_argument('--history', type=str, help="Startup history file to replay\n(default: %(default)s)", default=STARTUP_HISTORY_PATH)
+    parser.add_argument('--by', type=str, choices=STARTUP_GROUPS, help="Group starts of service by\n(default: %(default)s)", default='release')
+    parser.add_argument('--metric', type=str, choices=STARTUP_METRICS, help="'ready' is time to first successful health probe (or to active state when unit was not probed), 'activation' is time to active state\n(default: %(default)s)", default='ready')
+    parser.add_argument('--threshold', type=float, help="Flag p50 growing more than this percent against previous group\n(default: %(default)s)", default=20.0)
+    parser.add_argument('--min-starts', type=int, help="Compare only groups with at least this number of starts\n(default: %(default)s)", default=1)
+    parser.add_argument('--check', help="Exit with code 1 when latest group of any service regressed", action="store_true")
+    add_format_argument(parser)
+    parser.add_argument('--json', dest='format', help="Same as --format json", action="store_const", const='json')
+
+def format_change(stats:StartupStats, threshold:float)->str:
+    change = stats.Change
+    if change is None:
+        return ''
+    text = f"{change * 100:+.0f}%"
+    return f"{COLOR_DANGER}{text} regression{COLOR_BASE}" if stats.is_regression(threshold) else text
+
+def handle(args:argparse.Namespace):
+    records = (r for r in read_startup_history(args.history)
+               if fnmatch.fnmatch(r.Service, args.pattern) or fnmatch.fnmatch(r.Service.removeprefix(args.prefix), args.pattern))
+    report = build_startup_stats(records, args.by, args.metric)
+    if args.min_starts > 1:
+        report = [s for s in report if len(s.Durations) >= args.min_starts]
+        previous:dict[str,StartupStats] = {}
+        for stats in report:
+            stats.Previous = previous.get(stats.Service)
+            previous[stats.Service] = stats
+
+    latest:dict[str,StartupStats] = { stats.Service: stats for stats in report }
+    regressed = [stats for stats in latest.values() if stats.is_regression(args.threshold)]
+
+    if args.format != 'table':
+        writer = RowWriter(args.format, STARTUP_ROW_FIELDS)
+        for stats in report:
+            unit = None if stats.Service.endswith('@') else stats.Service
+            writer.write({ **stats.to_dict(args.threshold), **get_unit_fields(stats.Service, unit), 'metric': args.metric, 'by': args.by })
+        writer.close()
+    elif len(report) == 0:
+        print(f"No starts recorded in {args.history}")
+    else:
+        data = [[stats.Service, stats.Period, str(len(stats.Durations)), f"{stats.get(50):.0f}", f"{stats.get(90):.0f}",
+                 f"{stats.get(99):.0f}", f"{stats.Durations[-1]:.0f}", format_change(stats, args.threshold)] for stats in report]
+        headers = STARTUP_TABLE_HEADERS if args.by == 'release' else ["Name", args.by.capitalize()] + STARTUP_TABLE_HEADERS[2:]
+        from tabulate import tabulate # loaded only for table output
+        print(tabulate(data, headers=headers, tablefmt="grid", disable_numparse=True))
+        for stats in regressed:
+            print(f"{COLOR_DANGER}{stats.Service}: {args.metric} p50 {stats.Previous.get(50):.0f} ms -> {stats.get(50):.0f} ms in {stats.Period}{COLOR_BASE}")
+    exit(1 if args.check and len(regressed) > 0 else 0)
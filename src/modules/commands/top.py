@@ -0,0 +1,144 @@
+import select
+import argparse
+from datetime import datetime
+
+from modules.core import *
+from modules.NetService import *
+from modules.status import *
+from modules.dbus import DBusError
+from modules.cgroups import *
+from modules.listing import format_active_state
+
+TOP_STATUS_PROPERTIES = ['ActiveState', 'SubState', 'MainPID', 'NRestarts', 'ControlGroup']
+TOP_TABLE_HEADERS = ["Name", "Active", "Sub", "PID", "Restarts", "CPU%", "Memory", "Tasks"]
+TOP_COLUMN_WIDTHS = [0, 12, 12, 8, 9, 7, 9, 6]
+TOP_FIRST_ROW = 3 # title and headers lines come first
+
+ANSI_ALT_SCREEN = '\033[?1049h\033[?25l\033[2J'
+ANSI_MAIN_SCREEN = '\033[?25h\033[?1049l'
+
+def build_parser(parser:argparse.ArgumentParser):
+    add_service_dir_argument(parser)
+    parser.add_argument('--interval', type=float, help="Cgroup metrics refresh interval in seconds\n(default: %(default)s)", default=2.0)
+    parser.add_argument('--poll', help="Do not subscribe to systemd signals, poll state every interval", action="store_true")
+
+def format_top_row(widths:list[int], values:list[str], colored:bool=False)->str:
+    cells = [value[:width].ljust(width) for value, width in zip(values, widths)]
+    if colored:
+        # Color is added after padding, escape codes take no space on screen
+        active = values[1][:widths[1]]
+        cells[1] = format_active_state(active) + ' ' * (widths[1] - len(active))
+    return ' '.join(cells).rstrip()
+
+def unit_row_values(unit:str, status:ServiceStatus, stats:Optional[CgroupStats])->list[str]:
+    pid = str(status.MainPID) if status.MainPID > 0 else ''
+    cpu = f"{stats.CpuPercent:.1f}" if stats is not None and stats.CpuPercent is not None else ''
+    memory = format_bytes(stats.MemoryCurrent) if stats is not None else ''
+    tasks = str(stats.Tasks) if stats is not None and stats.Tasks is not None else ''
+    return [unit, status.Active, status.SubState, pid, str(status.NRestarts), cpu, memory, tasks]
+
+class TopScreen:
+    """Writes table rows, on terminal only rows which text changed are redrawn in place."""
+
+    def __init__(self, units:list[str], interactive:bool):
+        self.Units = units
+        self.Interactive = interactive
+        self.Widths = list(TOP_COLUMN_WIDTHS)
+        self.Widths[0] = max([len(u) for u in units] + [len(TOP_TABLE_HEADERS[0])])
+        self._positions = { unit: TOP_FIRST_ROW + idx for idx, unit in enumerate(units) }
+        self._rows:dict[str,str] = {}
+
+    def open(self, rows:dict[str,str]):
+        if self.Interactive:
+            sys.stdout.write(ANSI_ALT_SCREEN)
+        self.write_title()
+        sys.stdout.write(f"\033[2;1H" if self.Interactive else '')
+        sys.stdout.write(format_top_row(self.Widths, TOP_TABLE_HEADERS) + '\n')
+        for unit in self.Units:
+            sys.stdout.write(rows[unit] + '\n')
+        self._rows = dict(rows)
+        sys.stdout.flush()
+
+    def write_title(self):
+        title = f"systemd-net top - {len(self.Units)} units - {datetime.now().strftime('%H:%M:%S')}"
+        if self.Interactive:
+            sys.stdout.write(f"\033[1;1H{title}\033[K")
+        else:
+            sys.stdout.write(title + '\n')
+
+    def update(self, rows:dict[str,str]):
+        changed = [unit for unit, row in rows.items() if self._rows.get(unit) != row]
+        if len(changed) == 0:
+            return
+        if self.Interactive:
+            self.write_title()
+        for unit in changed:
+            if self.Interactive:
+                sys.stdout.write(f"\033[{self._positions[unit]};1H{rows[unit]}\033[K")
+            else:
+                sys.stdout.write(f"{datetime.now().strftime('%H:%M:%S')} {rows[unit]}\n")
+            self._rows[unit] = rows[unit]
+        if self.Interactive:
+            sys.stdout.write(f"\033[{TOP_FIRST_ROW + len(self.Units)};1H")
+        sys.stdout.flush()
+
+    def close(self):
+        if self.Interactive:
+            sys.stdout.write(ANSI_MAIN_SCREEN)
+            sys.stdout.flush()
+
+def handle(args:argparse.Namespace):
+    services = get_services(args.service_dir, args.prefix, args.cache_dir)
+    units = [unit for unit, _, _ in get_service_units(services)]
+    if len(units) == 0:
+        print("No services registered.")
+        exit()
+
+    bus = None
+    if not args.poll:
+        try:
+            bus = connect_systemd_bus()
+        except (OSError, DBusError) as e:
+            print(f"{COLOR_WARN}systemd bus is not available ({e}), polling every {args.interval}s{COLOR_BASE}", file=sys.stderr)
+
+    # Subscribe first, state read afterwards can only be older than signals queued meanwhile
+    statuses = get_services_status(units, TOP_STATUS_PROPERTIES)
+    sampler = CgroupSampler()
+    stats = sampler.sample({ u: get_unit_cgroup_path(u, statuses[u].ControlGroup) for u in units })
+
+    screen = TopScreen(units, sys.stdout.isatty())
+    def render()->dict[str,str]:
+        return { u: format_top_row(screen.Widths, unit_row_values(u, statuses[u], stats.get(u)), True) for u in units }
+
+    stale:set[str] = set()
+    screen.open(render())
+    next_refresh = time.monotonic() + args.interval
+    try:
+        while True:
+            timeout = max(0.0, next_refresh - time.monotonic())
+            if bus is not None:
+                readable = [bus] if bus.has_pending() else select.select([bus], [], [], timeout)[0]
+                if len(readable) > 0:
+                    for message in bus.read_signals():
+                        unit = get_signal_unit(message)
+                        if unit in statuses and apply_properties_changed(statuses[unit], message, TOP_STATUS_PROPERTIES):
+                            stale.add(unit)
+            else:
+                time.sleep(timeout)
+
+            if time.monotonic() >= next_refresh:
+                refresh = units if bus is None else [u for u in units if u in stale]
+                if len(refresh) > 0:
+                    statuses.update(get_services_status(refresh, TOP_STATUS_PROPERTIES))
+                    stale.clear()
+                stats = sampler.sample({ u: get_unit_cgroup_path(u, statuses[u].ControlGroup) for u in units })
+                next_refresh = time.monotonic() + args.interval
+            screen.update(render())
+    except KeyboardInterrupt:
+        pass
+    except DBusError as e:
+        screen.close()
+        print(f"{COLOR_DANGER}systemd bus connection lost: {e}{COLOR_BASE}", file=sys.stderr)
+        exit(1)
+    screen.close()
+    exit()
@@ -1,54 +1,99 @@
 import os
+import sys
 import glob
-import subprocess
+import time
 import argparse
+import importlib
+import subprocess
+from typing import Callable, Optional
 
-COLOR_BASE = '\033[0m'
-COLOR_INFO = '\033[94m'     # BLUE
-COLOR_SUCCESS = '\033[92m'  # GREEN
-COLOR_WARN = '\033[93m'     # YELLOW
-COLOR_DANGER = '\033[91m'   # RED
+# Colors only on terminal, so piped output has no escape codes inside fields (NO_COLOR disables them too)
+COLORS_ENABLED = sys.stdout.isatty() and 'NO_COLOR' not in os.environ
+COLOR_BASE = '\033[0m' if COLORS_ENABLED else ''
+COLOR_INFO = '\033[94m' if COLORS_ENABLED else ''     # BLUE
+COLOR_SUCCESS = '\033[92m' if COLORS_ENABLED else ''  # GREEN
+COLOR_WARN = '\033[93m' if COLORS_ENABLED else ''     # YELLOW
+COLOR_DANGER = '\033[91m' if COLORS_ENABLED else ''   # RED
 
 TOOL_FILEGEN_COMMENT = "# This file was automatically created using systemd-net utility"
-
-app_argsparser = argparse.ArgumentParser(prog='systemd-net', description=f"{COLOR_INFO}systemd-net is utility to easy manage your .NET Applications services{COLOR_BASE}")
-app_cmdparser = app_argsparser.add_subparsers(dest='command', help='Avaliable commands')
+DOTNET_CLI = "/usr/bin/dotnet"
+INVENTORY_CACHE_DIR = os.environ.get('SYSTEMD_NET_CACHE_DIR', "/var/cache/systemd-net/")
+
+SYSTEMD_SERVICE_DIR = "/etc/systemd/system/"
+
+# Command name -> (module with build_parser(parser) and handle(args), help)
+APP_COMMANDS:dict[str,tuple[str,str]] = {
+    'add': ('modules.commands.add', 'Add application'),
+    'del': ('modules.commands.delete', 'Delete application'),
+    'list': ('modules.commands.list', 'List registered applications'),
+    'edit': ('modules.commands.edit', "Edit with text editor"),
+    'start': ('modules.commands.start', "Start application"),
+    'stop': ('modules.commands.stop', "Stop application"),
+    'restart': ('modules.commands.restart', "Restart services in waves waiting for readiness"),
+    'apply': ('modules.commands.apply', "Apply services manifest (JSON or TOML)"),
+    'scale': ('modules.commands.scale', "Run service as N template instances pinned to CPUs"),
+    'deploy': ('modules.commands.deploy', "Deploy publish output as new release and restart"),
+    'rollback': ('modules.commands.rollback', "Switch service back to previous release"),
+    'top': ('modules.commands.top', "Live services state and resources view"),
+    'health': ('modules.commands.health', "Probe HTTP endpoints of services"),
+    'logs': ('modules.commands.logs', "Show journal of services in one stream"),
+    'ports': ('modules.commands.ports', "Show ports used by services and listening sockets"),
+    'set-env': ('modules.commands.set_env', "Set environment variables of many services, restart changed ones"),
+    'startup-report': ('modules.commands.startup_report', "Startup time percentiles per release and regressions"),
+    'metrics': ('modules.commands.metrics', "Export Prometheus metrics to textfile or over HTTP"),
+    'doctor': ('modules.commands.doctor', "Find crash looping services and tune their restart backoff"),
+}
 
 common_parser = argparse.ArgumentParser(add_help=False)
 common_parser.add_argument('-p', '--prefix', type=str, help="Prefix to filter services\n(default: '%(default)s')", default="netapp.")
-
-app_addparser = app_cmdparser.add_parser('add', parents=[common_parser], help='Add application')
-app_addparser.add_argument('service_name', type=str, help='Name of service in systemd')
-app_addparser.add_argument('exec_path', type=str, help="Path to application executable (.dll)")
-app_addparser.add_argument('-sdir', '--service-dir', type=str, help=".service files directory\n(default: %(default)s)", default="/etc/systemd/system/")
-app_addparser.add_argument('-edir', '--env-dir', type=str, help=".env files directory\n(default: %(default)s)", default="/etc/systemd/system/env/")
-app_addparser.add_argument('-wdir', '--working-dir', help="Application working directory\n(default same as 'exec_path' directory)")
-app_addparser.add_argument('-u', '--user', help='User to run application\n(default: %(default)s)', default='www-data')
-app_addparser.add_argument('--aspnetcore-env', type=str, help="ASPNETCORE_ENVIRONMENT environment variable (default: '%(default)s')", default="Production")
-app_addparser.add_argument('--aspnetcore-urls', type=str, help="ASPNETCORE_URLS environment variable", default=None)
-
-app_delparser = app_cmdparser.add_parser('del', parents=[common_parser], help='Delete application')
-app_delparser.add_argument('service_name', help='Name of service in systemd (with prefix)')
-app_delparser.add_argument('-sdir', '--service-dir', type=str, help=".service files directory\n(default: %(default)s)", default="/etc/systemd/system/")
-app_delparser.add_argument('-F', '--force', help="Force deletion", action="store_true")
-app_delparser.add_argument('--cleanup', help="Delete service and environment .bak files\n(default is false)", action="store_true", default=False)
-
-app_listparser = app_cmdparser.add_parser('list', parents=[common_parser], help='List registered applications')
-app_listparser.add_argument('-sdir', '--service-dir', type=str, help=".service files directory\n(default: %(default)s)", default="/etc/systemd/system/")
-
-app_editparser = app_cmdparser.add_parser('edit', parents=[common_parser], help="Edit with text editor")
-app_editparser.add_argument('app', help="Application of your choise to use for edit ('vi', 'nano', etc.)")
-app_editparser.add_argument('service_name', help="Name of service in systemd")
-app_editparser.add_argument('-sdir', '--service-dir', type=str, help=".service files directory\n(default: %(default)s)", default="/etc/systemd/system/")
-app_editparser.add_argument('--env', help="Edit environment file defined in service", action="store_true")
-
-app_startparser = app_cmdparser.add_parser('start', parents=[common_parser], help="Start application")
-app_startparser.add_argument('service_name', type=str, help='Name of service in systemd')
-app_startparser.add_argument('-sdir', '--service-dir', type=str, help=".service files directory\n(default: %(default)s)", default="/etc/systemd/system/")
-
-app_stopparser = app_cmdparser.add_parser('stop', parents=[common_parser], help="Stop application")
-app_stopparser.add_argument('service_name', type=str, help='Name of service in systemd')
-app_stopparser.add_argument('-sdir', '--service-dir', type=str, help=".service files directory\n(default: %(default)s)", default="/etc/systemd/system/")
+common_parser.add_argument('--cache-dir', type=str, help="Parsed services inventory cache directory, empty to disable\n(default: %(default)s)", default=INVENTORY_CACHE_DIR)
+
+def add_service_dir_argument(parser:argparse.ArgumentParser):
+    parser.add_argument('-sdir', '--service-dir', type=str, help=".service files directory\n(default: %(default)s)", default=SYSTEMD_SERVICE_DIR)
+
+def load_command(command:str):
+    return importlib.import_module(APP_COMMANDS[command][0])
+
+def find_command(argv:list[str])->Optional[str]:
+    # Global options take no values, so first positional argument is the command
+    for arg in argv:
+        if not arg.startswith('-'):
+            return arg if arg in APP_COMMANDS else None
+    return None
+
+def build_argsparser(command:Optional[str]=None)->argparse.ArgumentParser:
+    """Build arguments parser, loading arguments (and handler module) only for selected command."""
+    parser = argparse.ArgumentParser(prog='systemd-net', description=f"{COLOR_INFO}systemd-net is utility to easy manage your .NET Applications services{COLOR_BASE}")
+    parser.add_argument('--profile-startup', help="Print import and first action timings to stderr", action="store_true")
+    cmdparser = parser.add_subparsers(dest='command', help='Avaliable commands')
+    for name, (module_name, help) in APP_COMMANDS.items():
+        cmd_parser = cmdparser.add_parser(name, parents=[common_parser], help=help)
+        if name == command:
+            load_command(name).build_parser(cmd_parser)
+    return parser
+
+def parse_args(argv:Optional[list[str]]=None)->argparse.Namespace:
+    if argv is None:
+        argv = sys.argv[1:]
+    return build_argsparser(find_command(argv)).parse_args(argv)
+
+class StartupProfile:
+    Started:float = None
+    Marks:list[tuple[str,float]] = None
+
+    def __init__(self, started:Optional[float]=None):
+        self.Started = started if started is not None else time.perf_counter()
+        self.Marks = []
+
+    def mark(self, name:str):
+        self.Marks.append((name, time.perf_counter()))
+
+    def report(self, file=sys.stderr):
+        print("Startup profile:", file=file)
+        last = self.Started
+        for name, at in self.Marks:
+            print(f"  {name:<32}{(at - self.Started) * 1000:9.1f} ms  (+{(at - last) * 1000:.1f} ms)", file=file)
+            last = at
 
 class SVCArgsProp:
     ServiceDir:str
@@ -78,35 +123,17 @@ def is_dotnet_installed(dotnet_cli_path:str=None):
         return os.path.exists(dotnet_cli_path)
     return False
 
-def get_dotnet_runtimes(dotnet_cli_path:str):
-    if is_dotnet_installed(dotnet_cli_path) == 0:
-        return [('Self-contained Deployment', '')]
-
-    result = subprocess.run([dotnet_cli_path, '--list-runtimes'], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-    output = result.stdout.strip()
-
-    runtimes_list:list[tuple[str,str]] = []
-    runtimes_list.append(('Self-contained Deployment', ''))
-
-    for line in output.splitlines():
-        index = line.find('[')
-        if index != -1:
-            runtime = line[:index].strip()
-            path = line[index+1:-1].strip()
-
-            runtimes_list.append((runtime, path))
-
-    return runtimes_list
-
-def list_dotnet_runtimes(runtimes:list[tuple[str, str]]):
-    for idx, (runtime, path) in enumerate(runtimes):
-        print(f"{idx}: {runtime}")
-
 def list_service_files(services_dir:str, prefix:str):
     service_files = glob.glob(os.path.join(services_dir, f'{prefix}*.service'))
     return service_files
 
+# Reload requests of open locked write batches (modules.locking), systemd is reloaded once when outermost batch ends
+RELOAD_BATCHES:list[bool] = []
+
 def do_reload_systemctl():
+    if len(RELOAD_BATCHES) > 0:
+        RELOAD_BATCHES[-1] = True
+        return
     subprocess.run(["systemctl", "daemon-reload"])
 
 def do_enable_service(service_name:str):
@@ -115,8 +142,33 @@ def do_enable_service(service_name:str):
 def do_disable_service(service_name:str):
     subprocess.run(["systemctl", "disable", service_name])
 
-def do_start_service(service_name:str):
-    subprocess.run(["systemctl", "start", service_name])
+def do_start_service(service_name:str)->bool:
+    return subprocess.run(["systemctl", "start", service_name]).returncode == 0
+
+def do_stop_service(service_name:str)->bool:
+    return subprocess.run(["systemctl", "stop", service_name]).returncode == 0
+
+def do_enable_services(service_names:list[str]):
+    if len(service_names) > 0:
+        subprocess.run(["systemctl", "enable", "--", *service_names])
+
+def do_disable_services(service_names:list[str]):
+    if len(service_names) > 0:
+        subprocess.run(["systemctl", "disable", "--", *service_names])
+
+def do_restart_service(service_name:str)->bool:
+    result = subprocess.run(["systemctl", "restart", service_name], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    return result.returncode == 0
+
+def do_try_restart_service(service_name:str)->bool:
+    """Restart service only if it is running."""
+    result = subprocess.run(["systemctl", "try-restart", service_name], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    return result.returncode == 0
 
-def do_stop_service(service_name:str):
-    subprocess.run(["systemctl", "stop", service_name])
\ No newline at end of file
+def run_parallel(action:Callable, items:list, max_parallel:int=4)->list:
+    """Run action for every item with at most max_parallel running at once, results keep items order."""
+    if len(items) == 0:
+        return []
+    from concurrent.futures import ThreadPoolExecutor # most commands run nothing in parallel
+    with ThreadPoolExecutor(max_workers=max(1, max_parallel)) as pool:
+        return list(pool.map(action, items))
\ No newline at end of file
@@ -0,0 +1,320 @@
+import os
+import socket
+import string
+import struct
+from typing import Any, Optional
+
+# Minimal D-Bus client: enough to call methods with basic arguments and receive signals
+
+DBUS_SYSTEM_BUS_ADDRESS = "unix:path=/run/dbus/system_bus_socket"
+
+MESSAGE_METHOD_CALL = 1
+MESSAGE_METHOD_RETURN = 2
+MESSAGE_ERROR = 3
+MESSAGE_SIGNAL = 4
+
+HEADER_FIELDS = { 1: 'path', 2: 'interface', 3: 'member', 4: 'error_name', 5: 'reply_serial', 6: 'destination', 7: 'sender', 8: 'signature' }
+HEADER_FIELD_CODES = { name: (code, sig) for code, name, sig in (
+    (1, 'path', 'o'), (2, 'interface', 's'), (3, 'member', 's'), (4, 'error_name', 's'),
+    (5, 'reply_serial', 'u'), (6, 'destination', 's'), (7, 'sender', 's'), (8, 'signature', 'g')) }
+
+_FIXED = { 'y': ('B', 1), 'b': ('I', 4), 'n': ('h', 2), 'q': ('H', 2), 'i': ('i', 4), 'u': ('I', 4),
+           'x': ('q', 8), 't': ('Q', 8), 'd': ('d', 8), 'h': ('I', 4) }
+
+class DBusError(Exception):
+    pass
+
+def split_signature(signature:str)->list[str]:
+    """Split signature into complete types, 'sa{sv}as' -> ['s', 'a{sv}', 'as']."""
+    types:list[str] = []
+    idx = 0
+    while idx < len(signature):
+        end = _complete_type_end(signature, idx)
+        types.append(signature[idx:end])
+        idx = end
+    return types
+
+def _complete_type_end(signature:str, idx:int)->int:
+    char = signature[idx]
+    if char == 'a':
+        return _complete_type_end(signature, idx + 1)
+    if char in '({':
+        close = ')' if char == '(' else '}'
+        depth = 0
+        for pos in range(idx, len(signature)):
+            if signature[pos] == char:
+                depth += 1
+            elif signature[pos] == close:
+                depth -= 1
+                if depth == 0:
+                    return pos + 1
+        raise DBusError(f"Unbalanced signature '{signature}'")
+    return idx + 1
+
+def _alignment(sig:str)->int:
+    char = sig[0]
+    if char in 'ygv':
+        return 1
+    if char in 'nq':
+        return 2
+    if char in '({xtd':
+        return 8
+    return 4 # b, i, u, h, s, o, a
+
+class _Writer:
+    def __init__(self):
+        self.data = bytearray()
+
+    def align(self, size:int):
+        self.data += b'\0' * ((-len(self.data)) % size)
+
+    def write(self, sig:str, value:Any):
+        char = sig[0]
+        if char in _FIXED:
+            fmt, size = _FIXED[char]
+            self.align(size)
+            self.data += struct.pack(f"<{fmt}", int(value) if char != 'd' else float(value))
+        elif char in 'so':
+            encoded = str(value).encode('utf-8')
+            self.align(4)
+            self.data += struct.pack('<I', len(encoded)) + encoded + b'\0'
+        elif char == 'g':
+            encoded = str(value).encode('utf-8')
+            self.data += struct.pack('<B', len(encoded)) + encoded + b'\0'
+        elif char == 'v':
+            value_sig, inner = value
+            self.write('g', value_sig)
+            self.write(value_sig, inner)
+        elif char == 'a':
+            item_sig = sig[1:]
+            self.align(4)
+            length_pos = len(self.data)
+            self.data += b'\0\0\0\0'
+            self.align(_alignment(item_sig))
+            start = len(self.data)
+            items = value.items() if item_sig.startswith('{') else value
+            for item in items:
+                self.write(item_sig, item)
+            struct.pack_into('<I', self.data, length_pos, len(self.data) - start)
+        elif char in '({':
+            self.align(8)
+            for item_sig, item in zip(split_signature(sig[1:-1]), value):
+                self.write(item_sig, item)
+        else:
+            raise DBusError(f"Unsupported type '{sig}'")
+
+class _Reader:
+    def __init__(self, data:bytes, endian:str='<'):
+        self.data = data
+        self.pos = 0
+        self.endian = endian
+
+    def align(self, size:int):
+        self.pos += (-self.pos) % size
+
+    def read(self, sig:str)->Any:
+        char = sig[0]
+        if char in _FIXED:
+            fmt, size = _FIXED[char]
+            self.align(size)
+            value = struct.unpack_from(f"{self.endian}{fmt}", self.data, self.pos)[0]
+            self.pos += size
+            return bool(value) if char == 'b' else value
+        if char in 'so':
+            self.align(4)
+            length = struct.unpack_from(f"{self.endian}I", self.data, self.pos)[0]
+            self.pos += 4
+            value = self.data[self.pos:self.pos + length].decode('utf-8')
+            self.pos += length + 1
+            return value
+        if char == 'g':
+            length = self.data[self.pos]
+            self.pos += 1
+            value = self.data[self.pos:self.pos + length].decode('utf-8')
+            self.pos += length + 1
+            return value
+        if char == 'v':
+            value_sig = self.read('g')
+            return self.read(value_sig)
+        if char == 'a':
+            item_sig = sig[1:]
+            self.align(4)
+            length = struct.unpack_from(f"{self.endian}I", self.data, self.pos)[0]
+            self.pos += 4
+            self.align(_alignment(item_sig))
+            end = self.pos + length
+            items = []
+            while self.pos < end:
+                items.append(self.read(item_sig))
+            return dict(items) if item_sig.startswith('{') else items
+        if char in '({':
+            self.align(8)
+            values = tuple(self.read(item_sig) for item_sig in split_signature(sig[1:-1]))
+            return values
+        raise DBusError(f"Unsupported type '{sig}'")
+
+class DBusMessage:
+    Type:int = MESSAGE_METHOD_CALL
+    Serial:int = 0
+    Fields:dict[str,Any] = None
+    Body:list = None
+
+    def __init__(self, message_type:int, fields:dict[str,Any], body:Optional[list]=None, serial:int=0):
+        self.Type = message_type
+        self.Fields = fields
+        self.Body = body if body is not None else []
+        self.Serial = serial
+
+    def encode(self)->bytes:
+        body = _Writer()
+        signature = self.Fields.get('signature', '')
+        for sig, value in zip(split_signature(signature), self.Body):
+            body.write(sig, value)
+
+        header = _Writer()
+        header.data += struct.pack('<cBBBII', b'l', self.Type, 0, 1, len(body.data), self.Serial)
+        fields = [(HEADER_FIELD_CODES[name][0], (HEADER_FIELD_CODES[name][1], value))
+                  for name, value in self.Fields.items() if name in HEADER_FIELD_CODES and value not in (None, '')]
+        header.write('a(yv)', fields)
+        header.align(8)
+        return bytes(header.data + body.data)
+
+    @staticmethod
+    def decode(data:bytes)->tuple[Optional['DBusMessage'], int]:
+        """Decode message from start of buffer, returns (message or None if incomplete, consumed bytes)."""
+        if len(data) < 16:
+            return (None, 0)
+        endian = '<' if data[0:1] == b'l' else '>'
+        message_type = data[1]
+        body_length, serial, fields_length = struct.unpack_from(f"{endian}III", data, 4)
+        header_end = 16 + fields_length
+        header_end += (-header_end) % 8
+        total = header_end + body_length
+        if len(data) < total:
+            return (None, 0)
+
+        reader = _Reader(data[:header_end], endian)
+        reader.pos = 12
+        fields = { HEADER_FIELDS.get(code, str(code)): value for code, value in reader.read('a(yv)') }
+        body_reader = _Reader(data[header_end:total], endian)
+        body = [body_reader.read(sig) for sig in split_signature(fields.get('signature', ''))]
+        return (DBusMessage(message_type, fields, body, serial), total)
+
+def _socket_path(address:str)->tuple[str,bool]:
+    for part in address.split(';'):
+        transport, _, params = part.partition(':')
+        if transport != 'unix':
+            continue
+        values = dict(p.split('=', 1) for p in params.split(',') if '=' in p)
+        if 'path' in values:
+            return (values['path'], False)
+        if 'abstract' in values:
+            return (values['abstract'], True)
+    raise DBusError(f"Unsupported D-Bus address '{address}'")
+
+class DBusConnection:
+    """Blocking connection to message bus, signals received while waiting for replies are queued."""
+
+    def __init__(self, address:Optional[str]=None, sock:Optional[socket.socket]=None):
+        # Already connected socket (e.g. one end of socketpair) is used as is
+        if sock is None:
+            address = address or os.environ.get('DBUS_SYSTEM_BUS_ADDRESS', DBUS_SYSTEM_BUS_ADDRESS)
+            path, abstract = _socket_path(address)
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.connect(f"\0{path}" if abstract else path)
+        self._socket = sock
+        self._buffer = b''
+        self._serial = 0
+        self._pending:list[DBusMessage] = []
+        self._authenticate()
+        self.UniqueName = self.call('org.freedesktop.DBus', '/org/freedesktop/DBus', 'org.freedesktop.DBus', 'Hello')[0]
+
+    def _authenticate(self):
+        uid = str(os.getuid()).encode('ascii').hex()
+        self._socket.sendall(b'\0AUTH EXTERNAL ' + uid.encode('ascii') + b'\r\n')
+        line = b''
+        while not line.endswith(b'\r\n'):
+            chunk = self._socket.recv(256)
+            if not chunk:
+                raise DBusError("Connection closed during authentication")
+            line += chunk
+        if not line.startswith(b'OK'):
+            raise DBusError(f"Authentication rejected: {line.strip().decode('ascii', 'replace')}")
+        self._socket.sendall(b'BEGIN\r\n')
+
+    def fileno(self)->int:
+        return self._socket.fileno()
+
+    def close(self):
+        self._socket.close()
+
+    def send(self, message:DBusMessage)->int:
+        self._serial += 1
+        message.Serial = self._serial
+        self._socket.sendall(message.encode())
+        return message.Serial
+
+    def call(self, destination:str, path:str, interface:str, member:str, signature:str='', body:Optional[list]=None)->list:
+        serial = self.send(DBusMessage(MESSAGE_METHOD_CALL, {
+            'path': path, 'interface': interface, 'member': member, 'destination': destination, 'signature': signature
+        }, body))
+        while True:
+            message = self._receive()
+            if message.Fields.get('reply_serial') == serial:
+                if message.Type == MESSAGE_ERROR:
+                    raise DBusError(f"{message.Fields.get('error_name')}: {message.Body[0] if message.Body else ''}")
+                return message.Body
+            if message.Type == MESSAGE_SIGNAL:
+                self._pending.append(message)
+
+    def _receive(self)->DBusMessage:
+        while True:
+            message, consumed = DBusMessage.decode(self._buffer)
+            if message is not None:
+                self._buffer = self._buffer[consumed:]
+                return message
+            chunk = self._socket.recv(65536)
+            if not chunk:
+                raise DBusError("Connection closed")
+            self._buffer += chunk
+
+    def has_pending(self)->bool:
+        """Signals were queued while waiting for method reply, read them without waiting for socket."""
+        return len(self._pending) > 0
+
+    def read_signals(self)->list[DBusMessage]:
+        """Read available data (call when socket is readable) and return complete signals."""
+        try:
+            chunk = self._socket.recv(65536, socket.MSG_DONTWAIT)
+            if not chunk:
+                raise DBusError("Connection closed")
+            self._buffer += chunk
+        except BlockingIOError:
+            pass
+        signals = self._pending
+        self._pending = []
+        while True:
+            message, consumed = DBusMessage.decode(self._buffer)
+            if message is None:
+                break
+            self._buffer = self._buffer[consumed:]
+            if message.Type == MESSAGE_SIGNAL:
+                signals.append(message)
+        return signals
+
+def unescape_object_path(value:str)->str:
+    """Decode systemd object path element, 'netapp_2eapi_2eservice' -> 'netapp.api.service'."""
+    result = []
+    idx = 0
+    while idx < len(value):
+        code = value[idx + 1:idx + 3]
+        if value[idx] == '_' and len(code) == 2 and all(c in string.hexdigits for c in code):
+            result.append(chr(int(code, 16)))
+            idx += 3
+        else:
+            result.append(value[idx])
+            idx += 1
+    return ''.join(result)
+
+def escape_object_path(value:str)->str:
+    return ''.join(c if c.isascii() and c.isalnum() else f"_{ord(c):02x}" for c in value)
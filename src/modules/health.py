@@ -0,0 +1,126 @@
+import ssl
+import time
+import asyncio
+import statistics
+from typing import Optional
+
+from modules.urls import *
+
+HEALTH_USER_AGENT = "systemd-net-health"
+
+class ProbeResult:
+    Status:Optional[int] = None
+    Latency:Optional[float] = None # seconds
+    Error:Optional[str] = None
+
+    def __init__(self, status:Optional[int]=None, latency:Optional[float]=None, error:Optional[str]=None):
+        self.Status = status
+        self.Latency = latency
+        self.Error = error
+
+    @property
+    def Ok(self)->bool:
+        return self.Status is not None and 200 <= self.Status < 400
+
+class EndpointHealth:
+    """Results of all probes of single ASPNETCORE_URLS entry of unit."""
+    Unit:str = None
+    Url:str = None
+    Results:list[ProbeResult] = None
+
+    def __init__(self, unit:str, url:str):
+        self.Unit = unit
+        self.Url = url
+        self.Results = []
+
+    @property
+    def Healthy(self)->bool:
+        return len(self.Results) > 0 and all(r.Ok for r in self.Results)
+
+    @property
+    def Status(self)->Optional[int]:
+        # Last answered status, errors are reported separately
+        statuses = [r.Status for r in self.Results if r.Status is not None]
+        return statuses[-1] if len(statuses) > 0 else None
+
+    @property
+    def Errors(self)->list[str]:
+        return [r.Error for r in self.Results if r.Error is not None]
+
+    @property
+    def LatencyP50(self)->Optional[float]:
+        latencies = [r.Latency for r in self.Results if r.Latency is not None]
+        return statistics.median(latencies) if len(latencies) > 0 else None
+
+    @property
+    def LatencyMax(self)->Optional[float]:
+        latencies = [r.Latency for r in self.Results if r.Latency is not None]
+        return max(latencies) if len(latencies) > 0 else None
+
+    def to_dict(self)->dict:
+        return {
+            'unit': self.Unit, 'url': self.Url, 'healthy': self.Healthy, 'status': self.Status,
+            'p50_ms': _to_ms(self.LatencyP50), 'max_ms': _to_ms(self.LatencyMax),
+            'probes': len(self.Results), 'errors': self.Errors,
+        }
+
+def _to_ms(value:Optional[float])->Optional[float]:
+    return round(value * 1000, 2) if value is not None else None
+
+def get_probe_target(url:UrlBinding, path:str)->tuple[str,int,str]:
+    """(host, port, request path) to probe binding from local machine."""
+    base = url.Path.rstrip('/')
+    return (url.LoopbackHost, url.EffectivePort, f"{base}/{path.lstrip('/')}")
+
+def _ssl_context()->ssl.SSLContext:
+    # Probes go to loopback, development certificates are usually not trusted
+    context = ssl.create_default_context()
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+    return context
+
+async def _request(url:UrlBinding, path:str, context:Optional[ssl.SSLContext])->int:
+    host, port, target = get_probe_target(url, path)
+    reader, writer = await asyncio.open_connection(host, port, ssl=context if url.Scheme == 'https' else None)
+    try:
+        host_header = f"[{host}]" if ':' in host else host
+        writer.write((f"GET {target} HTTP/1.1\r\nHost: {host_header}:{port}\r\n"
+                      f"User-Agent: {HEALTH_USER_AGENT}\r\nConnection: close\r\n\r\n").encode('ascii'))
+        await writer.drain()
+        status_line = await reader.readline()
+    finally:
+        writer.close()
+    parts = status_line.decode('latin-1').split()
+    if len(parts) < 2 or not parts[0].startswith('HTTP/') or not parts[1].isdigit():
+        raise ValueError(f"invalid response '{status_line[:40]!r}'")
+    return int(parts[1])
+
+async def probe_url(url:UrlBinding, path:str, timeout:float, limit:asyncio.Semaphore, context:Optional[ssl.SSLContext]=None)->ProbeResult:
+    async with limit:
+        started = time.perf_counter()
+        try:
+            status = await asyncio.wait_for(_request(url, path, context), timeout)
+            return ProbeResult(status, time.perf_counter() - started)
+        except asyncio.TimeoutError:
+            return ProbeResult(error=f"timeout after {timeout}s")
+        except (OSError, ValueError) as e:
+            return ProbeResult(error=str(e) or type(e).__name__)
+
+async def _probe_all(endpoints:list[tuple[EndpointHealth,UrlBinding]], path:str, count:int, timeout:float, max_parallel:int):
+    limit = asyncio.Semaphore(max_parallel)
+    context = _ssl_context() if any(url.Scheme == 'https' for _, url in endpoints) else None
+    probes = [(health, probe_url(url, path, timeout, limit, context)) for health, url in endpoints for _ in range(count)]
+    results = await asyncio.gather(*[probe for _, probe in probes])
+    for (health, _), result in zip(probes, results):
+        health.Results.append(result)
+
+def probe_units(units:list[tuple[str,Optional[str]]], path:str='/', count:int=3, timeout:float=2.0, max_parallel:int=256)->list[EndpointHealth]:
+    """Probe every ASPNETCORE_URLS endpoint of (unit, urls) pairs `count` times, all endpoints at once."""
+    endpoints:list[tuple[EndpointHealth,UrlBinding]] = []
+    for unit, urls in units:
+        for url in parse_urls(urls):
+            if url.Scheme in DEFAULT_SCHEME_PORTS and url.EffectivePort is not None:
+                endpoints.append((EndpointHealth(unit, str(url)), url))
+    if len(endpoints) > 0:
+        asyncio.run(_probe_all(endpoints, path, count, timeout, max_parallel))
+    return [health for health, _ in endpoints]
@@ -0,0 +1,160 @@
+import os
+import json
+import time
+import hashlib
+from typing import Callable, Optional
+
+from modules.core import *
+
+INVENTORY_VERSION = 3
+# Files modified this close to index save time are not trusted (coarse fs timestamps)
+INVENTORY_RACY_NS = 2 * 1_000_000_000
+
+def _stat_key(st:os.stat_result)->list[int]:
+    return [st.st_ino, st.st_mtime_ns, st.st_size]
+
+def _checksum(data:bytes)->str:
+    return hashlib.sha256(data).hexdigest()
+
+class ServiceInventory:
+    """Persistent index of parsed unit and env files keyed by path, inode, mtime_ns and size."""
+    ServicesDir:str = None
+    CacheDir:Optional[str] = None
+    IndexPath:Optional[str] = None
+
+    def __init__(self, services_dir:str, cache_dir:Optional[str]=None):
+        self.ServicesDir = os.path.abspath(services_dir)
+        self.CacheDir = cache_dir if cache_dir else None
+        self.IndexPath = None
+        if self.CacheDir is not None:
+            dir_hash = hashlib.sha1(self.ServicesDir.encode('utf-8')).hexdigest()[:16]
+            self.IndexPath = os.path.join(self.CacheDir, f"inventory-{dir_hash}.json")
+
+        self._files:dict[str,dict] = {}
+        self._dir_key:Optional[list[int]] = None
+        self._units:list[str] = []
+        self._dropin_dirs:list[str] = []
+        self._dropin_names:Optional[set[str]] = None
+        self._scanned = False
+        self._dirty = False
+        self.load_index()
+
+    def load_index(self):
+        if self.IndexPath is None or not os.path.isfile(self.IndexPath):
+            return
+        try:
+            # Index layout: header line with version and checksum, then payload
+            with open(self.IndexPath, 'rb') as file:
+                header = json.loads(file.readline())
+                data = file.read()
+            if header.get('version') != INVENTORY_VERSION or header.get('checksum') != _checksum(data):
+                raise ValueError('stale index')
+            payload = json.loads(data)
+            if payload.get('services_dir') != self.ServicesDir:
+                raise ValueError('index belongs to another directory')
+            self._files = payload['files']
+            self._dir_key = payload['dir_key']
+            self._units = payload['units']
+            self._dropin_dirs = payload['dropin_dirs']
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            # Corrupted or stale index - fall back to a full rescan
+            self._files = {}
+            self._dir_key = None
+            self._units = []
+            self._dropin_dirs = []
+            self._dirty = True
+
+    def save(self):
+        if self.IndexPath is None or not self._dirty:
+            return
+        # Drop entries that may still change within the same timestamp tick
+        racy_from = time.time_ns() - INVENTORY_RACY_NS
+        files = {p: e for p, e in self._files.items() if e['key'][1] < racy_from}
+        dir_key = self._dir_key
+        if dir_key is not None and dir_key[1] >= racy_from:
+            dir_key = None
+
+        payload = {
+            'services_dir': self.ServicesDir,
+            'dir_key': dir_key,
+            'units': self._units if dir_key is not None else [],
+            'dropin_dirs': self._dropin_dirs if dir_key is not None else [],
+            'files': files
+        }
+        data = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+        header = json.dumps({ 'version': INVENTORY_VERSION, 'checksum': _checksum(data) }).encode('utf-8')
+        try:
+            os.makedirs(self.CacheDir, exist_ok=True)
+            tmp_path = f"{self.IndexPath}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as file:
+                file.write(header + b'\n' + data)
+            os.replace(tmp_path, self.IndexPath)
+            self._dirty = False
+        except OSError:
+            pass # cache is optional, e.g. not writable for regular users
+
+    def scan(self)->bool:
+        """Refresh listing of units and drop-in directories with one scandir when directory changed."""
+        try:
+            st = os.stat(self.ServicesDir)
+        except OSError:
+            return False
+        dir_key = [st.st_ino, st.st_mtime_ns]
+        self._scanned = True
+        if dir_key != self._dir_key:
+            units:list[str] = []
+            dropin_dirs:list[str] = []
+            for entry in os.scandir(self.ServicesDir):
+                if entry.name.endswith('.service'):
+                    units.append(entry.name)
+                elif entry.name.endswith('service.d') and entry.is_dir():
+                    dropin_dirs.append(entry.name)
+            self._units = sorted(units)
+            self._dropin_dirs = sorted(dropin_dirs)
+            self._dropin_names = None
+            self._dir_key = dir_key
+            self._dirty = True
+        return True
+
+    def list_units(self, prefix:str)->list[str]:
+        """List .service files with given prefix, reusing cached listing while directory is unchanged."""
+        if not self.scan():
+            return []
+        return [os.path.join(self.ServicesDir, name) for name in self._units if name.startswith(prefix)]
+
+    def list_dropin_dirs(self)->set[str]:
+        """Names of '*.service.d' (and 'service.d') directories, so units without drop-ins cost no extra stat."""
+        if not self._scanned and not self.scan():
+            return set()
+        if self._dropin_names is None:
+            self._dropin_names = set(self._dropin_dirs)
+        return self._dropin_names
+
+    def read(self, file_path:str, parser:Callable[[str], dict]):
+        """Return parsed content of file, calling parser only when file changed since it was indexed."""
+        path = os.path.abspath(file_path)
+        key = _stat_key(os.stat(path))
+        entry = self._files.get(path)
+        if entry is not None and entry['key'] == key:
+            return entry['data']
+
+        data = parser(path)
+        self._files[path] = { 'key': key, 'data': data }
+        self._dirty = True
+        return data
+
+    def find_changed(self)->list[str]:
+        """Paths of indexed files that were modified or removed since they were read, one stat per file."""
+        changed:list[str] = []
+        for path, entry in self._files.items():
+            try:
+                key = _stat_key(os.stat(path))
+            except OSError:
+                key = None
+            if key != entry['key']:
+                changed.append(path)
+        return changed
+
+    def forget(self, file_path:str):
+        if self._files.pop(os.path.abspath(file_path), None) is not None:
+            self._dirty = True
@@ -0,0 +1,142 @@
+import re
+import json
+import subprocess
+from datetime import datetime
+from typing import Iterable, Iterator, Optional
+
+JOURNAL_PRIORITIES = ['emerg', 'alert', 'crit', 'err', 'warning', 'notice', 'info', 'debug']
+JOURNAL_ERROR_PRIORITY = 3 # err and more severe
+JOURNAL_WARNING_PRIORITY = 4
+
+class JournalEntry:
+    __slots__ = ('Identifier', 'Timestamp', 'Priority', 'Message', 'Unit')
+
+    def __init__(self, identifier:str, timestamp:int, priority:int, message:str, unit:str=''):
+        self.Identifier = identifier
+        self.Timestamp = timestamp # microseconds since epoch
+        self.Priority = priority
+        self.Message = message
+        self.Unit = unit # unit systemd itself logs about (UNIT= field)
+
+    @property
+    def Time(self)->datetime:
+        return datetime.fromtimestamp(self.Timestamp / 1_000_000)
+
+def parse_priority(value:str)->tuple[int,int]:
+    """journalctl priority argument ('err', '3', 'warning..err') to (most severe, least severe)."""
+    def level(part:str)->int:
+        part = part.strip().lower()
+        if part.isdigit() and int(part) < len(JOURNAL_PRIORITIES):
+            return int(part)
+        if part in JOURNAL_PRIORITIES:
+            return JOURNAL_PRIORITIES.index(part)
+        raise ValueError(f"Unknown priority '{part}'")
+    if '..' in value:
+        first, last = value.split('..', 1)
+        levels = sorted([level(first), level(last)])
+        return (levels[0], levels[1])
+    return (0, level(value))
+
+def _field_text(value)->str:
+    # Journal exports non UTF-8 values as byte arrays
+    if isinstance(value, list):
+        return bytes(value).decode('utf-8', 'replace')
+    return str(value) if value is not None else ''
+
+def parse_journal_entry(line:str)->Optional[JournalEntry]:
+    """Parse single line of `journalctl -o json` output."""
+    try:
+        fields = json.loads(line)
+    except ValueError:
+        return None
+    if not isinstance(fields, dict):
+        return None
+    try:
+        timestamp = int(fields.get('__REALTIME_TIMESTAMP', 0))
+        priority = int(fields.get('PRIORITY', 6))
+    except (TypeError, ValueError):
+        return None
+    return JournalEntry(_field_text(fields.get('SYSLOG_IDENTIFIER')), timestamp, priority, _field_text(fields.get('MESSAGE')), _field_text(fields.get('UNIT')))
+
+def iter_journal_entries(lines:Iterable[str], identifiers:Optional[set[str]]=None, priority:Optional[tuple[int,int]]=None,
+                         pattern:Optional[re.Pattern]=None)->Iterator[JournalEntry]:
+    """Filter parsed entries lazily, nothing is kept after entry was yielded."""
+    for line in lines:
+        entry = parse_journal_entry(line)
+        if entry is None:
+            continue
+        if identifiers is not None and entry.Identifier not in identifiers:
+            continue
+        if priority is not None and not (priority[0] <= entry.Priority <= priority[1]):
+            continue
+        if pattern is not None and pattern.search(entry.Message) is None:
+            continue
+        yield entry
+
+def build_journalctl_command(identifiers:list[str], follow:bool=False, priority:Optional[tuple[int,int]]=None,
+                             since:Optional[str]=None, lines:Optional[int]=None)->list[str]:
+    # Matches of the same field are OR-ed by journalctl, so one reader serves all services
+    command = ["journalctl", "--output=json", "--no-pager"]
+    if follow:
+        command.append("--follow")
+    if priority is not None:
+        command.append(f"--priority={priority[0]}..{priority[1]}")
+    if since is not None:
+        command.append(f"--since={since}")
+    if lines is not None:
+        command.append(f"--lines={lines}")
+    return command + [f"SYSLOG_IDENTIFIER={identifier}" for identifier in identifiers]
+
+def build_unit_failures_command(units:list[str], identifiers:list[str], since:str)->list[str]:
+    """Messages of systemd about units plus errors logged by applications, read by single journalctl."""
+    command = ["journalctl", "--output=json", "--no-pager", f"--since={since}"]
+    command += [f"UNIT={unit}.service" for unit in units]
+    # '+' starts alternative group: application identifiers AND error priorities
+    command += ['+'] + [f"SYSLOG_IDENTIFIER={identifier}" for identifier in identifiers]
+    return command + [f"PRIORITY={level}" for level in range(JOURNAL_ERROR_PRIORITY + 1)]
+
+def read_journal(command:list[str])->Iterator[str]:
+    """Lines of journalctl output as they arrive, process is stopped when generator is closed."""
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True, errors='replace', bufsize=1)
+    try:
+        for line in process.stdout:
+            yield line
+    finally:
+        if process.poll() is None:
+            process.terminate()
+        process.wait()
+
+class LogSummary:
+    """Per service counters of streamed entries."""
+    Total:dict[str,int] = None
+    Errors:dict[str,int] = None
+    Warnings:dict[str,int] = None
+    First:dict[str,int] = None
+    Last:dict[str,int] = None
+
+    def __init__(self):
+        self.Total = {}
+        self.Errors = {}
+        self.Warnings = {}
+        self.First = {}
+        self.Last = {}
+
+    def add(self, entry:JournalEntry):
+        name = entry.Identifier
+        self.Total[name] = self.Total.get(name, 0) + 1
+        if entry.Priority <= JOURNAL_ERROR_PRIORITY:
+            self.Errors[name] = self.Errors.get(name, 0) + 1
+        elif entry.Priority == JOURNAL_WARNING_PRIORITY:
+            self.Warnings[name] = self.Warnings.get(name, 0) + 1
+        self.First.setdefault(name, entry.Timestamp)
+        self.Last[name] = entry.Timestamp
+
+    def error_rate(self, name:str)->float:
+        total = self.Total.get(name, 0)
+        return self.Errors.get(name, 0) * 100.0 / total if total > 0 else 0.0
+
+    def errors_per_minute(self, name:str)->Optional[float]:
+        span = (self.Last.get(name, 0) - self.First.get(name, 0)) / 60_000_000
+        if span <= 0:
+            return None
+        return self.Errors.get(name, 0) / span
@@ -0,0 +1,165 @@
+from typing import Iterable, Iterator
+
+from modules.core import *
+from modules.NetService import *
+from modules.status import *
+from modules.cgroups import *
+from modules.output import *
+
+SVC_TABLE_HEADERS = ["Name", "URLs", "Enable", "Active"]
+SVC_TABLE_VERBOSE_HEADERS = ["Profile", "Drop-ins"]
+SVC_TABLE_RESOURCES_HEADERS = ["CPU%", "Memory", "Peak", "Tasks", "IO R/W", "Restarts"]
+
+def format_enabled_state(state_enabled:str)->str:
+    if state_enabled == 'enabled':
+        return f"{COLOR_SUCCESS}{state_enabled}{COLOR_BASE}"
+    return state_enabled
+
+def format_active_state(state_active:str)->str:
+    if state_active == 'active':
+        return f"{COLOR_SUCCESS}{state_active}{COLOR_BASE}"
+    elif state_active == 'failed':
+        return f"{COLOR_DANGER}{state_active}{COLOR_BASE}"
+    elif state_active == 'activating':
+        return f"{COLOR_WARN}{state_active}{COLOR_BASE}"
+    return state_active
+
+def format_dropins(paths:list[str])->str:
+    return '\n'.join(os.path.join(os.path.basename(os.path.dirname(path)), os.path.basename(path)) for path in paths)
+
+def format_resources(row:dict)->list[str]:
+    cpu = f"{row['cpu_percent']:.1f}" if row.get('cpu_percent') is not None else ''
+    io = f"{format_bytes(row['io_read_bytes'])}/{format_bytes(row['io_write_bytes'])}" if row.get('io_read_bytes') is not None else ''
+    tasks = str(row['tasks']) if row.get('tasks') is not None else ''
+    return [cpu, format_bytes(row.get('memory_bytes')), format_bytes(row.get('memory_peak_bytes')), tasks, io, str(row['restarts'])]
+
+# Same schema for every output format, resources are null unless requested
+SERVICE_ROW_FIELDS = UNIT_ROW_FIELDS + ['template', 'urls', 'enabled', 'active', 'sub_state', 'main_pid', 'restarts', 'profile', 'dropins',
+                                        'cpu_percent', 'memory_bytes', 'memory_peak_bytes', 'tasks', 'io_read_bytes', 'io_write_bytes']
+# Units queried by one `systemctl show` when streaming rows
+SERVICE_ROWS_BATCH = 256
+
+def build_service_row(svc:NetService, unit:Optional[str], urls:Optional[str], status:ServiceStatus, stats:Optional[CgroupStats])->dict:
+    row = get_unit_fields(svc.Name, unit)
+    row.update({
+        'template': svc.IsTemplate, 'urls': [url for url in (urls or '').split(';') if url],
+        'enabled': status.Enabled, 'active': status.Active, 'sub_state': status.SubState,
+        'main_pid': status.MainPID or None, 'restarts': status.NRestarts, 'profile': svc.Profile, 'dropins': svc.DropInPaths,
+    })
+    if stats is not None:
+        row.update({
+            'cpu_percent': round(stats.CpuPercent, 1) if stats.CpuPercent is not None else None,
+            'memory_bytes': stats.MemoryCurrent, 'memory_peak_bytes': stats.MemoryPeak, 'tasks': stats.Tasks,
+            'io_read_bytes': stats.IoReadBytes, 'io_write_bytes': stats.IoWriteBytes,
+        })
+    return row
+
+def iter_service_rows(services:Iterable[NetService], services_dir:str, resources=False, interval:float=0.5, batch_size:int=0, units:Optional[list[str]]=None)->Iterator[tuple[NetService,dict]]:
+    """Row of every unit (template without instances gives one row without unit), state is read for batch_size units at once (0 - all).
+
+    With resources and all unit names given, their state and first CPU sample are read once before the first row,
+    so batches only read the second sample.
+    """
+    properties = SERVICE_STATUS_PROPERTIES + ['ControlGroup'] if resources else SERVICE_STATUS_PROPERTIES
+    instances:Optional[dict[str,list[str]]] = None
+    batch:list[tuple[NetService,Optional[str],Optional[str]]] = []
+    all_statuses:Optional[dict[str,ServiceStatus]] = None
+    sampler:Optional[CgroupSampler] = None
+    sampled_at:Optional[float] = None
+    if resources and units is not None:
+        all_statuses = get_services_status(units, properties)
+        sampler = CgroupSampler()
+        sampler.sample({ unit: get_unit_cgroup_path(unit, status.ControlGroup) for unit, status in all_statuses.items() })
+        sampled_at = time.monotonic()
+
+    def read_batch():
+        nonlocal sampled_at
+        units = [unit for _, unit, _ in batch if unit is not None]
+        statuses = all_statuses if all_statuses is not None else get_services_status(units, properties)
+        unit_stats:dict[str,Optional[CgroupStats]] = {}
+        if resources:
+            paths = { unit: get_unit_cgroup_path(unit, statuses.get(unit, ServiceStatus(unit)).ControlGroup) for unit in units }
+            if sampler is None:
+                unit_stats = collect_cgroup_stats(paths, interval)
+            else:
+                if sampled_at is not None:
+                    # Only rows of first batch wait, until then the interval passed for all units
+                    remaining = interval - (time.monotonic() - sampled_at)
+                    if remaining > 0:
+                        time.sleep(remaining)
+                    sampled_at = None
+                unit_stats = sampler.sample(paths)
+        for svc, unit, urls in batch:
+            yield (svc, build_service_row(svc, unit, urls, statuses.get(unit, ServiceStatus(unit)), unit_stats.get(unit)))
+
+    for svc in services:
+        if not svc.IsTemplate:
+            batch.append((svc, svc.Name, svc.ASPNETCORE_URLS))
+        else:
+            # Template services are listed together with their instances
+            if instances is None:
+                instances = get_template_instances(services_dir)
+            svc_instances = instances.get(svc.Name, [])
+            for instance in svc_instances:
+                urls = read_instance_environment(services_dir, svc.Name, instance).get('ASPNETCORE_URLS', '').strip('"')
+                batch.append((svc, f"{svc.Name}{instance}", urls))
+            if len(svc_instances) == 0:
+                batch.append((svc, None, None))
+        if batch_size > 0 and len(batch) >= batch_size:
+            yield from read_batch()
+            batch = []
+    if len(batch) > 0:
+        yield from read_batch()
+
+def format_service_table(rows:list[tuple[NetService,dict]], verbose=False, resources=False)->list[list[str]]:
+    def unit_row(name:str, row:dict)->list[str]:
+        cells = [name, '\n'.join(row['urls']), format_enabled_state(row['enabled']), format_active_state(row['active'])]
+        if verbose:
+            cells += [row['profile'] or '', format_dropins(row['dropins'])]
+        if resources:
+            cells += format_resources(row)
+        return cells
+
+    # (active, total) instances of every template for its summary row
+    counts:dict[str,list[int]] = {}
+    for svc, row in rows:
+        if svc.IsTemplate and row['unit'] is not None:
+            count = counts.setdefault(svc.Name, [0, 0])
+            count[0] += 1 if row['active'] == 'active' else 0
+            count[1] += 1
+
+    data = []
+    for idx, (svc, row) in enumerate(rows):
+        if not svc.IsTemplate:
+            data.append(unit_row(svc.Name, row))
+            continue
+        if idx == 0 or rows[idx - 1][0] is not svc:
+            active, total = counts.get(svc.Name, [0, 0])
+            cells = [svc.Name, (svc.ASPNETCORE_URLS or '').replace(";","\n"), '', f"{active}/{total} active"]
+            cells += [svc.Profile or '', format_dropins(svc.DropInPaths)] if verbose else []
+            cells += [''] * len(SVC_TABLE_RESOURCES_HEADERS) if resources else []
+            data.append(cells)
+        if row['unit'] is not None:
+            data.append(unit_row(f"  └ {row['unit']}", row))
+    return data
+
+def print_services(services:Iterable[NetService], services_dir:str, verbose=False, resources=False, interval:float=0.5, format:str='table', units:Optional[list[str]]=None):
+    if format != 'table':
+        # Rows are printed after each batch of units, without waiting for all services
+        writer = RowWriter(format, SERVICE_ROW_FIELDS)
+        for _, row in iter_service_rows(services, services_dir, resources, interval, SERVICE_ROWS_BATCH, units):
+            writer.write(row)
+        writer.close()
+        return
+
+    rows = list(iter_service_rows(services, services_dir, resources, interval))
+    if (len(rows) > 0):
+        headers = SVC_TABLE_HEADERS
+        if verbose:
+            headers = headers + SVC_TABLE_VERBOSE_HEADERS
+        if resources:
+            headers = headers + SVC_TABLE_RESOURCES_HEADERS
+        from tabulate import tabulate # loaded only for table output
+        print(tabulate(format_service_table(rows, verbose, resources), headers=headers, tablefmt="grid", disable_numparse=True))
+    else:
+        print("No services registered.")
@@ -0,0 +1,47 @@
+import fcntl
+
+from modules.core import *
+
+class ServiceDirLock:
+    """Exclusive flock of service (and env) directories, held by commands that change them.
+
+    Writers in separate processes are serialized. daemon-reload requested while lock is held
+    runs once, before lock is released, so next writer never races with it. Readers do not
+    take the lock and are never blocked.
+    """
+    Held:set[str] = set() # directories locked by this process, nested locks do not lock again
+
+    def __init__(self, *dirs:Optional[str]):
+        self.Dirs = sorted(set(os.path.realpath(d) for d in dirs if d and os.path.isdir(d))) # same order in every process
+        self._fds:list[tuple[str,int]] = []
+
+    def __enter__(self)->'ServiceDirLock':
+        for path in self.Dirs:
+            if path in ServiceDirLock.Held:
+                continue
+            fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                print(f"Waiting for other systemd-net process changing {path}...", file=sys.stderr)
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            self._fds.append((path, fd))
+            ServiceDirLock.Held.add(path)
+        RELOAD_BATCHES.append(False)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            # Files were written even when command failed or exited early, systemd has to see them
+            reload = RELOAD_BATCHES.pop()
+            if reload:
+                if len(RELOAD_BATCHES) > 0:
+                    RELOAD_BATCHES[-1] = True
+                else:
+                    do_reload_systemctl()
+        finally:
+            for path, fd in reversed(self._fds):
+                os.close(fd) # closing descriptor releases flock
+                ServiceDirLock.Held.discard(path)
+            self._fds = []
+        return False
@@ -0,0 +1,151 @@
+import os
+import json
+from typing import Optional
+
+from modules.core import *
+from modules.NetService import *
+from modules.runtimes import *
+from modules.profiles import *
+from modules.restarts import *
+
+MANIFEST_SERVICE_KEYS = ['exec_path', 'working_dir', 'user', 'group', 'description', 'aspnetcore_urls', 'aspnetcore_env', 'env', 'service', 'enabled', 'profile', 'restart']
+MANIFEST_RESTART_KEYS = ['backoff', 'restart_sec', 'restart_steps', 'restart_max_delay', 'start_limit_interval', 'start_limit_burst', 'jitter']
+
+def load_manifest(path:str)->dict:
+    """Read desired state manifest: { "defaults": {...}, "services": { name: {...} } }."""
+    if path.endswith('.toml'):
+        try:
+            import tomllib
+        except ImportError:
+            raise Exception("TOML manifest requires Python 3.11+, use JSON instead")
+        with open(path, 'rb') as file:
+            manifest = tomllib.load(file)
+    else:
+        with open(path, 'r') as file:
+            manifest = json.load(file)
+
+    services = manifest.get('services', None)
+    if not isinstance(services, dict):
+        raise Exception(f"Invalid manifest {path} - 'services' table is required")
+    defaults = manifest.get('defaults', {})
+
+    specs:dict[str,dict] = {}
+    for name, spec in services.items():
+        if not isinstance(spec, dict):
+            raise Exception(f"Invalid manifest {path} - service '{name}' must be a table")
+        spec = { **defaults, **spec }
+        unknown = [key for key in spec if key not in MANIFEST_SERVICE_KEYS]
+        if len(unknown) > 0:
+            raise Exception(f"Invalid manifest {path} - unknown keys for service '{name}': {', '.join(unknown)}")
+        if not spec.get('exec_path'):
+            raise Exception(f"Invalid manifest {path} - 'exec_path' is required for service '{name}'")
+        specs[name] = spec
+    return specs
+
+def build_service(svc_dir:str, prefix:str, name:str, spec:dict, profiles_dir:str=PROFILES_DIR)->NetService:
+    """Create service from manifest entry the same way 'add' does."""
+    svcArgs = SVCArgsProp(svc_dir, prefix, name)
+    svc = new_service(svc_dir, svcArgs.FullName)
+
+    if spec.get('working_dir'):
+        svc.Params.Properties['WorkingDirectory'] = str(spec['working_dir'])
+    exec_path, dotnet = resolve_exec_start(str(spec['exec_path']), read_runtimeconfig(str(spec['exec_path'])))
+    svc.Params.set_ExecStart(exec_path, dotnet=dotnet)
+
+    if spec.get('user'):
+        svc.ExecUser = str(spec['user'])
+        svc.ExecGroup = str(spec['user'])
+    if spec.get('group'):
+        svc.ExecGroup = str(spec['group'])
+    if spec.get('description'):
+        svc.Description = str(spec['description'])
+    for key, value in spec.get('service', {}).items():
+        svc.Params.Properties[key] = str(value)
+
+    if spec.get('aspnetcore_urls'):
+        svc.ASPNETCORE_URLS = str(spec['aspnetcore_urls'])
+    svc.ASPNETCORE_ENVIRONMENT = str(spec.get('aspnetcore_env', 'Production'))
+    if spec.get('profile'):
+        apply_profile(svc, load_profile(str(spec['profile']), profiles_dir))
+    for key, value in spec.get('env', {}).items():
+        svc.set_environment_variable(key, str(value))
+    if spec.get('restart'):
+        apply_restart_policy(svc, get_manifest_restart_policy(spec['restart']))
+    return svc
+
+def get_manifest_restart_policy(restart)->RestartPolicy:
+    """'restart' entry is "backoff" or table with add options: backoff, restart_sec, restart_steps, ..., jitter."""
+    values = { 'backoff': True } if restart == 'backoff' else restart
+    if not isinstance(values, dict):
+        raise Exception(f"Invalid restart settings '{restart}', expected \"backoff\" or table")
+    unknown = [key for key in values if key not in MANIFEST_RESTART_KEYS]
+    if len(unknown) > 0:
+        raise Exception(f"Unknown restart settings: {', '.join(unknown)}")
+    settings = get_restart_settings(values, bool(values.get('backoff', False)))
+    return RestartPolicy.from_settings(settings or {}, float(values.get('jitter', RESTART_JITTER_PERCENT)))
+
+class ApplyAction:
+    Name:str = None
+    Action:str = None # 'create', 'update', 'delete' or 'unchanged'
+    Service:Optional[NetService] = None
+    Current:Optional[NetService] = None
+    Enabled:Optional[bool] = None
+    UnitChanges:list[str] = None
+    EnvChanges:list[str] = None
+
+    def __init__(self, name:str, action:str, service:Optional[NetService]=None, current:Optional[NetService]=None):
+        self.Name = name
+        self.Action = action
+        self.Service = service
+        self.Current = current
+        self.UnitChanges = []
+        self.EnvChanges = []
+
+    @property
+    def UnitChanged(self)->bool:
+        return self.Action in ('create', 'delete') or len(self.UnitChanges) > 0
+
+    @property
+    def EnvChanged(self)->bool:
+        return len(self.EnvChanges) > 0
+
+def plan_apply(specs:dict[str,dict], svc_dir:str, prefix:str, cache_dir:Optional[str]=None, prune=False)->list[ApplyAction]:
+    """Compare manifest services with registered ones and return what has to be done."""
+    current = { svc.Name: svc for svc in get_services(svc_dir, prefix, cache_dir) }
+
+    actions:list[ApplyAction] = []
+    for name, spec in specs.items():
+        desired = build_service(svc_dir, prefix, name, spec)
+        existing = current.get(desired.Name, None)
+        if existing is None:
+            action = ApplyAction(desired.Name, 'create', desired)
+        else:
+            action = ApplyAction(desired.Name, 'update', desired, existing)
+            current_snapshot = existing.snapshot()
+            desired_snapshot = desired.snapshot()
+            if current_snapshot != desired_snapshot:
+                action.UnitChanges = current_snapshot.diff_sections(desired_snapshot)
+                action.EnvChanges = current_snapshot.diff_environment(desired_snapshot)
+            if not action.UnitChanged and not action.EnvChanged:
+                action.Action = 'unchanged'
+        if 'enabled' in spec:
+            action.Enabled = bool(spec['enabled'])
+        actions.append(action)
+
+    if prune:
+        desired_names = set(a.Name for a in actions)
+        for name, svc in sorted(current.items()):
+            if name not in desired_names:
+                actions.append(ApplyAction(name, 'delete', current=svc))
+    return actions
+
+def print_apply_plan(actions:list[ApplyAction]):
+    counts = { action: len([a for a in actions if a.Action == action]) for action in ('create', 'update', 'delete', 'unchanged') }
+    print(f"Plan: {counts['create']} to create, {counts['update']} to update, {counts['delete']} to delete, {counts['unchanged']} unchanged")
+    for a in actions:
+        if a.Action == 'create':
+            print(f"  {COLOR_SUCCESS}+ {a.Name}{COLOR_BASE}")
+        elif a.Action == 'update':
+            print(f"  {COLOR_WARN}~ {a.Name}{COLOR_BASE} ({', '.join(a.UnitChanges + a.EnvChanges)})")
+        elif a.Action == 'delete':
+            print(f"  {COLOR_DANGER}- {a.Name}{COLOR_BASE}")
@@ -0,0 +1,205 @@
+import os
+import time
+from typing import Optional
+
+from modules.core import *
+from modules.NetService import *
+from modules.status import *
+from modules.cgroups import *
+from modules.health import *
+
+METRICS_PREFIX = "systemd_net"
+METRICS_STATUS_PROPERTIES = ['UnitFileState', 'ActiveState', 'SubState', 'NRestarts', 'ControlGroup', 'ActiveEnterTimestampMonotonic']
+PROBE_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0]
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+class LatencyHistogram:
+    """Cumulative Prometheus histogram of probe latencies in seconds."""
+    __slots__ = ('Counts', 'Sum', 'Count')
+
+    def __init__(self):
+        self.Counts = [0] * len(PROBE_BUCKETS)
+        self.Sum = 0.0
+        self.Count = 0
+
+    def observe(self, value:float):
+        for idx, bound in enumerate(PROBE_BUCKETS):
+            if value <= bound:
+                self.Counts[idx] += 1
+        self.Sum += value
+        self.Count += 1
+
+def escape_label(value:str)->str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def format_labels(labels:dict[str,str])->str:
+    return '{' + ','.join(f'{key}="{escape_label(value)}"' for key, value in labels.items()) + '}'
+
+def format_value(value:float)->str:
+    return str(int(value)) if isinstance(value, int) or float(value).is_integer() else repr(float(value))
+
+class MetricsCollector:
+    """Keeps units, their state and probe histograms between scrapes.
+
+    Services are re-read only when services directory, a drop-in directory or one of their unit, drop-in
+    or env files changed, unit state only for units systemd signalled a change of (every scrape when bus
+    is not available).
+    """
+
+    def __init__(self, services_dir:str, prefix:str, cache_dir:Optional[str]=None, full_refresh:float=300.0):
+        self.ServicesDir = services_dir
+        self.Prefix = prefix
+        self.FullRefresh = full_refresh
+        self.Inventory = ServiceInventory(services_dir, cache_dir)
+        self.Bus:Optional['DBusConnection'] = None
+        self.Units:list[tuple[str,NetService,Optional[str]]] = []
+        self.Statuses:dict[str,ServiceStatus] = {}
+        self.Histograms:dict[tuple[str,str],LatencyHistogram] = {}
+        self.ProbeUp:dict[tuple[str,str],int] = {}
+        self._dir_key:Optional[list[int]] = None
+        self._stale:set[str] = set()
+        self._next_full_refresh = 0.0
+
+    def connect_bus(self)->bool:
+        from modules.dbus import DBusError # textfile output never connects
+        try:
+            self.Bus = connect_systemd_bus()
+            return True
+        except (OSError, DBusError) as e:
+            print(f"{COLOR_WARN}systemd bus is not available ({e}), unit state is read on every scrape{COLOR_BASE}", file=sys.stderr)
+            self.Bus = None
+            return False
+
+    def read_signals(self):
+        """Apply queued PropertiesChanged signals, units with invalidated properties are read on next refresh."""
+        if self.Bus is None:
+            return
+        from modules.dbus import DBusError
+        try:
+            messages = self.Bus.read_signals()
+        except DBusError as e:
+            print(f"{COLOR_WARN}systemd bus connection lost ({e}), unit state is read on every scrape{COLOR_BASE}", file=sys.stderr)
+            self.Bus = None
+            return
+        for message in messages:
+            unit = get_signal_unit(message)
+            if unit in self.Statuses and apply_properties_changed(self.Statuses[unit], message, METRICS_STATUS_PROPERTIES):
+                self._stale.add(unit)
+
+    def get_dir_key(self)->Optional[list[int]]:
+        """mtime_ns of services directory and of its drop-in directories, files added to any of them change it."""
+        if not self.Inventory.scan():
+            return None
+        key = [os.stat(self.ServicesDir).st_mtime_ns]
+        for name in sorted(self.Inventory.list_dropin_dirs()):
+            try:
+                key.append(os.stat(os.path.join(self.ServicesDir, name)).st_mtime_ns)
+            except OSError:
+                key.append(0)
+        return key
+
+    def refresh_units(self, force:bool=False):
+        try:
+            dir_key = self.get_dir_key()
+        except OSError:
+            dir_key = None
+        if not force and dir_key == self._dir_key:
+            # Files edited in place keep directory mtimes, they are found by stat keys of inventory
+            changed = self.Inventory.find_changed()
+            if len(changed) == 0:
+                return
+            for path in changed:
+                self.Inventory.forget(path) # removed files are not read again
+        self._dir_key = dir_key
+        services:list[NetService] = []
+        for svc_path in self.Inventory.list_units(self.Prefix):
+            try:
+                services.append(read_service(svc_path, self.Inventory))
+            except Exception:
+                print(f"{COLOR_WARN}Unable to read service {svc_path}{COLOR_BASE}", file=sys.stderr)
+        self.Inventory.save()
+        self.Units = get_service_units(services, self.Inventory)
+        units = set(unit for unit, _, _ in self.Units)
+        self._stale.update(units - set(self.Statuses))
+        for unit in set(self.Statuses) - units:
+            del self.Statuses[unit]
+        for key in [key for key in self.Histograms if key[0] not in units]:
+            del self.Histograms[key]
+            self.ProbeUp.pop(key, None)
+
+    def refresh(self):
+        """Bring units and their state up to date before rendering metrics."""
+        now = time.monotonic()
+        full = now >= self._next_full_refresh
+        self.refresh_units(full)
+        self.read_signals()
+        units = [unit for unit, _, _ in self.Units]
+        # Without signals (and periodically, e.g. for UnitFileState) every unit is queried
+        refresh = units if full or self.Bus is None else [u for u in units if u in self._stale]
+        if len(refresh) > 0:
+            self.Statuses.update(get_services_status(refresh, METRICS_STATUS_PROPERTIES))
+        self._stale.clear()
+        if full:
+            self._next_full_refresh = now + self.FullRefresh
+
+    def probe(self, path:str, timeout:float, max_parallel:int=256):
+        """Probe endpoints of active units once, latencies of answered probes go to histograms."""
+        active = [(unit, urls) for unit, _, urls in self.Units if unit in self.Statuses and self.Statuses[unit].Active == 'active']
+        for health in probe_units(active, path, 1, timeout, max_parallel):
+            key = (health.Unit, health.Url)
+            self.ProbeUp[key] = 1 if health.Healthy else 0
+            for result in health.Results:
+                if result.Status is not None and result.Latency is not None:
+                    self.Histograms.setdefault(key, LatencyHistogram()).observe(result.Latency)
+
+    def render(self)->str:
+        lines:list[str] = []
+        def family(name:str, kind:str, help:str):
+            lines.append(f"# HELP {METRICS_PREFIX}_{name} {help}")
+            lines.append(f"# TYPE {METRICS_PREFIX}_{name} {kind}")
+        def sample(name:str, labels:dict[str,str], value:float):
+            lines.append(f"{METRICS_PREFIX}_{name}{format_labels(labels)} {format_value(value)}")
+
+        now_usec = time.monotonic() * 1_000_000
+        units = [(unit, svc.Name, self.Statuses.get(unit, ServiceStatus(unit))) for unit, svc, _ in self.Units]
+        stats = { unit: read_cgroup_stats(get_unit_cgroup_path(unit, status.ControlGroup)) for unit, _, status in units }
+
+        family('unit_active', 'gauge', "1 if unit is active")
+        for unit, service, status in units:
+            sample('unit_active', { 'unit': unit, 'service': service, 'state': status.Active, 'sub_state': status.SubState }, 1 if status.Active == 'active' else 0)
+        family('unit_enabled', 'gauge', "1 if unit is enabled")
+        for unit, service, status in units:
+            sample('unit_enabled', { 'unit': unit, 'service': service }, 1 if status.Enabled == 'enabled' else 0)
+        family('unit_restarts_total', 'counter', "Automatic restarts of unit by systemd (NRestarts)")
+        for unit, service, status in units:
+            sample('unit_restarts_total', { 'unit': unit, 'service': service }, status.NRestarts)
+        family('unit_uptime_seconds', 'gauge', "Seconds since unit entered active state")
+        for unit, service, status in units:
+            entered = int(status.Properties.get('ActiveEnterTimestampMonotonic') or 0)
+            if status.Active == 'active' and entered > 0:
+                sample('unit_uptime_seconds', { 'unit': unit, 'service': service }, round(max(0.0, now_usec - entered) / 1_000_000, 3))
+
+        cgroup_metrics = [
+            ('unit_cpu_seconds_total', 'counter', "CPU time used by unit cgroup", lambda s: s.CpuUsageUsec / 1_000_000 if s.CpuUsageUsec is not None else None),
+            ('unit_memory_bytes', 'gauge', "Memory used by unit cgroup", lambda s: s.MemoryCurrent),
+            ('unit_memory_peak_bytes', 'gauge', "Peak memory of unit cgroup", lambda s: s.MemoryPeak),
+            ('unit_tasks', 'gauge', "Tasks in unit cgroup", lambda s: s.Tasks),
+        ]
+        for name, kind, help, getter in cgroup_metrics:
+            family(name, kind, help)
+            for unit, service, _ in units:
+                value = getter(stats[unit]) if stats[unit] is not None else None
+                if value is not None:
+                    sample(name, { 'unit': unit, 'service': service }, value)
+
+        family('probe_up', 'gauge', "1 if last probe of endpoint succeeded")
+        for (unit, url), up in sorted(self.ProbeUp.items()):
+            sample('probe_up', { 'unit': unit, 'url': url }, up)
+        family('probe_duration_seconds', 'histogram', "Latency of answered endpoint probes")
+        for (unit, url), histogram in sorted(self.Histograms.items()):
+            for bound, count in zip(PROBE_BUCKETS, histogram.Counts):
+                sample('probe_duration_seconds_bucket', { 'unit': unit, 'url': url, 'le': format_value(bound) }, count)
+            sample('probe_duration_seconds_bucket', { 'unit': unit, 'url': url, 'le': '+Inf' }, histogram.Count)
+            sample('probe_duration_seconds_sum', { 'unit': unit, 'url': url }, round(histogram.Sum, 6))
+            sample('probe_duration_seconds_count', { 'unit': unit, 'url': url }, histogram.Count)
+        return '\n'.join(lines) + '\n'
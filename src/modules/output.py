@@ -0,0 +1,78 @@
+import csv
+import json
+import argparse
+from typing import Optional, TextIO
+
+from modules.core import *
+
+OUTPUT_FORMATS = ['table', 'json', 'ndjson', 'csv']
+# Rows of every command start with these fields, so listings can be joined by unit
+UNIT_ROW_FIELDS = ['service', 'unit', 'instance']
+
+def add_format_argument(parser:argparse.ArgumentParser):
+    parser.add_argument('--format', type=str, choices=OUTPUT_FORMATS, help="Output format, json/ndjson/csv rows are printed as soon as they are ready\n(default: %(default)s)", default='table')
+
+def get_unit_fields(service:str, unit:Optional[str])->dict:
+    """Common fields of row about unit, instance is set for template instances 'name@instance'."""
+    instance = unit.partition('@')[2] if unit is not None else ''
+    return { 'service': service, 'unit': unit, 'instance': instance or None }
+
+def get_unit_fields_from_name(unit:str)->dict:
+    """Common fields when only unit name is known, instance 'name@instance' belongs to template 'name@'."""
+    name, at, _ = unit.partition('@')
+    return get_unit_fields(f"{name}@" if at else unit, unit)
+
+def format_csv_value(value)->str:
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, list):
+        return ';'.join(str(v) for v in value)
+    return str(value)
+
+class RowWriter:
+    """Writes rows (dicts with given fields) as JSON array, NDJSON or CSV, one row at a time.
+
+    Memory does not grow with number of rows, every row is flushed so readers get it immediately.
+    """
+
+    def __init__(self, format:str, fields:list[str], file:Optional[TextIO]=None):
+        if format not in OUTPUT_FORMATS or format == 'table':
+            raise Exception(f"Rows can not be streamed as '{format}'")
+        self.Format = format
+        self.Fields = fields
+        self.File = file if file is not None else sys.stdout
+        self.Count = 0
+        self._csv = csv.writer(self.File, lineterminator='\n') if format == 'csv' else None
+
+    def write(self, row:dict):
+        try:
+            if self.Format == 'ndjson':
+                self.File.write(json.dumps({ key: row.get(key) for key in self.Fields }) + '\n')
+            elif self.Format == 'json':
+                self.File.write(('[\n  ' if self.Count == 0 else ',\n  ') + json.dumps({ key: row.get(key) for key in self.Fields }))
+            else:
+                if self.Count == 0:
+                    self._csv.writerow(self.Fields)
+                self._csv.writerow([format_csv_value(row.get(key)) for key in self.Fields])
+            self.File.flush()
+        except BrokenPipeError:
+            self._reader_gone()
+        self.Count += 1
+
+    def close(self):
+        try:
+            if self.Format == 'json':
+                self.File.write('[]\n' if self.Count == 0 else '\n]\n')
+            elif self.Format == 'csv' and self.Count == 0:
+                self._csv.writerow(self.Fields)
+            self.File.flush()
+        except BrokenPipeError:
+            self._reader_gone()
+
+    def _reader_gone(self):
+        # Reader like `head` has enough rows, stop without traceback on interpreter exit flush
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, self.File.fileno())
+        exit(1)
@@ -0,0 +1,140 @@
+import os
+import ipaddress
+from typing import Optional
+
+from modules.urls import *
+
+PROC_NET_DIR = os.environ.get('SYSTEMD_NET_PROC_NET_DIR', "/proc/net")
+DEFAULT_PORT_RANGE = os.environ.get('SYSTEMD_NET_PORT_RANGE', "5000-5999")
+TCP_STATE_LISTEN = '0A'
+
+class PortOwner:
+    """Service or listening socket bound to port."""
+    Name:Optional[str] = None # service unit, None for listener not matched to any service
+    Host:str = None
+    Url:Optional[str] = None
+
+    def __init__(self, name:Optional[str], host:str, url:Optional[str]=None):
+        self.Name = name
+        self.Host = host
+        self.Url = url
+
+    @property
+    def IsListener(self)->bool:
+        return self.Url is None
+
+def parse_port_range(value:str)->tuple[int,int]:
+    first, sep, last = value.partition('-')
+    try:
+        ports = (int(first), int(last) if sep else int(first))
+    except ValueError:
+        raise ValueError(f"Invalid port range '{value}', expected e.g. 5000-5999")
+    if not (0 < ports[0] <= ports[1] < 65536):
+        raise ValueError(f"Invalid port range '{value}'")
+    return ports
+
+def _decode_proc_address(value:str)->str:
+    # Address words are stored in host (little endian) order
+    packed = b''.join(bytes.fromhex(value[i:i + 8])[::-1] for i in range(0, len(value), 8))
+    return str(ipaddress.ip_address(packed))
+
+def read_tcp_listeners(proc_net_dir:str=PROC_NET_DIR)->list[tuple[str,int]]:
+    """(address, port) of listening TCP sockets from /proc/net/tcp and tcp6."""
+    listeners:list[tuple[str,int]] = []
+    for file_name in ('tcp', 'tcp6'):
+        try:
+            with open(os.path.join(proc_net_dir, file_name), 'r') as file:
+                next(file, None) # header
+                for line in file:
+                    parts = line.split()
+                    if len(parts) < 4 or parts[3] != TCP_STATE_LISTEN:
+                        continue
+                    address, _, port = parts[1].partition(':')
+                    listeners.append((_decode_proc_address(address), int(port, 16)))
+        except (OSError, ValueError):
+            continue
+    return listeners
+
+def _is_wildcard(host:str)->bool:
+    return host in WILDCARD_HOSTS or host == ''
+
+def hosts_overlap(first:str, second:str)->bool:
+    if _is_wildcard(first) or _is_wildcard(second):
+        return True
+    loopback = ('localhost', '127.0.0.1', '::1')
+    if first in loopback and second in loopback:
+        return True
+    return first.strip('[]') == second.strip('[]')
+
+class PortIndex:
+    """Map of TCP ports to services (from ASPNETCORE_URLS) and listening sockets.
+
+    Index is not persisted: every command builds it from services (read through inventory cache)
+    and current listeners, so listeners that came or went since last run are always seen.
+    """
+    Ports:dict[int,list[PortOwner]] = None
+
+    def __init__(self):
+        self.Ports = {}
+        self._cursor:dict[tuple[int,int],int] = {}
+
+    def add_service(self, name:str, urls:Optional[str]):
+        for url in parse_urls(urls):
+            if url.EffectivePort is not None:
+                self.Ports.setdefault(url.EffectivePort, []).append(PortOwner(name, url.Host, str(url)))
+
+    def add_listeners(self, listeners:list[tuple[str,int]]):
+        for address, port in listeners:
+            owners = self.Ports.setdefault(port, [])
+            # Listener of configured service is expected, keep only unknown ones
+            if not any(not o.IsListener and hosts_overlap(o.Host, address) for o in owners):
+                owners.append(PortOwner(None, address))
+
+    def remove_services(self, names:set[str]):
+        """Forget ports of services that get new ones, listeners hidden by them are not brought back."""
+        self._cursor.clear() # freed ports may be below cursor
+        for port in list(self.Ports):
+            owners = [o for o in self.Ports[port] if o.Name is None or o.Name not in names]
+            if len(owners) > 0:
+                self.Ports[port] = owners
+            else:
+                del self.Ports[port]
+
+    def find_conflicts(self, url:UrlBinding, name:Optional[str]=None)->list[PortOwner]:
+        """Owners of url port with overlapping host, other than service `name`."""
+        owners = self.Ports.get(url.EffectivePort, [])
+        return [o for o in owners if (o.Name is None or o.Name != name) and hosts_overlap(o.Host, url.Host)]
+
+    def get_conflicts(self)->dict[int,list[PortOwner]]:
+        """Ports bound by more than one owner with overlapping hosts."""
+        conflicts:dict[int,list[PortOwner]] = {}
+        for port, owners in self.Ports.items():
+            names = set(o.Name for o in owners)
+            if len(names) > 1 and any(hosts_overlap(a.Host, b.Host) for i, a in enumerate(owners) for b in owners[i + 1:]):
+                conflicts[port] = owners
+        return conflicts
+
+    def next_free(self, port_range:tuple[int,int])->Optional[int]:
+        """Lowest unused port of range.
+
+        First call scans range from its start (once per invocation, index is not persisted), cursor
+        only moves forward, so further allocations of the same invocation (scale) continue from there.
+        """
+        first, last = port_range
+        port = self._cursor.get(port_range, first)
+        while port <= last and port in self.Ports:
+            port += 1
+        self._cursor[port_range] = port
+        return port if port <= last else None
+
+    def reserve(self, name:str, url:UrlBinding):
+        self.Ports.setdefault(url.EffectivePort, []).append(PortOwner(name, url.Host, str(url)))
+
+def build_port_index(units:list[tuple[str,Optional[str]]], proc_net_dir:Optional[str]=PROC_NET_DIR)->PortIndex:
+    """Index of (unit, ASPNETCORE_URLS) pairs, listening sockets are added unless proc_net_dir is None."""
+    index = PortIndex()
+    for name, urls in units:
+        index.add_service(name, urls)
+    if proc_net_dir is not None:
+        index.add_listeners(read_tcp_listeners(proc_net_dir))
+    return index
@@ -0,0 +1,114 @@
+import os
+import re
+import json
+from typing import Optional
+
+from modules.core import *
+
+PROFILES_DIR = "/etc/systemd-net/profiles/"
+# systemd ignores unknown [Unit] keys starting with X-, used to remember applied profile
+PROFILE_UNIT_KEY = 'X-SystemdNetProfile'
+
+# Allowed [Service] settings and .NET variables with their value formats
+PROFILE_SERVICE_SETTINGS:dict[str,str] = {
+    'CPUQuota': r'^\d+%$',
+    'MemoryHigh': r'^(\d+[KMGT]?|\d+%|infinity)$',
+    'MemoryMax': r'^(\d+[KMGT]?|\d+%|infinity)$',
+    'TasksMax': r'^(\d+|\d+%|infinity)$',
+    'CPUAffinity': r'^\d+(-\d+)?([ ,]+\d+(-\d+)?)*$',
+    'Nice': r'^-?\d+$',
+    'IOWeight': r'^\d+$',
+    'LimitNOFILE': r'^(\d+|infinity)(:(\d+|infinity))?$',
+}
+PROFILE_DOTNET_VARIABLES:dict[str,str] = {
+    'DOTNET_gcServer': r'^[01]$',
+    'DOTNET_GCHeapHardLimit': r'^(0x)?[0-9a-fA-F]+$',
+    'DOTNET_GCHeapCount': r'^(0x)?[0-9a-fA-F]+$',
+    'DOTNET_TieredPGO': r'^[01]$',
+    'DOTNET_TieredCompilation': r'^[01]$',
+    'DOTNET_ReadyToRun': r'^[01]$',
+}
+
+BUILTIN_PROFILES:dict[str,dict[str,dict[str,str]]] = {
+    'throughput': {
+        'service': { 'TasksMax': 'infinity', 'IOWeight': '500', 'LimitNOFILE': '65536' },
+        'env': { 'DOTNET_gcServer': '1', 'DOTNET_TieredPGO': '1', 'DOTNET_TieredCompilation': '1', 'DOTNET_ReadyToRun': '1' }
+    },
+    'latency': {
+        'service': { 'Nice': '-5', 'IOWeight': '1000', 'LimitNOFILE': '65536' },
+        'env': { 'DOTNET_gcServer': '1', 'DOTNET_TieredPGO': '1', 'DOTNET_TieredCompilation': '1', 'DOTNET_ReadyToRun': '1' }
+    },
+    'low-memory': {
+        'service': { 'CPUQuota': '100%', 'MemoryHigh': '256M', 'MemoryMax': '384M', 'TasksMax': '256', 'Nice': '5', 'IOWeight': '50', 'LimitNOFILE': '4096' },
+        'env': { 'DOTNET_gcServer': '0', 'DOTNET_GCHeapHardLimit': '0x10000000', 'DOTNET_TieredPGO': '0', 'DOTNET_TieredCompilation': '1', 'DOTNET_ReadyToRun': '1' }
+    },
+    # Filled by user in profiles directory
+    'custom': { 'service': {}, 'env': {} }
+}
+
+class ServiceProfile:
+    Name:str = None
+    Path:Optional[str] = None
+    Service:dict[str,str] = None
+    Environment:dict[str,str] = None
+
+    def __init__(self, name:str, data:dict, path:Optional[str]=None):
+        self.Name = name
+        self.Path = path
+        self.Service = { str(k): str(v) for k, v in data.get('service', {}).items() }
+        self.Environment = { str(k): str(v) for k, v in data.get('env', {}).items() }
+
+    def validate(self)->list[str]:
+        errors:list[str] = []
+        for key, value in self.Service.items():
+            pattern = PROFILE_SERVICE_SETTINGS.get(key, None)
+            if pattern is None:
+                errors.append(f"unsupported [Service] setting '{key}'")
+            elif not re.match(pattern, value):
+                errors.append(f"invalid value '{value}' for {key}")
+        if 'Nice' in self.Service and re.match(r'^-?\d+$', self.Service['Nice']) and not -20 <= int(self.Service['Nice']) <= 19:
+            errors.append("Nice must be between -20 and 19")
+        if 'IOWeight' in self.Service and self.Service['IOWeight'].isdigit() and not 1 <= int(self.Service['IOWeight']) <= 10000:
+            errors.append("IOWeight must be between 1 and 10000")
+
+        for key, value in self.Environment.items():
+            pattern = PROFILE_DOTNET_VARIABLES.get(key, None)
+            if pattern is None:
+                errors.append(f"unsupported environment variable '{key}'")
+            elif not re.match(pattern, value):
+                errors.append(f"invalid value '{value}' for {key}")
+        return errors
+
+def list_profiles(profiles_dir:str=PROFILES_DIR)->list[str]:
+    names = set(BUILTIN_PROFILES)
+    if os.path.isdir(profiles_dir):
+        names.update(e.name[0:-5] for e in os.scandir(profiles_dir) if e.name.endswith('.json'))
+    return sorted(names)
+
+def load_profile(name:str, profiles_dir:str=PROFILES_DIR)->ServiceProfile:
+    """Load profile from '<profiles_dir>/<name>.json' falling back to built-in one. Raises on invalid profile."""
+    profile_path = os.path.join(profiles_dir, f"{name}.json")
+    if os.path.isfile(profile_path):
+        with open(profile_path, 'r') as file:
+            try:
+                data = json.load(file)
+            except ValueError as e:
+                raise Exception(f"Invalid profile {profile_path} - {e}")
+        profile = ServiceProfile(name, data, profile_path)
+    elif name in BUILTIN_PROFILES:
+        profile = ServiceProfile(name, BUILTIN_PROFILES[name])
+    else:
+        raise Exception(f"Unknown profile '{name}', available: {', '.join(list_profiles(profiles_dir))}")
+
+    errors = profile.validate()
+    if len(errors) > 0:
+        raise Exception(f"Invalid profile '{name}' ({profile.Path or 'built-in'}): {'; '.join(errors)}")
+    return profile
+
+def apply_profile(svc, profile:ServiceProfile):
+    """Write profile settings to [Service] and environment of NetService."""
+    for key, value in profile.Service.items():
+        svc.Params.Properties[key] = value
+    for key, value in profile.Environment.items():
+        svc.set_environment_variable(key, value)
+    svc.Unit.Properties[PROFILE_UNIT_KEY] = profile.Name
@@ -0,0 +1,173 @@
+import os
+import json
+import shutil
+import hashlib
+from datetime import datetime
+from typing import Optional
+
+from modules.core import *
+from modules.NetService import write_file_atomic, fsync_directories
+
+RELEASES_DIR = os.environ.get('SYSTEMD_NET_RELEASES_DIR', "/var/lib/systemd-net/apps/")
+RELEASES_SUBDIR = "releases"
+CURRENT_LINK = "current"
+RELEASE_MANIFEST = ".systemd-net-release.json"
+HASH_CHUNK_SIZE = 1024 * 1024
+
+class ReleaseResult:
+    Name:str = None
+    Path:str = None
+    Copied:int = 0
+    Linked:int = 0
+    Hashed:int = 0
+    CopiedBytes:int = 0
+
+    def __init__(self, name:str, path:str):
+        self.Name = name
+        self.Path = path
+
+def get_app_dir(svc_name:str, releases_dir:str=RELEASES_DIR)->str:
+    return os.path.join(releases_dir, svc_name)
+
+def get_app_dir_of_service(svc)->Optional[str]:
+    """Releases directory of deployed service, its WorkingDirectory is '<app dir>/current'."""
+    wdir = svc.Params.Properties.get('WorkingDirectory', '').rstrip('/')
+    if os.path.basename(wdir) == CURRENT_LINK:
+        return os.path.dirname(wdir)
+    return None
+
+def _release_sort_key(name:str)->tuple[str,int]:
+    # '<timestamp>-<n>' are releases created in the same second, '-10' comes after '-9'
+    base, _, idx = name.partition('-')
+    return (base, int(idx) if idx.isdigit() else 1)
+
+def list_releases(app_dir:str)->list[str]:
+    """Release names from oldest to newest."""
+    releases_path = os.path.join(app_dir, RELEASES_SUBDIR)
+    if not os.path.isdir(releases_path):
+        return []
+    return sorted((entry.name for entry in os.scandir(releases_path) if entry.is_dir(follow_symlinks=False)), key=_release_sort_key)
+
+def get_current_release(app_dir:str)->Optional[str]:
+    try:
+        return os.path.basename(os.readlink(os.path.join(app_dir, CURRENT_LINK)).rstrip('/'))
+    except OSError:
+        return None
+
+def hash_file(path:str)->str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        while chunk := file.read(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def read_release_manifest(release_path:str)->dict[str,list]:
+    """Relative path -> [size, mtime_ns, sha256] of release files."""
+    try:
+        with open(os.path.join(release_path, RELEASE_MANIFEST), 'r') as file:
+            return json.load(file).get('files', {})
+    except (OSError, ValueError):
+        return {}
+
+def _new_release_name(app_dir:str)->str:
+    """Timestamp name sorting after every existing release, also after pruned names of the same second are free again."""
+    name = datetime.now().strftime('%Y%m%d%H%M%S')
+    releases = list_releases(app_dir)
+    if len(releases) > 0 and _release_sort_key(releases[-1]) >= (name, 1):
+        base, idx = _release_sort_key(releases[-1])
+        name = f"{base}-{idx + 1}"
+    return name
+
+def _scan_publish_dir(publish_dir:str)->tuple[list[str],list[str],list[str]]:
+    """Relative (directories, files, symlinks) of publish output."""
+    dirs:list[str] = []
+    files:list[str] = []
+    links:list[str] = []
+    for root, dir_names, file_names in os.walk(publish_dir):
+        rel_root = os.path.relpath(root, publish_dir)
+        for name in dir_names:
+            rel = os.path.normpath(os.path.join(rel_root, name))
+            (links if os.path.islink(os.path.join(root, name)) else dirs).append(rel)
+        for name in file_names:
+            rel = os.path.normpath(os.path.join(rel_root, name))
+            (links if os.path.islink(os.path.join(root, name)) else files).append(rel)
+    return (dirs, files, links)
+
+def create_release(app_dir:str, publish_dir:str, max_parallel:int=8)->ReleaseResult:
+    """Copy publish output to new release, files with same content as in current release are hardlinked.
+
+    Hash of source file is taken from previous manifest when its size and mtime did not change.
+    """
+    name = _new_release_name(app_dir)
+    release_path = os.path.join(app_dir, RELEASES_SUBDIR, name)
+    result = ReleaseResult(name, release_path)
+    previous = get_current_release(app_dir)
+    previous_path = os.path.join(app_dir, RELEASES_SUBDIR, previous) if previous is not None else None
+    previous_files = read_release_manifest(previous_path) if previous_path is not None else {}
+
+    dirs, files, links = _scan_publish_dir(publish_dir)
+    os.makedirs(release_path)
+    try:
+        _fill_release(release_path, publish_dir, previous_path, previous_files, dirs, files, links, result, max_parallel)
+    except BaseException:
+        shutil.rmtree(release_path, ignore_errors=True)
+        raise
+    return result
+
+def _fill_release(release_path:str, publish_dir:str, previous_path:Optional[str], previous_files:dict[str,list],
+                  dirs:list[str], files:list[str], links:list[str], result:ReleaseResult, max_parallel:int):
+    for rel in dirs:
+        os.makedirs(os.path.join(release_path, rel), exist_ok=True)
+    for rel in links:
+        os.symlink(os.readlink(os.path.join(publish_dir, rel)), os.path.join(release_path, rel))
+
+    def place(rel:str)->tuple[str,list,str]:
+        source = os.path.join(publish_dir, rel)
+        target = os.path.join(release_path, rel)
+        st = os.stat(source)
+        known = previous_files.get(rel)
+        if known is not None and known[0] == st.st_size and known[1] == st.st_mtime_ns:
+            digest, hashed = known[2], False
+        else:
+            digest, hashed = hash_file(source), True
+        if known is not None and known[2] == digest and os.path.isfile(os.path.join(previous_path, rel)):
+            os.link(os.path.join(previous_path, rel), target)
+            return (rel, [st.st_size, st.st_mtime_ns, digest], 'hashed-linked' if hashed else 'linked')
+        shutil.copy2(source, target)
+        return (rel, [st.st_size, st.st_mtime_ns, digest], 'hashed-copied' if hashed else 'copied')
+
+    manifest:dict[str,list] = {}
+    for rel, entry, action in run_parallel(place, files, max_parallel):
+        manifest[rel] = entry
+        if action.startswith('hashed'):
+            result.Hashed += 1
+        if action.endswith('linked'):
+            result.Linked += 1
+        else:
+            result.Copied += 1
+            result.CopiedBytes += entry[0]
+
+    write_file_atomic(os.path.join(release_path, RELEASE_MANIFEST), json.dumps({ 'source': os.path.abspath(publish_dir), 'files': manifest }), chmod=0o644, backup=False)
+
+def switch_release(app_dir:str, name:str):
+    """Point 'current' symlink to release, rename over old link is atomic."""
+    link_path = os.path.join(app_dir, CURRENT_LINK)
+    tmp_path = f"{link_path}.tmp-{os.getpid()}"
+    if os.path.lexists(tmp_path):
+        os.remove(tmp_path)
+    os.symlink(os.path.join(RELEASES_SUBDIR, name), tmp_path)
+    os.replace(tmp_path, link_path)
+    fsync_directories({ app_dir })
+
+def prune_releases(app_dir:str, keep:int)->list[str]:
+    """Remove releases older than current and `keep - 1` releases before it, so rollback targets survive.
+
+    Current and newer releases are never removed, newest release counts as current when link is missing.
+    """
+    releases = list_releases(app_dir)
+    current = get_current_release(app_dir)
+    current_idx = releases.index(current) if current in releases else len(releases) - 1
+    removed = releases[:max(0, current_idx - (max(1, keep) - 1))]
+    for name in removed:
+        shutil.rmtree(os.path.join(app_dir, RELEASES_SUBDIR, name), ignore_errors=True)
+    return removed
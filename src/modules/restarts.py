@@ -0,0 +1,146 @@
+import re
+import hashlib
+import argparse
+import subprocess
+from typing import Optional
+
+from modules.core import *
+
+# Exponential restart backoff of systemd 254+: RestartSec grows in RestartSteps up to RestartMaxDelaySec
+RESTART_BACKOFF_DEFAULTS:dict[str,str] = {
+    'RestartSec': '2s',
+    'RestartSteps': '8',
+    'RestartMaxDelaySec': '2min',
+    'StartLimitIntervalSec': '10min',
+    'StartLimitBurst': '30',
+}
+RESTART_JITTER_PERCENT = 20.0
+RESTART_BACKOFF_MIN_SYSTEMD = 254
+
+TIMESPAN_UNITS:dict[str,float] = {
+    'us': 1e-6, 'usec': 1e-6, 'ms': 1e-3, 'msec': 1e-3,
+    '': 1.0, 's': 1.0, 'sec': 1.0, 'second': 1.0, 'seconds': 1.0,
+    'm': 60.0, 'min': 60.0, 'minute': 60.0, 'minutes': 60.0,
+    'h': 3600.0, 'hr': 3600.0, 'hour': 3600.0, 'hours': 3600.0,
+    'd': 86400.0, 'day': 86400.0, 'days': 86400.0,
+}
+
+def parse_timespan(value:str)->float:
+    """systemd time span ('5', '500ms', '1min 30s') in seconds."""
+    parts = re.findall(r'(\d+(?:\.\d+)?)\s*([a-z]*)', value.strip().lower())
+    if len(parts) == 0 or re.sub(r'[\d.\sa-z]', '', value.lower()) != '':
+        raise ValueError(f"Invalid time span '{value}'")
+    seconds = 0.0
+    for number, unit in parts:
+        if unit not in TIMESPAN_UNITS:
+            raise ValueError(f"Invalid time span '{value}'")
+        seconds += float(number) * TIMESPAN_UNITS[unit]
+    return seconds
+
+def format_timespan(seconds:float)->str:
+    if seconds >= 60 and seconds % 60 == 0:
+        return f"{int(seconds // 60)}min"
+    if seconds == int(seconds):
+        return f"{int(seconds)}s"
+    return f"{int(round(seconds * 1000))}ms"
+
+def get_jitter_fraction(name:str)->float:
+    """Stable value in [0, 1) per service, same settings are written on every run."""
+    return int(hashlib.sha256(name.encode('utf-8')).hexdigest()[:8], 16) / 0x100000000
+
+class RestartPolicy:
+    """Restart settings of service, None keeps current value."""
+    RestartSec:Optional[float] = None
+    RestartSteps:Optional[int] = None
+    RestartMaxDelaySec:Optional[float] = None
+    StartLimitIntervalSec:Optional[float] = None
+    StartLimitBurst:Optional[int] = None
+    Jitter:float = RESTART_JITTER_PERCENT
+
+    @staticmethod
+    def from_settings(settings:dict[str,str], jitter:float=RESTART_JITTER_PERCENT)->'RestartPolicy':
+        policy = RestartPolicy()
+        try:
+            for key in ('RestartSec', 'RestartMaxDelaySec', 'StartLimitIntervalSec'):
+                if settings.get(key) is not None:
+                    setattr(policy, key, parse_timespan(str(settings[key])))
+            for key in ('RestartSteps', 'StartLimitBurst'):
+                if settings.get(key) is not None:
+                    setattr(policy, key, int(settings[key]))
+        except ValueError as e:
+            raise Exception(f"Invalid restart settings: {e}")
+        if jitter < 0 or jitter > 100:
+            raise Exception("Restart jitter must be between 0 and 100 percent")
+        if policy.RestartSteps is not None and policy.RestartSteps < 0:
+            raise Exception("RestartSteps must not be negative")
+        if policy.RestartSteps and policy.RestartMaxDelaySec is None:
+            raise Exception("RestartSteps requires RestartMaxDelaySec")
+        policy.Jitter = jitter
+        return policy
+
+    def get_settings(self, svc_name:str)->tuple[dict[str,str],dict[str,str]]:
+        """([Unit], [Service]) settings, delays are stretched by per service jitter. StartLimit* belong to [Unit]."""
+        stretch = 1 + self.Jitter / 100 * get_jitter_fraction(svc_name)
+        unit:dict[str,str] = {}
+        service:dict[str,str] = {}
+        if self.RestartSec is not None:
+            service['RestartSec'] = format_timespan(round(self.RestartSec * stretch, 3))
+        if self.RestartSteps is not None:
+            service['RestartSteps'] = str(self.RestartSteps)
+        if self.RestartMaxDelaySec is not None:
+            service['RestartMaxDelaySec'] = format_timespan(round(self.RestartMaxDelaySec * stretch, 3))
+        if self.StartLimitIntervalSec is not None:
+            unit['StartLimitIntervalSec'] = format_timespan(self.StartLimitIntervalSec)
+        if self.StartLimitBurst is not None:
+            unit['StartLimitBurst'] = str(self.StartLimitBurst)
+        return (unit, service)
+
+def apply_restart_policy(svc, policy:RestartPolicy):
+    unit, service = policy.get_settings(svc.Name)
+    svc.Unit.Properties.update(unit)
+    svc.Params.Properties.update(service)
+
+def format_restart_settings(restart_sec:Optional[float], steps:int=0, max_delay:Optional[float]=None)->str:
+    if restart_sec is None:
+        return ''
+    if steps > 0 and max_delay is not None:
+        return f"{format_timespan(restart_sec)} x{steps} -> {format_timespan(max_delay)}"
+    return format_timespan(restart_sec)
+
+def get_systemd_version()->Optional[int]:
+    try:
+        result = subprocess.run(["systemctl", "--version"], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    except OSError:
+        return None
+    match = re.match(r'systemd (\d+)', result.stdout)
+    return int(match.group(1)) if match else None
+
+def warn_backoff_support(policy:RestartPolicy):
+    if policy.RestartSteps is None and policy.RestartMaxDelaySec is None:
+        return
+    version = get_systemd_version()
+    if version is not None and version < RESTART_BACKOFF_MIN_SYSTEMD:
+        print(f"{COLOR_WARN}systemd {version} ignores RestartSteps and RestartMaxDelaySec (added in {RESTART_BACKOFF_MIN_SYSTEMD}), only RestartSec is used{COLOR_BASE}", file=sys.stderr)
+
+def add_restart_arguments(parser:argparse.ArgumentParser, backoff_option:bool=True):
+    if backoff_option:
+        parser.add_argument('--restart-backoff', help="Exponential restart backoff (RestartSec=2s growing in 8 steps to 2min, at most 30 starts in 10min), options below override it", action="store_true")
+    parser.add_argument('--restart-sec', type=str, help="RestartSec, first delay of backoff", default=None)
+    parser.add_argument('--restart-steps', type=int, help="RestartSteps", default=None)
+    parser.add_argument('--restart-max-delay', type=str, help="RestartMaxDelaySec", default=None)
+    parser.add_argument('--start-limit-interval', type=str, help="StartLimitIntervalSec", default=None)
+    parser.add_argument('--start-limit-burst', type=int, help="StartLimitBurst", default=None)
+    parser.add_argument('--restart-jitter', type=float, help="Stretch delays by up to this percent, different per service\n(default: %(default)s)", default=RESTART_JITTER_PERCENT)
+
+def get_restart_settings(values:dict, backoff:bool)->Optional[dict[str,str]]:
+    """Settings from CLI/manifest values named as add_restart_arguments options, None when nothing is requested."""
+    names = { 'restart_sec': 'RestartSec', 'restart_steps': 'RestartSteps', 'restart_max_delay': 'RestartMaxDelaySec',
+              'start_limit_interval': 'StartLimitIntervalSec', 'start_limit_burst': 'StartLimitBurst' }
+    settings = { key: str(values[name]) for name, key in names.items() if values.get(name) is not None }
+    if not backoff and len(settings) == 0:
+        return None
+    return { **RESTART_BACKOFF_DEFAULTS, **settings } if backoff else settings
+
+def get_restart_policy(args:argparse.Namespace)->Optional[RestartPolicy]:
+    settings = get_restart_settings(vars(args), args.restart_backoff)
+    return RestartPolicy.from_settings(settings, args.restart_jitter) if settings is not None else None
@@ -0,0 +1,161 @@
+import time
+import argparse
+from typing import Callable, Optional
+
+from modules.core import *
+from modules.status import *
+from modules.NetService import *
+from modules.health import *
+from modules.startup import *
+
+ROLLOUT_ABORT = 'abort'
+ROLLOUT_CONTINUE = 'continue'
+ROLLOUT_POLICIES = [ROLLOUT_ABORT, ROLLOUT_CONTINUE]
+ROLLOUT_TABLE_HEADERS = ["Wave", "Name", "Result", "Ready in", "Error"]
+
+def add_rollout_arguments(parser:argparse.ArgumentParser, wave_size:int=1):
+    parser.add_argument('-w', '--wave-size', type=int, help="Maximum number of units restarted at once\n(default: %(default)s)", default=wave_size)
+    parser.add_argument('--timeout', type=float, help="Seconds for wave to become ready\n(default: %(default)s)", default=60.0)
+    parser.add_argument('--health-path', type=str, help="Also wait for HTTP probe of ASPNETCORE_URLS endpoints on this path", default=None)
+    parser.add_argument('--on-failure', type=str, choices=ROLLOUT_POLICIES, help="Stop after failed wave or keep going\n(default: %(default)s)", default=ROLLOUT_ABORT)
+
+class UnitRollout:
+    """Restart result of single unit."""
+    Unit:str = None
+    Urls:Optional[str] = None
+    Wave:int = 0
+    Result:str = 'pending' # pending, ready, failed, timeout, skipped
+    RestartedAt:Optional[float] = None # time.monotonic() when restart of this unit was issued
+    ReadyIn:Optional[float] = None # seconds from restart of this unit to ready
+    ProbedAt:Optional[float] = None # time.monotonic() of first successful health probe
+    Error:str = ''
+
+    def __init__(self, unit:str, urls:Optional[str], wave:int):
+        self.Unit = unit
+        self.Urls = urls
+        self.Wave = wave
+
+def split_waves(units:list, wave_size:int)->list[list]:
+    wave_size = max(1, wave_size)
+    return [units[idx:idx + wave_size] for idx in range(0, len(units), wave_size)]
+
+def _probe_health(rollouts:list[UnitRollout], health_path:str, timeout:float)->set[str]:
+    """Units of rollouts which all endpoints answered with success, units without URLs pass."""
+    results = probe_units([(r.Unit, r.Urls) for r in rollouts], health_path, count=1, timeout=timeout)
+    unhealthy:dict[str,str] = {}
+    for health in results:
+        if not health.Healthy:
+            unhealthy.setdefault(health.Unit, health.Errors[0] if len(health.Errors) > 0 else f"HTTP {health.Status}")
+    for rollout in rollouts:
+        rollout.Error = unhealthy.get(rollout.Unit, '')
+    return set(r.Unit for r in rollouts if r.Unit not in unhealthy)
+
+def _get_active_since(status:ServiceStatus, rollout:UnitRollout)->Optional[float]:
+    """time.monotonic() the unit became active at according to systemd, None if it was before its restart."""
+    try:
+        entered = int(status.Properties.get('ActiveEnterTimestampMonotonic', '')) / 1_000_000
+    except ValueError:
+        return None
+    return entered if rollout.RestartedAt is not None and entered >= rollout.RestartedAt else None
+
+def wait_ready(wave:list[UnitRollout], started:float, timeout:float, health_path:Optional[str]=None, poll_interval:float=0.5):
+    """Wait until every unit of wave is active (and answers health probe), or failed, or timed out.
+
+    Readiness of each unit is counted from its own restart, to the activation time reported by systemd
+    (or the poll that saw it active) or to its first successful probe, so slow units do not hide fast ones.
+    """
+    pending = [r for r in wave if r.Result == 'pending']
+    delay = min(0.05, poll_interval)
+    while len(pending) > 0:
+        statuses = get_services_status([r.Unit for r in pending], ['ActiveState', 'SubState', 'ActiveEnterTimestampMonotonic'])
+        polled = time.monotonic()
+        active:list[UnitRollout] = []
+        for rollout in pending:
+            status = statuses[rollout.Unit]
+            if status.Active == 'failed':
+                rollout.Result = 'failed'
+                rollout.Error = f"unit {status.Active} ({status.SubState})"
+            elif status.Active == 'active':
+                active.append(rollout)
+
+        ready = set(r.Unit for r in active)
+        if health_path is not None and len(active) > 0:
+            ready = _probe_health(active, health_path, max(0.1, min(2.0, started + timeout - time.monotonic())))
+        probed = time.monotonic()
+        for rollout in active:
+            if rollout.Unit in ready:
+                rollout.Result = 'ready'
+                if health_path is not None:
+                    rollout.ProbedAt = probed
+                    ready_at = probed
+                else:
+                    ready_at = _get_active_since(statuses[rollout.Unit], rollout) or polled
+                rollout.ReadyIn = max(0.0, ready_at - (rollout.RestartedAt if rollout.RestartedAt is not None else started))
+
+        pending = [r for r in pending if r.Result == 'pending']
+        if len(pending) == 0:
+            break
+        if time.monotonic() - started >= timeout:
+            for rollout in pending:
+                rollout.Result = 'timeout'
+                rollout.Error = rollout.Error or f"not active after {timeout}s"
+            break
+        # Frequent polls at first, so fast units are not reported later than they were ready
+        time.sleep(delay)
+        delay = min(delay * 2, poll_interval)
+
+def restart_in_waves(units:list[tuple[str,Optional[str]]], wave_size:int=1, timeout:float=60.0, health_path:Optional[str]=None,
+                     on_failure:str=ROLLOUT_ABORT, restart:Callable[[str],bool]=do_restart_service,
+                     report:Optional[Callable[[list[UnitRollout]],None]]=None)->list[UnitRollout]:
+    """Restart (unit, ASPNETCORE_URLS) pairs wave by wave, next wave starts after previous one is ready."""
+    waves = [[UnitRollout(unit, urls, idx + 1) for unit, urls in wave] for idx, wave in enumerate(split_waves(units, wave_size))]
+    aborted = False
+    for wave in waves:
+        if aborted:
+            for rollout in wave:
+                rollout.Result = 'skipped'
+            continue
+        started = time.monotonic()
+        def restart_unit(rollout:UnitRollout)->bool:
+            rollout.RestartedAt = time.monotonic()
+            return restart(rollout.Unit)
+        results = run_parallel(restart_unit, wave, len(wave))
+        for rollout, ok in zip(wave, results):
+            if not ok:
+                rollout.Result = 'failed'
+                rollout.Error = 'systemctl restart failed'
+        wait_ready(wave, started, timeout, health_path)
+        if report is not None:
+            report(wave)
+        if on_failure == ROLLOUT_ABORT and any(r.Result != 'ready' for r in wave):
+            aborted = True
+    return [rollout for wave in waves for rollout in wave]
+
+def format_rollout(rollout:UnitRollout)->list[str]:
+    color = COLOR_SUCCESS if rollout.Result == 'ready' else (COLOR_WARN if rollout.Result == 'skipped' else COLOR_DANGER)
+    ready = f"{rollout.ReadyIn:.1f}s" if rollout.ReadyIn is not None else ''
+    return [str(rollout.Wave), rollout.Unit, f"{color}{rollout.Result}{COLOR_BASE}", ready, rollout.Error]
+
+def print_wave(wave:list[UnitRollout]):
+    for rollout in wave:
+        _, name, result, ready, error = format_rollout(rollout)
+        print(f"wave {rollout.Wave}: {name} {result} {ready} {error}".rstrip(), flush=True)
+
+def print_rollouts(rollouts:list[UnitRollout]):
+    from tabulate import tabulate # loaded only for table output
+    print(tabulate([format_rollout(r) for r in rollouts], headers=ROLLOUT_TABLE_HEADERS, tablefmt="grid", disable_numparse=True))
+
+def record_rollouts(rollouts:list[UnitRollout], releases:dict[str,Optional[str]], since:float):
+    """Append startup times of units that became ready to startup history."""
+    ready = [r for r in rollouts if r.Result == 'ready']
+    record_startups([(r.Unit, releases.get(r.Unit)) for r in ready], since, { r.Unit: r.ProbedAt for r in ready if r.ProbedAt is not None })
+
+def restart_service_units(svc:NetService, args:argparse.Namespace)->bool:
+    """Restart service (or all instances of template) with rollout arguments, returns True if all units are ready."""
+    units = [(unit, urls) for unit, _, urls in get_service_units([svc])]
+    started = time.monotonic()
+    rollouts = restart_in_waves(units, args.wave_size, args.timeout, args.health_path, args.on_failure, report=print_wave)
+    print_rollouts(rollouts)
+    release = get_service_release(svc)
+    record_rollouts(rollouts, { unit: release for unit, _ in units }, started)
+    return all(r.Result == 'ready' for r in rollouts)
@@ -0,0 +1,211 @@
+import os
+import json
+from typing import Optional
+
+from modules.core import *
+
+DOTNET_RUNTIMES_CACHE = "runtimes.json"
+DOTNET_ROLL_FORWARD_DEFAULT = 'Minor'
+DOTNET_ROLL_FORWARD_POLICIES = ['Disable', 'LatestPatch', 'Minor', 'LatestMinor', 'Major', 'LatestMajor']
+# Legacy 'rollForwardOnNoCandidateFx' values
+DOTNET_ROLL_FORWARD_LEGACY = { 0: 'LatestPatch', 1: 'Minor', 2: 'Major' }
+
+def parse_version(value:str)->Optional[tuple[int,int,int,str]]:
+    """Parse '8.0.1' or '9.0.0-preview.1' into (major, minor, patch, prerelease)."""
+    version, _, prerelease = str(value).strip().partition('-')
+    parts = version.split('.')
+    if len(parts) < 2:
+        return None
+    try:
+        numbers = [int(p) for p in parts[:3]]
+    except ValueError:
+        return None
+    while len(numbers) < 3:
+        numbers.append(0)
+    return (numbers[0], numbers[1], numbers[2], prerelease)
+
+def _version_order(version:tuple[int,int,int,str]):
+    # Pre-release versions go before the release with the same number
+    return (version[0], version[1], version[2], 0 if version[3] else 1, version[3])
+
+def get_dotnet_root(dotnet_cli_path:str=DOTNET_CLI)->Optional[str]:
+    dotnet_root = os.environ.get('DOTNET_ROOT')
+    if dotnet_root and os.path.isdir(dotnet_root):
+        return dotnet_root
+    if dotnet_cli_path is None or not os.path.exists(dotnet_cli_path):
+        return None
+    return os.path.dirname(os.path.realpath(dotnet_cli_path))
+
+def scan_dotnet_frameworks(dotnet_root:str, cache_dir:Optional[str]=None)->dict[str,list[str]]:
+    """List installed shared frameworks from '<dotnet_root>/shared/<framework>/<version>' directories."""
+    shared_dir = os.path.join(dotnet_root, 'shared')
+    try:
+        shared_mtime = os.stat(shared_dir).st_mtime_ns
+    except OSError:
+        return {}
+
+    cache_path = os.path.join(cache_dir, DOTNET_RUNTIMES_CACHE) if cache_dir else None
+    if cache_path is not None:
+        try:
+            with open(cache_path, 'r') as file:
+                cache = json.load(file)
+            # Installing or removing a version changes mtime of its framework directory
+            cached_keys:dict[str,int] = cache['keys']
+            if cached_keys.get(shared_dir) == shared_mtime and all(
+                    os.stat(path).st_mtime_ns == mtime for path, mtime in cached_keys.items()):
+                return cache['frameworks']
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            pass
+
+    keys:dict[str,int] = { shared_dir: shared_mtime }
+    frameworks:dict[str,list[str]] = {}
+    for fw_entry in os.scandir(shared_dir):
+        if not fw_entry.is_dir():
+            continue
+        keys[fw_entry.path] = fw_entry.stat().st_mtime_ns
+        versions = [e.name for e in os.scandir(fw_entry.path) if e.is_dir() and parse_version(e.name) is not None]
+        frameworks[fw_entry.name] = sorted(versions, key=lambda v: _version_order(parse_version(v)))
+
+    if cache_path is not None:
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w') as file:
+                json.dump({ 'keys': keys, 'frameworks': frameworks }, file)
+            os.replace(tmp_path, cache_path)
+        except OSError:
+            pass
+    return frameworks
+
+def get_dotnet_runtimes(dotnet_cli_path:str=DOTNET_CLI, cache_dir:Optional[str]=None):
+    runtimes_list:list[tuple[str,str]] = []
+    runtimes_list.append(('Self-contained Deployment', ''))
+
+    dotnet_root = get_dotnet_root(dotnet_cli_path)
+    if dotnet_root is None:
+        return runtimes_list
+
+    for framework, versions in sorted(scan_dotnet_frameworks(dotnet_root, cache_dir).items()):
+        for version in versions:
+            runtimes_list.append((f"{framework} {version}", os.path.join(dotnet_root, 'shared', framework)))
+    return runtimes_list
+
+def list_dotnet_runtimes(runtimes:list[tuple[str, str]]):
+    for idx, (runtime, path) in enumerate(runtimes):
+        print(f"{idx}: {runtime}")
+
+def resolve_framework_version(requested:str, available:list[str], roll_forward:str=DOTNET_ROLL_FORWARD_DEFAULT)->Optional[str]:
+    """Pick installed framework version the host would use for requested version and roll forward policy."""
+    req = parse_version(requested)
+    if req is None:
+        return None
+    versions = [(parse_version(v), v) for v in available]
+    versions = [(pv, v) for pv, v in versions if pv is not None]
+    if roll_forward == 'Disable':
+        return next((v for pv, v in versions if pv == req), None)
+
+    # Pre-release frameworks are only considered for pre-release requests
+    candidates = [(pv, v) for pv, v in versions
+                  if _version_order(pv) >= _version_order(req) and (req[3] or not pv[3])]
+    candidates.sort(key=lambda c: _version_order(c[0]))
+
+    def latest(items):
+        return items[-1][1] if len(items) > 0 else None
+
+    def latest_patch_of_lowest(items, level:int):
+        # lowest major(.minor) in items, then the highest patch of it
+        if len(items) == 0:
+            return None
+        lowest = items[0][0][:level]
+        return latest([c for c in items if c[0][:level] == lowest])
+
+    same_minor = [c for c in candidates if c[0][:2] == req[:2]]
+    same_major = [c for c in candidates if c[0][0] == req[0]]
+    if roll_forward == 'LatestPatch':
+        return latest(same_minor)
+    if roll_forward == 'LatestMinor':
+        return latest(same_major)
+    if roll_forward == 'LatestMajor':
+        return latest(candidates)
+
+    # Minor and Major
+    if len(same_minor) > 0:
+        return latest(same_minor)
+    if len(same_major) > 0:
+        return latest_patch_of_lowest(same_major, 2)
+    if roll_forward == 'Major':
+        higher = [c for c in candidates if c[0][0] > req[0]]
+        if len(higher) > 0:
+            lowest_major = higher[0][0][0]
+            return latest_patch_of_lowest([c for c in higher if c[0][0] == lowest_major], 2)
+    return None
+
+class RuntimeConfig:
+    Path:str = None
+    Frameworks:list[tuple[str,str]] = None
+    IncludedFrameworks:list[tuple[str,str]] = None
+    RollForward:str = DOTNET_ROLL_FORWARD_DEFAULT
+
+    def __init__(self, path:str):
+        self.Path = path
+        self.Frameworks = []
+        self.IncludedFrameworks = []
+
+    @property
+    def IsSelfContained(self)->bool:
+        return len(self.IncludedFrameworks) > 0
+
+def get_runtimeconfig_path(app_path:str)->str:
+    base = app_path[0:-4] if app_path.endswith('.dll') else app_path
+    return f"{base}.runtimeconfig.json"
+
+def read_runtimeconfig(app_path:str)->Optional[RuntimeConfig]:
+    config_path = get_runtimeconfig_path(app_path)
+    if not os.path.isfile(config_path):
+        return None
+    with open(config_path, 'r') as file:
+        data = json.load(file)
+
+    options = data.get('runtimeOptions', {})
+    config = RuntimeConfig(config_path)
+
+    frameworks = options.get('frameworks', [])
+    if 'framework' in options:
+        frameworks = [options['framework']] + frameworks
+    config.Frameworks = [(fw['name'], fw['version']) for fw in frameworks if 'name' in fw and 'version' in fw]
+    config.IncludedFrameworks = [(fw['name'], fw.get('version', '')) for fw in options.get('includedFrameworks', []) if 'name' in fw]
+
+    roll_forward = options.get('rollForward', None)
+    if roll_forward is None and 'rollForwardOnNoCandidateFx' in options:
+        roll_forward = DOTNET_ROLL_FORWARD_LEGACY.get(options['rollForwardOnNoCandidateFx'], None)
+    if roll_forward is not None:
+        for policy in DOTNET_ROLL_FORWARD_POLICIES:
+            if policy.lower() == str(roll_forward).lower():
+                config.RollForward = policy
+    return config
+
+def find_apphost(app_path:str)->Optional[str]:
+    """Native executable launcher generated next to application .dll (or app_path itself)."""
+    apphost = app_path[0:-4] if app_path.endswith('.dll') else app_path
+    if os.path.isfile(apphost) and os.access(apphost, os.X_OK):
+        return apphost
+    return None
+
+def find_missing_frameworks(config:RuntimeConfig, dotnet_cli_path:str=DOTNET_CLI, cache_dir:Optional[str]=None)->list[str]:
+    """Return required frameworks (as 'name version') that cannot be resolved from installed runtimes."""
+    dotnet_root = get_dotnet_root(dotnet_cli_path)
+    installed = scan_dotnet_frameworks(dotnet_root, cache_dir) if dotnet_root is not None else {}
+
+    missing:list[str] = []
+    for name, version in config.Frameworks:
+        if resolve_framework_version(version, installed.get(name, []), config.RollForward) is None:
+            missing.append(f"{name} {version}")
+    return missing
+
+def resolve_exec_start(exec_path:str, runtime_config:Optional[RuntimeConfig]=None, dotnet_cli_path:str=DOTNET_CLI)->tuple[str,Optional[str]]:
+    """Return (path, dotnet host) for ExecStart, self-contained apps and native apphost run without host."""
+    is_self_contained = runtime_config is not None and runtime_config.IsSelfContained
+    apphost = find_apphost(exec_path)
+    if apphost is not None and (is_self_contained or not exec_path.endswith('.dll')):
+        return (apphost, None)
+    return (exec_path, dotnet_cli_path)
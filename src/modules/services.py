@@ -1,23 +1,136 @@
 import os
+import sys
 from typing import Optional
 from modules.core import *
 
+# Settings that accumulate when repeated (in the same file or in drop-ins), empty assignment resets them.
+# Other settings keep the last assignment.
+UNIT_LIST_KEYS = frozenset([
+    'Documentation', 'Wants', 'Requires', 'Requisite', 'BindsTo', 'PartOf', 'Upholds', 'Conflicts', 'Before', 'After',
+    'OnFailure', 'OnSuccess', 'PropagatesReloadTo', 'ReloadPropagatedFrom', 'JoinsNamespaceOf', 'RequiresMountsFor',
+    'Environment', 'EnvironmentFile', 'PassEnvironment', 'UnsetEnvironment',
+    'ExecCondition', 'ExecStartPre', 'ExecStart', 'ExecStartPost', 'ExecReload', 'ExecStop', 'ExecStopPost',
+    'ReadWritePaths', 'ReadOnlyPaths', 'InaccessiblePaths', 'ExecPaths', 'NoExecPaths', 'BindPaths', 'BindReadOnlyPaths',
+    'SupplementaryGroups', 'DeviceAllow', 'IPAddressAllow', 'IPAddressDeny', 'SocketBindAllow', 'SocketBindDeny',
+    'SystemCallFilter', 'RestrictAddressFamilies', 'CapabilityBoundingSet', 'AmbientCapabilities', 'LogExtraFields',
+    'ListenStream', 'ListenDatagram', 'ListenSequentialPacket', 'ListenFIFO', 'Sockets',
+    'WantedBy', 'RequiredBy', 'UpheldBy', 'Also', 'Alias',
+])
+
+def is_list_key(key:str)->bool:
+    return key in UNIT_LIST_KEYS or key.startswith(('Condition', 'Assert'))
+
+def parse_unit_file(file_path:str)->dict[str,dict[str,str]]:
+    """Parse unit file or drop-in in one pass, following systemd syntax.
+
+    '#' and ';' lines are comments, trailing backslash continues value on next line (joined by
+    space, comment lines inside are skipped). Scalar keys keep their last value. Assignments of
+    list keys are kept in order joined by new line, empty assignment stays as empty item, so
+    resets can be applied over earlier files (see collapse_values).
+    """
+    with open(file_path, 'r') as file:
+        content = file.read()
+    lines = content.splitlines() if '\\' not in content else _join_continuations(content.splitlines())
+
+    sections:dict[str,dict[str,str]] = {}
+    current:Optional[dict[str,str]] = None
+    for line in lines:
+        line = line.strip()
+        if len(line) == 0 or line[0] in '#;':
+            continue
+        if line[0] == '[' and line[-1] == ']':
+            current = sections.setdefault(sys.intern(line[1:-1]), {})
+            continue
+        key, sep, value = line.partition('=')
+        if current is None or not sep:
+            continue # assignment outside of section or garbage, systemd ignores it with warning
+        key = sys.intern(key.rstrip())
+        value = value.lstrip()
+        if key in current and is_list_key(key):
+            current[key] = f"{current[key]}\n{value}"
+        else:
+            current[key] = value
+    return sections
+
+def _join_continuations(lines:list[str])->list[str]:
+    joined:list[str] = []
+    pending:Optional[str] = None
+    for line in lines:
+        stripped = line.strip()
+        if pending is not None:
+            if stripped.startswith(('#', ';')):
+                continue
+            stripped = f"{pending} {stripped}"
+            pending = None
+        elif stripped.startswith(('#', ';')):
+            continue
+        if stripped.endswith('\\'):
+            pending = stripped[0:-1].rstrip()
+        else:
+            joined.append(stripped)
+    if pending is not None:
+        joined.append(pending)
+    return joined
+
+def collapse_values(value:str)->str:
+    """Apply resets (empty items) of list key assignments, leaving effective values joined by new line."""
+    items = value.split('\n')
+    if '' in items:
+        items = items[len(items) - items[::-1].index(''):]
+    return '\n'.join(items)
+
+def merge_unit_files(files:list[tuple[str,dict[str,dict[str,str]]]])->dict[str,dict[str,list[tuple[str,str]]]]:
+    """Effective settings of unit file followed by its drop-ins as section -> key -> [(value, source path)]."""
+    merged:dict[str,dict[str,list[tuple[str,str]]]] = {}
+    for source, sections in files:
+        for section, props in sections.items():
+            target = merged.setdefault(section, {})
+            for key, value in props.items():
+                if not is_list_key(key):
+                    target[key] = [(value, source)]
+                    continue
+                entries = target.get(key, [])
+                for item in value.split('\n'):
+                    if item == '':
+                        entries = []
+                    else:
+                        entries.append((item, source))
+                target[key] = entries
+    return merged
+
 class ServiceSection:
-    Name:str = None
-    Properties:dict[str,str] = {}
+    __slots__ = ('Name', 'Properties')
+    Name:str
+    Properties:dict[str,str]
 
     def __init__(self, name:str):
         if (len(name.strip()) == 0):
             raise Exception(f"Invalid section name '{name}'")
-        self.Name = name
+        self.Name = sys.intern(name)
+        self.Properties = {}
+
+    def get_values(self, key:str)->list[str]:
+        """Values of key that is repeated in unit file, e.g. several EnvironmentFile= lines."""
+        value = self.Properties.get(key, None)
+        return value.split('\n') if value else []
+
+    def set_values(self, key:str, values:list[str]):
+        if len(values) > 0:
+            self.Properties[key] = '\n'.join(values)
+        else:
+            self.Properties.pop(key, None)
 
     def format_section(self)->str:
         lines:list[str] = [f"[{self.Name}]"]
         for key, val in self.Properties.items():
-            lines.append(f"{key}={val}")
+            # Repeated keys are kept as lines of one value
+            for item in val.split('\n'):
+                lines.append(f"{key}={item}")
         return '\n'.join(lines)
 
 class ServiceUnit(ServiceSection):
+    __slots__ = ()
+
     def __init__(self):
         super().__init__('Unit')
         # Default properties for [Unit] section
@@ -34,6 +147,8 @@ class ServiceUnit(ServiceSection):
         self.Properties['Description'] = value
 
 class ServiceParameters(ServiceSection):
+    __slots__ = ()
+
     def __init__(self):
         super().__init__('Service')
         # Default properties for [Service] section
@@ -59,9 +174,11 @@ class ServiceParameters(ServiceSection):
         if len(wdir.strip()) == 0:
             self.Properties['WorkingDirectory'] = os.path.dirname(path)
         elif not path.startswith(wdir):
-            print(f"{COLOR_WARN}Execution path is not in the working directory{COLOR_BASE}")
+            print(f"{COLOR_WARN}Execution path is not in the working directory{COLOR_BASE}", file=sys.stderr)
 
 class ServiceInstall(ServiceSection):
+    __slots__ = ()
+
     def __init__(self):
         super().__init__('Install')
         # Default [Install] section
@@ -72,13 +189,9 @@ class ServiceInstall(ServiceSection):
     def format_section(self)->str:
         lines:list[str] = [f"[{self.Name}]"]
 
-        if ('WantedBy' in self.Properties):
-            lines.append(f"WantedBy={self.Properties['WantedBy']}")
-        if ('RequiredBy' in self.Properties):
-            lines.append(f"RequiredBy={self.Properties['RequiredBy']}")
-        if ('Also' in self.Properties):
-            lines.append(f"Also={self.Properties['Also']}")
-        if ('Alias' in self.Properties):
-            lines.append(f"Alias={self.Properties['Alias']}")
+        for key in ('WantedBy', 'RequiredBy', 'Also', 'Alias'):
+            if key in self.Properties:
+                for value in self.Properties[key].split('\n'):
+                    lines.append(f"{key}={value}")
 
         return '\n'.join(lines)
@@ -0,0 +1,65 @@
+import os
+
+from modules.core import *
+from modules.services import *
+from modules.urls import *
+
+def format_listen_address(url:UrlBinding)->str:
+    """ListenStream= value for ASPNETCORE_URLS entry."""
+    port = url.EffectivePort
+    if url.Host in WILDCARD_HOSTS:
+        return str(port) # dual-stack on all interfaces
+    if url.Host == 'localhost':
+        return f"127.0.0.1:{port}"
+    if ':' in url.Host:
+        return f"[{url.Host}]:{port}"
+    return f"{url.Host}:{port}"
+
+def get_socket_names(svc_name:str, urls:list[UrlBinding])->list[str]:
+    names:list[str] = []
+    for url in urls:
+        name = f"{svc_name}-{url.EffectivePort}.socket"
+        idx = 2
+        while name in names:
+            name = f"{svc_name}-{url.EffectivePort}-{idx}.socket"
+            idx += 1
+        names.append(name)
+    return names
+
+def format_socket_unit(svc_name:str, url:UrlBinding)->str:
+    unit = ServiceSection('Unit')
+    unit.Properties['Description'] = f"Socket for {svc_name} ({url})"
+    unit.Properties['PartOf'] = f"{svc_name}.service"
+    socket = ServiceSection('Socket')
+    socket.Properties['ListenStream'] = format_listen_address(url)
+    socket.Properties['Service'] = f"{svc_name}.service"
+    socket.Properties['NoDelay'] = 'true'
+    install = ServiceSection('Install')
+    install.Properties['WantedBy'] = 'sockets.target'
+
+    lines = [ TOOL_FILEGEN_COMMENT, '', unit.format_section(), '', socket.format_section(), '', install.format_section() ]
+    return '\n'.join(lines)
+
+def enable_socket_activation(svc, svc_dir:str)->dict[str,str]:
+    """Configure NetService to receive listening sockets from systemd.
+
+    Returns socket unit files (path -> content) to write for every ASPNETCORE_URLS entry.
+    The app has to call UseSystemd() for host (READY notification) and Kestrel (inherited sockets).
+    """
+    urls = [url for url in parse_urls(svc.ASPNETCORE_URLS) if url.EffectivePort is not None]
+    if len(urls) == 0:
+        raise Exception("Socket activation requires ASPNETCORE_URLS with ports")
+
+    names = get_socket_names(svc.Name, urls)
+    svc.Params.Properties['Type'] = 'notify'
+    svc.Params.Properties['NotifyAccess'] = 'main'
+    svc.Params.Properties['Sockets'] = ' '.join(names)
+    svc.Unit.Properties['Requires'] = ' '.join(names)
+    svc.Unit.Properties['After'] = ' '.join(names)
+    # Endpoints configured from inherited sockets in code win over ASPNETCORE_URLS
+    svc.set_environment_variable('ASPNETCORE_PREFERHOSTINGURLS', 'false')
+
+    return { os.path.join(svc_dir, name): format_socket_unit(svc.Name, url) for name, url in zip(names, urls) }
+
+def get_service_sockets(svc)->list[str]:
+    return svc.Params.Properties.get('Sockets', '').split()
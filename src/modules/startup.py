@@ -0,0 +1,171 @@
+import os
+import json
+import math
+import time
+from datetime import datetime
+from typing import Iterator, Optional
+
+from modules.core import *
+from modules.status import *
+from modules.releases import get_app_dir_of_service, get_current_release
+
+STARTUP_HISTORY_PATH = os.environ.get('SYSTEMD_NET_STARTUP_HISTORY', "/var/lib/systemd-net/startup-history.jsonl")
+# Monotonic timestamps share clock with time.monotonic(), so probe time can be compared to them
+STARTUP_STATUS_PROPERTIES = ['ActiveState', 'InactiveExitTimestampMonotonic', 'ActiveEnterTimestampMonotonic']
+
+class StartupRecord:
+    """Single start of unit: activation is InactiveExit -> ActiveEnter, ready is InactiveExit -> first successful probe."""
+    __slots__ = ('Time', 'Unit', 'Release', 'ActivationMs', 'ReadyMs')
+    Time:int # unix time of start
+    Unit:str
+    Release:Optional[str]
+    ActivationMs:float
+    ReadyMs:Optional[float]
+
+    def __init__(self, started:int, unit:str, release:Optional[str], activation_ms:float, ready_ms:Optional[float]=None):
+        self.Time = started
+        self.Unit = unit
+        self.Release = release
+        self.ActivationMs = activation_ms
+        self.ReadyMs = ready_ms
+
+    @property
+    def Service(self)->str:
+        """Template name for instances ('api@1' -> 'api@'), unit name otherwise."""
+        name, at, _ = self.Unit.partition('@')
+        return f"{name}@" if at else self.Unit
+
+    def get_duration(self, metric:str)->float:
+        # Units that were not probed are ready once active
+        if metric == 'ready' and self.ReadyMs is not None:
+            return self.ReadyMs
+        return self.ActivationMs
+
+    def to_row(self)->list:
+        return [self.Time, self.Unit, self.Release, self.ActivationMs, self.ReadyMs]
+
+    @staticmethod
+    def from_row(row:list)->'StartupRecord':
+        return StartupRecord(int(row[0]), str(row[1]), row[2], float(row[3]), float(row[4]) if row[4] is not None else None)
+
+def _to_us(value:Optional[str])->int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+def get_service_release(svc)->Optional[str]:
+    app_dir = get_app_dir_of_service(svc)
+    return get_current_release(app_dir) if app_dir is not None else None
+
+def collect_startups(units:list[tuple[str,Optional[str]]], since:float, probes:Optional[dict[str,float]]=None)->list[StartupRecord]:
+    """Startup records of (unit, release) pairs started after `since`, times are time.monotonic() like probes of first successful probe."""
+    if len(units) == 0:
+        return []
+    statuses = get_services_status([unit for unit, _ in units], STARTUP_STATUS_PROPERTIES)
+    now = int(time.time())
+    records:list[StartupRecord] = []
+    for unit, release in units:
+        status = statuses[unit]
+        exit_us = _to_us(status.Properties.get('InactiveExitTimestampMonotonic'))
+        enter_us = _to_us(status.Properties.get('ActiveEnterTimestampMonotonic'))
+        # Unit was not started by us (e.g. try-restart of stopped unit) or did not become active
+        if status.Active != 'active' or exit_us < since * 1_000_000 or enter_us < exit_us:
+            continue
+        ready_ms = None
+        if probes is not None and unit in probes:
+            ready_ms = round(max(probes[unit] * 1_000_000 - exit_us, enter_us - exit_us) / 1000, 1)
+        records.append(StartupRecord(now, unit, release, round((enter_us - exit_us) / 1000, 1), ready_ms))
+    return records
+
+def append_startup_history(records:list[StartupRecord], history_path:str=STARTUP_HISTORY_PATH):
+    """Append records as JSON lines with single write, so concurrent runs do not mix lines."""
+    if len(records) == 0:
+        return
+    data = ''.join(json.dumps(r.to_row(), separators=(',', ':')) + '\n' for r in records).encode('utf-8')
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(history_path)), exist_ok=True)
+        fd = os.open(history_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, data)
+        finally:
+            os.close(fd)
+    except OSError:
+        pass # history is optional, e.g. not writable for regular users
+
+def record_startups(units:list[tuple[str,Optional[str]]], since:float, probes:Optional[dict[str,float]]=None, history_path:str=STARTUP_HISTORY_PATH):
+    append_startup_history(collect_startups(units, since, probes), history_path)
+
+def read_startup_history(history_path:str=STARTUP_HISTORY_PATH)->Iterator[StartupRecord]:
+    if not os.path.isfile(history_path):
+        return
+    with open(history_path, 'r') as file:
+        for line in file:
+            try:
+                yield StartupRecord.from_row(json.loads(line))
+            except (ValueError, TypeError, IndexError):
+                continue # line cut by crash while appending
+
+def percentile(values:list[float], p:float)->float:
+    """Nearest-rank percentile of sorted values."""
+    return values[max(0, min(len(values), math.ceil(p / 100 * len(values))) - 1)]
+
+def get_period(record:StartupRecord, group_by:str)->str:
+    if group_by == 'release':
+        return record.Release or '-'
+    started = datetime.fromtimestamp(record.Time)
+    if group_by == 'week':
+        year, week, _ = started.isocalendar()
+        return f"{year}-W{week:02d}"
+    return started.strftime('%Y-%m-%d')
+
+class StartupStats:
+    """Percentiles of startup durations of service in one release or period."""
+    Service:str = None
+    Period:str = None
+    Durations:list[float] = None
+    Previous:Optional['StartupStats'] = None
+
+    def __init__(self, service:str, period:str):
+        self.Service = service
+        self.Period = period
+        self.Durations = []
+        self.Previous = None
+
+    def get(self, p:float)->float:
+        return percentile(self.Durations, p)
+
+    @property
+    def Change(self)->Optional[float]:
+        """Relative change of p50 against previous release or period."""
+        if self.Previous is None or self.Previous.get(50) <= 0:
+            return None
+        return self.get(50) / self.Previous.get(50) - 1
+
+    def is_regression(self, threshold:float)->bool:
+        change = self.Change
+        return change is not None and change * 100 > threshold
+
+    def to_dict(self, threshold:float)->dict:
+        return {
+            'service': self.Service, 'period': self.Period, 'starts': len(self.Durations),
+            'p50_ms': self.get(50), 'p90_ms': self.get(90), 'p99_ms': self.get(99), 'max_ms': self.Durations[-1],
+            'change': round(self.Change, 4) if self.Change is not None else None, 'regression': self.is_regression(threshold),
+        }
+
+def build_startup_stats(records:Iterator[StartupRecord], group_by:str='release', metric:str='ready')->list[StartupStats]:
+    """Stats per service and release (or day/week), groups of service are in order of their first start."""
+    groups:dict[tuple[str,str],StartupStats] = {}
+    for record in records:
+        key = (record.Service, get_period(record, group_by))
+        stats = groups.get(key)
+        if stats is None:
+            stats = groups[key] = StartupStats(*key)
+        stats.Durations.append(record.get_duration(metric))
+
+    last:dict[str,StartupStats] = {}
+    for stats in groups.values():
+        stats.Durations.sort()
+        stats.Previous = last.get(stats.Service)
+        last[stats.Service] = stats
+    return sorted(groups.values(), key=lambda s: s.Service) # stable, keeps periods order
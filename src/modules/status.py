@@ -0,0 +1,111 @@
+import subprocess
+from typing import Optional
+
+from modules.core import *
+
+SERVICE_STATUS_PROPERTIES = ['UnitFileState', 'ActiveState', 'SubState', 'MainPID', 'NRestarts']
+
+SYSTEMD_BUS_NAME = 'org.freedesktop.systemd1'
+SYSTEMD_OBJECT_PATH = '/org/freedesktop/systemd1'
+SYSTEMD_UNIT_PATH = '/org/freedesktop/systemd1/unit/'
+SYSTEMD_MANAGER_INTERFACE = 'org.freedesktop.systemd1.Manager'
+PROPERTIES_CHANGED_MATCH = (f"type='signal',sender='{SYSTEMD_BUS_NAME}',interface='org.freedesktop.DBus.Properties',"
+                            f"member='PropertiesChanged',path_namespace='{SYSTEMD_UNIT_PATH.rstrip('/')}'")
+
+class ServiceStatus:
+    Name:str = None
+    Properties:dict[str,str] = None
+
+    def __init__(self, name:str, properties:Optional[dict[str,str]]=None):
+        self.Name = name
+        self.Properties = properties if properties is not None else {}
+
+    @property
+    def Enabled(self)->str:
+        return self.Properties.get('UnitFileState', '')
+
+    @property
+    def Active(self)->str:
+        return self.Properties.get('ActiveState', '')
+
+    @property
+    def SubState(self)->str:
+        return self.Properties.get('SubState', '')
+
+    @property
+    def MainPID(self)->int:
+        return _to_int(self.Properties.get('MainPID'))
+
+    @property
+    def NRestarts(self)->int:
+        return _to_int(self.Properties.get('NRestarts'))
+
+    @property
+    def ControlGroup(self)->str:
+        return self.Properties.get('ControlGroup', '')
+
+def _to_int(value:Optional[str])->int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+def parse_systemctl_show(output:str)->list[dict[str,str]]:
+    """Split `systemctl show` output for several units into one property dict per unit."""
+    blocks:list[dict[str,str]] = []
+    current:dict[str,str] = {}
+    for line in output.splitlines():
+        if len(line.strip()) == 0:
+            if len(current) > 0:
+                blocks.append(current)
+                current = {}
+            continue
+        if '=' in line:
+            key, value = line.split('=', 1)
+            current[key] = value
+    if len(current) > 0:
+        blocks.append(current)
+    return blocks
+
+def get_services_status(service_names:list[str], properties:list[str]=SERVICE_STATUS_PROPERTIES)->dict[str,ServiceStatus]:
+    """Query state of all given units with a single `systemctl show` call."""
+    statuses:dict[str,ServiceStatus] = {}
+    if len(service_names) == 0:
+        return statuses
+
+    props = ','.join(['Id'] + [p for p in properties if p != 'Id'])
+    result = subprocess.run(
+        ["systemctl", "show", f"--property={props}", "--", *service_names],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
+    )
+
+    # Blocks are matched by Id, units systemctl failed to show (e.g. invalid names) print no block
+    blocks = { block['Id'].removesuffix('.service'): block for block in parse_systemctl_show(result.stdout) if 'Id' in block }
+    for name in service_names:
+        statuses[name] = ServiceStatus(name, blocks.get(name.removesuffix('.service'), {}))
+    return statuses
+
+def connect_systemd_bus()->'DBusConnection':
+    """Connect to system bus and ask systemd to emit unit PropertiesChanged signals."""
+    from modules.dbus import DBusConnection # socket and D-Bus client only for commands following signals
+    bus = DBusConnection()
+    bus.call('org.freedesktop.DBus', '/org/freedesktop/DBus', 'org.freedesktop.DBus', 'AddMatch', 's', [PROPERTIES_CHANGED_MATCH])
+    bus.call(SYSTEMD_BUS_NAME, SYSTEMD_OBJECT_PATH, SYSTEMD_MANAGER_INTERFACE, 'Subscribe')
+    return bus
+
+def get_signal_unit(message:'DBusMessage')->Optional[str]:
+    from modules.dbus import unescape_object_path
+    path = message.Fields.get('path', '')
+    if message.Fields.get('member') != 'PropertiesChanged' or not path.startswith(SYSTEMD_UNIT_PATH):
+        return None
+    return unescape_object_path(path[len(SYSTEMD_UNIT_PATH):]).removesuffix('.service')
+
+def apply_properties_changed(status:ServiceStatus, message:'DBusMessage', properties:list[str])->bool:
+    """Update status from signal body (interface, changed, invalidated), returns True if state is incomplete."""
+    if len(message.Body) < 3:
+        return False
+    _, changed, invalidated = message.Body[:3]
+    for key, value in changed.items():
+        if key in properties:
+            status.Properties[key] = str(value)
+    return any(key in properties for key in invalidated)
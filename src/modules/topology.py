@@ -0,0 +1,98 @@
+import os
+import re
+
+SYSFS_SYSTEM_DIR = "/sys/devices/system"
+
+class CpuInfo:
+    Id:int = 0
+    Node:int = 0
+    Package:int = 0
+    Core:int = 0
+
+    def __init__(self, cpu_id:int, node:int=0, package:int=0, core:int=0):
+        self.Id = cpu_id
+        self.Node = node
+        self.Package = package
+        self.Core = core
+
+def parse_cpulist(value:str)->list[int]:
+    """Parse kernel cpu list format '0-3,8,10-11'."""
+    cpus:list[int] = []
+    for part in value.strip().split(','):
+        part = part.strip()
+        if len(part) == 0:
+            continue
+        if '-' in part:
+            start, end = part.split('-', 1)
+            cpus.extend(range(int(start), int(end) + 1))
+        else:
+            cpus.append(int(part))
+    return cpus
+
+def format_cpulist(cpus:list[int])->str:
+    """Format cpu ids as systemd CPUAffinity= value with ranges, e.g. '0-3 8'."""
+    ranges:list[str] = []
+    ids = sorted(set(cpus))
+    idx = 0
+    while idx < len(ids):
+        end = idx
+        while end + 1 < len(ids) and ids[end + 1] == ids[end] + 1:
+            end += 1
+        ranges.append(str(ids[idx]) if end == idx else f"{ids[idx]}-{ids[end]}")
+        idx = end + 1
+    return ' '.join(ranges)
+
+def _read_int(path:str, default:int=0)->int:
+    try:
+        with open(path, 'r') as file:
+            return int(file.read().strip())
+    except (OSError, ValueError):
+        return default
+
+def read_cpu_topology(sysfs_dir:str=SYSFS_SYSTEM_DIR)->list[CpuInfo]:
+    """Online CPUs with NUMA node, package and core ids, ordered so siblings and nodes are adjacent."""
+    cpu_dir = os.path.join(sysfs_dir, 'cpu')
+    try:
+        with open(os.path.join(cpu_dir, 'online'), 'r') as file:
+            online = parse_cpulist(file.read())
+    except OSError:
+        online = list(range(os.cpu_count() or 1))
+
+    cpu_nodes:dict[int,int] = {}
+    node_dir = os.path.join(sysfs_dir, 'node')
+    if os.path.isdir(node_dir):
+        for entry in os.scandir(node_dir):
+            match = re.match(r'^node(\d+)$', entry.name)
+            if match is None:
+                continue
+            try:
+                with open(os.path.join(entry.path, 'cpulist'), 'r') as file:
+                    for cpu in parse_cpulist(file.read()):
+                        cpu_nodes[cpu] = int(match.group(1))
+            except OSError:
+                continue
+
+    cpus:list[CpuInfo] = []
+    for cpu in online:
+        topology_dir = os.path.join(cpu_dir, f"cpu{cpu}", 'topology')
+        cpus.append(CpuInfo(cpu, cpu_nodes.get(cpu, 0),
+                            _read_int(os.path.join(topology_dir, 'physical_package_id')),
+                            _read_int(os.path.join(topology_dir, 'core_id'), cpu)))
+    cpus.sort(key=lambda c: (c.Node, c.Package, c.Core, c.Id))
+    return cpus
+
+def split_cpus(cpus:list[CpuInfo], count:int)->list[list[CpuInfo]]:
+    """Split CPUs into count contiguous slices, wrapping around when there are more slices than CPUs."""
+    if count <= 0 or len(cpus) == 0:
+        return []
+    if count >= len(cpus):
+        return [[cpus[idx % len(cpus)]] for idx in range(count)]
+
+    slices:list[list[CpuInfo]] = []
+    size, extra = divmod(len(cpus), count)
+    start = 0
+    for idx in range(count):
+        end = start + size + (1 if idx < extra else 0)
+        slices.append(cpus[start:end])
+        start = end
+    return slices
@@ -0,0 +1,71 @@
+from typing import Optional
+
+DEFAULT_SCHEME_PORTS = { 'http': 80, 'https': 443 }
+# Hosts meaning "all interfaces" in ASPNETCORE_URLS
+WILDCARD_HOSTS = ['+', '*', '0.0.0.0', '[::]', '::']
+
+class UrlBinding:
+    """Single ASPNETCORE_URLS entry, e.g. 'http://+:5000'."""
+    Scheme:str = None
+    Host:str = None
+    Port:Optional[int] = None
+    Path:str = ''
+
+    def __init__(self, scheme:str, host:str, port:Optional[int], path:str=''):
+        self.Scheme = scheme
+        self.Host = host
+        self.Port = port
+        self.Path = path
+
+    @property
+    def EffectivePort(self)->Optional[int]:
+        return self.Port if self.Port is not None else DEFAULT_SCHEME_PORTS.get(self.Scheme, None)
+
+    def with_port(self, port:int)->'UrlBinding':
+        return UrlBinding(self.Scheme, self.Host, port, self.Path)
+
+    @property
+    def LoopbackHost(self)->str:
+        """Address to reach binding from local machine."""
+        if self.Host in ('[::]', '::'):
+            return '::1'
+        if self.Host in WILDCARD_HOSTS:
+            return '127.0.0.1'
+        return self.Host
+
+    def __str__(self):
+        host = f"[{self.Host}]" if ':' in self.Host else self.Host
+        port = f":{self.Port}" if self.Port is not None else ''
+        return f"{self.Scheme}://{host}{port}{self.Path}"
+
+def parse_url(value:str)->Optional[UrlBinding]:
+    value = value.strip()
+    scheme, sep, rest = value.partition('://')
+    if not sep or len(rest) == 0:
+        return None
+    authority, slash, path = rest.partition('/')
+    path = f"/{path}" if slash else ''
+
+    port:Optional[int] = None
+    if authority.startswith('['):
+        # IPv6 literal - [::1]:5000
+        host, _, port_part = authority[1:].partition(']')
+        port_part = port_part[1:] if port_part.startswith(':') else ''
+    else:
+        host, _, port_part = authority.rpartition(':') if ':' in authority else (authority, '', '')
+    if port_part:
+        try:
+            port = int(port_part)
+        except ValueError:
+            return None
+    return UrlBinding(scheme.lower(), host, port, path)
+
+def parse_urls(value:Optional[str])->list[UrlBinding]:
+    """Parse ';' separated ASPNETCORE_URLS value skipping invalid entries."""
+    if value is None:
+        return []
+    urls = [parse_url(part) for part in value.split(';') if len(part.strip()) > 0]
+    return [url for url in urls if url is not None]
+
+def format_urls(urls:list[UrlBinding])->str:
+    return ';'.join(str(url) for url in urls)
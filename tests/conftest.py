@@ -0,0 +1,58 @@
+import os
+import sys
+import json
+import subprocess
+
+import pytest
+
+TESTS_DIR = os.path.abspath(os.path.dirname(__file__))
+SRC_DIR = os.path.join(os.path.dirname(TESTS_DIR), 'src')
+sys.path.insert(0, SRC_DIR)
+sys.path.insert(0, os.path.join(SRC_DIR, 'bench')) # synthetic units of benchmarks
+
+FAKE_BIN_DIR = os.path.join(SRC_DIR, 'bench', 'fakebin')
+CLI_PATH = os.path.join(SRC_DIR, 'bin', 'systemd-net.py')
+
+class FakeTools:
+    """Environment running systemd-net against fake systemctl/journalctl of benchmarks."""
+
+    def __init__(self, work_dir:str):
+        self.WorkDir = work_dir
+        self.ServiceDir = os.path.join(work_dir, 'services')
+        self.CallsLog = os.path.join(work_dir, 'calls.jsonl')
+        self.UnitsPath = os.path.join(work_dir, 'units.json')
+        os.makedirs(self.ServiceDir, exist_ok=True)
+        os.makedirs(os.path.join(work_dir, 'proc-net'), exist_ok=True)
+        self.Env = {
+            'PATH': f"{FAKE_BIN_DIR}{os.pathsep}{os.environ.get('PATH', '')}",
+            'BENCH_CALLS_LOG': self.CallsLog,
+            'BENCH_FAKE_UNITS': self.UnitsPath,
+            'SYSTEMD_NET_CACHE_DIR': os.path.join(work_dir, 'cache'),
+            'SYSTEMD_NET_PROC_NET_DIR': os.path.join(work_dir, 'proc-net'),
+            'SYSTEMD_NET_CGROUP_ROOT': os.path.join(work_dir, 'cgroup'),
+            'SYSTEMD_NET_STARTUP_HISTORY': os.path.join(work_dir, 'startup-history.jsonl'),
+            'NO_COLOR': '1',
+        }
+        self.set_units({})
+
+    def set_units(self, units:dict[str,dict[str,str]]):
+        with open(self.UnitsPath, 'w') as file:
+            json.dump(units, file)
+
+    def run(self, *args:str)->subprocess.CompletedProcess:
+        return subprocess.run([sys.executable, CLI_PATH, *args], env=dict(os.environ, **self.Env),
+                              stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, timeout=60)
+
+    def calls(self, tool:str='systemctl')->list[list[str]]:
+        if not os.path.isfile(self.CallsLog):
+            return []
+        with open(self.CallsLog, 'r') as file:
+            entries = [json.loads(line) for line in file if line.strip()]
+        return [entry['argv'] for entry in entries if entry['tool'] == tool]
+
+@pytest.fixture
+def fake_tools(tmp_path, monkeypatch)->FakeTools:
+    tools = FakeTools(str(tmp_path))
+    for key, value in tools.Env.items():
+        monkeypatch.setenv(key, value)
+    return tools
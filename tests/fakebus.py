@@ -0,0 +1,119 @@
+import os
+import socket
+import threading
+from typing import Optional
+
+from modules.dbus import *
+
+BUS_UNIQUE_NAME = ':1.42'
+SYSTEMD_UNIT_INTERFACE = 'org.freedesktop.systemd1.Unit'
+
+def properties_changed(unit:str, changed:dict[str,tuple[str,object]], invalidated:Optional[list[str]]=None)->DBusMessage:
+    """PropertiesChanged signal of unit like systemd emits it, changed values are (signature, value)."""
+    return DBusMessage(MESSAGE_SIGNAL, {
+        'path': f"/org/freedesktop/systemd1/unit/{escape_object_path(unit)}",
+        'interface': 'org.freedesktop.DBus.Properties', 'member': 'PropertiesChanged',
+        'sender': ':1.1', 'signature': 'sa{sv}as',
+    }, [SYSTEMD_UNIT_INTERFACE, changed, invalidated or []])
+
+class FakeBus:
+    """Bus side of one client connection: checks EXTERNAL auth, answers Hello, AddMatch and Subscribe."""
+
+    def __init__(self, sock:socket.socket, early_signals:Optional[list[DBusMessage]]=None):
+        self.Socket = sock
+        self.AuthUid:Optional[int] = None
+        self.Calls:list[DBusMessage] = []
+        self.Subscribed = threading.Event()
+        self.EarlySignals = early_signals or [] # sent before reply to Subscribe, client has to queue them
+        self._serial = 100
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def _send(self, message:DBusMessage):
+        self._serial += 1
+        message.Serial = self._serial
+        self.Socket.sendall(message.encode())
+
+    def emit(self, signal:DBusMessage):
+        self._send(signal)
+
+    def close(self):
+        try:
+            self.Socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.Socket.close()
+        self._thread.join(5)
+
+    def _read_line(self, buffer:bytes)->tuple[bytes,bytes]:
+        while b'\r\n' not in buffer:
+            chunk = self.Socket.recv(4096)
+            if not chunk:
+                raise ConnectionError("Client closed during authentication")
+            buffer += chunk
+        line, _, rest = buffer.partition(b'\r\n')
+        return line, rest
+
+    def _serve(self):
+        try:
+            line, buffer = self._read_line(b'')
+            assert line.startswith(b'\0AUTH EXTERNAL '), line
+            self.AuthUid = int(bytes.fromhex(line[len(b'\0AUTH EXTERNAL '):].decode('ascii')).decode('ascii'))
+            self.Socket.sendall(b'OK 0123456789abcdef0123456789abcdef\r\n')
+            line, buffer = self._read_line(buffer)
+            assert line == b'BEGIN', line
+            while True:
+                message, consumed = DBusMessage.decode(buffer)
+                if message is None:
+                    chunk = self.Socket.recv(65536)
+                    if not chunk:
+                        return
+                    buffer += chunk
+                    continue
+                buffer = buffer[consumed:]
+                self._answer(message)
+        except OSError:
+            return # closed by test
+
+    def _answer(self, message:DBusMessage):
+        self.Calls.append(message)
+        member = message.Fields.get('member')
+        fields = { 'reply_serial': message.Serial, 'destination': BUS_UNIQUE_NAME, 'sender': 'org.freedesktop.DBus' }
+        if member == 'Hello':
+            self._send(DBusMessage(MESSAGE_METHOD_RETURN, { **fields, 'signature': 's' }, [BUS_UNIQUE_NAME]))
+        elif member in ('AddMatch', 'Subscribe'):
+            if member == 'Subscribe':
+                for signal in self.EarlySignals:
+                    self._send(signal)
+            self._send(DBusMessage(MESSAGE_METHOD_RETURN, fields))
+            if member == 'Subscribe':
+                self.Subscribed.set()
+        else:
+            self._send(DBusMessage(MESSAGE_ERROR, { **fields, 'error_name': 'org.freedesktop.DBus.Error.UnknownMethod', 'signature': 's' },
+                                   [f"Unknown method {member}"]))
+
+class FakeBusServer:
+    """Unix socket bus for processes connecting with DBUS_SYSTEM_BUS_ADDRESS, serves first client."""
+
+    def __init__(self, socket_path:str, early_signals:Optional[list[DBusMessage]]=None):
+        self.Address = f"unix:path={socket_path}"
+        self.Bus:Optional[FakeBus] = None
+        self.Connected = threading.Event()
+        self._listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._listener.bind(socket_path)
+        self._listener.listen(1)
+        self._early_signals = early_signals
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        try:
+            client, _ = self._listener.accept()
+        except OSError:
+            return
+        self.Bus = FakeBus(client, self._early_signals)
+        self.Connected.set()
+
+    def close(self):
+        self._listener.close()
+        if self.Bus is not None:
+            self.Bus.close()
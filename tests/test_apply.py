@@ -0,0 +1,140 @@
+import os
+import json
+
+import pytest
+
+from modules.manifest import *
+from generate import generate_units
+
+MANIFEST_TOML = """
+[defaults]
+user = "www-data"
+enabled = true
+
+[services.api]
+exec_path = "/www/Api/Api.dll"
+aspnetcore_urls = "http://+:5000"
+env = { ConnectionStrings__Db = "Host=db" }
+
+[services.worker]
+exec_path = "/www/Worker/Worker.dll"
+user = "worker"
+enabled = false
+service = { Restart = "on-failure" }
+restart = "backoff"
+"""
+
+def write_manifest(tmp_path, services:dict, defaults:Optional[dict]=None)->str:
+    path = str(tmp_path / 'services.json')
+    with open(path, 'w') as file:
+        json.dump({ 'defaults': defaults or {}, 'services': services }, file)
+    return path
+
+def dir_state(svc_dir:str)->dict[str,tuple]:
+    state:dict[str,tuple] = {}
+    for name in sorted(os.listdir(svc_dir)):
+        path = os.path.join(svc_dir, name)
+        with open(path, 'rb') as file:
+            state[name] = (os.stat(path).st_ino, os.stat(path).st_mtime_ns, file.read())
+    return state
+
+def test_load_toml_manifest_with_defaults(tmp_path):
+    path = str(tmp_path / 'services.toml')
+    with open(path, 'w') as file:
+        file.write(MANIFEST_TOML)
+    specs = load_manifest(path)
+    assert list(specs) == ['api', 'worker']
+    assert specs['api'] == { 'user': 'www-data', 'enabled': True, 'exec_path': '/www/Api/Api.dll',
+                             'aspnetcore_urls': 'http://+:5000', 'env': { 'ConnectionStrings__Db': 'Host=db' } }
+    assert (specs['worker']['user'], specs['worker']['enabled']) == ('worker', False)
+
+    svc = build_service(str(tmp_path), 'netapp.', 'worker', specs['worker'])
+    assert svc.Name == 'netapp.worker'
+    assert (svc.ExecUser, svc.ExecGroup) == ('worker', 'worker')
+    assert svc.Params.Properties['Restart'] == 'on-failure'
+    assert svc.Params.Properties['RestartSteps'] == '8'
+    assert svc.ASPNETCORE_ENVIRONMENT == 'Production'
+    api = build_service(str(tmp_path), 'netapp.', 'api', specs['api'])
+    assert (api.ASPNETCORE_URLS, api.get_environment_variable('ConnectionStrings__Db')) == ('http://+:5000', 'Host=db')
+
+@pytest.mark.parametrize('manifest, error', [
+    ({ 'services': [] }, "'services' table is required"),
+    ({}, "'services' table is required"),
+    ({ 'services': { 'api': 'x' } }, "service 'api' must be a table"),
+    ({ 'services': { 'api': { 'exec_path': '/a', 'port': 5000 } } }, "unknown keys for service 'api': port"),
+    ({ 'defaults': { 'colour': 'red' }, 'services': { 'api': { 'exec_path': '/a' } } }, "unknown keys for service 'api': colour"),
+    ({ 'services': { 'api': { 'user': 'www-data' } } }, "'exec_path' is required for service 'api'"),
+])
+def test_invalid_manifest(tmp_path, manifest, error):
+    path = str(tmp_path / 'services.json')
+    with open(path, 'w') as file:
+        json.dump(manifest, file)
+    with pytest.raises(Exception, match=error):
+        load_manifest(path)
+
+def test_restart_policy_of_manifest():
+    assert get_manifest_restart_policy('backoff').RestartSteps == 8
+    with pytest.raises(Exception, match='Unknown restart settings: delay'):
+        get_manifest_restart_policy({ 'delay': 5 })
+    with pytest.raises(Exception, match='expected "backoff" or table'):
+        get_manifest_restart_policy('always')
+
+def test_plan_create_update_delete(fake_tools, tmp_path):
+    services = { 'api': { 'exec_path': '/www/Api/Api.dll', 'aspnetcore_urls': 'http://+:5000' },
+                 'web': { 'exec_path': '/www/Web/Web.dll' },
+                 'old': { 'exec_path': '/www/Old/Old.dll' } }
+    result = fake_tools.run('apply', write_manifest(tmp_path, services), '-sdir', fake_tools.ServiceDir)
+    assert result.returncode == 0, result.stderr
+
+    services['api']['aspnetcore_urls'] = 'http://+:5001'
+    services['web']['service'] = { 'Restart': 'on-failure' }
+    del services['old']
+    services['new'] = { 'exec_path': '/www/New/New.dll' }
+    specs = load_manifest(write_manifest(tmp_path, services))
+    plan = { a.Name: a for a in plan_apply(specs, fake_tools.ServiceDir, 'netapp.', None, prune=True) }
+    assert { name: a.Action for name, a in plan.items() } == {
+        'netapp.api': 'update', 'netapp.web': 'update', 'netapp.new': 'create', 'netapp.old': 'delete' }
+    assert (plan['netapp.api'].UnitChanged, plan['netapp.api'].EnvChanged) == (False, True)
+    assert plan['netapp.api'].EnvChanges == ['env ASPNETCORE_URLS']
+    assert (plan['netapp.web'].UnitChanged, plan['netapp.web'].EnvChanged) == (True, False)
+    assert [a.Name for a in plan_apply(specs, fake_tools.ServiceDir, 'netapp.', None) if a.Action == 'delete'] == []
+
+    unchanged = plan_apply(load_manifest(write_manifest(tmp_path, { 'api': { 'exec_path': '/www/Api/Api.dll', 'aspnetcore_urls': 'http://+:5000' } })),
+                           fake_tools.ServiceDir, 'netapp.', None)
+    assert [(a.Name, a.Action) for a in unchanged] == [('netapp.api', 'unchanged')]
+
+def test_dry_run_changes_nothing(fake_tools, tmp_path):
+    generate_units(fake_tools.ServiceDir, 3)
+    before = dir_state(fake_tools.ServiceDir)
+    services = { 'bench0': { 'exec_path': '/www/Other/Other.dll' }, 'new': { 'exec_path': '/www/New/New.dll', 'enabled': True } }
+    fake_tools.set_units({ 'netapp.new.service': { 'UnitFileState': '', 'ActiveState': 'inactive' } })
+    result = fake_tools.run('apply', write_manifest(tmp_path, services), '-sdir', fake_tools.ServiceDir, '--dry-run', '--prune')
+    assert result.returncode == 0, result.stderr
+    assert 'Plan: 1 to create, 1 to update, 2 to delete, 0 unchanged' in result.stdout
+    assert '  enable netapp.new' in result.stdout
+    assert dir_state(fake_tools.ServiceDir) == before
+    # Only state is read
+    assert [argv[0] for argv in fake_tools.calls()] == ['show']
+
+def test_apply_writes_and_restarts_changed(fake_tools, tmp_path):
+    services = { 'api': { 'exec_path': '/www/Api/Api.dll', 'enabled': True }, 'idle': { 'exec_path': '/www/Idle/Idle.dll' } }
+    fake_tools.set_units({ f"netapp.{name}.service": { 'UnitFileState': '', 'ActiveState': 'inactive' } for name in services })
+    manifest = write_manifest(tmp_path, services)
+    result = fake_tools.run('apply', manifest, '-sdir', fake_tools.ServiceDir)
+    assert result.returncode == 0, result.stderr
+    assert sorted(os.listdir(fake_tools.ServiceDir)) == ['netapp.api.env', 'netapp.api.service', 'netapp.idle.env', 'netapp.idle.service']
+    calls = fake_tools.calls()
+    assert calls.count(['daemon-reload']) == 1
+    assert ['enable', '--', 'netapp.api'] in calls
+    # Created enabled service is started, stopped one is left alone
+    assert [argv for argv in calls if argv[0] == 'restart'] == [['restart', 'netapp.api']]
+
+    # Second apply of the same manifest writes and restarts nothing
+    before = dir_state(fake_tools.ServiceDir)
+    os.remove(fake_tools.CallsLog)
+    fake_tools.set_units({})
+    result = fake_tools.run('apply', manifest, '-sdir', fake_tools.ServiceDir)
+    assert result.returncode == 0, result.stderr
+    assert 'Plan: 0 to create, 0 to update, 0 to delete, 2 unchanged' in result.stdout
+    assert dir_state(fake_tools.ServiceDir) == before
+    assert [argv[0] for argv in fake_tools.calls()] == ['show']
@@ -0,0 +1,119 @@
+import os
+import json
+import time
+
+import pytest
+
+import modules.cgroups
+from modules.cgroups import *
+from generate import generate_units
+
+def write_cgroup(cgroup_dir:str, usage_usec:int, memory:int=64 << 20, tasks:int=12):
+    os.makedirs(cgroup_dir, exist_ok=True)
+    files = {
+        'cpu.stat': f"usage_usec {usage_usec}\nuser_usec {usage_usec // 2}\nsystem_usec {usage_usec // 2}\n",
+        'memory.current': f"{memory}\n", 'memory.peak': f"{memory * 2}\n", 'pids.current': f"{tasks}\n",
+        'io.stat': "8:0 rbytes=1024 wbytes=2048 rios=1 wios=2\n8:16 rbytes=1024 wbytes=0 rios=1 wios=0\n",
+    }
+    for name, content in files.items():
+        with open(os.path.join(cgroup_dir, name), 'w') as file:
+            file.write(content)
+
+def test_streamed_resources_sample_all_units_once(fake_tools):
+    names = generate_units(fake_tools.ServiceDir, 600)
+    slice_dir = os.path.join(fake_tools.Env['SYSTEMD_NET_CGROUP_ROOT'], 'system.slice')
+    for name in names:
+        write_cgroup(os.path.join(slice_dir, f"{name}.service"), 1_000_000)
+
+    interval = 1.0
+    started = time.monotonic()
+    result = fake_tools.run('list', '-sdir', fake_tools.ServiceDir, '-r', '--interval', str(interval), '--format', 'ndjson')
+    elapsed = time.monotonic() - started
+    assert result.returncode == 0, result.stderr
+
+    rows = [json.loads(line) for line in result.stdout.splitlines()]
+    assert sorted(row['service'] for row in rows) == sorted(names)
+    assert all(row['cpu_percent'] == 0.0 and row['memory_bytes'] == 64 << 20 and row['tasks'] == 12 for row in rows)
+    assert all(row['io_read_bytes'] == 2048 and row['io_write_bytes'] == 2048 for row in rows)
+    # 3 batches of rows, but one state query and one sampling interval
+    assert len([argv for argv in fake_tools.calls() if argv[0] == 'show']) == 1
+    assert elapsed < interval * 2
+
+class FakeClock:
+    def __init__(self):
+        self.Now = 1000.0
+        self.OnSleep = None
+
+    def monotonic(self)->float:
+        return self.Now
+
+    def sleep(self, seconds:float):
+        self.Now += seconds
+        if self.OnSleep is not None:
+            self.OnSleep()
+
+@pytest.fixture
+def clock(monkeypatch)->FakeClock:
+    fake = FakeClock()
+    monkeypatch.setattr(modules.cgroups, 'time', fake)
+    return fake
+
+def test_read_stats_of_cgroup_tree(tmp_path):
+    cgroup_dir = str(tmp_path / 'system.slice' / 'netapp.api.service')
+    write_cgroup(cgroup_dir, 5_000_000, memory=3 << 20, tasks=4)
+    stats = read_cgroup_stats(cgroup_dir)
+    assert (stats.CpuUsageUsec, stats.MemoryCurrent, stats.MemoryPeak, stats.Tasks) == (5_000_000, 3 << 20, 6 << 20, 4)
+    assert (stats.IoReadBytes, stats.IoWriteBytes) == (2048, 2048)
+    assert stats.CpuPercent is None
+
+    # Limits without value and missing controllers are unknown, not zero
+    with open(os.path.join(cgroup_dir, 'memory.peak'), 'w') as file:
+        file.write('max\n')
+    os.remove(os.path.join(cgroup_dir, 'io.stat'))
+    os.remove(os.path.join(cgroup_dir, 'pids.current'))
+    stats = read_cgroup_stats(cgroup_dir)
+    assert (stats.MemoryPeak, stats.Tasks, stats.IoReadBytes, stats.IoWriteBytes) == (None, None, None, None)
+    assert read_cgroup_stats(str(tmp_path / 'system.slice' / 'stopped.service')) is None
+
+def test_unit_cgroup_paths(tmp_path):
+    root = str(tmp_path)
+    assert get_unit_cgroup_path('netapp.api', cgroup_root=root) == os.path.join(root, 'system.slice', 'netapp.api.service')
+    assert get_unit_cgroup_path('netapp.api-v2@3.service', cgroup_root=root) == \
+        os.path.join(root, 'system.slice', 'system-netapp.api\\x2dv2.slice', 'netapp.api-v2@3.service')
+    assert get_unit_cgroup_path('netapp.api', '/custom.slice/netapp.api.service', root) == os.path.join(root, 'custom.slice', 'netapp.api.service')
+    assert systemd_escape('.a/b c') == '\\x2ea-b\\x20c'
+
+def test_collect_computes_cpu_between_samples(tmp_path, clock):
+    paths = { name: str(tmp_path / f"{name}.service") for name in ('busy', 'idle', 'gone') }
+    write_cgroup(paths['busy'], 1_000_000)
+    write_cgroup(paths['idle'], 2_000_000)
+    clock.OnSleep = lambda: write_cgroup(paths['busy'], 1_250_000)
+
+    stats = collect_cgroup_stats(paths, interval=0.5)
+    assert stats['busy'].CpuPercent == pytest.approx(50.0)
+    assert stats['idle'].CpuPercent == 0.0
+    assert stats['gone'] is None
+
+def test_sampler_keeps_previous_sample_of_other_units(tmp_path, clock):
+    paths = { name: str(tmp_path / f"{name}.service") for name in ('a', 'b') }
+    write_cgroup(paths['a'], 1_000_000)
+    write_cgroup(paths['b'], 1_000_000)
+    sampler = CgroupSampler()
+    first = sampler.sample(paths)
+    assert first['a'].CpuPercent is None and first['b'].CpuPercent is None
+
+    clock.sleep(2)
+    write_cgroup(paths['a'], 2_000_000)
+    assert sampler.sample({ 'a': paths['a'] })['a'].CpuPercent == pytest.approx(50.0)
+    clock.sleep(2)
+    write_cgroup(paths['b'], 5_000_000)
+    # Sample of b is 4 s old, sampling a in between did not drop it
+    assert sampler.sample({ 'b': paths['b'] })['b'].CpuPercent == pytest.approx(100.0)
+
+    # Restarted unit starts new cgroup with lower usage, CPU% is not negative
+    clock.sleep(1)
+    write_cgroup(paths['a'], 10)
+    assert sampler.sample({ 'a': paths['a'] })['a'].CpuPercent == 0.0
+
+def test_format_bytes():
+    assert [format_bytes(value) for value in (None, 512, 1536, 64 << 20, 3 << 40, 5 << 50)] == ['', '512B', '1.5K', '64.0M', '3.0T', '5120.0T']
@@ -0,0 +1,122 @@
+import os
+import sys
+import time
+import select
+import socket
+import subprocess
+
+import pytest
+
+import modules.dbus
+from modules.dbus import *
+from modules.status import *
+from conftest import CLI_PATH
+from fakebus import FakeBus, FakeBusServer, properties_changed, BUS_UNIQUE_NAME
+from generate import generate_units
+
+@pytest.fixture
+def bus_pair():
+    client, server = socket.socketpair(socket.AF_UNIX, socket.SOCK_STREAM)
+    buses = []
+    def connect(early_signals=None)->tuple[DBusConnection,FakeBus]:
+        fake = FakeBus(server, early_signals)
+        buses.append(fake)
+        return DBusConnection(sock=client), fake
+    yield connect
+    for fake in buses:
+        fake.close()
+    client.close()
+
+def wait_signals(bus:DBusConnection, timeout:float=5.0)->list[DBusMessage]:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if bus.has_pending() or len(select.select([bus], [], [], 0.1)[0]) > 0:
+            signals = bus.read_signals()
+            if len(signals) > 0:
+                return signals
+    return []
+
+def test_authenticates_and_says_hello(bus_pair):
+    bus, fake = bus_pair()
+    assert fake.AuthUid == os.getuid()
+    assert bus.UniqueName == BUS_UNIQUE_NAME
+    assert [m.Fields['member'] for m in fake.Calls] == ['Hello']
+
+def test_connect_systemd_bus_adds_match_and_subscribes(bus_pair, monkeypatch):
+    early = properties_changed('netapp.api@1.service', { 'ActiveState': ('s', 'deactivating') })
+    bus, fake = bus_pair([early])
+    monkeypatch.setattr(modules.dbus, 'DBusConnection', lambda: bus)
+    assert connect_systemd_bus() is bus
+
+    add_match, subscribe = fake.Calls[1:]
+    assert (add_match.Fields['interface'], add_match.Fields['member'], add_match.Fields['signature']) == ('org.freedesktop.DBus', 'AddMatch', 's')
+    assert add_match.Body == [PROPERTIES_CHANGED_MATCH]
+    assert "member='PropertiesChanged'" in add_match.Body[0] and "path_namespace='/org/freedesktop/systemd1/unit'" in add_match.Body[0]
+    assert (subscribe.Fields['destination'], subscribe.Fields['path'], subscribe.Fields['member']) == (SYSTEMD_BUS_NAME, SYSTEMD_OBJECT_PATH, 'Subscribe')
+    # Signal sent before the reply was queued, socket has nothing to read
+    assert bus.has_pending()
+    assert [get_signal_unit(m) for m in bus.read_signals()] == ['netapp.api@1']
+
+def test_properties_changed_is_decoded(bus_pair):
+    bus, fake = bus_pair()
+    fake.emit(properties_changed('netapp.api.service', {
+        'ActiveState': ('s', 'failed'), 'NRestarts': ('u', 4), 'MainPID': ('u', 0), 'Ignored': ('b', True),
+    }, ['SubState']))
+    fake.emit(DBusMessage(MESSAGE_SIGNAL, { 'path': '/org/freedesktop/systemd1', 'interface': SYSTEMD_MANAGER_INTERFACE,
+                                            'member': 'JobRemoved', 'signature': 'uoss' }, [1, '/org/freedesktop/systemd1/job/1', 'x.service', 'done']))
+    signals = wait_signals(bus)
+    while len(signals) < 2:
+        signals += wait_signals(bus)
+
+    message = signals[0]
+    assert message.Body[1] == { 'ActiveState': 'failed', 'NRestarts': 4, 'MainPID': 0, 'Ignored': True }
+    assert get_signal_unit(message) == 'netapp.api'
+    status = ServiceStatus('netapp.api', { 'ActiveState': 'active', 'SubState': 'running', 'NRestarts': '0' })
+    assert apply_properties_changed(status, message, ['ActiveState', 'SubState', 'NRestarts', 'MainPID'])
+    assert (status.Active, status.NRestarts, status.MainPID) == ('failed', 4, 0)
+    assert 'Ignored' not in status.Properties
+    assert get_signal_unit(signals[1]) is None
+
+def test_method_error_raises(bus_pair):
+    bus, _ = bus_pair()
+    with pytest.raises(DBusError, match='UnknownMethod'):
+        bus.call(SYSTEMD_BUS_NAME, SYSTEMD_OBJECT_PATH, SYSTEMD_MANAGER_INTERFACE, 'Reboot')
+
+def test_message_roundtrip():
+    message = DBusMessage(MESSAGE_METHOD_CALL, { 'path': '/a/b', 'member': 'M', 'signature': 'yxa{sv}(ib)as' },
+                          [7, -5, { 'k': ('as', ['x', 'y']) }, (3, False), []], serial=9)
+    data = message.encode()
+    decoded, consumed = DBusMessage.decode(data + b'tail')
+    assert consumed == len(data)
+    assert (decoded.Serial, decoded.Body) == (9, [7, -5, { 'k': ['x', 'y'] }, (3, False), []])
+    assert DBusMessage.decode(data[:-1]) == (None, 0)
+    assert unescape_object_path(escape_object_path('netapp.api@1.service')) == 'netapp.api@1.service'
+
+def test_top_redraws_row_on_signal(fake_tools):
+    names = generate_units(fake_tools.ServiceDir, 3)
+    server = FakeBusServer(os.path.join(fake_tools.WorkDir, 'bus.sock'))
+    process = subprocess.Popen([sys.executable, CLI_PATH, 'top', '-sdir', fake_tools.ServiceDir, '--interval', '60'],
+                               env=dict(os.environ, **fake_tools.Env, DBUS_SYSTEM_BUS_ADDRESS=server.Address),
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    try:
+        title = process.stdout.readline()
+        assert title.startswith('systemd-net top - 3 units'), title + process.stderr.read()
+        process.stdout.readline() # headers
+        rows = [process.stdout.readline().split() for _ in names]
+        assert [(row[0], row[1]) for row in rows] == [(name, 'active') for name in names]
+        assert server.Connected.wait(5) and server.Bus.Subscribed.wait(5)
+        calls = len(fake_tools.calls())
+
+        server.Bus.emit(properties_changed(f"{names[1]}.service", { 'ActiveState': ('s', 'failed'), 'NRestarts': ('u', 5) }))
+        redrawn = process.stdout.readline().split()
+        assert redrawn[1:4] == [names[1], 'failed', 'running']
+        assert redrawn[5] == '5'
+        # State came from the signal, systemctl was not asked again
+        assert len(fake_tools.calls()) == calls
+    finally:
+        server.close()
+        process.wait(10)
+    assert process.returncode == 1
+    assert 'systemd bus connection lost' in process.stderr.read()
+    process.stdout.close()
+    process.stderr.close()
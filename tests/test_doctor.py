@@ -0,0 +1,47 @@
+import os
+
+from modules.services import parse_unit_file
+
+LOOPING_UNIT = """# Written by hand
+[Unit]
+Description=Crash looping service
+After=network.target
+
+[Service]
+WorkingDirectory=/www/loop
+ExecStart=/www/loop/Loop
+EnvironmentFile={env_path}
+"""
+
+def write_service(svc_dir:str, name:str, text:str)->tuple[str,str]:
+    svc_path = os.path.join(svc_dir, f"{name}.service")
+    env_path = os.path.join(svc_dir, f"{name}.env")
+    with open(svc_path, 'w') as file:
+        file.write(text.format(env_path=env_path))
+    with open(env_path, 'w') as file:
+        file.write('ASPNETCORE_URLS="http://+:5000"\n')
+    return svc_path, env_path
+
+def read_bytes(path:str)->bytes:
+    with open(path, 'rb') as file:
+        return file.read()
+
+def test_apply_changes_only_restart_settings(fake_tools):
+    loop_path, loop_env = write_service(fake_tools.ServiceDir, 'netapp.loop', LOOPING_UNIT)
+    ok_path, ok_env = write_service(fake_tools.ServiceDir, 'netapp.ok', LOOPING_UNIT.replace('Crash looping', 'Healthy'))
+    fake_tools.set_units({ 'netapp.loop.service': { 'ActiveState': 'activating', 'SubState': 'auto-restart', 'NRestarts': '7' } })
+    before = parse_unit_file(loop_path)
+    unchanged = { path: read_bytes(path) for path in (loop_env, ok_path, ok_env) }
+
+    result = fake_tools.run('doctor', '-sdir', fake_tools.ServiceDir, '--apply')
+    assert result.returncode == 0, result.stdout + result.stderr
+
+    after = parse_unit_file(loop_path)
+    assert set(after) == { 'Unit', 'Service' }
+    assert { key: value for key, value in after['Unit'].items() if not key.startswith('StartLimit') } == before['Unit']
+    assert set(after['Unit']) - set(before['Unit']) == { 'StartLimitIntervalSec', 'StartLimitBurst' }
+    assert { key: value for key, value in after['Service'].items() if not key.startswith('Restart') } == before['Service']
+    assert set(after['Service']) - set(before['Service']) == { 'RestartSec', 'RestartSteps', 'RestartMaxDelaySec' }
+    for path, content in unchanged.items():
+        assert read_bytes(path) == content, path
+    assert ['daemon-reload'] in fake_tools.calls()
@@ -0,0 +1,140 @@
+import os
+import json
+import time
+import socket
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+from modules.health import *
+from generate import generate_units
+
+class HealthHandler(BaseHTTPRequestHandler):
+    """'/ok' answers 200, '/fail' 503, '/slow' 200 after server.Delay seconds, other paths 404."""
+
+    def do_GET(self):
+        self.server.Requests.append((self.path, self.headers.get('User-Agent')))
+        if self.path.endswith('/slow'):
+            time.sleep(self.server.Delay)
+        status = { 'ok': 200, 'slow': 200, 'fail': 503 }.get(self.path.rsplit('/', 1)[-1], 404)
+        self.send_response(status)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+@pytest.fixture
+def http_server():
+    servers:list[ThreadingHTTPServer] = []
+    def start(delay:float=0.0)->ThreadingHTTPServer:
+        server = ThreadingHTTPServer(('127.0.0.1', 0), HealthHandler)
+        server.daemon_threads = True
+        server.Requests = []
+        server.Delay = delay
+        threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+        servers.append(server)
+        return server
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+@pytest.fixture
+def garbage_server():
+    """Answers every connection with a line that is not HTTP."""
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.bind(('127.0.0.1', 0))
+    listener.listen(16)
+    def serve():
+        while True:
+            try:
+                client, _ = listener.accept()
+            except OSError:
+                return
+            client.sendall(b'SSH-2.0-OpenSSH\r\n')
+            client.close()
+    threading.Thread(target=serve, daemon=True).start()
+    yield listener.getsockname()[1]
+    listener.close()
+
+def closed_port()->int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def test_probes_every_url_of_every_unit(http_server):
+    first, second = http_server(), http_server()
+    port1, port2 = first.server_address[1], second.server_address[1]
+    results = probe_units([
+        ('netapp.a', f"http://+:{port1};http://127.0.0.1:{port2}/api"),
+        ('netapp.b', None),
+        ('netapp.c', f"http://localhost:{port2};ftp://+:21;not an url"),
+    ], path='/ok', count=2)
+
+    assert [(h.Unit, h.Url) for h in results] == [
+        ('netapp.a', f"http://+:{port1}"), ('netapp.a', f"http://127.0.0.1:{port2}/api"), ('netapp.c', f"http://localhost:{port2}"),
+    ]
+    assert all(h.Healthy and h.Status == 200 and len(h.Results) == 2 and h.Errors == [] for h in results)
+    assert all(h.LatencyP50 is not None and h.LatencyP50 <= h.LatencyMax for h in results)
+    assert first.Requests == [('/ok', HEALTH_USER_AGENT)] * 2
+    assert sorted(second.Requests) == sorted([('/api/ok', HEALTH_USER_AGENT)] * 2 + [('/ok', HEALTH_USER_AGENT)] * 2)
+
+def test_failures_are_reported_per_endpoint(http_server, garbage_server):
+    server = http_server()
+    port = server.server_address[1]
+    refused = closed_port()
+    results = { h.Url: h for h in probe_units([
+        ('netapp.fail', f"http://+:{port}"), ('netapp.down', f"http://+:{refused}"), ('netapp.garbage', f"http://+:{garbage_server}"),
+    ], path='/fail', count=1, timeout=1.0) }
+
+    failing = results[f"http://+:{port}"]
+    assert (failing.Healthy, failing.Status, failing.Errors) == (False, 503, [])
+    down = results[f"http://+:{refused}"]
+    assert (down.Healthy, down.Status, len(down.Errors)) == (False, None, 1)
+    garbage = results[f"http://+:{garbage_server}"]
+    assert garbage.Status is None and garbage.Errors[0].startswith('invalid response')
+    assert down.to_dict()['p50_ms'] is None and failing.to_dict()['probes'] == 1
+
+def test_slow_endpoints_time_out_and_run_concurrently(http_server):
+    delay = 0.4
+    servers = [http_server(delay) for _ in range(5)]
+    units = [(f"netapp.s{idx}", f"http://+:{server.server_address[1]}") for idx, server in enumerate(servers)]
+
+    started = time.monotonic()
+    results = probe_units(units, path='/slow', count=3, timeout=2.0)
+    # 15 probes of 0.4 s each, all in flight at once
+    assert time.monotonic() - started < delay * 4
+    assert all(h.Healthy and h.LatencyMax >= delay for h in results)
+
+    timed_out = probe_units(units[:1], path='/slow', count=1, timeout=0.1)[0]
+    assert timed_out.Errors == ['timeout after 0.1s'] and not timed_out.Healthy
+
+def test_max_parallel_limits_probes_in_flight(http_server):
+    delay = 0.2
+    server = http_server(delay)
+    started = time.monotonic()
+    results = probe_units([('netapp.a', f"http://+:{server.server_address[1]}")], path='/slow', count=4, max_parallel=1)
+    assert time.monotonic() - started >= delay * 4
+    assert results[0].Healthy
+
+def test_health_command_rows_and_exit_code(fake_tools, http_server):
+    server = http_server()
+    names = generate_units(fake_tools.ServiceDir, 3)
+    ports = { names[0]: server.server_address[1], names[1]: closed_port() }
+    for name in names:
+        lines = [f"ASPNETCORE_URLS=\"http://+:{ports[name]}\""] if name in ports else []
+        with open(os.path.join(fake_tools.ServiceDir, f"{name}.env"), 'w') as file:
+            file.write('\n'.join(lines))
+
+    result = fake_tools.run('health', names[0], '-sdir', fake_tools.ServiceDir, '--path', '/ok', '-k', '1', '--format', 'ndjson')
+    assert result.returncode == 0, result.stderr
+    assert [json.loads(line)['status'] for line in result.stdout.splitlines()] == [200]
+
+    result = fake_tools.run('health', '-sdir', fake_tools.ServiceDir, '--path', '/ok', '-k', '1', '--timeout', '1', '--format', 'ndjson')
+    assert result.returncode == 1
+    rows = { row['service']: row for row in map(json.loads, result.stdout.splitlines()) }
+    assert (rows[names[0]]['healthy'], rows[names[0]]['status']) == (True, 200)
+    assert (rows[names[1]]['healthy'], rows[names[1]]['status'], len(rows[names[1]]['errors'])) == (False, None, 1)
+    assert rows[names[2]]['errors'] == ['no ASPNETCORE_URLS']
@@ -0,0 +1,118 @@
+import os
+import json
+
+import modules.inventory
+from modules.inventory import *
+from generate import generate_units
+
+class CountingParser:
+    def __init__(self):
+        self.Paths:list[str] = []
+
+    def __call__(self, path:str)->dict:
+        self.Paths.append(os.path.basename(path))
+        with open(path, 'r') as file:
+            return { 'content': file.read() }
+
+def load_all(svc_dir:str, cache_dir:str, parser:CountingParser)->ServiceInventory:
+    inventory = ServiceInventory(svc_dir, cache_dir)
+    for svc_path in inventory.list_units('netapp.'):
+        inventory.read(svc_path, parser)
+    inventory.save()
+    return inventory
+
+def test_saved_index_is_reused(tmp_path):
+    svc_dir, cache_dir = str(tmp_path / 'services'), str(tmp_path / 'cache')
+    names = generate_units(svc_dir, 3)
+    parser = CountingParser()
+    load_all(svc_dir, cache_dir, parser)
+    assert parser.Paths == [f"{name}.service" for name in names]
+
+    parser.Paths.clear()
+    inventory = load_all(svc_dir, cache_dir, parser)
+    assert parser.Paths == []
+    assert inventory.list_dropin_dirs() == set()
+
+def test_corrupt_or_stale_index_falls_back_to_rescan(tmp_path):
+    svc_dir, cache_dir = str(tmp_path / 'services'), str(tmp_path / 'cache')
+    generate_units(svc_dir, 2)
+    load_all(svc_dir, cache_dir, CountingParser())
+    index_path = ServiceInventory(svc_dir, cache_dir).IndexPath
+    with open(index_path, 'rb') as file:
+        header, data = file.read().split(b'\n', 1)
+
+    payload = json.loads(data)
+    for name in payload['files']:
+        payload['files'][name]['data'] = { 'content': 'tampered' }
+    tampered = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    other_dir = dict(payload, services_dir='/elsewhere')
+    other_data = json.dumps(other_dir).encode('utf-8')
+    versions = json.loads(header)
+    cases = {
+        'checksum mismatch': header + b'\n' + tampered,
+        'truncated': header + b'\n' + data[:len(data) // 2],
+        'not json': b'garbage',
+        'old version': json.dumps(dict(versions, version=INVENTORY_VERSION - 1)).encode('utf-8') + b'\n' + data,
+        'other directory': json.dumps({ 'version': INVENTORY_VERSION, 'checksum': modules.inventory._checksum(other_data) }).encode('utf-8') + b'\n' + other_data,
+    }
+    for case, content in cases.items():
+        with open(index_path, 'wb') as file:
+            file.write(content)
+        parser = CountingParser()
+        inventory = load_all(svc_dir, cache_dir, parser)
+        assert len(parser.Paths) == 2, case
+        assert all(inventory.read(p, parser)['content'] != 'tampered' for p in inventory.list_units('netapp.')), case
+        # Rescanned index is written again and valid
+        parser.Paths.clear()
+        load_all(svc_dir, cache_dir, parser)
+        assert parser.Paths == [], case
+
+def test_file_modified_in_same_tick_is_read_again(tmp_path):
+    svc_dir, cache_dir = str(tmp_path / 'services'), str(tmp_path / 'cache')
+    names = generate_units(svc_dir, 2)
+    svc_path = os.path.join(svc_dir, f"{names[0]}.service")
+    # Just written file: a change within the same timestamp tick would keep mtime_ns
+    with open(svc_path, 'a') as file:
+        file.write('\n# fresh\n')
+    parser = CountingParser()
+    load_all(svc_dir, cache_dir, parser)
+    with open(ServiceInventory(svc_dir, cache_dir).IndexPath, 'rb') as file:
+        saved = json.loads(file.read().split(b'\n', 1)[1])
+    assert sorted(os.path.basename(p) for p in saved['files']) == [f"{names[1]}.service"]
+
+    # Same size and mtime, but different content: racy entry was not trusted, so file is parsed again
+    st = os.stat(svc_path)
+    with open(svc_path, 'r+') as file:
+        file.seek(st.st_size - 6)
+        file.write('FRESH\n')
+    os.utime(svc_path, ns=(st.st_atime_ns, st.st_mtime_ns))
+    parser.Paths.clear()
+    inventory = load_all(svc_dir, cache_dir, parser)
+    assert parser.Paths == [f"{names[0]}.service"]
+    assert inventory.read(svc_path, parser)['content'].endswith('# FRESH\n')
+
+def test_find_changed_and_forget(tmp_path):
+    svc_dir, cache_dir = str(tmp_path / 'services'), str(tmp_path / 'cache')
+    names = generate_units(svc_dir, 3)
+    inventory = load_all(svc_dir, cache_dir, CountingParser())
+    assert inventory.find_changed() == []
+
+    edited = os.path.join(svc_dir, f"{names[0]}.service")
+    with open(edited, 'a') as file:
+        file.write('\n')
+    removed = os.path.join(svc_dir, f"{names[1]}.service")
+    os.remove(removed)
+    assert sorted(inventory.find_changed()) == sorted([edited, removed])
+
+    # Removed files are dropped from index and from next listing
+    inventory.forget(removed)
+    assert inventory.find_changed() == [edited]
+    assert inventory.list_units('netapp.') == [edited, os.path.join(svc_dir, f"{names[2]}.service")]
+    parser = CountingParser()
+    inventory.read(edited, parser)
+    assert parser.Paths == [f"{names[0]}.service"] and inventory.find_changed() == []
+
+    inventory.save()
+    with open(inventory.IndexPath, 'rb') as file:
+        saved = json.loads(file.read().split(b'\n', 1)[1])
+    assert removed not in saved['files']
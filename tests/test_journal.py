@@ -0,0 +1,107 @@
+import os
+import re
+import sys
+import json
+import time
+
+import pytest
+
+from modules.journal import *
+from generate import generate_units
+
+# Recorded `journalctl -o json` of two services, sshd and systemd itself, with a banner line,
+# an entry with invalid timestamp and a line truncated by stopped reader
+JOURNAL_PATH = os.path.join(os.path.dirname(__file__), 'data', 'journal.json')
+JOURNAL_START = 1760781600000000
+
+def read_recording()->list[str]:
+    with open(JOURNAL_PATH, 'r') as file:
+        return file.readlines()
+
+def test_parse_recorded_entries():
+    entries = [parse_journal_entry(line) for line in read_recording()]
+    assert sum(entry is not None for entry in entries) == 11
+
+    first = entries[0]
+    assert (first.Identifier, first.Timestamp, first.Priority, first.Unit) == ('netapp.bench0', JOURNAL_START, 6, '')
+    assert first.Message.endswith('Now listening on: http://[::]:10000')
+    assert first.Time == datetime.fromtimestamp(JOURNAL_START / 1_000_000)
+    # Non UTF-8 message is exported as byte array
+    assert [entry.Message for entry in entries if entry is not None and entry.Timestamp == JOURNAL_START + 31_000_000] == ['binary �!']
+    systemd = [entry for entry in entries if entry is not None and entry.Identifier == 'systemd']
+    assert [entry.Unit for entry in systemd] == ['netapp.bench1.service'] * 2
+
+def test_parse_invalid_lines():
+    assert parse_journal_entry('-- No entries --') is None
+    assert parse_journal_entry('[1, 2]') is None
+    assert parse_journal_entry('{"__REALTIME_TIMESTAMP": "x"}') is None
+    entry = parse_journal_entry('{"MESSAGE": null}')
+    assert (entry.Identifier, entry.Timestamp, entry.Priority, entry.Message) == ('', 0, 6, '')
+
+def test_filter_recorded_entries():
+    lines = read_recording()
+    services = { 'netapp.bench0', 'netapp.bench1' }
+    assert len(list(iter_journal_entries(lines, services))) == 8
+    errors = list(iter_journal_entries(lines, services, parse_priority('err')))
+    assert [(entry.Identifier, entry.Priority) for entry in errors] == [('netapp.bench0', 3), ('netapp.bench1', 2), ('netapp.bench0', 3)]
+    matched = list(iter_journal_entries(lines, None, None, re.compile(r'netapp\.bench1\.service')))
+    assert [entry.Identifier for entry in matched] == ['systemd', 'systemd']
+    warnings = list(iter_journal_entries(lines, { 'netapp.bench0' }, parse_priority('warning..warning')))
+    assert [entry.Message.split(':')[0] for entry in warnings] == ['warn']
+
+def test_filter_is_lazy():
+    consumed:list[str] = []
+    def source():
+        for line in read_recording():
+            consumed.append(line)
+            yield line
+    entries = iter_journal_entries(source(), { 'netapp.bench1' })
+    assert next(entries).Timestamp == JOURNAL_START + 1_000_000
+    assert len(consumed) == 2
+
+def test_parse_priority():
+    assert parse_priority('err') == (0, 3)
+    assert parse_priority('4') == (0, 4)
+    assert parse_priority('warning..emerg') == (0, 4)
+    assert parse_priority('ERR..notice') == (3, 5)
+    for value in ('verbose', '8', 'err..'):
+        with pytest.raises(ValueError):
+            parse_priority(value)
+
+def test_journalctl_commands():
+    assert build_journalctl_command(['a', 'b'], follow=True, priority=(0, 3), since='1 hour ago', lines=10) == [
+        'journalctl', '--output=json', '--no-pager', '--follow', '--priority=0..3', '--since=1 hour ago', '--lines=10',
+        'SYSLOG_IDENTIFIER=a', 'SYSLOG_IDENTIFIER=b']
+    assert build_unit_failures_command(['netapp.a'], ['netapp.a'], 'today') == [
+        'journalctl', '--output=json', '--no-pager', '--since=today', 'UNIT=netapp.a.service',
+        '+', 'SYSLOG_IDENTIFIER=netapp.a', 'PRIORITY=0', 'PRIORITY=1', 'PRIORITY=2', 'PRIORITY=3']
+
+def test_summary_of_recording():
+    summary = LogSummary()
+    for entry in iter_journal_entries(read_recording(), { 'netapp.bench0', 'netapp.bench1' }):
+        summary.add(entry)
+    assert summary.Total == { 'netapp.bench0': 6, 'netapp.bench1': 2 }
+    assert summary.Errors == { 'netapp.bench0': 2, 'netapp.bench1': 1 }
+    assert summary.Warnings == { 'netapp.bench0': 1 }
+    assert summary.error_rate('netapp.bench0') == pytest.approx(100 / 3)
+    # Rate is over span between first and last entry: 2 errors in 120 s, 1 error in 59 s
+    assert summary.errors_per_minute('netapp.bench0') == pytest.approx(1.0)
+    assert summary.errors_per_minute('netapp.bench1') == pytest.approx(60 / 59)
+    assert summary.errors_per_minute('sshd') is None and summary.error_rate('sshd') == 0.0
+
+def test_read_journal_stops_reader_on_close():
+    started = time.monotonic()
+    lines = read_journal([sys.executable, '-c', "import sys, time; print('first', flush=True); time.sleep(30)"])
+    assert next(lines) == 'first\n'
+    lines.close()
+    assert time.monotonic() - started < 10
+
+def test_logs_reads_journal_with_one_reader(fake_tools):
+    generate_units(fake_tools.ServiceDir, 2)
+    fake_tools.Env['BENCH_JOURNAL_FILE'] = JOURNAL_PATH
+    result = fake_tools.run('logs', '-sdir', fake_tools.ServiceDir, '--priority', 'warning', '--format', 'ndjson')
+    assert result.returncode == 0, result.stderr
+    rows = [json.loads(line) for line in result.stdout.splitlines()]
+    assert [(row['service'], row['priority']) for row in rows] == [
+        ('netapp.bench0', 'warning'), ('netapp.bench0', 'err'), ('netapp.bench1', 'crit'), ('netapp.bench0', 'err')]
+    assert fake_tools.calls('journalctl') == [['--output=json', '--no-pager', '--priority=0..4']]
@@ -0,0 +1,66 @@
+import os
+import sys
+import time
+import subprocess
+from contextlib import contextmanager
+
+from generate import generate_units
+
+HOLD_LOCK_SCRIPT = """
+import os, sys, time, fcntl
+fds = [os.open(path, os.O_RDONLY | os.O_DIRECTORY) for path in sys.argv[2:]]
+for fd in fds:
+    fcntl.flock(fd, fcntl.LOCK_EX)
+print('locked', flush=True)
+time.sleep(float(sys.argv[1]))
+"""
+HOLD_SECONDS = 1.0
+
+@contextmanager
+def other_writer(*dirs:str):
+    """Other process holding locks of directories for HOLD_SECONDS."""
+    process = subprocess.Popen([sys.executable, '-c', HOLD_LOCK_SCRIPT, str(HOLD_SECONDS), *dirs], stdout=subprocess.PIPE, text=True)
+    try:
+        assert process.stdout.readline().strip() == 'locked'
+        yield process
+    finally:
+        process.wait()
+        process.stdout.close()
+
+def run_waiting(fake_tools, *dirs:str, command:list[str]):
+    with other_writer(*dirs):
+        started = time.monotonic()
+        result = fake_tools.run(*command)
+        elapsed = time.monotonic() - started
+    assert result.returncode == 0, result.stdout + result.stderr
+    assert "Waiting for other systemd-net process" in result.stderr
+    assert elapsed >= HOLD_SECONDS * 0.8
+    return result
+
+def test_scale_waits_for_other_writer(fake_tools):
+    generate_units(fake_tools.ServiceDir, 1)
+    run_waiting(fake_tools, fake_tools.ServiceDir, command=['scale', 'bench0', '2', '-sdir', fake_tools.ServiceDir, '--no-pin'])
+    assert sorted(os.listdir(fake_tools.ServiceDir)) == [
+        'netapp.bench0.env', 'netapp.bench0.service.bak', 'netapp.bench0@.service',
+        'netapp.bench0@1.env', 'netapp.bench0@1.service.d', 'netapp.bench0@2.env', 'netapp.bench0@2.service.d']
+    # daemon-reload requested under lock runs once, when it is released
+    assert fake_tools.calls().count(['daemon-reload']) == 1
+
+def test_deploy_and_rollback_wait_for_other_writer(fake_tools):
+    generate_units(fake_tools.ServiceDir, 1)
+    publish_dir = os.path.join(fake_tools.WorkDir, 'publish')
+    releases_dir = os.path.join(fake_tools.WorkDir, 'releases')
+    os.makedirs(publish_dir)
+    for content in ('v1', 'v2'):
+        with open(os.path.join(publish_dir, 'App0.dll'), 'w') as file:
+            file.write(content)
+        run_waiting(fake_tools, fake_tools.ServiceDir,
+                    command=['deploy', 'bench0', publish_dir, '-sdir', fake_tools.ServiceDir, '--releases-dir', releases_dir, '--no-restart'])
+
+    app_dir = os.path.join(releases_dir, 'netapp.bench0')
+    releases = sorted(os.listdir(os.path.join(app_dir, 'releases')))
+    assert len(releases) == 2
+    assert os.readlink(os.path.join(app_dir, 'current')) == os.path.join('releases', releases[1])
+
+    run_waiting(fake_tools, app_dir, command=['rollback', 'bench0', '-sdir', fake_tools.ServiceDir, '--no-restart'])
+    assert os.readlink(os.path.join(app_dir, 'current')) == os.path.join('releases', releases[0])
@@ -0,0 +1,78 @@
+import os
+import gc
+import tracemalloc
+
+import pytest
+
+from generate import generate_units, BENCH_PROFILES, BENCH_FIRST_PORT
+from modules.NetService import *
+
+SERVICES_COUNT = 10000
+# Measured about 15 MiB for 10k units, plain dicts per service took several times more
+MAX_TRACED_BYTES = 40 * 1024 * 1024
+
+@pytest.fixture(scope='module')
+def many_services(tmp_path_factory)->tuple[str,list[str]]:
+    svc_dir = str(tmp_path_factory.mktemp('many') / 'services')
+    return svc_dir, generate_units(svc_dir, SERVICES_COUNT)
+
+def load_traced(svc_dir:str, cache_dir:str=None)->tuple[list[NetService],int]:
+    gc.collect()
+    tracemalloc.start()
+    try:
+        services = get_services(svc_dir, 'netapp.', cache_dir)
+        current, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return services, current
+
+def check_service(svc:NetService, idx:int, svc_dir:str):
+    name = f"netapp.bench{idx}"
+    assert svc.Name == name
+    assert svc.ServicePath == os.path.join(svc_dir, f"{name}.service")
+    assert svc.Description == f"Benchmark service {idx}"
+    assert svc.Params.Properties['ExecStart'] == f"/usr/bin/dotnet /www/{name}/App{idx}.dll"
+    assert svc.Params.Properties['SyslogIdentifier'] == name
+    assert svc.EnvironmentFile == os.path.join(svc_dir, f"{name}.env")
+    assert svc.Profile == BENCH_PROFILES[idx % len(BENCH_PROFILES)]
+    assert svc.ASPNETCORE_URLS.strip('"') == f"http://+:{BENCH_FIRST_PORT + idx}"
+    assert svc.get_environment_variable('ConnectionStrings__Default').strip('"') == f"Host=db{idx % 4};Database=app{idx}"
+
+def test_loads_10k_services_in_bounded_memory(many_services):
+    svc_dir, names = many_services
+    services, traced = load_traced(svc_dir)
+    assert len(services) == len(names)
+    assert traced < MAX_TRACED_BYTES, f"{traced / 1024 / 1024:.1f} MiB for {len(services)} services"
+
+def test_every_service_keeps_own_values(many_services):
+    svc_dir, names = many_services
+    services = { svc.Name: svc for svc in get_services(svc_dir, 'netapp.') }
+    assert sorted(services) == sorted(names)
+    for idx, name in enumerate(names):
+        check_service(services[name], idx, svc_dir)
+
+    # Interning shares strings only, sections and environments are own objects of every service
+    for attr in ('Unit', 'Params', 'Install', 'Environment'):
+        objects = [getattr(svc, attr) for svc in services.values()]
+        assert len({ id(obj) for obj in objects }) == len(names), attr
+    assert len({ id(svc.Params.Properties) for svc in services.values() }) == len(names)
+    assert all(not hasattr(svc, '__dict__') for svc in services.values())
+
+    first, second = services[names[0]], services[names[1]]
+    first.Params.Properties['Restart'] = 'no'
+    first.Environment['ASPNETCORE_ENVIRONMENT'] = 'Staging'
+    assert second.Params.Properties['Restart'] == 'always'
+    assert second.ASPNETCORE_ENVIRONMENT.strip('"') == 'Production'
+
+def test_snapshots_are_distinct_and_stable_with_cache(many_services, tmp_path):
+    svc_dir, names = many_services
+    cache_dir = str(tmp_path / 'cache')
+    cold = { svc.Name: svc.snapshot() for svc in get_services(svc_dir, 'netapp.', cache_dir) }
+    assert len(set(cold.values())) == len(names)
+
+    services, traced = load_traced(svc_dir, cache_dir)
+    assert traced < MAX_TRACED_BYTES
+    cached = { svc.Name: svc for svc in services }
+    assert { name: svc.snapshot() for name, svc in cached.items() } == cold
+    for idx, name in enumerate(names):
+        check_service(cached[name], idx, svc_dir)
@@ -0,0 +1,111 @@
+import os
+
+import modules.metrics
+from modules.metrics import MetricsCollector
+from modules.NetService import TEMPLATE_INSTANCE_DROPIN
+from generate import generate_units
+
+def edit_in_place(path:str, old:str, new:str):
+    """Rewrite file without replacing it like editors without atomic save do, directory mtime stays the same."""
+    with open(path, 'r') as file:
+        content = file.read()
+    with open(path, 'r+') as file:
+        file.write(content.replace(old, new))
+        file.truncate()
+    # mtime of the past generated files, so only size and mtime_ns of the file tell about the edit
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+
+def count_reads(monkeypatch)->list[str]:
+    reads:list[str] = []
+    read_service = modules.metrics.read_service
+    def counted(svc_path, inventory=None):
+        reads.append(os.path.basename(svc_path))
+        return read_service(svc_path, inventory)
+    monkeypatch.setattr(modules.metrics, 'read_service', counted)
+    return reads
+
+def get_urls(collector:MetricsCollector)->dict[str,str]:
+    return { unit: urls for unit, _, urls in collector.Units }
+
+def test_refresh_units_finds_edited_files(tmp_path, monkeypatch):
+    svc_dir = str(tmp_path / 'services')
+    names = generate_units(svc_dir, 3)
+    template = 'netapp.scaled@'
+    with open(os.path.join(svc_dir, f"{template}.service"), 'w') as file:
+        file.write("[Unit]\nDescription=Scaled\n\n[Service]\nExecStart=/www/scaled/Scaled\n")
+    env_path = os.path.join(svc_dir, f"{template}1.env")
+    with open(env_path, 'w') as file:
+        file.write('ASPNETCORE_URLS="http://+:7001"\n')
+    os.makedirs(os.path.join(svc_dir, f"{template}1.service.d"))
+    with open(os.path.join(svc_dir, f"{template}1.service.d", TEMPLATE_INSTANCE_DROPIN), 'w') as file:
+        file.write(f"[Service]\nEnvironmentFile={env_path}\n")
+    past = os.stat(os.path.join(svc_dir, f"{names[0]}.service")).st_mtime
+    os.utime(svc_dir, (past, past))
+    dir_mtime = os.stat(svc_dir).st_mtime_ns
+
+    reads = count_reads(monkeypatch)
+    collector = MetricsCollector(svc_dir, 'netapp.', str(tmp_path / 'cache'))
+    collector.refresh_units(True)
+    assert get_urls(collector)[names[1]] == 'http://+:10001'
+    assert get_urls(collector)[f"{template}1"] == 'http://+:7001'
+
+    # Nothing changed, nothing is read
+    reads.clear()
+    collector.refresh_units()
+    assert reads == []
+
+    edit_in_place(os.path.join(svc_dir, f"{names[1]}.env"), ':10001', ':11001')
+    edit_in_place(os.path.join(svc_dir, f"{names[2]}.service"), 'Benchmark service 2', 'Edited service 2')
+    edit_in_place(env_path, ':7001', ':17001')
+    assert os.stat(svc_dir).st_mtime_ns == dir_mtime
+    collector.refresh_units()
+    assert get_urls(collector)[names[1]] == 'http://+:11001'
+    assert get_urls(collector)[f"{template}1"] == 'http://+:17001'
+    assert { svc.Name: svc.Description for _, svc, _ in collector.Units }[names[2]] == 'Edited service 2'
+
+    # Removed env file is read once, then forgotten
+    os.remove(os.path.join(svc_dir, f"{names[0]}.env"))
+    os.utime(svc_dir, ns=(dir_mtime, dir_mtime))
+    collector.refresh_units()
+    assert get_urls(collector)[names[0]] is None
+    reads.clear()
+    collector.refresh_units()
+    assert reads == []
+
+def test_refresh_units_finds_new_dropin(tmp_path, monkeypatch):
+    svc_dir = str(tmp_path / 'services')
+    names = generate_units(svc_dir, 2)
+    dropin_dir = os.path.join(svc_dir, f"{names[1]}.service.d")
+    os.makedirs(dropin_dir)
+    with open(os.path.join(dropin_dir, '10-limits.conf'), 'w') as file:
+        file.write("[Service]\nLimitNOFILE=65536\n")
+    past = os.stat(os.path.join(svc_dir, f"{names[0]}.service")).st_mtime
+    for path in (dropin_dir, svc_dir):
+        os.utime(path, (past, past))
+    dir_mtime = os.stat(svc_dir).st_mtime_ns
+
+    reads = count_reads(monkeypatch)
+    collector = MetricsCollector(svc_dir, 'netapp.', str(tmp_path / 'cache'))
+    collector.refresh_units(True)
+    reads.clear()
+    collector.refresh_units()
+    assert reads == []
+
+    # New file in existing drop-in directory changes neither services directory nor any indexed file
+    with open(os.path.join(dropin_dir, '20-description.conf'), 'w') as file:
+        file.write("[Unit]\nDescription=Overridden\n")
+    assert os.stat(svc_dir).st_mtime_ns == dir_mtime
+    collector.refresh_units()
+    svc = { svc.Name: svc for _, svc, _ in collector.Units }[names[1]]
+    assert [os.path.basename(path) for path in svc.DropInPaths] == ['10-limits.conf', '20-description.conf']
+    assert svc.get_effective('Unit', 'Description') == 'Overridden'
+
+def test_textfile_once_reads_state_once(fake_tools):
+    generate_units(fake_tools.ServiceDir, 3)
+    textfile = os.path.join(fake_tools.WorkDir, 'systemd_net.prom')
+    result = fake_tools.run('metrics', '-sdir', fake_tools.ServiceDir, '--textfile', textfile, '--once', '--no-probe')
+    assert result.returncode == 0, result.stderr
+    assert [argv[0] for argv in fake_tools.calls()] == ['show']
+    with open(textfile, 'r') as file:
+        assert 'unit="netapp.bench2"' in file.read()
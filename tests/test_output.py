@@ -0,0 +1,71 @@
+import os
+import csv
+import json
+
+from generate import generate_units
+
+def test_streamed_rows_stay_parseable_with_warnings(fake_tools):
+    names = generate_units(fake_tools.ServiceDir, 3)
+    os.remove(os.path.join(fake_tools.ServiceDir, f"{names[1]}.env"))
+
+    result = fake_tools.run('list', '-sdir', fake_tools.ServiceDir, '--format', 'json')
+    assert result.returncode == 0, result.stderr
+    rows = json.loads(result.stdout)
+    assert [row['service'] for row in rows] == names
+    assert "Missing EnvironmentFile" in result.stderr
+
+    result = fake_tools.run('list', '-sdir', fake_tools.ServiceDir, '--format', 'ndjson')
+    assert [json.loads(line)['service'] for line in result.stdout.splitlines()] == names
+
+    result = fake_tools.run('list', '-sdir', fake_tools.ServiceDir, '--format', 'csv')
+    assert [row['service'] for row in csv.DictReader(result.stdout.splitlines())] == names
+
+def test_health_json_is_format_alias(fake_tools):
+    generate_units(fake_tools.ServiceDir, 2)
+    outputs = [fake_tools.run('health', '-sdir', fake_tools.ServiceDir, '-k', '1', '--timeout', '0.2', *args).stdout for args in (['--json'], ['--format', 'json'])]
+    rows = [json.loads(output) for output in outputs]
+    assert rows[0] == rows[1]
+    assert [(row['service'], row['healthy']) for row in rows[0]] == [('netapp.bench0', False), ('netapp.bench1', False)]
+
+def test_startup_report_rows(fake_tools):
+    history_path = os.path.join(fake_tools.WorkDir, 'history.jsonl')
+    with open(history_path, 'w') as file:
+        for idx in range(4):
+            file.write(json.dumps([1700000000 + idx, 'netapp.api@1', 'r1', 1000.0, None]) + '\n')
+            file.write(json.dumps([1700100000 + idx, 'netapp.api@2', 'r2', 3000.0, 3500.0]) + '\n')
+
+    result = fake_tools.run('startup-report', '--history', history_path, '--format', 'csv')
+    rows = list(csv.DictReader(result.stdout.splitlines()))
+    assert [(row['service'], row['unit'], row['period'], row['starts'], row['p50_ms']) for row in rows] == [
+        ('netapp.api@', '', 'r1', '4', '1000.0'), ('netapp.api@', '', 'r2', '4', '3500.0')]
+    assert [row['regression'] for row in rows] == ['false', 'true']
+    assert json.loads(fake_tools.run('startup-report', '--history', history_path, '--json').stdout)[1]['change'] == 2.5
+
+def test_logs_rows(fake_tools):
+    names = generate_units(fake_tools.ServiceDir, 2)
+    journal_path = os.path.join(fake_tools.WorkDir, 'journal.json')
+    with open(journal_path, 'w') as file:
+        for idx, (name, priority) in enumerate([(names[0], 6), (names[1], 3), ('other', 3), (names[1], 4)]):
+            file.write(json.dumps({ '__REALTIME_TIMESTAMP': str(1700000000_000000 + idx * 60_000_000), 'PRIORITY': str(priority),
+                                    'SYSLOG_IDENTIFIER': name, 'MESSAGE': f"message {idx}" }) + '\n')
+
+    result = fake_tools.run('logs', '-sdir', fake_tools.ServiceDir, '--from-file', journal_path, '--format', 'ndjson')
+    rows = [json.loads(line) for line in result.stdout.splitlines()]
+    assert [(row['unit'], row['priority'], row['message']) for row in rows] == [
+        (names[0], 'info', 'message 0'), (names[1], 'err', 'message 1'), (names[1], 'warning', 'message 3')]
+
+    result = fake_tools.run('logs', '-sdir', fake_tools.ServiceDir, '--from-file', journal_path, '--summary', '--format', 'json')
+    summary = { row['unit']: row for row in json.loads(result.stdout) }
+    assert (summary[names[1]]['lines'], summary[names[1]]['errors'], summary[names[1]]['warnings']) == (2, 1, 1)
+    assert summary[names[1]]['errors_per_minute'] == 0.5
+
+def test_doctor_rows(fake_tools):
+    names = generate_units(fake_tools.ServiceDir, 2)
+    fake_tools.set_units({ f"{names[1]}.service": { 'ActiveState': 'failed', 'SubState': 'failed', 'NRestarts': '9', 'Result': 'exit-code' } })
+
+    result = fake_tools.run('doctor', '-sdir', fake_tools.ServiceDir, '--format', 'ndjson')
+    assert result.returncode == 1
+    rows = [json.loads(line) for line in result.stdout.splitlines()]
+    assert [(row['unit'], row['crash_loop'], row['restarts'], row['result']) for row in rows] == [
+        (names[0], False, 0, None), (names[1], True, 9, 'exit-code')]
+    assert rows[0]['suggested'] is None and rows[1]['suggested']['RestartSteps'] == '8'
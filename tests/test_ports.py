@@ -0,0 +1,100 @@
+import os
+
+import pytest
+
+from modules.ports import *
+from generate import generate_units
+
+def write_proc_net(proc_net_dir:str, tcp:list[tuple[str,int,str]], tcp6:list[tuple[str,int,str]]):
+    """Fake /proc/net/tcp and tcp6 with (hex address, port, state) rows."""
+    for file_name, rows in (('tcp', tcp), ('tcp6', tcp6)):
+        lines = ["  sl  local_address rem_address   st tx_queue rx_queue tr tm->when retrnsmt   uid  timeout inode"]
+        for idx, (address, port, state) in enumerate(rows):
+            lines.append(f"   {idx}: {address}:{port:04X} {'0' * len(address)}:0000 {state} 00000000:00000000 00:00000000 00000000     0        0 {1000 + idx} 1")
+        with open(os.path.join(proc_net_dir, file_name), 'w') as file:
+            file.write('\n'.join(lines) + '\n')
+
+def test_parse_port_range():
+    assert parse_port_range('5000-5999') == (5000, 5999)
+    assert parse_port_range('8080') == (8080, 8080)
+    for value in ('5999-5000', '0-10', '5000-70000', 'a-b', '5000-'):
+        with pytest.raises(ValueError):
+            parse_port_range(value)
+
+def test_read_listeners(tmp_path):
+    write_proc_net(str(tmp_path), [('0100007F', 5001, '0A'), ('00000000', 5002, '0A'), ('00000000', 5003, '01')],
+                   [('00000000000000000000000001000000', 5004, '0A')])
+    assert read_tcp_listeners(str(tmp_path)) == [('127.0.0.1', 5001), ('0.0.0.0', 5002), ('::1', 5004)]
+    assert read_tcp_listeners(str(tmp_path / 'missing')) == []
+
+def test_auto_allocation_skips_used_ports():
+    index = build_port_index([('netapp.a', 'http://+:5000;https://+:5001'), ('netapp.b', 'http://localhost:5003'), ('netapp.c', None)], None)
+    index.add_listeners([('127.0.0.1', 5004), ('0.0.0.0', 5003)])
+    assert sorted(index.Ports) == [5000, 5001, 5003, 5004]
+    # Listener of configured service is hidden, unknown listener takes port
+    assert [o.Name for o in index.Ports[5003]] == ['netapp.b']
+    assert [o.IsListener for o in index.Ports[5004]] == [True]
+
+    port_range = (5000, 5010)
+    allocated = []
+    for name in ('netapp.d', 'netapp.e', 'netapp.f'):
+        port = index.next_free(port_range)
+        index.reserve(name, parse_urls(f"http://+:{port}")[0])
+        allocated.append(port)
+    assert allocated == [5002, 5005, 5006]
+    # Other range has its own cursor
+    assert index.next_free((5000, 5001)) is None
+    assert index.next_free((5004, 5010)) == 5007
+
+def test_exhausted_range():
+    index = build_port_index([(f"netapp.s{port}", f"http://+:{port}") for port in range(6000, 6004)], None)
+    assert index.next_free((6000, 6003)) is None
+    assert index.next_free((6000, 6003)) is None
+    assert index.next_free((6000, 6004)) == 6004
+    # Ports freed by removed services are found again
+    index.remove_services({ 'netapp.s6001' })
+    assert index.next_free((6000, 6003)) == 6001
+
+def test_conflict_detection():
+    index = build_port_index([('netapp.a', 'http://127.0.0.1:5000'), ('netapp.b', 'http://10.0.0.2:5000'),
+                              ('netapp.c', 'http://+:5001'), ('netapp.d', 'http://10.0.0.3:5001'), ('netapp.e', 'http://localhost:5002')], None)
+    conflicts = index.get_conflicts()
+    # Different specific addresses share port, wildcard overlaps every address
+    assert sorted(conflicts) == [5001]
+    assert [o.Name for o in conflicts[5001]] == ['netapp.c', 'netapp.d']
+
+    names = lambda url, name=None: [o.Name for o in index.find_conflicts(parse_urls(url)[0], name)]
+    assert names('http://+:5000') == ['netapp.a', 'netapp.b']
+    assert names('http://[::1]:5000') == ['netapp.a']
+    assert names('http://10.0.0.9:5000') == []
+    assert names('http://127.0.0.1:5002') == ['netapp.e']
+    # Own ports of service are not conflicts
+    assert names('http://localhost:5002', 'netapp.e') == []
+    assert names('http://+:5010') == []
+
+    index.add_listeners([('0.0.0.0', 5010)])
+    assert [o.Host for o in index.find_conflicts(parse_urls('http://localhost:5010')[0])] == ['0.0.0.0']
+
+def test_add_auto_and_conflicting_urls(fake_tools, tmp_path):
+    generate_units(fake_tools.ServiceDir, 3)
+    write_proc_net(fake_tools.Env['SYSTEMD_NET_PROC_NET_DIR'], [('00000000', 10003, '0A')], [])
+    exec_path = str(tmp_path / 'App')
+    open(exec_path, 'w').close()
+    add = lambda name, *args: fake_tools.run('add', name, exec_path, '-sdir', fake_tools.ServiceDir, '--no-runtime-check', *args)
+
+    result = add('auto', '--aspnetcore-urls', 'auto', '--port-range', '10000-10005')
+    assert result.returncode == 0, result.stderr
+    assert 'Using http://+:10004' in result.stdout
+
+    result = add('taken', '--aspnetcore-urls', 'http://+:10001')
+    assert result.returncode == 1
+    assert 'Port 10001 of http://+:10001 is already used by netapp.bench1' in result.stderr
+    result = add('listened', '--aspnetcore-urls', 'http://localhost:10003')
+    assert result.returncode == 1
+    assert 'already used by listening socket 0.0.0.0' in result.stderr
+
+    result = add('exhausted', '--aspnetcore-urls', 'auto', '--port-range', '10000-10004')
+    assert result.returncode == 1
+    assert 'No free port in range 10000-10004' in result.stderr
+    assert sorted(os.listdir(fake_tools.ServiceDir)) == sorted([f"netapp.bench{idx}.{ext}" for idx in range(3) for ext in ('env', 'service')]
+                                                              + ['netapp.auto.env', 'netapp.auto.service'])
@@ -0,0 +1,91 @@
+import os
+import json
+
+import pytest
+
+from modules.profiles import *
+from modules.NetService import new_service, read_service, read_environment
+
+def write_profile(profiles_dir:str, name:str, data):
+    os.makedirs(profiles_dir, exist_ok=True)
+    with open(os.path.join(profiles_dir, f"{name}.json"), 'w') as file:
+        file.write(data if isinstance(data, str) else json.dumps(data))
+
+@pytest.mark.parametrize('name', list(BUILTIN_PROFILES))
+def test_builtin_profiles_are_valid(tmp_path, name):
+    profile = load_profile(name, str(tmp_path))
+    assert profile.Path is None and profile.validate() == []
+
+@pytest.mark.parametrize('data, errors', [
+    ({ 'service': { 'ExecStart': '/bin/sh' } }, ["unsupported [Service] setting 'ExecStart'"]),
+    ({ 'env': { 'PATH': '/tmp' } }, ["unsupported environment variable 'PATH'"]),
+    ({ 'service': { 'CPUQuota': '50' } }, ["invalid value '50' for CPUQuota"]),
+    ({ 'service': { 'MemoryMax': '1 GB' } }, ["invalid value '1 GB' for MemoryMax"]),
+    ({ 'service': { 'Nice': '-21' } }, ["Nice must be between -20 and 19"]),
+    ({ 'service': { 'IOWeight': '0' } }, ["IOWeight must be between 1 and 10000"]),
+    ({ 'env': { 'DOTNET_gcServer': 'true' } }, ["invalid value 'true' for DOTNET_gcServer"]),
+    ({ 'service': { 'LimitNOFILE': '1024:infinity', 'CPUAffinity': '0-3, 6', 'MemoryHigh': '75%' },
+       'env': { 'DOTNET_GCHeapHardLimit': '0x20000000' } }, []),
+    ({ 'service': { 'User': 'root', 'TasksMax': 'all' }, 'env': { 'DOTNET_TieredPGO': '2' } },
+     ["unsupported [Service] setting 'User'", "invalid value 'all' for TasksMax", "invalid value '2' for DOTNET_TieredPGO"]),
+])
+def test_validate_profile(data, errors):
+    assert ServiceProfile('own', data).validate() == errors
+
+def test_load_profile_from_directory(tmp_path):
+    profiles_dir = str(tmp_path / 'profiles')
+    with pytest.raises(Exception, match="Unknown profile 'fast', available: custom, latency, low-memory, throughput$"):
+        load_profile('fast', profiles_dir)
+
+    # Own file profile is listed and overrides built-in one
+    write_profile(profiles_dir, 'fast', { 'service': { 'Nice': '-10' } })
+    write_profile(profiles_dir, 'custom', { 'env': { 'DOTNET_gcServer': '1' } })
+    assert list_profiles(profiles_dir) == ['custom', 'fast', 'latency', 'low-memory', 'throughput']
+    fast = load_profile('fast', profiles_dir)
+    assert (fast.Path, fast.Service, fast.Environment) == (os.path.join(profiles_dir, 'fast.json'), { 'Nice': '-10' }, {})
+    assert load_profile('custom', profiles_dir).Environment == { 'DOTNET_gcServer': '1' }
+
+    write_profile(profiles_dir, 'bad', { 'service': { 'Restart': 'no' } })
+    with pytest.raises(Exception, match=r"Invalid profile 'bad' \(.*bad.json\): unsupported \[Service\] setting 'Restart'"):
+        load_profile('bad', profiles_dir)
+    write_profile(profiles_dir, 'broken', '{ "service": ')
+    with pytest.raises(Exception, match="Invalid profile .*broken.json"):
+        load_profile('broken', profiles_dir)
+
+def test_profile_round_trip_through_unit(tmp_path):
+    svc_dir = str(tmp_path)
+    svc = new_service(svc_dir, 'netapp.profiled')
+    svc.Params.set_ExecStart('/www/profiled/Profiled')
+    apply_profile(svc, load_profile('low-memory', str(tmp_path / 'profiles')))
+    svc.try_save(svc_dir)
+
+    read = read_service(svc.ServicePath)
+    assert read.Profile == 'low-memory'
+    assert read.Unit.Properties[PROFILE_UNIT_KEY] == 'low-memory'
+    assert all(read.Params.Properties[k] == v for k, v in BUILTIN_PROFILES['low-memory']['service'].items())
+    env = read_environment(read.EnvironmentFile)
+    assert all(env[k] == f'"{v}"' for k, v in BUILTIN_PROFILES['low-memory']['env'].items())
+
+    # Drop-in can change remembered profile
+    dropin_dir = f"{svc.ServicePath}.d"
+    os.makedirs(dropin_dir)
+    with open(os.path.join(dropin_dir, 'override.conf'), 'w') as file:
+        file.write(f"[Unit]\n{PROFILE_UNIT_KEY}=latency\n")
+    assert read_service(svc.ServicePath).Profile == 'latency'
+
+    plain = new_service(svc_dir, 'netapp.plain')
+    plain.Params.set_ExecStart('/www/plain/Plain')
+    plain.try_save(svc_dir)
+    assert read_service(plain.ServicePath).Profile is None
+
+def test_add_with_profile(fake_tools, tmp_path):
+    exec_path = str(tmp_path / 'Api.dll')
+    add = lambda name, *args: fake_tools.run('add', name, exec_path, '-sdir', fake_tools.ServiceDir, '--no-runtime-check',
+                                             '--profiles-dir', str(tmp_path / 'profiles'), *args)
+    result = add('api', '--profile', 'fast')
+    assert result.returncode == 1 and "Unknown profile 'fast'" in result.stderr
+    assert os.listdir(fake_tools.ServiceDir) == []
+
+    result = add('api', '--profile', 'throughput')
+    assert result.returncode == 0, result.stderr
+    assert read_service(os.path.join(fake_tools.ServiceDir, 'netapp.api.service')).Profile == 'throughput'
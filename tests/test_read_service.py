@@ -0,0 +1,60 @@
+import os
+
+from modules.NetService import read_service
+from modules.services import parse_unit_file
+
+HAND_WRITTEN_UNIT = """# Written by hand
+[Unit]
+Description=Hand written service
+After=network.target
+
+[Service]
+WorkingDirectory=/www/hand
+ExecStart=/www/hand/Hand
+EnvironmentFile={env_path}
+"""
+
+def write_unit(tmp_path, text:str, name:str="netapp.hand")->tuple[str,str]:
+    svc_path = os.path.join(tmp_path, f"{name}.service")
+    env_path = os.path.join(tmp_path, f"{name}.env")
+    with open(svc_path, 'w') as file:
+        file.write(text.format(env_path=env_path))
+    with open(env_path, 'w') as file:
+        file.write('ASPNETCORE_URLS="http://+:5000"\n')
+    return svc_path, env_path
+
+def test_read_service_has_no_defaults(tmp_path):
+    svc_path, _ = write_unit(str(tmp_path), HAND_WRITTEN_UNIT)
+    svc = read_service(svc_path)
+    assert list(svc.Unit.Properties) == ['Description', 'After']
+    assert list(svc.Params.Properties) == ['WorkingDirectory', 'ExecStart', 'EnvironmentFile']
+    assert svc.Install.Properties == {}
+    assert svc.ExecUser is None
+
+def test_read_then_save_keeps_unit(tmp_path):
+    svc_path, env_path = write_unit(str(tmp_path), HAND_WRITTEN_UNIT)
+    with open(svc_path, 'rb') as file:
+        before = file.read()
+    before_stat = os.stat(svc_path)
+
+    result = read_service(svc_path).try_save(str(tmp_path))
+    assert result.Unchanged
+    with open(svc_path, 'rb') as file:
+        assert file.read() == before
+    assert os.stat(svc_path).st_ino == before_stat.st_ino
+    assert not os.path.exists(f"{svc_path}.bak")
+
+def test_saved_edit_writes_only_own_settings(tmp_path):
+    svc_path, env_path = write_unit(str(tmp_path), HAND_WRITTEN_UNIT)
+    svc = read_service(svc_path)
+    svc.Params.Properties['Restart'] = 'on-failure'
+    result = svc.try_save(str(tmp_path))
+    assert result.UnitChanged and not result.EnvChanged
+
+    data = parse_unit_file(svc_path)
+    assert data['Unit'] == { 'Description': 'Hand written service', 'After': 'network.target' }
+    assert data['Service'] == {
+        'WorkingDirectory': '/www/hand', 'ExecStart': '/www/hand/Hand',
+        'EnvironmentFile': env_path, 'Restart': 'on-failure',
+    }
+    assert 'Install' not in data
@@ -0,0 +1,159 @@
+import os
+
+import pytest
+
+import modules.releases
+from modules.releases import *
+from modules.NetService import read_service
+from generate import generate_units
+
+def write_publish(publish_dir:str, files:dict[str,str]):
+    for rel, content in files.items():
+        path = os.path.join(publish_dir, rel)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as file:
+            file.write(content)
+
+def make_releases(app_dir:str, names:list[str]):
+    for name in names:
+        os.makedirs(os.path.join(app_dir, RELEASES_SUBDIR, name))
+
+def test_release_hardlinks_unchanged_files(tmp_path):
+    app_dir, publish_dir = str(tmp_path / 'app'), str(tmp_path / 'publish')
+    write_publish(publish_dir, { 'App.dll': 'app v1', 'App.runtimeconfig.json': '{}', 'wwwroot/site.css': 'body {}' })
+    os.symlink('App.dll', os.path.join(publish_dir, 'Alias.dll'))
+
+    first = create_release(app_dir, publish_dir)
+    assert (first.Copied, first.Linked, first.Hashed, first.CopiedBytes) == (3, 0, 3, len('app v1') + len('{}') + len('body {}'))
+    assert os.readlink(os.path.join(first.Path, 'Alias.dll')) == 'App.dll'
+    switch_release(app_dir, first.Name)
+
+    # Unchanged size and mtime reuse hash of previous manifest
+    second = create_release(app_dir, publish_dir)
+    assert second.Name == f"{first.Name}-2"
+    assert (second.Copied, second.Linked, second.Hashed) == (0, 3, 0)
+    for rel in ('App.dll', 'wwwroot/site.css'):
+        assert os.stat(os.path.join(second.Path, rel)).st_ino == os.stat(os.path.join(first.Path, rel)).st_ino
+    switch_release(app_dir, second.Name)
+
+    # Touched file with same content is hashed and still linked, changed one is copied
+    os.utime(os.path.join(publish_dir, 'wwwroot/site.css'))
+    write_publish(publish_dir, { 'App.dll': 'app v2' })
+    third = create_release(app_dir, publish_dir)
+    assert (third.Copied, third.Linked, third.Hashed) == (1, 2, 2)
+    assert os.stat(os.path.join(third.Path, 'App.dll')).st_ino != os.stat(os.path.join(second.Path, 'App.dll')).st_ino
+    with open(os.path.join(third.Path, 'App.dll'), 'r') as file:
+        assert file.read() == 'app v2'
+    assert read_release_manifest(third.Path)['App.dll'][2] == hash_file(os.path.join(publish_dir, 'App.dll'))
+    # Files of older release are never overwritten
+    with open(os.path.join(second.Path, 'App.dll'), 'r') as file:
+        assert file.read() == 'app v1'
+
+def test_failed_release_is_removed(tmp_path, monkeypatch):
+    app_dir, publish_dir = str(tmp_path / 'app'), str(tmp_path / 'publish')
+    write_publish(publish_dir, { 'App.dll': 'app' })
+    def failing_hash(path:str)->str:
+        raise OSError('read error')
+    monkeypatch.setattr(modules.releases, 'hash_file', failing_hash)
+    with pytest.raises(OSError):
+        create_release(app_dir, publish_dir)
+    assert list_releases(app_dir) == []
+
+def test_switch_release(tmp_path):
+    app_dir = str(tmp_path / 'app')
+    make_releases(app_dir, ['r1', 'r2'])
+    assert get_current_release(app_dir) is None
+    switch_release(app_dir, 'r2')
+    switch_release(app_dir, 'r1')
+    # Link is relative, so app dir can be moved
+    assert os.readlink(os.path.join(app_dir, CURRENT_LINK)) == os.path.join(RELEASES_SUBDIR, 'r1')
+    assert get_current_release(app_dir) == 'r1'
+    assert sorted(os.listdir(app_dir)) == [CURRENT_LINK, RELEASES_SUBDIR]
+
+@pytest.mark.parametrize('current, keep, kept', [
+    ('r6', 3, ['r4', 'r5', 'r6']),
+    ('r6', 1, ['r6']),
+    ('r6', 0, ['r6']),
+    ('r6', 10, ['r1', 'r2', 'r3', 'r4', 'r5', 'r6']),
+    # After rollback: current, releases before it and newer ones are kept
+    ('r4', 3, ['r2', 'r3', 'r4', 'r5', 'r6']),
+    ('r2', 2, ['r1', 'r2', 'r3', 'r4', 'r5', 'r6']),
+    ('r1', 1, ['r1', 'r2', 'r3', 'r4', 'r5', 'r6']),
+    # Without current link newest release is protected
+    (None, 2, ['r5', 'r6']),
+])
+def test_prune_keeps_current_and_previous(tmp_path, current, keep, kept):
+    app_dir = str(tmp_path / 'app')
+    releases = [f"r{idx}" for idx in range(1, 7)]
+    make_releases(app_dir, releases)
+    if current is not None:
+        switch_release(app_dir, current)
+    removed = prune_releases(app_dir, keep)
+    assert list_releases(app_dir) == kept
+    assert removed == [name for name in releases if name not in kept]
+
+def test_deploy_and_rollback(fake_tools, tmp_path):
+    names = generate_units(fake_tools.ServiceDir, 2)
+    releases_dir = str(tmp_path / 'apps')
+    publish_dir = str(tmp_path / 'publish')
+    write_publish(publish_dir, { 'App0.dll': 'v1', 'appsettings.json': '{}' })
+    deploy = lambda *args: fake_tools.run('deploy', names[0], publish_dir, '-sdir', fake_tools.ServiceDir, '--releases-dir', releases_dir, *args)
+
+    result = deploy('--no-restart')
+    assert result.returncode == 0, result.stderr
+    app_dir = os.path.join(releases_dir, names[0])
+    svc = read_service(os.path.join(fake_tools.ServiceDir, f"{names[0]}.service"))
+    assert svc.Params.Properties['WorkingDirectory'] == os.path.join(app_dir, CURRENT_LINK)
+    assert svc.Params.Properties['ExecStart'].endswith(os.path.join(app_dir, CURRENT_LINK, 'App0.dll'))
+    assert fake_tools.calls() == [['daemon-reload']]
+
+    write_publish(publish_dir, { 'App0.dll': 'v2' })
+    result = deploy('--timeout', '5')
+    assert result.returncode == 0, result.stderr
+    assert '1 files copied (2 bytes), 1 hardlinked to previous release' in result.stdout
+    # Unit is unchanged, only restarted
+    assert fake_tools.calls().count(['daemon-reload']) == 1
+    assert [argv for argv in fake_tools.calls() if argv[0] == 'restart'] == [['restart', names[0]]]
+    first, second = list_releases(app_dir)
+    assert get_current_release(app_dir) == second
+
+    result = fake_tools.run('rollback', names[0], '-sdir', fake_tools.ServiceDir, '--no-restart')
+    assert result.returncode == 0, result.stderr
+    assert f"switched from {second} to {first}" in result.stdout
+    assert get_current_release(app_dir) == first
+    with open(os.path.join(app_dir, CURRENT_LINK, 'App0.dll'), 'r') as file:
+        assert file.read() == 'v1'
+
+    result = fake_tools.run('rollback', names[0], '-sdir', fake_tools.ServiceDir, '--no-restart')
+    assert result.returncode == 1 and f"No release older than {first}" in result.stderr
+    result = fake_tools.run('rollback', names[0], second, '-sdir', fake_tools.ServiceDir, '--no-restart')
+    assert result.returncode == 0, result.stderr
+    result = fake_tools.run('rollback', names[0], '-sdir', fake_tools.ServiceDir, '--list')
+    assert result.stdout.splitlines() == [f"  {first}", f"* {second}"]
+
+    # Services not deployed have no releases
+    result = fake_tools.run('rollback', names[1], '-sdir', fake_tools.ServiceDir)
+    assert result.returncode == 1 and 'was not deployed' in result.stderr
+
+def test_deploy_prunes_old_releases(fake_tools, tmp_path):
+    names = generate_units(fake_tools.ServiceDir, 1)
+    releases_dir = str(tmp_path / 'apps')
+    publish_dir = str(tmp_path / 'publish')
+    for idx in range(4):
+        write_publish(publish_dir, { 'App0.dll': f"v{idx}" })
+        result = fake_tools.run('deploy', names[0], publish_dir, '-sdir', fake_tools.ServiceDir, '--releases-dir', releases_dir, '--keep', '2', '--no-restart')
+        assert result.returncode == 0, result.stderr
+    app_dir = os.path.join(releases_dir, names[0])
+    releases = list_releases(app_dir)
+    assert len(releases) == 2 and get_current_release(app_dir) == releases[-1]
+    with open(os.path.join(app_dir, RELEASES_SUBDIR, releases[0], 'App0.dll'), 'r') as file:
+        assert file.read() == 'v2'
+
+def test_new_release_sorts_after_existing(tmp_path):
+    app_dir, publish_dir = str(tmp_path / 'app'), str(tmp_path / 'publish')
+    write_publish(publish_dir, { 'App.dll': 'app' })
+    # Clock is behind newest release, or names of the same second were pruned
+    make_releases(app_dir, ['29990101000000', '29990101000000-9'])
+    names = [create_release(app_dir, publish_dir).Name for _ in range(2)]
+    assert names == ['29990101000000-10', '29990101000000-11']
+    assert list_releases(app_dir) == ['29990101000000', '29990101000000-9'] + names
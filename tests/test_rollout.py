@@ -0,0 +1,119 @@
+import time
+import threading
+
+import pytest
+
+from modules.rollout import *
+from generate import generate_units
+
+class FakeRestarts:
+    """Restart callable recording calls, units become active (as fake systemctl reports) after their delay."""
+
+    def __init__(self, fake_tools, delays:Optional[dict[str,float]]=None, failing:Optional[set[str]]=None):
+        self.Tools = fake_tools
+        self.Delays = delays or {}
+        self.Failing = failing or set()
+        self.Calls:list[tuple[str,float]] = []
+        self.Units:dict[str,dict[str,str]] = {}
+        self._lock = threading.Lock()
+
+    def set_state(self, unit:str, **properties:str):
+        with self._lock:
+            self.Units[f"{unit}.service"] = properties
+            self.Tools.set_units(self.Units)
+
+    def __call__(self, unit:str)->bool:
+        with self._lock:
+            self.Calls.append((unit, time.monotonic()))
+        if unit in self.Failing:
+            return False
+        self.set_state(unit, ActiveState='activating')
+        # Like `systemctl restart` of Type=notify unit, call returns when unit is active
+        time.sleep(self.Delays.get(unit, 0.0))
+        self.set_state(unit, ActiveState='active', ActiveEnterTimestampMonotonic=str(int(time.monotonic() * 1_000_000)))
+        return True
+
+def test_split_waves():
+    assert split_waves([1, 2, 3, 4, 5], 2) == [[1, 2], [3, 4], [5]]
+    assert split_waves([1, 2], 0) == [[1], [2]]
+    assert split_waves([], 3) == []
+
+def test_waves_restart_in_order(fake_tools):
+    restarts = FakeRestarts(fake_tools, { 'a': 0.2, 'c': 0.1 })
+    reported:list[list[str]] = []
+    rollouts = restart_in_waves([(unit, None) for unit in 'abcde'], 2, 5.0, restart=restarts,
+                                report=lambda wave: reported.append([r.Unit for r in wave]))
+    assert [(r.Unit, r.Wave, r.Result) for r in rollouts] == [('a', 1, 'ready'), ('b', 1, 'ready'), ('c', 2, 'ready'), ('d', 2, 'ready'), ('e', 3, 'ready')]
+    assert reported == [['a', 'b'], ['c', 'd'], ['e']]
+    # Next wave is restarted only after every unit of previous wave is ready
+    called = dict(restarts.Calls)
+    for first, then in ((('a', 'b'), ('c', 'd')), (('c', 'd'), ('e',))):
+        assert max(called[u] + restarts.Delays.get(u, 0.0) for u in first) <= min(called[u] for u in then)
+
+@pytest.mark.parametrize('on_failure', [ROLLOUT_ABORT, ROLLOUT_CONTINUE])
+def test_failed_wave(fake_tools, on_failure):
+    restarts = FakeRestarts(fake_tools, failing={ 'c' })
+    rollouts = restart_in_waves([(unit, None) for unit in 'abcde'], 2, 5.0, on_failure=on_failure, restart=restarts)
+    results = [(r.Unit, r.Result, r.Error) for r in rollouts]
+    if on_failure == ROLLOUT_ABORT:
+        assert results == [('a', 'ready', ''), ('b', 'ready', ''), ('c', 'failed', 'systemctl restart failed'), ('d', 'ready', ''), ('e', 'skipped', '')]
+        assert sorted(unit for unit, _ in restarts.Calls) == ['a', 'b', 'c', 'd']
+    else:
+        assert [r.Result for r in rollouts] == ['ready', 'ready', 'failed', 'ready', 'ready']
+
+def test_unit_failing_after_restart_aborts(fake_tools):
+    restarts = FakeRestarts(fake_tools)
+    def restart(unit:str)->bool:
+        restarts(unit)
+        if unit == 'a':
+            restarts.set_state(unit, ActiveState='failed', SubState='failed')
+        return True
+    rollouts = restart_in_waves([(unit, None) for unit in 'abc'], 1, 5.0, restart=restart)
+    assert [(r.Result, r.Error) for r in rollouts] == [('failed', 'unit failed (failed)'), ('skipped', ''), ('skipped', '')]
+
+def test_timeout(fake_tools):
+    fake_tools.set_units({ 'a.service': { 'ActiveState': 'activating' } })
+    started = time.monotonic()
+    rollouts = restart_in_waves([('a', None), ('b', None)], 1, 0.3, restart=lambda unit: True)
+    assert [(r.Result, r.Error) for r in rollouts] == [('timeout', 'not active after 0.3s'), ('skipped', '')]
+    assert time.monotonic() - started < 2.0
+
+def test_ready_in_is_counted_per_unit(fake_tools):
+    restarts = FakeRestarts(fake_tools, { 'slow': 0.6, 'fast': 0.05 })
+    rollouts = restart_in_waves([('slow', None), ('fast', None)], 2, 5.0, restart=restarts)
+    ready_in = { r.Unit: r.ReadyIn for r in rollouts }
+    # Fast unit is not reported as slow as the slowest unit of its wave
+    assert ready_in['fast'] == pytest.approx(0.05, abs=0.1)
+    assert ready_in['slow'] == pytest.approx(0.6, abs=0.1)
+    assert all(r.RestartedAt is not None for r in rollouts)
+
+def test_ready_in_without_systemd_timestamp(fake_tools):
+    def restart(unit:str)->bool:
+        time.sleep(0.3 if unit == 'slow' else 0.0)
+        return True
+    rollouts = restart_in_waves([('slow', None), ('fast', None)], 2, 5.0, restart=restart)
+    # Unit is seen active by first poll after all restarts of wave returned
+    assert [r.Result for r in rollouts] == ['ready', 'ready']
+    assert all(0.0 <= r.ReadyIn < 1.0 for r in rollouts)
+
+def test_restart_command(fake_tools):
+    names = generate_units(fake_tools.ServiceDir, 5)
+    result = fake_tools.run('restart', 'bench*', '-sdir', fake_tools.ServiceDir, '--wave-size', '2', '--timeout', '5')
+    assert result.returncode == 0, result.stderr
+    assert sorted(argv[1] for argv in fake_tools.calls() if argv[0] == 'restart') == names
+    assert 'Restarting 5 units in 3 waves of up to 2' in result.stdout
+    assert 'wave 3: netapp.bench4 ready' in result.stdout
+
+    # Unit of first wave fails, later waves are skipped
+    fake_tools.set_units({ f"{names[1]}.service": { 'ActiveState': 'failed', 'SubState': 'failed' } })
+    calls_before = len(fake_tools.calls())
+    result = fake_tools.run('restart', 'bench*', '-sdir', fake_tools.ServiceDir, '--wave-size', '2', '--timeout', '5')
+    assert result.returncode == 1
+    restarted = [argv[1] for argv in fake_tools.calls()[calls_before:] if argv[0] == 'restart']
+    assert sorted(restarted) == names[:2]
+    assert f"wave 1: {names[1]} failed" in result.stdout and 'wave 2:' not in result.stdout
+    # Skipped units are listed in final table
+    assert result.stdout.count('skipped') == 3
+
+    result = fake_tools.run('restart', 'missing*', '-sdir', fake_tools.ServiceDir)
+    assert result.returncode == 1 and "No services match 'missing*'" in result.stdout
@@ -0,0 +1,150 @@
+import os
+import json
+from typing import Optional
+
+import pytest
+
+from modules.runtimes import *
+
+NETCORE_APP = 'Microsoft.NETCore.App'
+INSTALLED = ['6.0.5', '8.0.1', '8.0.3', '8.1.0', '8.2.0', '9.0.0-preview.1', '9.0.2']
+PAST_NS = 1_000_000_000_000_000_000
+
+def make_dotnet_root(root:str, frameworks:dict[str,list[str]])->str:
+    for framework, versions in frameworks.items():
+        for version in versions:
+            os.makedirs(os.path.join(root, 'shared', framework, version))
+    # Changes made by the test must change mtimes of directories
+    for framework in frameworks:
+        os.utime(os.path.join(root, 'shared', framework), ns=(PAST_NS, PAST_NS))
+    os.utime(os.path.join(root, 'shared'), ns=(PAST_NS, PAST_NS))
+    return root
+
+def write_app(app_dir:str, name:str, runtime_options:dict, apphost:Optional[int]=None)->str:
+    os.makedirs(app_dir, exist_ok=True)
+    dll_path = os.path.join(app_dir, f"{name}.dll")
+    with open(dll_path, 'w') as file:
+        file.write('')
+    with open(os.path.join(app_dir, f"{name}.runtimeconfig.json"), 'w') as file:
+        json.dump({ 'runtimeOptions': runtime_options }, file)
+    if apphost is not None:
+        with open(os.path.join(app_dir, name), 'w') as file:
+            file.write('')
+        os.chmod(os.path.join(app_dir, name), apphost)
+    return dll_path
+
+def test_scan_shared_frameworks(tmp_path):
+    root = str(tmp_path / 'dotnet')
+    make_dotnet_root(root, { NETCORE_APP: list(reversed(INSTALLED)) + ['not-a-version'], 'Microsoft.AspNetCore.App': ['8.0.3'] })
+    with open(os.path.join(root, 'shared', 'LICENSE.txt'), 'w') as file:
+        file.write('')
+    frameworks = scan_dotnet_frameworks(root)
+    # Versions are in version order, not by name (9.0.0-preview.1 < 9.0.2, 10 > 9)
+    assert frameworks == { NETCORE_APP: INSTALLED, 'Microsoft.AspNetCore.App': ['8.0.3'] }
+    assert scan_dotnet_frameworks(str(tmp_path / 'missing')) == {}
+
+def test_scan_cache_is_invalidated_by_install(tmp_path):
+    root = make_dotnet_root(str(tmp_path / 'dotnet'), { NETCORE_APP: ['8.0.1'] })
+    cache_dir = str(tmp_path / 'cache')
+    assert scan_dotnet_frameworks(root, cache_dir) == { NETCORE_APP: ['8.0.1'] }
+
+    # Unchanged tree is answered from cache
+    cache_path = os.path.join(cache_dir, DOTNET_RUNTIMES_CACHE)
+    with open(cache_path, 'r') as file:
+        cache = json.load(file)
+    cache['frameworks'][NETCORE_APP].append('cached')
+    with open(cache_path, 'w') as file:
+        json.dump(cache, file)
+    assert scan_dotnet_frameworks(root, cache_dir) == { NETCORE_APP: ['8.0.1', 'cached'] }
+
+    os.makedirs(os.path.join(root, 'shared', NETCORE_APP, '10.0.0'))
+    assert scan_dotnet_frameworks(root, cache_dir) == { NETCORE_APP: ['8.0.1', '10.0.0'] }
+    os.makedirs(os.path.join(root, 'shared', 'Microsoft.AspNetCore.App', '10.0.0'))
+    assert scan_dotnet_frameworks(root, cache_dir)['Microsoft.AspNetCore.App'] == ['10.0.0']
+
+    with open(cache_path, 'w') as file:
+        file.write('{ broken')
+    assert scan_dotnet_frameworks(root, cache_dir)[NETCORE_APP] == ['8.0.1', '10.0.0']
+
+@pytest.mark.parametrize('requested, roll_forward, resolved', [
+    ('8.0.1', 'Disable', '8.0.1'),
+    ('8.0.2', 'Disable', None),
+    ('8.0.0', 'LatestPatch', '8.0.3'),
+    ('8.0.4', 'LatestPatch', None),
+    ('8.0.0', 'Minor', '8.0.3'),
+    # No patch of requested minor: lowest higher minor, its latest patch
+    ('8.0.4', 'Minor', '8.1.0'),
+    ('8.0.4', 'LatestMinor', '8.2.0'),
+    ('7.0.0', 'Minor', None),
+    ('7.0.0', 'LatestMinor', None),
+    ('7.0.0', 'Major', '8.0.3'),
+    ('6.0.0', 'Major', '6.0.5'),
+    ('7.0.0', 'LatestMajor', '9.0.2'),
+    ('10.0.0', 'Major', None),
+    # Pre-release frameworks only for pre-release requests
+    ('9.0.0', 'Minor', '9.0.2'),
+    ('9.0.0-preview.1', 'Disable', '9.0.0-preview.1'),
+    ('9.0.0-preview.0', 'LatestPatch', '9.0.2'),
+    ('9.0', 'Minor', '9.0.2'),
+    ('bad', 'Minor', None),
+])
+def test_resolve_framework_version(requested, roll_forward, resolved):
+    assert resolve_framework_version(requested, INSTALLED, roll_forward) == resolved
+
+@pytest.mark.parametrize('options, roll_forward, self_contained', [
+    ({ 'framework': { 'name': NETCORE_APP, 'version': '8.0.0' } }, 'Minor', False),
+    ({ 'framework': { 'name': NETCORE_APP, 'version': '8.0.0' }, 'rollForward': 'latestMajor' }, 'LatestMajor', False),
+    ({ 'framework': { 'name': NETCORE_APP, 'version': '8.0.0' }, 'rollForwardOnNoCandidateFx': 2 }, 'Major', False),
+    ({ 'includedFrameworks': [{ 'name': NETCORE_APP, 'version': '8.0.3' }] }, 'Minor', True),
+])
+def test_read_runtimeconfig(tmp_path, options, roll_forward, self_contained):
+    config = read_runtimeconfig(write_app(str(tmp_path), 'App', options))
+    assert (config.RollForward, config.IsSelfContained) == (roll_forward, self_contained)
+    assert read_runtimeconfig(str(tmp_path / 'Other.dll')) is None
+
+def test_find_missing_frameworks(tmp_path, monkeypatch):
+    root = make_dotnet_root(str(tmp_path / 'dotnet'), { NETCORE_APP: INSTALLED, 'Microsoft.AspNetCore.App': ['8.0.3'] })
+    monkeypatch.setenv('DOTNET_ROOT', root)
+    assert get_dotnet_root('/nonexistent/dotnet') == root
+    config = read_runtimeconfig(write_app(str(tmp_path / 'app'), 'App', { 'frameworks': [
+        { 'name': NETCORE_APP, 'version': '8.0.0' }, { 'name': 'Microsoft.AspNetCore.App', 'version': '9.0.0' } ] }))
+    assert find_missing_frameworks(config) == ['Microsoft.AspNetCore.App 9.0.0']
+
+    monkeypatch.delenv('DOTNET_ROOT')
+    assert get_dotnet_root(str(tmp_path / 'missing')) is None
+    assert find_missing_frameworks(config, str(tmp_path / 'missing')) == [f"{NETCORE_APP} 8.0.0", 'Microsoft.AspNetCore.App 9.0.0']
+    # Root of host is found through symlink, like /usr/bin/dotnet
+    os.symlink(os.path.join(root, 'dotnet'), str(tmp_path / 'dotnet-link'))
+    with open(os.path.join(root, 'dotnet'), 'w') as file:
+        file.write('')
+    assert get_dotnet_root(str(tmp_path / 'dotnet-link')) == root
+
+@pytest.mark.parametrize('exec_name, apphost, options, expected', [
+    # Framework-dependent .dll runs through dotnet host even with apphost next to it
+    ('App.dll', 0o755, { 'framework': { 'name': NETCORE_APP, 'version': '8.0.0' } }, ('App.dll', 'dotnet')),
+    ('App.dll', None, { 'framework': { 'name': NETCORE_APP, 'version': '8.0.0' } }, ('App.dll', 'dotnet')),
+    # Self-contained app runs its apphost
+    ('App.dll', 0o755, { 'includedFrameworks': [{ 'name': NETCORE_APP, 'version': '8.0.3' }] }, ('App', None)),
+    ('App', 0o755, { 'framework': { 'name': NETCORE_APP, 'version': '8.0.0' } }, ('App', None)),
+    # Not executable apphost is not used
+    ('App', 0o644, { 'framework': { 'name': NETCORE_APP, 'version': '8.0.0' } }, ('App', 'dotnet')),
+])
+def test_resolve_exec_start(tmp_path, exec_name, apphost, options, expected):
+    app_dir = str(tmp_path / 'app')
+    write_app(app_dir, 'App', options, apphost=apphost)
+    exec_path = os.path.join(app_dir, exec_name)
+    config = read_runtimeconfig(exec_path)
+    path, dotnet = resolve_exec_start(exec_path, config, 'dotnet')
+    assert (os.path.relpath(path, app_dir), dotnet) == expected
+
+def test_add_rejects_missing_runtime(fake_tools, tmp_path, monkeypatch):
+    monkeypatch.setenv('DOTNET_ROOT', make_dotnet_root(str(tmp_path / 'dotnet'), { NETCORE_APP: ['8.0.1'] }))
+    exec_path = write_app(str(tmp_path / 'app'), 'App', { 'framework': { 'name': NETCORE_APP, 'version': '9.0.0' } })
+    result = fake_tools.run('add', 'app', exec_path, '-sdir', fake_tools.ServiceDir)
+    assert result.returncode == 1
+    assert f"Required .NET runtime not installed (Minor roll forward): {NETCORE_APP} 9.0.0" in result.stderr
+    assert os.listdir(fake_tools.ServiceDir) == []
+
+    exec_path = write_app(str(tmp_path / 'app'), 'App', { 'framework': { 'name': NETCORE_APP, 'version': '8.0.0' } })
+    result = fake_tools.run('add', 'app', exec_path, '-sdir', fake_tools.ServiceDir)
+    assert result.returncode == 0, result.stderr
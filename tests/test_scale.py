@@ -0,0 +1,108 @@
+import os
+import json
+
+from modules.ports import build_port_index
+from modules.urls import parse_urls
+from generate import generate_units
+
+def write_listeners(proc_net_dir:str, ports:list[int]):
+    lines = ["  sl  local_address rem_address   st tx_queue rx_queue tr tm->when retrnsmt   uid  timeout inode"]
+    for idx, port in enumerate(ports):
+        lines.append(f"   {idx}: 00000000:{port:04X} 00000000:0000 0A 00000000:00000000 00:00000000 00000000     0        0 {1000 + idx} 1")
+    with open(os.path.join(proc_net_dir, 'tcp'), 'w') as file:
+        file.write('\n'.join(lines) + '\n')
+
+def read_instance_urls(svc_dir:str, template_name:str)->dict[str,str]:
+    urls:dict[str,str] = {}
+    for name in sorted(os.listdir(svc_dir)):
+        if name.startswith(template_name) and name.endswith('.env'):
+            with open(os.path.join(svc_dir, name), 'r') as file:
+                urls[name[len(template_name):-4]] = [line for line in file.read().splitlines() if line.startswith('ASPNETCORE_URLS=')][0]
+    return urls
+
+def test_removed_services_free_their_ports():
+    index = build_port_index([('netapp.a@1', 'http://+:5000'), ('netapp.a@2', 'http://+:5001'), ('netapp.b', 'http://+:5002')], None)
+    index.add_listeners([('0.0.0.0', 5000), ('127.0.0.1', 5003)])
+    index.remove_services({ 'netapp.a@1', 'netapp.a@2' })
+    # Listener of removed instance stays hidden, unknown listener is kept
+    assert sorted(index.Ports) == [5002, 5003]
+    assert index.next_free((5000, 5010)) == 5000
+    assert index.find_conflicts(parse_urls('http://+:5003')[0]) != []
+
+def test_scale_skips_ports_used_by_other_services(fake_tools):
+    names = generate_units(fake_tools.ServiceDir, 3)
+    # Ports 10000-10002 belong to generated services, 10003 to unknown listener
+    write_listeners(fake_tools.Env['SYSTEMD_NET_PROC_NET_DIR'], [10000, 10001, 10003])
+    result = fake_tools.run('scale', names[0], '5', '-sdir', fake_tools.ServiceDir, '--no-pin', '--port-range', '20000-20010')
+    assert result.returncode == 0, result.stderr
+    assert 'already used by netapp.bench1' in result.stderr and 'already used by listening socket' in result.stderr
+
+    template = f"{names[0]}@"
+    assert read_instance_urls(fake_tools.ServiceDir, template) == {
+        '1': 'ASPNETCORE_URLS="http://+:10000"', '2': 'ASPNETCORE_URLS="http://+:20000"', '3': 'ASPNETCORE_URLS="http://+:20001"',
+        '4': 'ASPNETCORE_URLS="http://+:20002"', '5': 'ASPNETCORE_URLS="http://+:10004"',
+    }
+
+    # Scaling again keeps ports of own instances
+    result = fake_tools.run('scale', names[0], '3', '-sdir', fake_tools.ServiceDir, '--no-pin', '--port-range', '20000-20010')
+    assert result.returncode == 0, result.stderr
+    assert list(read_instance_urls(fake_tools.ServiceDir, template).values()) == [
+        'ASPNETCORE_URLS="http://+:10000"', 'ASPNETCORE_URLS="http://+:20000"', 'ASPNETCORE_URLS="http://+:20001"']
+
+    result = fake_tools.run('ports', '-sdir', fake_tools.ServiceDir, '--no-listeners', '--conflicts', '--format', 'ndjson')
+    assert (result.returncode, result.stdout) == (0, '')
+
+def test_scale_fails_without_free_port(fake_tools):
+    names = generate_units(fake_tools.ServiceDir, 2)
+    result = fake_tools.run('scale', names[0], '3', '-sdir', fake_tools.ServiceDir, '--no-pin', '--port-range', '10000-10001')
+    assert result.returncode == 1
+    assert 'No free port in range 10000-10001' in result.stderr
+    # Nothing was written
+    assert os.path.isfile(os.path.join(fake_tools.ServiceDir, f"{names[0]}.service"))
+    assert not os.path.exists(os.path.join(fake_tools.ServiceDir, f"{names[0]}@.service"))
+
+def test_delete_scaled_service(fake_tools):
+    names = generate_units(fake_tools.ServiceDir, 2)
+    result = fake_tools.run('scale', names[0], '3', '-sdir', fake_tools.ServiceDir, '--no-pin')
+    assert result.returncode == 0, result.stderr
+    before = sorted(os.listdir(fake_tools.ServiceDir))
+    assert f"{names[0]}.service.bak" in before and f"{names[0]}@2.service.d" in before
+
+    result = fake_tools.run('del', names[0], '-sdir', fake_tools.ServiceDir)
+    assert result.returncode == 1
+    assert 'Use --force' in result.stderr
+
+    result = fake_tools.run('del', names[0], '-sdir', fake_tools.ServiceDir, '--force', '--cleanup')
+    assert result.returncode == 0, result.stderr
+    assert sorted(os.listdir(fake_tools.ServiceDir)) == [f"{names[1]}.env", f"{names[1]}.service"]
+    assert ['disable', '--now', '--'] in fake_tools.calls()
+
+    result = fake_tools.run('list', '-sdir', fake_tools.ServiceDir, '--format', 'ndjson')
+    assert [json.loads(line)['service'] for line in result.stdout.splitlines()] == [names[1]]
+
+def test_start_and_stop_scaled_service(fake_tools):
+    names = generate_units(fake_tools.ServiceDir, 2)
+    result = fake_tools.run('scale', names[0], '3', '-sdir', fake_tools.ServiceDir, '--no-pin')
+    assert result.returncode == 0, result.stderr
+    units = [f"{names[0]}@{idx}" for idx in (1, 2, 3)]
+
+    # Instance 2 is still running, only stopped ones are started
+    fake_tools.set_units({ f"{unit}.service": { 'ActiveState': 'inactive' } for unit in (units[0], units[2]) })
+    os.remove(fake_tools.CallsLog)
+    result = fake_tools.run('start', names[0], '-sdir', fake_tools.ServiceDir)
+    assert result.returncode == 0, result.stderr
+    assert sorted(argv for argv in fake_tools.calls() if argv[0] == 'start') == [['start', units[0]], ['start', units[2]]]
+
+    fake_tools.set_units({})
+    os.remove(fake_tools.CallsLog)
+    result = fake_tools.run('stop', names[0], '-sdir', fake_tools.ServiceDir)
+    assert result.returncode == 0, result.stderr
+    assert sorted(argv for argv in fake_tools.calls() if argv[0] == 'stop') == [['stop', unit] for unit in units]
+
+    os.remove(fake_tools.CallsLog)
+    result = fake_tools.run('stop', names[1], '-sdir', fake_tools.ServiceDir)
+    assert result.returncode == 0, result.stderr
+    assert [argv for argv in fake_tools.calls() if argv[0] == 'stop'] == [['stop', names[1]]]
+
+    result = fake_tools.run('start', 'missing', '-sdir', fake_tools.ServiceDir)
+    assert result.returncode == 1 and 'Service not found' in result.stderr
@@ -0,0 +1,102 @@
+import os
+
+from modules.NetService import read_service, read_environment
+from generate import generate_units
+
+def set_env(fake_tools, *args:str):
+    if os.path.isfile(fake_tools.CallsLog):
+        os.remove(fake_tools.CallsLog)
+    return fake_tools.run('set-env', *args, '-sdir', fake_tools.ServiceDir)
+
+def restarted(fake_tools)->list[str]:
+    return sorted(argv[1] for argv in fake_tools.calls() if argv[0] == 'try-restart')
+
+def file_keys(svc_dir:str)->dict[str,tuple[int,int]]:
+    return { name: (os.stat(os.path.join(svc_dir, name)).st_ino, os.stat(os.path.join(svc_dir, name)).st_mtime_ns) for name in os.listdir(svc_dir) }
+
+def append_env(env_path:str, line:str):
+    with open(env_path, 'a') as file:
+        file.write(f"\n{line}\n")
+
+def test_set_env_rewrites_and_restarts_only_changed(fake_tools):
+    names = generate_units(fake_tools.ServiceDir, 3)
+    before = file_keys(fake_tools.ServiceDir)
+    result = set_env(fake_tools, 'FEATURE_X=on', '--services', 'bench1')
+    assert result.returncode == 0, result.stderr
+    assert restarted(fake_tools) == [names[1]]
+    assert read_environment(os.path.join(fake_tools.ServiceDir, f"{names[1]}.env"))['FEATURE_X'] == '"on"'
+    after = file_keys(fake_tools.ServiceDir)
+    assert [name for name in before if after.get(name) != before[name]] == [f"{names[1]}.env"]
+
+    # Same value again writes and restarts nothing
+    after = file_keys(fake_tools.ServiceDir)
+    result = set_env(fake_tools, 'FEATURE_X=on', '--services', 'bench1')
+    assert result.returncode == 0, result.stderr
+    assert 'up to date' in result.stdout
+    assert restarted(fake_tools) == []
+    assert file_keys(fake_tools.ServiceDir) == after
+
+    # Unset of variable set only by some services
+    result = set_env(fake_tools, '--unset', 'FEATURE_X')
+    assert result.returncode == 0, result.stderr
+    assert restarted(fake_tools) == [names[1]]
+
+def test_set_env_dry_run_and_no_restart(fake_tools):
+    names = generate_units(fake_tools.ServiceDir, 2)
+    before = file_keys(fake_tools.ServiceDir)
+    result = set_env(fake_tools, 'FEATURE_X=on', '--dry-run')
+    assert result.returncode == 0, result.stderr
+    assert f"write {os.path.join(fake_tools.ServiceDir, names[0])}.env" in result.stdout
+    assert file_keys(fake_tools.ServiceDir) == before
+    assert fake_tools.calls() == []
+
+    result = set_env(fake_tools, 'FEATURE_X=on', '--no-restart')
+    assert result.returncode == 0, result.stderr
+    assert restarted(fake_tools) == []
+    assert all(read_environment(os.path.join(fake_tools.ServiceDir, f"{name}.env"))['FEATURE_X'] == '"on"' for name in names)
+
+    assert set_env(fake_tools, 'BAD KEY=1').returncode == 2
+    assert set_env(fake_tools).returncode == 2
+    assert set_env(fake_tools, 'A=1', '--services', 'missing').returncode == 1
+
+def test_base_env_skips_services_overriding_key(fake_tools):
+    names = generate_units(fake_tools.ServiceDir, 3)
+    env_dir = os.path.join(fake_tools.WorkDir, 'env')
+    base_path = os.path.join(env_dir, 'common.env')
+    # Own env file is loaded after base file, its value wins
+    append_env(os.path.join(fake_tools.ServiceDir, f"{names[2]}.env"), 'FEATURE_X="own"')
+
+    result = set_env(fake_tools, 'FEATURE_X=base', '--base', 'common', '--env-dir', env_dir)
+    assert result.returncode == 0, result.stderr
+    assert restarted(fake_tools) == names[:2]
+    assert read_environment(base_path) == { 'FEATURE_X': '"base"' }
+    assert fake_tools.calls().count(['daemon-reload']) == 1
+    for name in names:
+        svc = read_service(os.path.join(fake_tools.ServiceDir, f"{name}.service"))
+        assert svc.BaseEnvironmentFiles == [base_path]
+        assert svc.ResolvedEnvironment['FEATURE_X'] == ('"own"' if name == names[2] else '"base"')
+
+    # Shared file changes services outside of --services that reference it too, units are not written again
+    units_before = { name: os.stat(os.path.join(fake_tools.ServiceDir, f"{name}.service")).st_mtime_ns for name in names }
+    result = set_env(fake_tools, 'FEATURE_X=changed', '--base', 'common', '--env-dir', env_dir, '--services', 'bench0')
+    assert result.returncode == 0, result.stderr
+    assert restarted(fake_tools) == names[:2]
+    assert ['daemon-reload'] not in fake_tools.calls()
+    assert units_before == { name: os.stat(os.path.join(fake_tools.ServiceDir, f"{name}.service")).st_mtime_ns for name in names }
+
+def test_base_env_restarts_template_instances(fake_tools):
+    names = generate_units(fake_tools.ServiceDir, 2)
+    result = fake_tools.run('scale', names[0], '3', '-sdir', fake_tools.ServiceDir, '--no-pin')
+    assert result.returncode == 0, result.stderr
+    env_dir = os.path.join(fake_tools.WorkDir, 'env')
+    # Instance env file is the last layer
+    append_env(os.path.join(fake_tools.ServiceDir, f"{names[0]}@2.env"), 'FEATURE_X="instance"')
+
+    result = set_env(fake_tools, 'FEATURE_X=base', '--base', 'common', '--env-dir', env_dir)
+    assert result.returncode == 0, result.stderr
+    assert restarted(fake_tools) == [f"{names[0]}@1", f"{names[0]}@3", names[1]]
+
+    # Key set only in own env files of services, instances of template inherit it
+    result = set_env(fake_tools, 'OTHER=1')
+    assert result.returncode == 0, result.stderr
+    assert restarted(fake_tools) == [f"{names[0]}@1", f"{names[0]}@2", f"{names[0]}@3", names[1]]
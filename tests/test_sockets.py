@@ -0,0 +1,67 @@
+import os
+
+import pytest
+
+from modules.sockets import *
+from modules.NetService import read_service, read_environment
+
+@pytest.mark.parametrize('url, listen', [
+    ('http://+:5000', '5000'),
+    ('http://*:5000', '5000'),
+    ('http://0.0.0.0:5000', '5000'),
+    ('http://localhost:5001', '127.0.0.1:5001'),
+    ('http://10.0.0.5:5002', '10.0.0.5:5002'),
+    ('http://[::1]:5003', '[::1]:5003'),
+    ('https://+', '443'),
+])
+def test_format_listen_address(url, listen):
+    assert format_listen_address(parse_urls(url)[0]) == listen
+
+def test_socket_names_are_unique():
+    urls = parse_urls('http://localhost:5000;http://10.0.0.5:5000;http://+:5001')
+    assert get_socket_names('netapp.api', urls) == ['netapp.api-5000.socket', 'netapp.api-5000-2.socket', 'netapp.api-5001.socket']
+
+def test_socket_units_written_and_deleted_with_service(fake_tools, tmp_path):
+    exec_path = str(tmp_path / 'Api.dll')
+    name = 'netapp.api'
+    sockets = [f"{name}-5000.socket", f"{name}-5001.socket"]
+    result = fake_tools.run('add', 'api', exec_path, '-sdir', fake_tools.ServiceDir, '--no-runtime-check',
+                            '--aspnetcore-urls', 'http://+:5000;http://localhost:5001', '--socket-activation')
+    assert result.returncode == 0, result.stderr
+    assert f"Enable them with: sudo systemctl enable --now {' '.join(sockets)}" in result.stdout
+    assert sorted(os.listdir(fake_tools.ServiceDir)) == sorted([f"{name}.env", f"{name}.service"] + sockets)
+    assert fake_tools.calls() == [['daemon-reload']]
+
+    # Sockets are read back from service unit
+    svc = read_service(os.path.join(fake_tools.ServiceDir, f"{name}.service"))
+    assert get_service_sockets(svc) == sockets
+    assert (svc.Params.Properties['Type'], svc.Params.Properties['NotifyAccess']) == ('notify', 'main')
+    assert svc.Unit.Properties['Requires'] == svc.Unit.Properties['After'] == ' '.join(sockets)
+    assert read_environment(svc.EnvironmentFile)['ASPNETCORE_PREFERHOSTINGURLS'] == '"false"'
+    for socket_name, listen in zip(sockets, ['5000', '127.0.0.1:5001']):
+        with open(os.path.join(fake_tools.ServiceDir, socket_name), 'r') as file:
+            content = file.read()
+        assert f"ListenStream={listen}\n" in content
+        assert f"Service={name}.service\n" in content and f"PartOf={name}.service\n" in content
+
+    # Existing socket unit is not overwritten by another service
+    result = fake_tools.run('add', 'api', exec_path, '-sdir', fake_tools.ServiceDir, '--no-runtime-check',
+                            '--aspnetcore-urls', 'http://+:5000', '--socket-activation')
+    assert result.returncode == 1
+
+    os.remove(fake_tools.CallsLog)
+    result = fake_tools.run('del', name, '-sdir', fake_tools.ServiceDir, '--force')
+    assert result.returncode == 0, result.stderr
+    assert os.listdir(fake_tools.ServiceDir) == []
+    calls = fake_tools.calls()
+    # Sockets are stopped before service so they cannot activate it again
+    disables = [argv for argv in calls if argv[0] == 'disable']
+    assert disables[:2] == [['disable', '--now', sockets[0]], ['disable', '--now', sockets[1]]]
+    assert calls.index(disables[1]) < calls.index(['stop', name])
+    assert calls.count(['daemon-reload']) == 1
+
+def test_socket_activation_requires_ports(fake_tools, tmp_path):
+    result = fake_tools.run('add', 'api', str(tmp_path / 'Api.dll'), '-sdir', fake_tools.ServiceDir, '--no-runtime-check', '--socket-activation')
+    assert result.returncode == 1
+    assert 'Socket activation requires ASPNETCORE_URLS with ports' in result.stderr
+    assert os.listdir(fake_tools.ServiceDir) == []
@@ -0,0 +1,138 @@
+import os
+import json
+import math
+import time
+import random
+
+import pytest
+
+from modules.startup import *
+
+DAY = 86400
+# Median start time of every release, r2 of api is slow, web stays flat
+RELEASE_MEDIANS = { 'netapp.api@': [1000, 1600, 1050], 'netapp.web': [400, 420, 410] }
+
+def write_history(path:str, seed:int=3, starts:int=30)->list[list]:
+    """Replayable history of three releases a day apart, ends with line cut by crash while appending."""
+    rng = random.Random(seed)
+    rows:list[list] = []
+    started = 1760000000
+    for release_idx in range(3):
+        for idx in range(starts):
+            for service, medians in RELEASE_MEDIANS.items():
+                unit = f"{service}{idx % 3 + 1}" if service.endswith('@') else service
+                activation = round(medians[release_idx] * rng.uniform(0.8, 1.2), 1)
+                ready = round(activation + rng.uniform(50, 150), 1) if idx % 4 else None
+                rows.append([started + release_idx * DAY + idx * 60, unit, f"r{release_idx + 1}", activation, ready])
+    with open(path, 'w') as file:
+        for row in rows:
+            file.write(json.dumps(row, separators=(',', ':')) + '\n')
+        file.write('not json\n["too", "short"]\n')
+        file.write('[1760999999,"netapp.web","r3",41')
+    return rows
+
+def expected_stats(rows:list[list], metric:str)->dict[tuple[str,str],list[float]]:
+    groups:dict[tuple[str,str],list[float]] = {}
+    for started, unit, release, activation, ready in rows:
+        service = f"{unit.split('@')[0]}@" if '@' in unit else unit
+        value = ready if metric == 'ready' and ready is not None else activation
+        groups.setdefault((service, release), []).append(value)
+    return { key: sorted(values) for key, values in groups.items() }
+
+def nearest_rank(values:list[float], p:float)->float:
+    return values[math.ceil(p / 100 * len(values)) - 1]
+
+def test_percentile_is_nearest_rank():
+    values = [float(v) for v in range(1, 101)]
+    assert [percentile(values, p) for p in (1, 50, 90, 99, 100)] == [1.0, 50.0, 90.0, 99.0, 100.0]
+    assert [percentile([5.0], p) for p in (0, 50, 100)] == [5.0, 5.0, 5.0]
+    assert percentile([1.0, 2.0, 3.0, 4.0], 50) == 2.0
+
+@pytest.mark.parametrize('metric', ['ready', 'activation'])
+def test_replayed_history_matches_recorded_starts(tmp_path, metric):
+    history_path = str(tmp_path / 'history.jsonl')
+    rows = write_history(history_path)
+    assert len(list(read_startup_history(history_path))) == len(rows)
+
+    report = build_startup_stats(read_startup_history(history_path), 'release', metric)
+    expected = expected_stats(rows, metric)
+    assert [(s.Service, s.Period) for s in report] == [(service, f"r{idx}") for service in sorted(RELEASE_MEDIANS) for idx in (1, 2, 3)]
+    for stats in report:
+        durations = expected[(stats.Service, stats.Period)]
+        assert stats.Durations == durations
+        assert [stats.get(p) for p in (50, 90, 99)] == [nearest_rank(durations, p) for p in (50, 90, 99)]
+        previous = expected.get((stats.Service, f"r{int(stats.Period[1]) - 1}"))
+        if previous is None:
+            assert stats.Previous is None and stats.Change is None
+        else:
+            assert stats.Change == pytest.approx(nearest_rank(durations, 50) / nearest_rank(previous, 50) - 1)
+
+    flagged = { (s.Service, s.Period) for s in report if s.is_regression(20.0) }
+    assert flagged == { ('netapp.api@', 'r2') }
+
+def test_history_grouped_by_day_and_week(tmp_path):
+    history_path = str(tmp_path / 'history.jsonl')
+    rows = write_history(history_path, starts=5)
+    by_day = build_startup_stats(read_startup_history(history_path), 'day')
+    days = sorted(set(datetime.fromtimestamp(row[0]).strftime('%Y-%m-%d') for row in rows))
+    assert sorted(set(s.Period for s in by_day)) == days
+    assert sum(len(s.Durations) for s in by_day) == len(rows)
+    by_week = build_startup_stats(read_startup_history(history_path), 'week')
+    assert all(s.Period.startswith('2025-W') for s in by_week)
+    assert sum(len(s.Durations) for s in by_week) == len(rows)
+
+def test_appended_history_replays_in_order(tmp_path):
+    history_path = str(tmp_path / 'nested' / 'history.jsonl')
+    first = [StartupRecord(1760000000, 'netapp.api@1', 'r1', 900.0, 1000.0)]
+    second = [StartupRecord(1760000060, 'netapp.api@2', None, 800.5), StartupRecord(1760000061, 'netapp.web', 'r1', 300.0, None)]
+    append_startup_history(first, history_path)
+    append_startup_history([], history_path)
+    append_startup_history(second, history_path)
+    replayed = list(read_startup_history(history_path))
+    assert [r.to_row() for r in replayed] == [r.to_row() for r in first + second]
+    assert [r.Service for r in replayed] == ['netapp.api@', 'netapp.api@', 'netapp.web']
+    assert [r.get_duration('ready') for r in replayed] == [1000.0, 800.5, 300.0]
+    assert get_period(replayed[1], 'release') == '-'
+    assert list(read_startup_history(str(tmp_path / 'missing.jsonl'))) == []
+
+def test_collect_startups_from_unit_timestamps(fake_tools):
+    since = 100.0
+    fake_tools.set_units({
+        'netapp.fast.service': { 'InactiveExitTimestampMonotonic': '100500000', 'ActiveEnterTimestampMonotonic': '100750000' },
+        'netapp.probed.service': { 'InactiveExitTimestampMonotonic': '101000000', 'ActiveEnterTimestampMonotonic': '101200000' },
+        'netapp.old.service': { 'InactiveExitTimestampMonotonic': '50000000', 'ActiveEnterTimestampMonotonic': '50100000' },
+        'netapp.failed.service': { 'ActiveState': 'failed', 'InactiveExitTimestampMonotonic': '100100000', 'ActiveEnterTimestampMonotonic': '0' },
+        'netapp.missing.service': None,
+    })
+    units = [(name, 'r7') for name in ('netapp.fast', 'netapp.probed', 'netapp.old', 'netapp.failed', 'netapp.missing')]
+    before = int(time.time())
+    records = collect_startups(units, since, { 'netapp.probed': 103.5 })
+    assert [argv[0] for argv in fake_tools.calls()] == ['show']
+    assert [(r.Unit, r.Release, r.ActivationMs, r.ReadyMs) for r in records] == [
+        ('netapp.fast', 'r7', 250.0, None), ('netapp.probed', 'r7', 200.0, 2500.0)]
+    assert all(r.Time >= before for r in records)
+
+    history_path = os.path.join(fake_tools.WorkDir, 'history.jsonl')
+    record_startups(units, since, None, history_path)
+    assert [r.Unit for r in read_startup_history(history_path)] == ['netapp.fast', 'netapp.probed']
+
+def test_startup_report_check_replays_history(fake_tools, tmp_path):
+    history_path = str(tmp_path / 'history.jsonl')
+    rows = write_history(history_path)
+    # Latest release recovered, nothing to flag
+    result = fake_tools.run('startup-report', '--history', history_path, '--check', '--format', 'ndjson')
+    assert result.returncode == 0, result.stderr
+    assert len(result.stdout.splitlines()) == 6
+
+    with open(history_path, 'a') as file:
+        file.write('\n' + '\n'.join(json.dumps([1760999999 + idx, 'netapp.web', 'r4', 900.0, None]) for idx in range(3)) + '\n')
+    result = fake_tools.run('startup-report', 'web', '--history', history_path, '--check', '--metric', 'activation', '--format', 'ndjson')
+    assert result.returncode == 1
+    report = [json.loads(line) for line in result.stdout.splitlines()]
+    assert [(row['period'], row['starts'], row['regression']) for row in report] == [('r1', 30, False), ('r2', 30, False), ('r3', 30, False), ('r4', 3, True)]
+    assert report[3]['change'] == pytest.approx(900.0 / nearest_rank(expected_stats(rows, 'activation')[('netapp.web', 'r3')], 50) - 1, abs=1e-4)
+
+    # Releases with too few starts are skipped, r3 is latest again
+    result = fake_tools.run('startup-report', 'web', '--history', history_path, '--check', '--min-starts', '5', '--format', 'ndjson')
+    assert result.returncode == 0
+    assert [json.loads(line)['period'] for line in result.stdout.splitlines()] == ['r1', 'r2', 'r3']
@@ -0,0 +1,49 @@
+import os
+import re
+import sys
+import json
+import subprocess
+
+import pytest
+
+from conftest import SRC_DIR, CLI_PATH
+
+# Imports done before command is known, generous for slow CI machines (about 45 ms on a laptop)
+IMPORTS_LIMIT_MS = 150
+# Modules only some commands need, they are imported by those commands
+COMMAND_ONLY_MODULES = ['modules.NetService', 'modules.status', 'modules.dbus', 'modules.cgroups', 'modules.output',
+                        'modules.inventory', 'tabulate', 'concurrent.futures', 'socket', 'ssl', 'tomllib']
+
+def get_modules_after(code:str)->set[str]:
+    result = subprocess.run([sys.executable, '-c', f"import sys, json; sys.path.insert(0, {SRC_DIR!r}); {code}; print(json.dumps(list(sys.modules)))"],
+                            stdout=subprocess.PIPE, text=True, check=True)
+    return set(json.loads(result.stdout.splitlines()[-1]))
+
+def test_dispatcher_imports_no_command_modules():
+    loaded = get_modules_after("import modules.core, modules.application")
+    assert [name for name in COMMAND_ONLY_MODULES if name in loaded] == []
+
+def test_command_loads_only_its_modules():
+    loaded = get_modules_after("import modules.core; modules.core.parse_args(['del', 'app'])")
+    assert 'modules.commands.delete' in loaded
+    assert [name for name in loaded if name.startswith('modules.commands.') and name != 'modules.commands.delete'] == []
+    assert [name for name in ('modules.status', 'modules.dbus', 'modules.cgroups', 'modules.output', 'tabulate') if name in loaded] == []
+
+def test_list_loads_no_bus_client():
+    loaded = get_modules_after("import modules.core; modules.core.parse_args(['list'])")
+    assert 'modules.commands.list' in loaded and 'modules.status' in loaded
+    assert [name for name in ('modules.dbus', 'socket', 'ssl', 'tabulate', 'concurrent.futures') if name in loaded] == []
+
+@pytest.mark.parametrize('args', [['restart', 'app'], ['metrics']])
+def test_state_commands_load_bus_client_only_when_used(args):
+    loaded = get_modules_after(f"import modules.core; modules.core.parse_args({args!r})")
+    assert 'modules.status' in loaded and 'modules.dbus' not in loaded
+
+def test_startup_imports_time(tmp_path):
+    env = dict(os.environ, SYSTEMD_NET_CACHE_DIR=str(tmp_path / 'cache'))
+    timings = []
+    for _ in range(5):
+        result = subprocess.run([sys.executable, CLI_PATH, '--profile-startup', 'list', '-sdir', str(tmp_path)],
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, env=env)
+        timings.append(float(re.search(r'^\s+imports\s+([\d.]+) ms', result.stderr, re.M).group(1)))
+    assert min(timings) < IMPORTS_LIMIT_MS, timings
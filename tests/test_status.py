@@ -0,0 +1,27 @@
+from generate import generate_units
+from modules.status import get_services_status, parse_systemctl_show
+
+def test_list_queries_all_units_with_one_call(fake_tools):
+    names = generate_units(fake_tools.ServiceDir, 50)
+    result = fake_tools.run('list', '-sdir', fake_tools.ServiceDir, '--format', 'ndjson')
+    assert result.returncode == 0, result.stderr
+    assert len(result.stdout.splitlines()) == len(names)
+    # Not is-enabled and is-active of every unit (2N calls)
+    assert [argv[0] for argv in fake_tools.calls()] == ['show']
+
+def test_blocks_are_matched_by_id(fake_tools):
+    fake_tools.set_units({
+        'netapp.a.service': { 'ActiveState': 'failed', 'NRestarts': '3' },
+        'netapp.missing.service': None,
+        'netapp.c@2.service': { 'ActiveState': 'activating', 'MainPID': '77' },
+    })
+    statuses = get_services_status(['netapp.a', 'netapp.missing', 'netapp.b', 'netapp.c@2.service'])
+    assert [argv[0] for argv in fake_tools.calls()] == ['show']
+    assert (statuses['netapp.a'].Active, statuses['netapp.a'].NRestarts) == ('failed', 3)
+    assert statuses['netapp.missing'].Properties == {}
+    assert statuses['netapp.b'].Active == 'active'
+    assert (statuses['netapp.c@2.service'].Active, statuses['netapp.c@2.service'].MainPID) == ('activating', 77)
+
+def test_parse_systemctl_show_blocks():
+    output = "Id=a.service\nActiveState=active\n\n\nId=b.service\nDescription=x=y\n"
+    assert parse_systemctl_show(output) == [{ 'Id': 'a.service', 'ActiveState': 'active' }, { 'Id': 'b.service', 'Description': 'x=y' }]
@@ -0,0 +1,108 @@
+import os
+
+import pytest
+
+import modules.NetService
+from modules.NetService import *
+
+def new_saved_service(svc_dir:str)->NetService:
+    svc = new_service(svc_dir, 'netapp.saved')
+    svc.Params.set_ExecStart('/www/saved/Saved')
+    svc.ASPNETCORE_URLS = 'http://+:5000'
+    result = svc.try_save(svc_dir)
+    assert (result.UnitChanged, result.EnvChanged, result.NeedsReload, result.NeedsRestart) == (True, True, True, True)
+    return svc
+
+def read_file(path:str)->str:
+    with open(path, 'r') as file:
+        return file.read()
+
+def test_second_save_writes_nothing(tmp_path):
+    svc_dir = str(tmp_path)
+    svc = new_saved_service(svc_dir)
+    before = { name: os.stat(os.path.join(svc_dir, name)) for name in os.listdir(svc_dir) }
+    assert sorted(before) == ['netapp.saved.env', 'netapp.saved.service']
+
+    # Generated header has time of save, it is not part of content
+    result = read_service(svc.ServicePath).try_save(svc_dir)
+    assert result.Unchanged and not result.NeedsReload and not result.NeedsRestart
+    result = svc.try_save(svc_dir)
+    assert result.Unchanged
+    after = { name: os.stat(os.path.join(svc_dir, name)) for name in os.listdir(svc_dir) }
+    assert sorted(after) == sorted(before)
+    assert all((after[n].st_ino, after[n].st_mtime_ns) == (before[n].st_ino, before[n].st_mtime_ns) for n in before)
+
+def test_changed_env_needs_restart_only(tmp_path):
+    svc_dir = str(tmp_path)
+    svc = new_saved_service(svc_dir)
+    unit_ino = os.stat(svc.ServicePath).st_ino
+    env_ino = os.stat(svc.EnvironmentFile).st_ino
+    old_env = read_file(svc.EnvironmentFile)
+
+    svc.ASPNETCORE_URLS = 'http://+:5001'
+    result = svc.try_save(svc_dir)
+    assert (result.UnitChanged, result.EnvChanged, result.NeedsReload, result.NeedsRestart) == (False, True, False, True)
+    assert os.stat(svc.ServicePath).st_ino == unit_ino
+    assert not os.path.exists(f"{svc.ServicePath}.bak")
+    # Old file is kept as .bak hardlink, new content is renamed over it
+    assert os.stat(f"{svc.EnvironmentFile}.bak").st_ino == env_ino
+    assert read_file(f"{svc.EnvironmentFile}.bak") == old_env
+    assert os.stat(svc.EnvironmentFile).st_ino != env_ino
+    assert 'ASPNETCORE_URLS="http://+:5001"' in read_file(svc.EnvironmentFile)
+
+def test_changed_unit_needs_reload(tmp_path):
+    svc_dir = str(tmp_path)
+    svc = new_saved_service(svc_dir)
+    old_unit = read_file(svc.ServicePath)
+    svc.Params.Properties['Restart'] = 'on-failure'
+    synced_dirs:set[str] = set()
+    result = svc.try_save(svc_dir, synced_dirs=synced_dirs)
+    assert (result.UnitChanged, result.EnvChanged, result.NeedsReload, result.NeedsRestart) == (True, False, True, True)
+    assert synced_dirs == { svc_dir }
+    assert read_file(f"{svc.ServicePath}.bak") == old_unit
+    assert 'Restart=on-failure' in read_file(svc.ServicePath)
+
+    # Next backup replaces previous one
+    svc.Params.Properties['Restart'] = 'always'
+    svc.try_save(svc_dir)
+    assert 'Restart=on-failure' in read_file(f"{svc.ServicePath}.bak")
+    assert sorted(os.listdir(svc_dir)) == ['netapp.saved.env', 'netapp.saved.service', 'netapp.saved.service.bak']
+
+def test_save_without_rewrite(tmp_path):
+    svc_dir = str(tmp_path)
+    new_saved_service(svc_dir)
+    svc = new_service(svc_dir, 'netapp.saved')
+    assert svc.try_save(svc_dir, rewrite=False) is False
+
+def test_is_same_content(tmp_path):
+    path = str(tmp_path / 'unit.service')
+    assert not is_same_content(path, '[Service]\nExecStart=/a\n')
+    with open(path, 'w') as file:
+        file.write('# Generated 01/01/2026\n[Service]\n  ExecStart=/a\n\n; note\n')
+    assert is_same_content(path, '# Generated 02/01/2026\n\n[Service]\nExecStart=/a')
+    assert not is_same_content(path, '[Service]\nExecStart=/b\n')
+    assert not is_same_content(path, '[Service]\nExecStart=/a\nUser=www-data\n')
+
+def test_write_file_atomic(tmp_path):
+    path = str(tmp_path / 'file.env')
+    write_file_atomic(path, 'A=1\n', chmod=0o600)
+    assert read_file(path) == 'A=1\n'
+    assert os.stat(path).st_mode & 0o777 == 0o600
+    assert not os.path.exists(f"{path}.bak")
+
+    write_file_atomic(path, 'A=2\n', backup=False)
+    assert read_file(path) == 'A=2\n'
+    assert os.listdir(str(tmp_path)) == ['file.env']
+
+def test_failed_write_keeps_file(tmp_path, monkeypatch):
+    path = str(tmp_path / 'file.env')
+    write_file_atomic(path, 'A=1\n')
+    def failing_replace(src, dst):
+        raise OSError('disk full')
+    monkeypatch.setattr(modules.NetService.os, 'replace', failing_replace)
+    with pytest.raises(OSError):
+        write_file_atomic(path, 'A=2\n', backup=False)
+    monkeypatch.undo()
+    # Temp file is removed, old content stays
+    assert os.listdir(str(tmp_path)) == ['file.env']
+    assert read_file(path) == 'A=1\n'
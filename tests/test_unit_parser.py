@@ -0,0 +1,180 @@
+import os
+import random
+
+import pytest
+
+from modules.NetService import *
+from modules.services import parse_unit_file, merge_unit_files, collapse_values, is_list_key
+
+SEEDS = range(40)
+SECTIONS = ['Unit', 'Service', 'Install']
+SCALAR_KEYS = ['Description', 'Restart', 'RestartSec', 'User', 'KillSignal']
+LIST_KEYS = ['After', 'Wants', 'Environment', 'ExecStartPre', 'ConditionPathExists', 'WantedBy']
+COMMENTS = ['# comment', '; comment', '#', '# not continued \\']
+
+def random_value(rng:random.Random, allow_empty:bool=True)->str:
+    if allow_empty and rng.random() < 0.15:
+        return ''
+    words = [''.join(rng.choice('abcxyz019/._-=') for _ in range(rng.randint(1, 6))) for _ in range(rng.randint(1, 4))]
+    return ' '.join(words)
+
+def random_assignments(rng:random.Random, count:int)->list[tuple[str,str,str]]:
+    assignments = []
+    for _ in range(count):
+        key = rng.choice(SCALAR_KEYS + LIST_KEYS)
+        assignments.append((rng.choice(SECTIONS), key, random_value(rng)))
+    return assignments
+
+def render_assignment(rng:random.Random, key:str, value:str)->list[str]:
+    """Assignment with random spacing, split into backslash continuations with comments between them."""
+    words = value.split(' ')
+    parts:list[list[str]] = [[]]
+    for word in words:
+        if len(parts[-1]) > 0 and rng.random() < 0.4:
+            parts.append([])
+        parts[-1].append(word)
+    lines = [f"{key}{rng.choice(['=', ' =', '= ', ' = '])}{' '.join(parts[0])}"]
+    for part in parts[1:]:
+        lines[-1] += rng.choice(['\\', ' \\'])
+        lines += [rng.choice(COMMENTS) for _ in range(rng.randint(0, 2))]
+        lines.append(f"{' ' * rng.randint(0, 4)}{' '.join(part)}")
+    return lines
+
+def render_unit(rng:random.Random, assignments:list[tuple[str,str,str]])->str:
+    lines = [rng.choice(COMMENTS)]
+    section = None
+    for name, key, value in assignments:
+        if name != section or rng.random() < 0.1: # repeated headers continue the same section
+            lines.append(f"[{name}]")
+            section = name
+        lines += render_assignment(rng, key, value)
+        lines += [rng.choice(COMMENTS + ['']) for _ in range(rng.randint(0, 1))]
+    return '\n'.join(lines) + rng.choice(['', '\n'])
+
+def expected_sections(assignments:list[tuple[str,str,str]])->dict[str,dict[str,str]]:
+    expected:dict[str,dict[str,list[str]]] = {}
+    for name, key, value in assignments:
+        values = expected.setdefault(name, {}).setdefault(key, [])
+        if is_list_key(key):
+            values.append(value)
+        else:
+            values[:] = [value]
+    return { name: { key: '\n'.join(values) for key, values in props.items() } for name, props in expected.items() }
+
+def expected_effective(files:list[tuple[str,list[tuple[str,str,str]]]])->dict[str,dict[str,list[tuple[str,str]]]]:
+    effective:dict[str,dict[str,list[tuple[str,str]]]] = {}
+    for source, assignments in files:
+        for name, key, value in assignments:
+            section = effective.setdefault(name, {})
+            if not is_list_key(key):
+                section[key] = [(value, source)]
+            elif value == '':
+                section[key] = []
+            else:
+                section.setdefault(key, []).append((value, source))
+    return effective
+
+def write_file(path:str, text:str)->str:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as file:
+        file.write(text)
+    return path
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_parse_matches_assignments(tmp_path, seed):
+    rng = random.Random(seed)
+    assignments = random_assignments(rng, rng.randint(1, 25))
+    path = write_file(str(tmp_path / 'a.service'), render_unit(rng, assignments))
+    assert parse_unit_file(path) == expected_sections(assignments)
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_empty_assignment_resets_list(tmp_path, seed):
+    rng = random.Random(seed)
+    assignments = [('Unit', 'After', random_value(rng)) for _ in range(rng.randint(1, 10))]
+    path = write_file(str(tmp_path / 'a.service'), render_unit(rng, assignments))
+    values = [value for _, _, value in assignments]
+    if '' in values:
+        values = values[len(values) - values[::-1].index(''):]
+    assert collapse_values(parse_unit_file(path)['Unit']['After']) == '\n'.join(values)
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_merge_applies_files_in_order(tmp_path, seed):
+    rng = random.Random(seed)
+    files = []
+    for idx in range(rng.randint(1, 5)):
+        assignments = random_assignments(rng, rng.randint(1, 12))
+        path = write_file(str(tmp_path / f"{idx}.conf"), render_unit(rng, assignments))
+        files.append((path, assignments))
+    merged = merge_unit_files([(path, parse_unit_file(path)) for path, _ in files])
+    # List keys reset by the last file stay as empty lists
+    assert merged == expected_effective(files)
+
+def test_continuation_skips_comment_lines(tmp_path):
+    path = write_file(str(tmp_path / 'a.service'), "[Service]\nExecStart=/usr/bin/dotnet \\\n# --urls x \\\n  ; other\n   /www/app/App.dll \\\n  --port 5\nRestart=no\n")
+    assert parse_unit_file(path) == { 'Service': { 'ExecStart': '/usr/bin/dotnet /www/app/App.dll --port 5', 'Restart': 'no' } }
+
+def test_dropins_follow_systemd_order(tmp_path):
+    svc_dir = str(tmp_path)
+    rng = random.Random(7)
+    unit_name = 'netapp-api-v2@blue'
+    dir_names = get_dropin_dir_names(unit_name)
+    assert dir_names == ['service.d', 'netapp-.service.d', 'netapp-api-.service.d', 'netapp-api-v2@.service.d', 'netapp-api-v2@blue.service.d']
+    winners:dict[str,str] = {}
+    for level, dir_name in enumerate(dir_names):
+        for conf in rng.sample(['10-a.conf', '20-b.conf', '50-c.conf', '90-z.conf'], rng.randint(1, 3)):
+            winners[conf] = write_file(os.path.join(svc_dir, dir_name, conf), f"[Service]\nRestart=level{level}\n")
+    write_file(os.path.join(svc_dir, 'netapp-api-v2@blue.service.d', 'ignored.txt'), "[Service]\nRestart=never\n")
+    write_file(os.path.join(svc_dir, 'other.service.d', '99-other.conf'), "[Service]\nRestart=never\n")
+    assert find_dropins(svc_dir, unit_name) == [winners[conf] for conf in sorted(winners)]
+    assert find_dropins(svc_dir, unit_name, set(dir_names[1:2])) == sorted(
+        os.path.join(svc_dir, dir_names[1], name) for name in os.listdir(os.path.join(svc_dir, dir_names[1])))
+
+def test_dropin_overrides_and_resets_unit(tmp_path):
+    svc_dir = str(tmp_path)
+    svc_path = write_file(os.path.join(svc_dir, 'netapp.api.service'),
+        "[Unit]\nDescription=Api\nAfter=network.target\nAfter=db.service\n\n[Service]\nExecStart=/www/api/Api\nRestart=always\n")
+    write_file(os.path.join(svc_dir, 'netapp.api.service.d', '10-restart.conf'), "[Service]\nRestart=on-failure\n")
+    write_file(os.path.join(svc_dir, 'netapp.api.service.d', '20-after.conf'), "[Unit]\nAfter=\nAfter=cache.service\n")
+    write_file(os.path.join(svc_dir, 'service.d', '20-after.conf'), "[Unit]\nAfter=never.service\n")
+    svc = read_service(svc_path)
+    assert svc.get_effective('Service', 'Restart') == 'on-failure'
+    assert svc.get_effective_values('Unit', 'After') == [('cache.service', os.path.join(svc_dir, 'netapp.api.service.d', '20-after.conf'))]
+    # Unit file itself keeps its own values
+    assert svc.Unit.Properties['After'] == 'network.target\ndb.service'
+    assert svc.Params.Properties['Restart'] == 'always'
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_environment_precedence(tmp_path, seed):
+    rng = random.Random(seed)
+    svc_dir = str(tmp_path)
+    # Lowest precedence first: Environment= lines, shared base file, own env file, EnvironmentFile= of drop-in
+    layers = ['unit', 'base', 'own', 'dropin']
+    keys = [f"KEY_{idx}" for idx in range(8)]
+    defined = { key: [layer for layer in layers if rng.random() < 0.5] for key in keys }
+
+    def env_lines(layer:str)->list[str]:
+        return [f"{key}=\"{layer}-{key}\"" for key in keys if layer in defined[key]]
+
+    base_path = write_file(os.path.join(svc_dir, 'shared.env'), '\n'.join(env_lines('base')))
+    own_path = write_file(os.path.join(svc_dir, 'netapp.api.env'), '\n'.join(env_lines('own')))
+    dropin_env = write_file(os.path.join(svc_dir, 'extra.env'), '\n'.join(env_lines('dropin')))
+    environment = ' '.join(f"{key}=unit-{key}" for key in keys if 'unit' in defined[key])
+    svc_path = write_file(os.path.join(svc_dir, 'netapp.api.service'),
+        f"[Unit]\nDescription=Api\n\n[Service]\nExecStart=/www/api/Api\n"
+        f"{'Environment=' + environment if environment else ''}\n"
+        f"EnvironmentFile=-{base_path}\nEnvironmentFile={own_path}\n")
+    write_file(os.path.join(svc_dir, 'netapp.api.service.d', 'env.conf'), f"[Service]\nEnvironmentFile={dropin_env}\n")
+
+    svc = read_service(svc_path)
+    assert svc.EnvironmentFile == own_path
+    assert svc.BaseEnvironmentFiles == [base_path]
+    resolved = svc.ResolvedEnvironment
+    for key, key_layers in defined.items():
+        if len(key_layers) == 0:
+            assert key not in resolved
+            assert svc.get_environment_variable(key) is None
+            continue
+        winner = key_layers[-1]
+        expected = f"{winner}-{key}"
+        assert resolved[key].strip('"') == expected
+        assert svc.get_environment_variable(key) == expected